@@ -0,0 +1,69 @@
+"""
+Measure the memory used per entity by the architecture model.
+
+Builds a document shaped like the ones ManifestParser produces: every component receives implicit
+Intents from the message bus and sends explicit Intents to a few other components through their own
+connectors. Run with "python3 benchmarks/memory.py [components] [intents per component]".
+"""
+import os
+import sys
+import tracemalloc
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from entities import Component, Connector, Interface, Document
+
+
+def build_document(component_count, intents_per_component):
+    doc = Document("memory.xml", "memory")
+    bus = doc.add_bus()
+
+    components = []
+    for i in range(component_count):
+        component = Component(name=f"com.example.app.Activity{i}")
+        doc.add_component(component)
+        interface_in = Interface(direction=Interface.DIRECTION_IN)
+        component.add_interface_in(interface_in)
+        doc.add_link(bus, interface_in)
+        components.append(component)
+
+    for i, sender in enumerate(components):
+        for j in range(1, intents_per_component + 1):
+            receiver = components[(i + j) % component_count]
+
+            sender_interface_out = Interface(direction=Interface.DIRECTION_OUT)
+            sender.add_interface_out(sender_interface_out)
+            receiver_interface_in = Interface(direction=Interface.DIRECTION_IN)
+            receiver.add_interface_in(receiver_interface_in)
+
+            connector = Connector(name=f"Explicit Intent from {sender.get_name()} to {receiver.get_name()}")
+            doc.add_connector(connector)
+            doc.add_link(sender_interface_out, connector)
+            doc.add_link(connector, receiver_interface_in)
+
+    return doc
+
+
+def count_entities(doc):
+    interfaces = sum(len(component.get_interfaces()) for component in doc.get_components())
+    # every connector owns exactly one in and one out interface
+    interfaces += 2 * len(doc.get_connectors())
+    return len(doc.get_components()) + len(doc.get_connectors()) + len(doc.get_links()) + interfaces
+
+
+def measure(component_count, intents_per_component):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    doc = build_document(component_count, intents_per_component)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    entities = count_entities(doc)
+    return allocated, entities
+
+
+if __name__ == "__main__":
+    component_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    intents_per_component = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    allocated, entities = measure(component_count, intents_per_component)
+    print(f"{entities} entities, {allocated / 1024 / 1024:.1f} MiB allocated, {allocated / entities:.1f} bytes per entity")
@@ -0,0 +1,168 @@
+"""
+Time each phase of the analysis on synthetic projects of increasing size.
+
+For every size a synthetic project is generated (see synthetic_app.py) and analyzed, timing the manifest
+parse, the source scan, the link resolution and the xADL serialization separately. Results are written
+as JSON, and can be compared against a saved baseline to flag phases that got slower.
+
+    python3 benchmarks/run.py --output baseline.json
+    python3 benchmarks/run.py --compare baseline.json --threshold 0.2
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from manifest_parser import ManifestParser
+from synthetic_app import SyntheticApp, add_app_arguments, generate
+
+
+DEFAULT_SIZES = (10, 1000, 10000, 50000)
+
+PHASES = ("parse", "scan", "link", "serialize")
+
+# differences below this many seconds are noise, whatever the ratio, so tiny apps don't flag regressions
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def run_phases(manifest_path, src_dir):
+    """
+    Analyze a project once.
+    Returns a dictionary mapping each phase to the seconds it took, along with the size of the result
+    """
+    # no cache, so every run measures the extraction itself
+    parser = ManifestParser(id_allocator="counter")
+    timings = {}
+
+    start = time.perf_counter()
+    doc, components, authorities = parser.parse_manifest(manifest_path, "benchmark")
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    links_to_add = parser.find_source_links(doc, components, authorities, src_dir)
+    timings["scan"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parser.add_explicit_links(doc, links_to_add)
+    timings["link"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    output = io.BytesIO()
+    doc.write_xml(output)
+    timings["serialize"] = time.perf_counter() - start
+
+    timings["total"] = sum(timings[phase] for phase in PHASES)
+    timings["components"] = len(doc.get_components())
+    timings["connectors"] = len(doc.get_connectors())
+    timings["links"] = len(doc.get_links())
+    timings["output_bytes"] = len(output.getvalue())
+    return timings
+
+
+def run_size(size, app_options, repeat):
+    """
+    Generate a project with size components and analyze it repeat times, keeping the fastest time of each phase
+    """
+    app = SyntheticApp(components=size, **app_options)
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest_path, src_dir = generate(tmp, app)
+
+        best = None
+        for _ in range(repeat):
+            timings = run_phases(manifest_path, src_dir)
+            if best is None:
+                best = timings
+            else:
+                for phase in PHASES + ("total",):
+                    best[phase] = min(best[phase], timings[phase])
+    return best
+
+
+def run_benchmarks(sizes, app_options, repeat=1):
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "app": app_options,
+        "repeat": repeat,
+        "sizes": {},
+    }
+    for size in sizes:
+        timings = run_size(size, app_options, repeat)
+        results["sizes"][str(size)] = timings
+        print(f"{size:>6} components: " + ", ".join(f"{phase} {timings[phase]:.3f}s" for phase in PHASES + ("total",)),
+              flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results against a baseline.
+    Returns a list of (size, phase, baseline_seconds, seconds) for every phase that is more than
+    threshold (e.g. 0.2 for 20%) slower than in the baseline
+    """
+    regressions = []
+    for size, timings in results["sizes"].items():
+        if size not in baseline["sizes"]:
+            continue
+        for phase in PHASES + ("total",):
+            before = baseline["sizes"][size].get(phase)
+            after = timings[phase]
+            if before is None:
+                continue
+            if after > before * (1 + threshold) and after - before > MIN_REGRESSION_SECONDS:
+                regressions.append((size, phase, before, after))
+    return regressions
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Benchmark the analyzer on synthetic Android projects.')
+    arg_parser.add_argument('--sizes', dest='sizes', type=str, default=",".join(str(size) for size in DEFAULT_SIZES),
+                            help='Comma separated numbers of components to benchmark')
+    arg_parser.add_argument('--repeat', dest='repeat', type=int, default=1,
+                            help='Number of runs per size, the fastest time of each phase is kept')
+    arg_parser.add_argument('--output', dest='output', type=str, default=None,
+                            help='Write the results as JSON to this file')
+    arg_parser.add_argument('--compare', dest='compare', type=str, default=None,
+                            help='JSON results of a previous run to compare against')
+    arg_parser.add_argument('--threshold', dest='threshold', type=float, default=0.2,
+                            help='Relative slowdown over the baseline that counts as a regression')
+    add_app_arguments(arg_parser)
+    args = arg_parser.parse_args(argv)
+
+    app_options = {
+        "intent_density": args.intent_density,
+        "implicit_ratio": args.implicit_ratio,
+        "file_size": args.file_size,
+        "seed": args.seed,
+    }
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = run_benchmarks(sizes, app_options, repeat=args.repeat)
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+
+        if baseline.get("app") != app_options:
+            print(f"Warning: the baseline was generated with different options {baseline.get('app')}")
+
+        regressions = compare(results, baseline, args.threshold)
+        for size, phase, before, after in regressions:
+            print(f"REGRESSION {size} components, {phase}: {before:.3f}s -> {after:.3f}s "
+                  f"(+{(after / before - 1) * 100:.0f}%)")
+        if len(regressions) > 0:
+            return 1
+        print(f"No regressions beyond {args.threshold * 100:.0f}%")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+Generate synthetic Android projects to benchmark the analyzer with.
+
+Each project has an AndroidManifest.xml and one Java source file per component. The number of
+components, how many Intents each component sends, the share of implicit Intents and the size of the
+source files are configurable, and the same seed always produces the same project.
+Run with "python3 benchmarks/synthetic_app.py output_dir [--components N] [options]".
+"""
+import argparse
+import os
+import random
+
+
+PACKAGE_NAME = "com.example.bench"
+
+# share of each kind of component, the rest are activities
+SERVICE_SHARE = 0.15
+RECEIVER_SHARE = 0.1
+PROVIDER_SHARE = 0.05
+
+# components per Java package, so no single source directory grows too large
+COMPONENTS_PER_PACKAGE = 1000
+
+# share of the activities declaring an intent filter, and so receiving implicit Intents
+INTENT_FILTER_SHARE = 0.3
+
+IMPLICIT_ACTIONS = ("Intent.ACTION_VIEW", "Intent.ACTION_SEND", "\"com.example.bench.ACTION_SYNC\"")
+
+FILLER_METHOD = """
+    // keeps the synthetic sources close to the size of real ones
+    private int compute{index}(int value) {{
+        String label = "value {index}: " + value;
+        /* a block comment mentioning new Intent(this, Ignored.class) */
+        return label.length() + value * {index};
+    }}
+"""
+
+
+class SyntheticApp:
+    """
+    Parameters of a synthetic project
+    """
+    def __init__(self, components=10, intent_density=2.0, implicit_ratio=0.2, file_size=2048, seed=0):
+        self.components = components
+
+        # mean number of Intents sent by each component
+        self.intent_density = intent_density
+
+        # share of the Intents that are implicit
+        self.implicit_ratio = implicit_ratio
+
+        # approximate size of each Java source file in bytes
+        self.file_size = file_size
+
+        self.seed = seed
+
+    def to_dict(self):
+        return {
+            "components": self.components,
+            "intent_density": self.intent_density,
+            "implicit_ratio": self.implicit_ratio,
+            "file_size": self.file_size,
+            "seed": self.seed,
+        }
+
+
+def get_component_type(index, count):
+    # component types are laid out in contiguous ranges so every type is present even in small apps
+    share = index / count
+    if share < PROVIDER_SHARE:
+        return "Provider"
+    if share < PROVIDER_SHARE + RECEIVER_SHARE:
+        return "Receiver"
+    if share < PROVIDER_SHARE + RECEIVER_SHARE + SERVICE_SHARE:
+        return "Service"
+    return "Activity"
+
+
+def get_class_name(index, component_type):
+    return f"m{index // COMPONENTS_PER_PACKAGE}.{component_type}{index}"
+
+
+def get_intent_count(rng, intent_density):
+    count = int(intent_density)
+    if rng.random() < intent_density - count:
+        count += 1
+    return count
+
+
+def get_intent_statement(rng, app, types):
+    if rng.random() < app.implicit_ratio:
+        return f"startActivity(new Intent({rng.choice(IMPLICIT_ACTIONS)}));"
+
+    target = rng.randrange(app.components)
+    target_type = types[target]
+    target_class = get_class_name(target, target_type).split(".")[-1]
+    if target_type == "Service":
+        return f"startService(new Intent(this, {target_class}.class));"
+    if target_type == "Receiver":
+        return f"sendBroadcast(new Intent(this, {target_class}.class));"
+    if target_type == "Provider":
+        return f"getContentResolver().query(Uri.parse(\"content://{PACKAGE_NAME}.provider{target}/items\"), null, null, null, null);"
+    return f"startActivity(new Intent(this, {target_class}.class));"
+
+
+def write_source(path, package_name, class_name, statements, file_size):
+    body = "".join(f"        {statement}\n" for statement in statements)
+    content = (f"package {package_name};\n\npublic class {class_name} {{\n"
+               f"    void communicate() {{\n{body}    }}\n")
+
+    index = 0
+    while len(content) < file_size:
+        content += FILLER_METHOD.format(index=index)
+        index += 1
+    content += "}\n"
+
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def generate(output_dir, app):
+    """
+    Write a synthetic project to output_dir.
+    Returns a tuple (manifest_path, src_dir)
+    """
+    rng = random.Random(app.seed)
+    types = [get_component_type(i, app.components) for i in range(app.components)]
+    src_dir = os.path.join(output_dir, "src")
+
+    manifest = [f'<manifest xmlns:android="http://schemas.android.com/apk/res/android" package="{PACKAGE_NAME}">',
+                "    <application>"]
+
+    for index, component_type in enumerate(types):
+        class_name = get_class_name(index, component_type)
+        tag = component_type.lower()
+        attributes = f'android:name=".{class_name}"'
+        if component_type == "Provider":
+            attributes += f' android:authorities="{PACKAGE_NAME}.provider{index}"'
+
+        if component_type == "Activity" and rng.random() < INTENT_FILTER_SHARE:
+            manifest.append(f"        <{tag} {attributes}>")
+            manifest.append('            <intent-filter><action android:name="android.intent.action.VIEW"/></intent-filter>')
+            manifest.append(f"        </{tag}>")
+        else:
+            manifest.append(f"        <{tag} {attributes}/>")
+
+        package_name, simple_name = f"{PACKAGE_NAME}.{class_name}".rsplit(".", 1)
+        package_dir = os.path.join(src_dir, *package_name.split("."))
+        os.makedirs(package_dir, exist_ok=True)
+
+        statements = [get_intent_statement(rng, app, types) for _ in range(get_intent_count(rng, app.intent_density))]
+        write_source(os.path.join(package_dir, simple_name + ".java"), package_name, simple_name, statements,
+                     app.file_size)
+
+    manifest.append("    </application>")
+    manifest.append("</manifest>")
+
+    manifest_path = os.path.join(output_dir, "AndroidManifest.xml")
+    with open(manifest_path, "w") as f:
+        f.write("\n".join(manifest) + "\n")
+
+    return manifest_path, src_dir
+
+
+def add_app_arguments(arg_parser):
+    """
+    Add the command line options describing a synthetic project, except the number of components
+    """
+    arg_parser.add_argument('--intent-density', dest='intent_density', type=float, default=2.0,
+                            help='Mean number of Intents sent by each component')
+    arg_parser.add_argument('--implicit-ratio', dest='implicit_ratio', type=float, default=0.2,
+                            help='Share of the Intents that are implicit')
+    arg_parser.add_argument('--file-size', dest='file_size', type=int, default=2048,
+                            help='Approximate size of each Java source file in bytes')
+    arg_parser.add_argument('--seed', dest='seed', type=int, default=0,
+                            help='Seed of the generator, the same seed always produces the same project')
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description='Generate a synthetic Android project.')
+    arg_parser.add_argument('output_dir', type=str, help='Directory to write the project to')
+    arg_parser.add_argument('--components', dest='components', type=int, default=10,
+                            help='Number of components declared in the manifest')
+    add_app_arguments(arg_parser)
+    args = arg_parser.parse_args()
+
+    app = SyntheticApp(args.components, args.intent_density, args.implicit_ratio, args.file_size, args.seed)
+    manifest_path, src_dir = generate(args.output_dir, app)
+    print(f"Wrote {manifest_path} and {app.components} sources under {src_dir}")
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the modules in src import each other by their plain names because main.py is run as a script,
+# so make those names resolvable when the modules are imported through the src package as well
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
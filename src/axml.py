@@ -0,0 +1,257 @@
+import struct
+import xml.etree.ElementTree as ET
+import zipfile
+
+
+# chunk types of Android's binary XML, see ResourceTypes.h in the Android framework
+RES_STRING_POOL_TYPE = 0x0001
+RES_XML_TYPE = 0x0003
+RES_XML_START_NAMESPACE_TYPE = 0x0100
+RES_XML_END_NAMESPACE_TYPE = 0x0101
+RES_XML_START_ELEMENT_TYPE = 0x0102
+RES_XML_END_ELEMENT_TYPE = 0x0103
+RES_XML_CDATA_TYPE = 0x0104
+RES_XML_RESOURCE_MAP_TYPE = 0x0180
+
+# string pool flags
+UTF8_FLAG = 1 << 8
+
+# types of Res_value
+TYPE_NULL = 0x00
+TYPE_REFERENCE = 0x01
+TYPE_ATTRIBUTE = 0x02
+TYPE_STRING = 0x03
+TYPE_FLOAT = 0x04
+TYPE_DIMENSION = 0x05
+TYPE_FRACTION = 0x06
+TYPE_INT_DEC = 0x10
+TYPE_INT_HEX = 0x11
+TYPE_INT_BOOLEAN = 0x12
+TYPE_FIRST_COLOR_INT = 0x1c
+TYPE_LAST_COLOR_INT = 0x1f
+
+NO_ENTRY = 0xffffffff
+
+ANDROID_NAMESPACE = "http://schemas.android.com/apk/res/android"
+
+MANIFEST_ENTRY = "AndroidManifest.xml"
+
+# names of the framework attributes the analysis reads, by resource id. Release builds may strip
+# the attribute names from the string pool, in which case they are recovered from the resource map
+ANDROID_ATTRIBUTES = {
+    0x01010001: "label",
+    0x01010002: "icon",
+    0x01010003: "name",
+    0x01010006: "permission",
+    0x01010010: "exported",
+    0x01010011: "process",
+    0x01010018: "authorities",
+    0x0101001b: "grantUriPermissions",
+    0x0101001c: "priority",
+    0x01010026: "mimeType",
+    0x01010027: "scheme",
+    0x01010028: "host",
+    0x01010029: "port",
+    0x0101002a: "path",
+    0x0101002b: "pathPrefix",
+    0x0101002c: "pathPattern",
+    0x0101020c: "minSdkVersion",
+    0x0101021b: "versionCode",
+    0x0101021c: "versionName",
+    0x01010270: "targetSdkVersion",
+}
+
+CHUNK_HEADER = struct.Struct("<HHI")
+STRING_POOL_HEADER = struct.Struct("<IIIII")
+NODE_HEADER = struct.Struct("<II")
+NAMESPACE = struct.Struct("<II")
+ELEMENT = struct.Struct("<IIHHHHHH")
+END_ELEMENT = struct.Struct("<II")
+ATTRIBUTE = struct.Struct("<IIIHBBI")
+
+
+class AxmlError(Exception):
+    """
+    Raised when binary XML is truncated or malformed
+    """
+    pass
+
+
+def is_binary_xml(content):
+    """
+    Check whether a file starts like Android's binary XML rather than text
+    """
+    return len(content) >= CHUNK_HEADER.size and CHUNK_HEADER.unpack_from(content, 0)[0] == RES_XML_TYPE
+
+
+def read_string_pool(data, offset):
+    """
+    Read the strings of the string pool chunk starting at offset
+    """
+    _, header_size, _ = CHUNK_HEADER.unpack_from(data, offset)
+    string_count, _, flags, strings_start, _ = STRING_POOL_HEADER.unpack_from(data, offset + CHUNK_HEADER.size)
+    offsets = struct.unpack_from(f"<{string_count}I", data, offset + header_size)
+    is_utf8 = flags & UTF8_FLAG != 0
+    base = offset + strings_start
+
+    strings = []
+    for string_offset in offsets:
+        position = base + string_offset
+        if is_utf8:
+            # the length in UTF-16 code units comes first, then the length in bytes, each on one or two bytes
+            _, position = read_utf8_length(data, position)
+            length, position = read_utf8_length(data, position)
+            strings.append(bytes(data[position:position + length]).decode("utf-8", errors="replace"))
+        else:
+            length = struct.unpack_from("<H", data, position)[0]
+            position += 2
+            if length & 0x8000:
+                length = ((length & 0x7fff) << 16) | struct.unpack_from("<H", data, position)[0]
+                position += 2
+            strings.append(bytes(data[position:position + length * 2]).decode("utf-16-le", errors="replace"))
+    return strings
+
+
+def read_utf8_length(data, position):
+    length = data[position]
+    position += 1
+    if length & 0x80:
+        length = ((length & 0x7f) << 8) | data[position]
+        position += 1
+    return length, position
+
+
+def format_value(data_type, value, strings):
+    """
+    Format a typed attribute value the way aapt dump shows it
+    """
+    if data_type == TYPE_STRING:
+        return strings[value] if value < len(strings) else ""
+    if data_type == TYPE_REFERENCE:
+        return f"@0x{value:08x}"
+    if data_type == TYPE_ATTRIBUTE:
+        return f"?0x{value:08x}"
+    if data_type == TYPE_INT_BOOLEAN:
+        return "true" if value != 0 else "false"
+    if data_type == TYPE_INT_HEX:
+        return f"0x{value:08x}"
+    if data_type == TYPE_FLOAT:
+        return repr(struct.unpack("<f", struct.pack("<I", value))[0])
+    if TYPE_FIRST_COLOR_INT <= data_type <= TYPE_LAST_COLOR_INT:
+        return f"#{value:08x}"
+    if data_type == TYPE_NULL:
+        return ""
+    # decimal integers, and the dimensions and fractions we have no use for, as signed integers
+    return str(struct.unpack("<i", struct.pack("<I", value))[0])
+
+
+class AxmlDecoder:
+    """
+    Decodes Android's binary XML, as found in the AndroidManifest.xml of an APK, into the same
+    ElementTree elements ElementTree.fromstring builds from the text form. Attribute names are
+    qualified by their namespace URI, e.g. "{http://schemas.android.com/apk/res/android}name".
+    """
+    def __init__(self, data):
+        self.data = data
+        self.strings = []
+        self.resource_ids = []
+
+    def get_string(self, index):
+        if index == NO_ENTRY:
+            return None
+        if index >= len(self.strings):
+            raise AxmlError(f"String index {index} is out of range")
+        return self.strings[index]
+
+    def get_attribute_name(self, index):
+        name = self.get_string(index)
+        if (name is None or len(name) == 0) and index < len(self.resource_ids):
+            name = ANDROID_ATTRIBUTES.get(self.resource_ids[index], f"0x{self.resource_ids[index]:08x}")
+        return name
+
+    def qualify(self, namespace_index, name):
+        namespace = self.get_string(namespace_index)
+        return name if namespace is None else f"{{{namespace}}}{name}"
+
+    def decode(self):
+        data = self.data
+        if not is_binary_xml(data):
+            raise AxmlError("Not Android binary XML")
+
+        _, header_size, size = CHUNK_HEADER.unpack_from(data, 0)
+        end = min(size, len(data))
+        builder = ET.TreeBuilder()
+        depth = 0
+
+        offset = header_size
+        while offset + CHUNK_HEADER.size <= end:
+            chunk_type, chunk_header_size, chunk_size = CHUNK_HEADER.unpack_from(data, offset)
+            if chunk_size < CHUNK_HEADER.size or offset + chunk_size > end:
+                raise AxmlError(f"Chunk at offset {offset} has an invalid size {chunk_size}")
+
+            if chunk_type == RES_STRING_POOL_TYPE:
+                self.strings = read_string_pool(data, offset)
+            elif chunk_type == RES_XML_RESOURCE_MAP_TYPE:
+                count = (chunk_size - chunk_header_size) // 4
+                self.resource_ids = struct.unpack_from(f"<{count}I", data, offset + chunk_header_size)
+            elif chunk_type == RES_XML_START_ELEMENT_TYPE:
+                builder.start(*self.read_element(offset + chunk_header_size))
+                depth += 1
+            elif chunk_type == RES_XML_END_ELEMENT_TYPE:
+                namespace_index, name_index = END_ELEMENT.unpack_from(data, offset + chunk_header_size)
+                builder.end(self.qualify(namespace_index, self.get_string(name_index)))
+                depth -= 1
+            elif chunk_type == RES_XML_CDATA_TYPE:
+                text = self.get_string(struct.unpack_from("<I", data, offset + chunk_header_size)[0])
+                if text is not None:
+                    builder.data(text)
+            # namespace chunks only declare prefixes, and names are already qualified by their URI
+
+            offset += chunk_size
+
+        if depth != 0:
+            raise AxmlError("Binary XML ended before every element was closed")
+
+        return builder.close()
+
+    def read_element(self, offset):
+        """
+        Read the ResXMLTree_attrExt of a start element chunk.
+        Returns a tuple (tag, attributes)
+        """
+        namespace_index, name_index, attribute_start, attribute_size, attribute_count, _, _, _ = \
+            ELEMENT.unpack_from(self.data, offset)
+        tag = self.qualify(namespace_index, self.get_string(name_index))
+
+        attributes = {}
+        for i in range(attribute_count):
+            attribute_namespace, attribute_name, raw_value, _, _, data_type, value = \
+                ATTRIBUTE.unpack_from(self.data, offset + attribute_start + i * attribute_size)
+            name = self.qualify(attribute_namespace, self.get_attribute_name(attribute_name))
+            if raw_value != NO_ENTRY:
+                attributes[name] = self.get_string(raw_value)
+            else:
+                attributes[name] = format_value(data_type, value, self.strings)
+        return tag, attributes
+
+
+def decode(data):
+    """
+    Decode binary XML held in a bytes-like object into an ElementTree element
+    """
+    try:
+        return AxmlDecoder(data).decode()
+    except (struct.error, IndexError) as e:
+        raise AxmlError(f"Truncated binary XML: {e}")
+
+
+def is_apk(path):
+    return path.lower().endswith(".apk")
+
+
+def read_apk_manifest(path):
+    """
+    Read the binary AndroidManifest.xml of an APK without extracting anything else from the archive
+    """
+    with zipfile.ZipFile(path) as apk:
+        return apk.read(MANIFEST_ENTRY)
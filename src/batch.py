@@ -0,0 +1,263 @@
+from entities import get_default_output_dir
+from manifest_parser import ManifestParser
+from intent_cache import add_cache_arguments, create_cache
+from source_scanner import EXTRACTOR_VERSION
+from identifiers import ID_ALLOCATORS
+from axml import is_apk
+from profiling import Profiler, NULL_PROFILER
+from exporters import add_format_arguments
+from store import ArchitectureStore, DocumentRows, add_store_arguments
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import json
+import logging
+import os
+import time
+
+
+MANIFEST_FILE_NAME = "AndroidManifest.xml"
+
+
+class BatchJob:
+    """
+    A single app to analyze as part of a batch run
+    """
+    def __init__(self, manifest, structure, src_dir=None, res_dir=None, lib_dir=None, dex_files=None):
+        self.manifest = manifest
+        self.structure = structure
+        self.src_dir = src_dir
+        self.res_dir = res_dir
+        self.lib_dir = lib_dir
+        self.dex_files = dex_files
+
+
+def read_manifest_list(list_file):
+    """
+    Read a manifest list file. Each non-empty line holds the path to a manifest followed by the optional
+    paths to its source roots, separated by whitespace. Lines starting with # are ignored and relative
+    paths are resolved against the directory containing the list file.
+    """
+    base_dir = os.path.dirname(os.path.abspath(list_file))
+    entries = []
+    with open(list_file, "r") as f:
+        for line in f:
+            line = line.strip()
+            if len(line) == 0 or line.startswith("#"):
+                continue
+
+            fields = line.split()
+            manifest = os.path.join(base_dir, fields[0])
+            src_dir = [os.path.join(base_dir, field) for field in fields[1:]] if len(fields) > 1 else None
+            entries.append((manifest, src_dir))
+    return entries
+
+
+def find_app_roots(directory):
+    """
+    Find every app root directly inside a directory. An app root contains an AndroidManifest.xml and,
+    optionally, a src/ directory with its source code. APKs directly inside the directory are apps as well.
+    """
+    entries = []
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if entry.is_file() and is_apk(entry.name):
+            entries.append((entry.path, None))
+            continue
+        if not entry.is_dir():
+            continue
+
+        manifest = os.path.join(entry.path, MANIFEST_FILE_NAME)
+        if not os.path.isfile(manifest):
+            logging.debug(f"Skipping {entry.path}, no {MANIFEST_FILE_NAME} found")
+            continue
+
+        src_dir = os.path.join(entry.path, "src")
+        entries.append((manifest, src_dir if os.path.isdir(src_dir) else None))
+    return entries
+
+
+def build_jobs(entries):
+    """
+    Turn (manifest, src_dir) pairs into jobs, naming each structure after the directory containing its
+    manifest, or after the APK, and making the names unique so no two apps write to the same output file
+    """
+    jobs = []
+    used_names = set()
+    for manifest, src_dir in entries:
+        if is_apk(manifest):
+            base_name = os.path.splitext(os.path.basename(manifest))[0] or "app"
+        else:
+            base_name = os.path.basename(os.path.dirname(os.path.abspath(manifest))) or "app"
+        name = base_name
+        suffix = 2
+        while name in used_names:
+            name = f"{base_name}-{suffix}"
+            suffix += 1
+        used_names.add(name)
+        jobs.append(BatchJob(manifest, name, src_dir))
+    return jobs
+
+
+def analyze_app(job, output_dir, parser_options, profile=None, export_options=None, store_rows=False, output=None):
+    """
+    Analyze a single app and write its architecture. This runs inside a worker process, so it only
+    returns a small dictionary describing the result rather than the Document itself.
+    If profile is the path of a file, a profile of the analysis is written to it, see profiling.py.
+    export_options are passed on to Document.write_current_contents, e.g. {"format": "json"}.
+    output, the path of a file or of a directory ending with a separator, replaces output_dir.
+    With store_rows, the DocumentRows of the architecture are returned as "rows" for the parent process
+    to write to the store, see run_jobs.
+    """
+    start = time.perf_counter()
+    result = {
+        "manifest": job.manifest,
+        "structure": job.structure,
+        "status": "ok",
+    }
+
+    try:
+        # memory isn't traced, tracemalloc is global to the process and other analyses may be running
+        profiler = Profiler(trace_memory=False) if profile is not None else NULL_PROFILER
+        profiler.start()
+
+        parser = ManifestParser(profiler=profiler, **parser_options)
+        doc = parser.parse(job.manifest, job.structure, src_dir=job.src_dir, res_dir=job.res_dir,
+                           lib_dir=job.lib_dir, dex_files=job.dex_files)
+        parsed = time.perf_counter()
+
+        with profiler.phase("write_xml"):
+            if output is not None:
+                result["output"] = doc.export(output, **(export_options or {}))
+            else:
+                result["output"] = doc.write_current_contents(output_dir, **(export_options or {}))
+
+        profiler.stop()
+        if profile is not None:
+            profiler.write(profile)
+
+        result["components"] = len(doc.get_components())
+        result["connectors"] = len(doc.get_connectors())
+        result["links"] = len(doc.get_links())
+        result["diagnostics"] = doc.get_diagnostics()
+        result["parse_seconds"] = parsed - start
+        if store_rows:
+            result["rows"] = DocumentRows(doc)
+    except (Exception, SystemExit) as e:
+        # the parser exits on fatal errors, don't let that take down the whole worker
+        result["status"] = "error"
+        if isinstance(e, SystemExit):
+            result["error"] = "The analysis stopped on a fatal error, see the log for details"
+        else:
+            result["error"] = f"{type(e).__name__}: {e}"
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_jobs(jobs, output_dir=None, workers=None, parser_options=None, export_options=None, store=None):
+    """
+    Analyze every job across a pool of worker processes and return the results in job order. Given an
+    ArchitectureStore, every architecture is also stored as its result comes in, this process being
+    the only writer.
+    """
+    if parser_options is None:
+        parser_options = {}
+
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(analyze_app, job, output_dir, parser_options, None, export_options, store is not None): i
+                   for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            result = future.result()
+            rows = result.pop("rows", None)
+            if rows is not None:
+                store.add_rows(rows)
+            results[futures[future]] = result
+            logging.info(f"[{result['status']}] {result['structure']} ({result['seconds']:.3f}s)")
+    return results
+
+
+def build_summary(results, seconds):
+    failed = [result for result in results if result["status"] != "ok"]
+    return {
+        "apps": len(results),
+        "succeeded": len(results) - len(failed),
+        "failed": len(failed),
+        "seconds": seconds,
+        "results": results,
+    }
+
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='main.py batch',
+                                         description='Extract the architectures of many android applications in parallel.')
+
+    arg_parser.add_argument('input', metavar='input', type=str,
+                            help='Path to a manifest list file, or to a directory whose subdirectories are app roots')
+
+    arg_parser.add_argument('--debug', dest='debug', action='store_const',
+                            const=True, default=False,
+                            help='Run the program in debug mode')
+    arg_parser.add_argument('--workers', dest='workers', type=int, default=None,
+                            help='Number of worker processes (default: number of CPUs)')
+    arg_parser.add_argument('--output-dir', dest='output_dir', type=str, default=None,
+                            help='Directory to write the extracted architectures to (default: output/)')
+    arg_parser.add_argument('--summary', dest='summary', type=str, default=None,
+                            help='Path of the JSON summary to write (default: batch-summary.json in the output directory)')
+    arg_parser.add_argument('--stream', dest='stream', action='store_const',
+                            const=True, default=False,
+                            help='Parse manifests incrementally (see main.py --help)')
+    arg_parser.add_argument('--aggregate', dest='aggregate', action='store_const',
+                            const=True, default=False,
+                            help='Use a single connector per pair of components (see main.py --help)')
+    add_cache_arguments(arg_parser)
+    arg_parser.add_argument('--ids', dest='ids', choices=sorted(ID_ALLOCATORS), default='random',
+                            help='How entity ids are allocated (see main.py --help)')
+    add_format_arguments(arg_parser)
+    add_store_arguments(arg_parser)
+
+    return arg_parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    if os.path.isdir(args.input):
+        entries = find_app_roots(args.input)
+    else:
+        entries = read_manifest_list(args.input)
+
+    jobs = build_jobs(entries)
+    logging.info(f"Analyzing {len(jobs)} apps")
+
+    start = time.perf_counter()
+    # the cache is shared by every worker, which is also how identical files across apps become hits
+    parser_options = {"cache": create_cache(args, EXTRACTOR_VERSION), "id_allocator": args.ids, "stream": args.stream,
+                      "aggregate": args.aggregate}
+    export_options = {"format": args.format, "compress": args.gzip}
+    store = ArchitectureStore(args.store) if args.store is not None else None
+    try:
+        results = run_jobs(jobs, output_dir=args.output_dir, workers=args.workers, parser_options=parser_options,
+                           export_options=export_options, store=store)
+    finally:
+        if store is not None:
+            store.close()
+    summary = build_summary(results, time.perf_counter() - start)
+
+    summary_file = args.summary
+    if summary_file is None:
+        output_dir = args.output_dir if args.output_dir is not None else get_default_output_dir()
+        os.makedirs(output_dir, exist_ok=True)
+        summary_file = os.path.join(output_dir, "batch-summary.json")
+
+    with open(summary_file, "w") as f:
+        json.dump(summary, f, indent=4)
+
+    print(f"Analyzed {summary['apps']} apps ({summary['succeeded']} succeeded, {summary['failed']} failed) "
+          f"in {summary['seconds']:.3f}s. Summary written to {summary_file}")
+
+    return 0 if summary["failed"] == 0 else 1
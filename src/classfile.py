@@ -0,0 +1,341 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from intent_extractor import SEND_APIS, Finding
+import logging
+import os
+import re
+import struct
+import zipfile
+
+
+CLASS_MAGIC = 0xCAFEBABE
+
+HEADER = struct.Struct(">IHHH")
+U1 = struct.Struct(">B")
+U2 = struct.Struct(">H")
+U2_PAIR = struct.Struct(">HH")
+U4 = struct.Struct(">I")
+
+# constant pool tags, see chapter 4.4 of the JVM specification
+CONSTANT_UTF8 = 1
+CONSTANT_CLASS = 7
+CONSTANT_STRING = 8
+CONSTANT_METHODREF = 10
+CONSTANT_INTERFACE_METHODREF = 11
+CONSTANT_NAME_AND_TYPE = 12
+
+# the size of the entries that are skipped, by tag. Longs and doubles also take two slots of the pool
+SKIPPED_SIZES = {3: 4, 4: 4, 5: 8, 6: 8, 9: 4, 15: 3, 16: 2, 17: 4, 18: 4, 19: 2, 20: 2}
+WIDE_TAGS = (5, 6)
+
+OP_LDC = 0x12
+OP_LDC_W = 0x13
+OP_TABLESWITCH = 0xaa
+OP_LOOKUPSWITCH = 0xab
+OP_WIDE = 0xc4
+OP_IINC = 0x84
+
+
+def get_instruction_lengths():
+    # the length of each opcode in bytes with its operands, 0 for the switches whose length varies and
+    # for the opcodes that don't exist, see chapter 6.5 of the JVM specification
+    lengths = [1] * 0xcb + [0] * (256 - 0xcb)
+    for opcodes, length in (((0x10, 0x12, 0xa9, 0xbc), 2), (range(0x15, 0x1a), 2), (range(0x36, 0x3b), 2),
+                            ((0x11, 0x13, 0x14, 0x84, 0xbb, 0xbd, 0xc0, 0xc1, 0xc6, 0xc7), 3),
+                            (range(0x99, 0xa9), 3), (range(0xb2, 0xb9), 3), ((0xc5,), 4),
+                            ((0xb9, 0xba, 0xc8, 0xc9), 5), ((OP_TABLESWITCH, OP_LOOKUPSWITCH), 0)):
+        for opcode in opcodes:
+            lengths[opcode] = length
+    return lengths
+
+
+INSTRUCTION_LENGTHS = get_instruction_lengths()
+
+INTENT_CLASS = "android/content/Intent"
+
+# methods sending an Intent, on whatever class they are called, e.g. Context, Activity or Fragment
+SEND_METHODS = ("startActivity", "startActivityForResult", "startActivities", "startActivityIfNeeded",
+                "startService", "startForegroundService", "bindService", "stopService",
+                "sendBroadcast", "sendOrderedBroadcast", "sendStickyBroadcast")
+
+# string constants shaped like Intent actions, e.g. "android.intent.action.VIEW" or "com.example.ACTION_SYNC",
+# but not extras keys such as "com.example.EXTRA_ID" or permissions such as "android.permission.CAMERA"
+ACTION_PATTERN = re.compile(r"^[a-z]\w*(?:\.\w+)*\.(?:(?<=\.action\.)[A-Z][A-Z0-9_]*|ACTION_[A-Z0-9_]+)$")
+
+# packages whose classes are never app components
+PLATFORM_PREFIXES = ("java/", "javax/", "kotlin/", "android/", "dalvik/")
+
+
+class ClassFileError(Exception):
+    """
+    Raised when a class file is truncated or malformed
+    """
+    pass
+
+
+class ClassInfo:
+    """
+    What the constant pool of a class file references. Class names are in their internal form,
+    e.g. "com/example/MainActivity"
+    """
+    def __init__(self, name, super_name=None, classes=None, methods=None, strings=None, class_constants=None):
+        self.name = name
+        self.super_name = super_name
+
+        # every class referenced by the class, e.g. by its fields, casts and calls
+        self.classes = classes if classes is not None else []
+
+        # the classes loaded by the ldc instructions of its methods, e.g. DetailActivity.class
+        self.class_constants = class_constants if class_constants is not None else []
+
+        # (owner, name, descriptor) of every method called by the class
+        self.methods = methods if methods is not None else []
+
+        self.strings = strings if strings is not None else []
+
+
+def decode_utf8(data):
+    # class files use a modified UTF-8, which only differs from UTF-8 for NUL and supplementary characters
+    return data.decode("utf-8", errors="replace")
+
+
+def read_class(data):
+    """
+    Read the constant pool, name and super class of a class file held in a bytes-like object and, if it
+    calls methods of Intent, the classes its methods load as constants. Bytecode is only walked to find
+    the ldc instructions.
+    """
+    try:
+        magic, _, _, count = HEADER.unpack_from(data, 0)
+        if magic != CLASS_MAGIC:
+            raise ClassFileError("Not a class file")
+
+        # the pool is indexed from 1, each entry is (tag, value)
+        pool = [None] * count
+        offset = HEADER.size
+        index = 1
+        while index < count:
+            tag = data[offset]
+            offset += 1
+            if tag == CONSTANT_UTF8:
+                length = U2.unpack_from(data, offset)[0]
+                pool[index] = (tag, decode_utf8(bytes(data[offset + 2:offset + 2 + length])))
+                offset += 2 + length
+            elif tag in (CONSTANT_CLASS, CONSTANT_STRING):
+                pool[index] = (tag, U2.unpack_from(data, offset)[0])
+                offset += 2
+            elif tag in (CONSTANT_METHODREF, CONSTANT_INTERFACE_METHODREF, CONSTANT_NAME_AND_TYPE):
+                pool[index] = (tag, U2_PAIR.unpack_from(data, offset))
+                offset += 4
+            elif tag in SKIPPED_SIZES:
+                offset += SKIPPED_SIZES[tag]
+                if tag in WIDE_TAGS:
+                    index += 1
+            else:
+                raise ClassFileError(f"Unknown constant pool tag {tag} at offset {offset - 1}")
+            index += 1
+
+        _, this_class, super_class, interfaces = struct.unpack_from(">HHHH", data, offset)
+        offset += 8 + interfaces * 2
+
+        def get_utf8(i):
+            return pool[i][1]
+
+        def get_class_name(i):
+            return get_utf8(pool[i][1]) if i != 0 else None
+
+        info = ClassInfo(get_class_name(this_class), get_class_name(super_class))
+        for entry in pool:
+            if entry is None:
+                continue
+            tag, value = entry
+            if tag == CONSTANT_CLASS:
+                info.classes.append(get_utf8(value))
+            elif tag == CONSTANT_STRING:
+                info.strings.append(get_utf8(value))
+            elif tag in (CONSTANT_METHODREF, CONSTANT_INTERFACE_METHODREF):
+                class_index, name_and_type = value
+                name_index, descriptor_index = pool[name_and_type][1]
+                info.methods.append((get_class_name(class_index), get_utf8(name_index), get_utf8(descriptor_index)))
+
+        if not any(owner == INTENT_CLASS for owner, _, _ in info.methods):
+            return info
+
+        # the fields, then the methods, each with their attributes
+        for is_method in (False, True):
+            count = U2.unpack_from(data, offset)[0]
+            offset += 2
+            for _ in range(count):
+                attributes = U2.unpack_from(data, offset + 6)[0]
+                offset += 8
+                for _ in range(attributes):
+                    name_index, length = struct.unpack_from(">HI", data, offset)
+                    if is_method and get_utf8(name_index) == "Code":
+                        code_length = U4.unpack_from(data, offset + 10)[0]
+                        code = data[offset + 14:offset + 14 + code_length]
+                        for index in get_constant_indexes(code):
+                            if pool[index][0] == CONSTANT_CLASS:
+                                info.class_constants.append(get_utf8(pool[index][1]))
+                    offset += 6 + length
+        return info
+    except (struct.error, IndexError, TypeError) as e:
+        raise ClassFileError(f"Truncated class file: {e}")
+
+
+def get_constant_indexes(code):
+    """
+    Get the constant pool indexes loaded by the ldc and ldc_w instructions of the bytecode of a method
+    """
+    indexes = []
+    position = 0
+    while position < len(code):
+        opcode = code[position]
+        length = INSTRUCTION_LENGTHS[opcode]
+        if opcode == OP_LDC:
+            indexes.append(code[position + 1])
+        elif opcode == OP_LDC_W:
+            indexes.append(U2.unpack_from(code, position + 1)[0])
+        elif opcode == OP_WIDE:
+            length = 6 if code[position + 1] == OP_IINC else 4
+        elif opcode in (OP_TABLESWITCH, OP_LOOKUPSWITCH):
+            # the operands are aligned on 4 bytes from the start of the code
+            operands = (position + 4) & ~3
+            if opcode == OP_TABLESWITCH:
+                low, high = struct.unpack_from(">ii", code, operands + 4)
+                length = operands - position + 12 + (high - low + 1) * 4
+            else:
+                pairs = struct.unpack_from(">i", code, operands + 4)[0]
+                length = operands - position + 8 + pairs * 8
+        if length <= 0:
+            raise ClassFileError(f"Malformed opcode {opcode} at offset {position}")
+        position += length
+    return indexes
+
+
+def get_qualified_name(name):
+    """
+    Get the qualified name of the class a class belongs to, inner and anonymous classes belonging to
+    their outermost class, e.g. "com/example/MainActivity$1" is "com.example.MainActivity"
+    """
+    return name.split("$")[0].replace("/", ".")
+
+
+def get_findings(info):
+    """
+    Get the Findings of a class from the methods and constants it references. Without following the
+    bytecode a class that creates an explicit Intent and sends it is taken to target every class it loads
+    as a constant, which is narrowed down to the components of the manifest afterwards. Implicit Intents
+    are only known to be sent through an API when the class sends through no other.
+    """
+    sends = any(name in SEND_METHODS for _, name, _ in info.methods)
+    if not sends:
+        return []
+
+    explicit = implicit = False
+    for owner, name, descriptor in info.methods:
+        if owner != INTENT_CLASS:
+            continue
+        if name == "<init>":
+            if "Ljava/lang/Class;" in descriptor:
+                explicit = True
+            elif descriptor.startswith("(Ljava/lang/String;"):
+                implicit = True
+        elif name in ("setClass", "setClassName", "setComponent"):
+            explicit = True
+        elif name == "setAction":
+            implicit = True
+
+    findings = []
+    if explicit:
+        for name in info.class_constants:
+            if name.startswith(PLATFORM_PREFIXES) or name.startswith("["):
+                continue
+            finding = Finding(Finding.EXPLICIT_INTENT, get_qualified_name(name))
+            if finding not in findings:
+                findings.append(finding)
+    if implicit:
+        apis = {SEND_APIS[name] for _, name, _ in info.methods if name in SEND_APIS}
+        api = apis.pop() if len(apis) == 1 else None
+        actions = [string for string in info.strings if ACTION_PATTERN.match(string) is not None]
+        for action in actions if len(actions) > 0 else [None]:
+            findings.append(Finding(Finding.IMPLICIT_INTENT, None, detail=action, api=api))
+    return findings
+
+
+class JarResult:
+    """
+    The findings of the classes of a JAR, by the qualified name of the outermost class they belong to
+    """
+    def __init__(self, path, findings=None, classes_read=0, bytes_read=0, error=None):
+        self.path = path
+        self.findings = findings if findings is not None else {}
+        self.classes_read = classes_read
+        self.bytes_read = bytes_read
+        self.error = error
+
+
+def scan_jar(path):
+    """
+    Read every class of a JAR, one entry at a time, and collect its findings. This runs inside a
+    worker thread or process.
+    """
+    result = JarResult(path)
+    try:
+        with zipfile.ZipFile(path) as jar:
+            for entry in jar.infolist():
+                if not entry.filename.endswith(".class"):
+                    continue
+                data = jar.read(entry)
+                result.classes_read += 1
+                result.bytes_read += len(data)
+                try:
+                    info = read_class(data)
+                except ClassFileError as e:
+                    logging.debug(f"Could not read {entry.filename} in {path}: {e}")
+                    continue
+                findings = get_findings(info)
+                if len(findings) > 0:
+                    class_findings = result.findings.setdefault(get_qualified_name(info.name), [])
+                    class_findings.extend(finding for finding in findings if finding not in class_findings)
+    except (OSError, zipfile.BadZipFile, zipfile.LargeZipFile, EOFError) as e:
+        result.error = str(e)
+    return result
+
+
+class JarScanner:
+    """
+    Scans the classes of bundled library JARs, several JARs at a time
+    """
+    def __init__(self, max_workers=None, use_processes=False):
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+
+    def find_jars(self, lib_dirs):
+        """
+        Get the paths of the JARs given, or found under the directories given, e.g. libs/
+        """
+        if isinstance(lib_dirs, str):
+            lib_dirs = [lib_dirs]
+
+        paths = []
+        for lib_dir in lib_dirs:
+            if os.path.isfile(lib_dir):
+                paths.append(lib_dir)
+                continue
+            for root, dirs, files in os.walk(lib_dir):
+                dirs.sort()
+                paths.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(".jar"))
+        return paths
+
+    def scan(self, lib_dirs):
+        """
+        Scan every JAR of lib_dirs and return a list of JarResult, in the order the JARs were found
+        """
+        paths = self.find_jars(lib_dirs)
+        executor_type = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with executor_type(max_workers=self.max_workers) as executor:
+            results = list(executor.map(scan_jar, paths))
+
+        for result in results:
+            if result.error is not None:
+                logging.warning(f"Could not read JAR {result.path}: {result.error}")
+        return results
@@ -0,0 +1,229 @@
+"""
+Thin client of the analysis server started with "main.py serve".
+
+Only the standard library is imported, so running "python3 src/client.py" or "main.py client" skips
+the imports of the analyzer itself. The arguments are the same as those of main.py, but for the
+options configuring the server, which are rejected, and paths are sent to the server as absolute paths.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+
+DEFAULT_HOST = "127.0.0.1"
+
+# the same choices as identifiers.ID_ALLOCATORS, repeated so the client doesn't import the analyzer
+ID_CHOICES = ("content", "counter", "random")
+
+# the same choices as exporters.EXPORTERS
+FORMAT_CHOICES = ("xadl", "json", "jsonl", "graphml", "dot")
+
+# messages are single lines of JSON, a request and then its response
+ENCODING = "utf-8"
+
+# options of main.py that configure the server rather than a single analysis, with how to set them
+SERVER_OPTIONS = {
+    "cache_dir": ("--cache-dir", "start the server with main.py serve --cache-dir"),
+    "cache_max_mb": ("--cache-max-mb", "start the server with main.py serve --cache-max-mb"),
+    "no_cache": ("--no-cache", "start the server with main.py serve --no-cache"),
+    "scan_workers": ("--scan-workers", "start the server with main.py serve --scan-workers"),
+    "scan_processes": ("--scan-processes", "the server scans source files with threads, start it with "
+                                           "main.py serve --processes to run analyses in processes"),
+}
+
+
+def get_default_socket_path():
+    """
+    Get the per-user path of the server's Unix socket
+    """
+    user = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    return os.path.join(tempfile.gettempdir(), f"android_architecture_analyzer-{user}.sock")
+
+
+def add_connection_arguments(arg_parser):
+    """
+    Add the command line options selecting how to reach the server
+    """
+    arg_parser.add_argument('--socket', dest='socket', type=str, default=None,
+                            help=f'Path of the Unix socket of the server (default: {get_default_socket_path()})')
+    arg_parser.add_argument('--port', dest='port', type=int, default=None,
+                            help=f'Use a TCP connection to {DEFAULT_HOST} on this port instead of a Unix socket')
+
+
+def connect(socket_path=None, port=None, timeout=None):
+    if port is not None:
+        return socket.create_connection((DEFAULT_HOST, port), timeout=timeout)
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(timeout)
+    connection.connect(socket_path if socket_path is not None else get_default_socket_path())
+    return connection
+
+
+def send_request(request, socket_path=None, port=None, timeout=None):
+    """
+    Send a request to the server and return its response as a dictionary
+    """
+    with connect(socket_path, port, timeout) as connection:
+        connection.sendall(json.dumps(request).encode(ENCODING) + b"\n")
+        with connection.makefile("rb") as f:
+            line = f.readline()
+
+    if len(line) == 0:
+        raise ConnectionError("The server closed the connection without a response")
+    return json.loads(line.decode(ENCODING))
+
+
+def get_absolute_paths(paths):
+    return [os.path.abspath(path) for path in paths] if paths is not None else None
+
+
+def get_absolute_output(output):
+    # a trailing separator tells a directory apart from a file, see sinks.get_sink
+    if output is None:
+        return None
+    return os.path.abspath(output) + (os.sep if output.endswith(("/", os.sep)) else "")
+
+
+def build_request(args):
+    """
+    Build an analysis request from parsed arguments, making every path absolute since the server
+    may run in another directory
+    """
+    return {
+        "command": "analyze",
+        "manifest": os.path.abspath(args.manifest),
+        "structure": args.structure,
+        "src_dir": get_absolute_paths(args.src_dir),
+        "res_dir": get_absolute_paths(args.res_dir),
+        "lib_dir": get_absolute_paths(args.lib_dir),
+        "dex_files": get_absolute_paths(args.dex_files),
+        "resolve_implicit": args.resolve_implicit,
+        "aggregate": args.aggregate,
+        "output_dir": os.path.abspath(args.output_dir) if args.output_dir is not None else None,
+        "output": get_absolute_output(args.output),
+        "store": os.path.abspath(args.store) if args.store is not None else None,
+        "ids": args.ids,
+        "stream": args.stream,
+        "format": args.format,
+        "gzip": args.gzip,
+        "profile": os.path.abspath(args.profile) if args.profile is not None else None,
+    }
+
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='main.py client',
+                                         description='Extract the architecture from an android application using a '
+                                                     'running analysis server.')
+
+    arg_parser.add_argument('manifest', metavar='manifest_file', type=str, nargs='?',
+                            help='Path to the manifest file, or to an APK, to analyze')
+    arg_parser.add_argument('structure', metavar='structure_name', type=str, nargs='?',
+                            help='Name of the output base structure for the extracted architecture')
+    arg_parser.add_argument('--src', dest='src_dir', type=str, action='append',
+                            help='Path to the source code corresponding to the provided manifest file. '
+                                 'May be given several times for apps with more than one source root')
+    arg_parser.add_argument('--res', dest='res_dir', type=str, action='append',
+                            help='Path to the res/ directory of the application (see main.py --help)')
+    arg_parser.add_argument('--libs', dest='lib_dir', type=str, action='append',
+                            help='Path to a directory of bundled library JARs, or to a single JAR (see main.py --help)')
+    arg_parser.add_argument('--dex', dest='dex_files', type=str, action='append',
+                            help='Path to an APK, or to a classes.dex file, to scan (see main.py --help)')
+    arg_parser.add_argument('--resolve-implicit', dest='resolve_implicit', action='store_const',
+                            const=True, default=False,
+                            help='Connect the senders of implicit Intents to their receivers (see main.py --help)')
+    arg_parser.add_argument('--aggregate', dest='aggregate', action='store_const',
+                            const=True, default=False,
+                            help='Connect each pair of components through a single connector (see main.py --help)')
+    arg_parser.add_argument('--output-dir', dest='output_dir', type=str, default=None,
+                            help='Directory to write the extracted architecture to (default: output/)')
+    arg_parser.add_argument('--output', dest='output', type=str, default=None, metavar='PATH',
+                            help='Write the output to PATH: a file, or a directory ending with /. The standard output '
+                                 'of the server is not supported')
+    arg_parser.add_argument('--store', dest='store', type=str, default=None, metavar='DATABASE',
+                            help='Also add the architecture to the SQLite architecture store DATABASE, written by the '
+                                 'server (see main.py store --help)')
+    arg_parser.add_argument('--ids', dest='ids', choices=ID_CHOICES, default='random',
+                            help='How entity ids are allocated (see main.py --help)')
+    arg_parser.add_argument('--stream', dest='stream', action='store_const',
+                            const=True, default=False,
+                            help='Parse the manifest incrementally (see main.py --help)')
+    arg_parser.add_argument('--format', dest='format', choices=FORMAT_CHOICES, default='xadl',
+                            help='Output format (see main.py --help)')
+    arg_parser.add_argument('--gzip', dest='gzip', action='store_const',
+                            const=True, default=False,
+                            help='Compress the output with gzip')
+    arg_parser.add_argument('--profile', dest='profile', type=str, default=None, metavar='REPORT_FILE',
+                            help='Write a profile of the analysis as JSON to REPORT_FILE. Memory is not traced')
+    arg_parser.add_argument('--ping', dest='command', action='store_const', const='ping',
+                            help='Check whether the server is running')
+    arg_parser.add_argument('--stats', dest='command', action='store_const', const='stats',
+                            help='Print the statistics of the server')
+    arg_parser.add_argument('--shutdown', dest='command', action='store_const', const='shutdown',
+                            help='Stop the server')
+    arg_parser.add_argument('--timeout', dest='timeout', type=float, default=None,
+                            help='Seconds to wait for the server before giving up')
+    arg_parser.add_argument('--debug', dest='debug', action='store_const',
+                            const=True, default=False,
+                            help='Print the request sent to the server and its response')
+    add_connection_arguments(arg_parser)
+
+    # accepted so a main.py command line can be run as is, but rejected with how to set them instead
+    server_options = arg_parser.add_argument_group('server options',
+                                                   'Rejected, they are given when the server is started, see '
+                                                   'main.py serve --help')
+    server_options.add_argument('--cache-dir', dest='cache_dir', type=str, default=None)
+    server_options.add_argument('--cache-max-mb', dest='cache_max_mb', type=int, default=None)
+    server_options.add_argument('--no-cache', dest='no_cache', action='store_const', const=True, default=None)
+    server_options.add_argument('--scan-workers', dest='scan_workers', type=int, default=None)
+    server_options.add_argument('--scan-processes', dest='scan_processes', action='store_const', const=True,
+                                default=None)
+
+    return arg_parser
+
+
+def main(argv=None):
+    arg_parser = build_arg_parser()
+    args = arg_parser.parse_args(argv)
+
+    for dest, (option, advice) in SERVER_OPTIONS.items():
+        if getattr(args, dest) is not None:
+            arg_parser.error(f"{option} configures the server and can't be given to the client, {advice}")
+
+    if args.command is not None:
+        request = {"command": args.command}
+    elif args.manifest is None or args.structure is None:
+        arg_parser.error("the following arguments are required: manifest_file, structure_name")
+    elif args.output == "-":
+        arg_parser.error("--output - is not supported, the output is written by the server")
+    else:
+        request = build_request(args)
+
+    if args.debug:
+        print(f"Request: {json.dumps(request)}", file=sys.stderr)
+    try:
+        response = send_request(request, socket_path=args.socket, port=args.port, timeout=args.timeout)
+    except OSError as e:
+        print(f"Could not reach the analysis server: {e}", file=sys.stderr)
+        return 2
+    if args.debug:
+        print(f"Response: {json.dumps(response)}", file=sys.stderr)
+
+    if response.get("status") != "ok":
+        print(f"[FAILED] {response.get('error')}", file=sys.stderr)
+        return 1
+
+    if request["command"] == "analyze":
+        for diagnostic in response.get("diagnostics", []):
+            print(f"WARNING: {diagnostic}", file=sys.stderr)
+        print(f"\033[92m[SUCCESS]\033[0m Output written to \033[4m{response['output']}\033[0m")
+    else:
+        print(json.dumps(response, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from intent_extractor import SEND_APIS, Finding
+import logging
+import mmap
+import re
+import struct
+import zipfile
+
+
+DEX_MAGIC = b"dex\n"
+
+# dex files of an APK: classes.dex, classes2.dex, ...
+DEX_ENTRY_PATTERN = re.compile(r"^classes\d*\.dex$")
+
+# offsets of the header fields, see https://source.android.com/docs/core/runtime/dex-format
+HEADER_SIZE = 0x70
+STRING_IDS = 0x38
+TYPE_IDS = 0x40
+PROTO_IDS = 0x48
+METHOD_IDS = 0x58
+CLASS_DEFS = 0x60
+
+U2 = struct.Struct("<H")
+U4 = struct.Struct("<I")
+SIZE_AND_OFFSET = struct.Struct("<II")
+PROTO_ID = struct.Struct("<III")
+METHOD_ID = struct.Struct("<HHI")
+CLASS_DEF = struct.Struct("<IIIIIIII")
+CODE_ITEM = struct.Struct("<HHHHII")
+
+OP_CONST_STRING = 0x1a
+OP_CONST_STRING_JUMBO = 0x1b
+OP_CONST_CLASS = 0x1c
+INVOKE_OPCODES = set(range(0x6e, 0x73)) | set(range(0x74, 0x79))
+
+
+def get_instruction_widths():
+    # the width of each opcode in 16-bit code units, from the format of its instruction
+    widths = [1] * 256
+    for opcodes, width in (((0x02, 0x05, 0x08, 0x13, 0x15, 0x16, 0x19, 0x1a, 0x1c, 0x1f, 0x20, 0x22, 0x23, 0x29,
+                             0xfe, 0xff), 2),
+                           ((0x03, 0x06, 0x09, 0x14, 0x17, 0x1b, 0x24, 0x25, 0x26, 0x2a, 0x2b, 0x2c, 0xfc, 0xfd), 3),
+                           ((0x18,), 5),
+                           ((0xfa, 0xfb), 4),
+                           (range(0x2d, 0x3e), 2), (range(0x44, 0x6e), 2), (range(0x6e, 0x73), 3),
+                           (range(0x74, 0x79), 3), (range(0x90, 0xb0), 2), (range(0xd0, 0xe3), 2)):
+        for opcode in opcodes:
+            widths[opcode] = width
+    return widths
+
+
+INSTRUCTION_WIDTHS = get_instruction_widths()
+
+INTENT_TYPE = "Landroid/content/Intent;"
+CLASS_TYPE = "Ljava/lang/Class;"
+STRING_TYPE = "Ljava/lang/String;"
+
+
+class DexError(Exception):
+    """
+    Raised when a dex file is truncated or malformed
+    """
+    pass
+
+
+def read_uleb128(data, offset):
+    """
+    Read an unsigned LEB128 value. Returns a tuple (value, offset after it)
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def get_qualified_name(descriptor):
+    """
+    Get the qualified name of the class a type belongs to, inner and anonymous classes belonging to
+    their outermost class, e.g. "Lcom/example/MainActivity$1;" is "com.example.MainActivity"
+    """
+    return descriptor[1:-1].split("$")[0].replace("/", ".")
+
+
+class DexFile:
+    """
+    A dex file held in a bytes-like object, typically an mmap. Strings, types, prototypes and methods
+    are only decoded when they are first looked up, and the bytecode of a class only when it is scanned.
+    """
+    def __init__(self, data):
+        self.data = data
+        if len(data) < HEADER_SIZE or bytes(data[:4]) != DEX_MAGIC:
+            raise DexError("Not a dex file")
+
+        self.string_ids = SIZE_AND_OFFSET.unpack_from(data, STRING_IDS)
+        self.type_ids = SIZE_AND_OFFSET.unpack_from(data, TYPE_IDS)
+        self.proto_ids = SIZE_AND_OFFSET.unpack_from(data, PROTO_IDS)
+        self.method_ids = SIZE_AND_OFFSET.unpack_from(data, METHOD_IDS)
+        self.class_defs = SIZE_AND_OFFSET.unpack_from(data, CLASS_DEFS)
+
+        self._strings = {}
+        self._methods = {}
+
+    def get_string(self, index):
+        string = self._strings.get(index)
+        if string is None:
+            offset = U4.unpack_from(self.data, self.string_ids[1] + index * 4)[0]
+            # the length is in UTF-16 units, the MUTF-8 data itself ends with a NUL
+            _, start = read_uleb128(self.data, offset)
+            end = start
+            while self.data[end] != 0:
+                end += 1
+            string = bytes(self.data[start:end]).decode("utf-8", errors="replace")
+            self._strings[index] = string
+        return string
+
+    def get_type(self, index):
+        return self.get_string(U4.unpack_from(self.data, self.type_ids[1] + index * 4)[0])
+
+    def get_parameters(self, proto_index):
+        _, _, parameters_offset = PROTO_ID.unpack_from(self.data, self.proto_ids[1] + proto_index * PROTO_ID.size)
+        if parameters_offset == 0:
+            return ()
+        size = U4.unpack_from(self.data, parameters_offset)[0]
+        return tuple(self.get_type(U2.unpack_from(self.data, parameters_offset + 4 + i * 2)[0]) for i in range(size))
+
+    def get_method(self, index):
+        """
+        Get the (class, name, parameter types) of a method
+        """
+        method = self._methods.get(index)
+        if method is None:
+            class_index, proto_index, name_index = METHOD_ID.unpack_from(self.data,
+                                                                         self.method_ids[1] + index * METHOD_ID.size)
+            method = (self.get_type(class_index), self.get_string(name_index), self.get_parameters(proto_index))
+            self._methods[index] = method
+        return method
+
+    def iter_classes(self):
+        """
+        Yield the (type descriptor, class data offset) of every class defined in the file
+        """
+        count, offset = self.class_defs
+        for i in range(count):
+            class_def = CLASS_DEF.unpack_from(self.data, offset + i * CLASS_DEF.size)
+            yield self.get_type(class_def[0]), class_def[6]
+
+    def iter_code_offsets(self, class_data_offset):
+        # the code of every direct and virtual method of a class, skipping its fields
+        if class_data_offset == 0:
+            return
+        sizes = []
+        offset = class_data_offset
+        for _ in range(4):
+            size, offset = read_uleb128(self.data, offset)
+            sizes.append(size)
+        for _ in range(sizes[0] + sizes[1]):
+            _, offset = read_uleb128(self.data, offset)
+            _, offset = read_uleb128(self.data, offset)
+        for _ in range(sizes[2] + sizes[3]):
+            _, offset = read_uleb128(self.data, offset)
+            _, offset = read_uleb128(self.data, offset)
+            code_offset, offset = read_uleb128(self.data, offset)
+            if code_offset != 0:
+                yield code_offset
+
+    def scan_code(self, code_offset):
+        """
+        Find the Intents created by the bytecode of a method. An Intent constructor, setClass or
+        setClassName targets the last class constant loaded before it, and an Intent constructor or
+        setAction taking a String gets the last string constant as its action, and is sent through
+        the API of the next method sending an Intent.
+        """
+        data = self.data
+        *_, size = CODE_ITEM.unpack_from(data, code_offset)
+        start = code_offset + CODE_ITEM.size
+        end = start + size * 2
+
+        findings = []
+        last_class = None
+        last_string = None
+        unsent = []
+        position = start
+        while position < end:
+            unit = U2.unpack_from(data, position)[0]
+            opcode = unit & 0xff
+            if opcode == 0 and unit != 0:
+                # switch and array data payloads sit among the instructions
+                position += self.get_payload_size(position, unit) * 2
+                continue
+
+            if opcode == OP_CONST_CLASS:
+                last_class = self.get_type(U2.unpack_from(data, position + 2)[0])
+            elif opcode == OP_CONST_STRING:
+                last_string = self.get_string(U2.unpack_from(data, position + 2)[0])
+            elif opcode == OP_CONST_STRING_JUMBO:
+                last_string = self.get_string(U4.unpack_from(data, position + 2)[0])
+            elif opcode in INVOKE_OPCODES:
+                method_index = U2.unpack_from(data, position + 2)[0]
+                finding = self.get_finding(method_index, last_class, last_string)
+                if finding is not None:
+                    findings.append(finding)
+                    if finding.kind == Finding.IMPLICIT_INTENT:
+                        unsent.append(finding)
+                elif len(unsent) > 0 and self.get_method(method_index)[1] in SEND_APIS:
+                    for implicit in unsent:
+                        implicit.api = SEND_APIS[self.get_method(method_index)[1]]
+                    unsent = []
+            position += INSTRUCTION_WIDTHS[opcode] * 2
+        return findings
+
+    def get_payload_size(self, position, unit):
+        # in code units, including the identifying unit
+        size = U2.unpack_from(self.data, position + 2)[0]
+        if unit == 0x0100:
+            return 4 + size * 2
+        if unit == 0x0200:
+            return 2 + size * 4
+        if unit == 0x0300:
+            element_width = size
+            count = U4.unpack_from(self.data, position + 4)[0]
+            return 4 + (count * element_width + 1) // 2
+        return 1
+
+    def get_finding(self, method_index, last_class, last_string):
+        owner, name, parameters = self.get_method(method_index)
+        if owner != INTENT_TYPE:
+            return None
+        if name in ("<init>", "setClass", "setClassName") and CLASS_TYPE in parameters:
+            if last_class is not None:
+                return Finding(Finding.EXPLICIT_INTENT, get_qualified_name(last_class))
+        elif name == "setClassName" and parameters[-1:] == (STRING_TYPE,) and last_string is not None:
+            return Finding(Finding.EXPLICIT_INTENT, last_string)
+        elif (name == "<init>" and parameters[:1] == (STRING_TYPE,)) or name == "setAction":
+            return Finding(Finding.IMPLICIT_INTENT, detail=last_string)
+        return None
+
+    def scan(self, class_names=None):
+        """
+        Scan the bytecode of every class, or of the classes belonging to class_names, and return their
+        findings by the qualified name of the outermost class. Returns a tuple (findings, classes_scanned)
+        """
+        findings = {}
+        classes_scanned = 0
+        for descriptor, class_data_offset in self.iter_classes():
+            qualified_name = get_qualified_name(descriptor)
+            if class_names is not None and qualified_name not in class_names:
+                continue
+            classes_scanned += 1
+            for code_offset in self.iter_code_offsets(class_data_offset):
+                class_findings = findings.setdefault(qualified_name, [])
+                class_findings.extend(finding for finding in self.scan_code(code_offset)
+                                      if finding not in class_findings)
+        return {name: class_findings for name, class_findings in findings.items() if len(class_findings) > 0}, \
+            classes_scanned
+
+
+class DexResult:
+    """
+    The findings of the classes of a dex file, or of every dex file of an APK, by the qualified name
+    of the outermost class they belong to
+    """
+    def __init__(self, path, findings=None, classes_read=0, bytes_read=0, error=None):
+        self.path = path
+        self.findings = findings if findings is not None else {}
+        self.classes_read = classes_read
+        self.bytes_read = bytes_read
+        self.error = error
+
+
+def open_dex_buffers(path):
+    """
+    Get the buffers of the dex files of an APK or of a single dex file. Dex files on disk and those
+    stored uncompressed in an APK are memory-mapped, compressed ones are read into memory.
+    """
+    with open(path, "rb") as f:
+        if f.read(4) == DEX_MAGIC:
+            return [mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)]
+
+    buffers = []
+    with zipfile.ZipFile(path) as apk:
+        entries = [entry for entry in apk.infolist() if DEX_ENTRY_PATTERN.match(entry.filename) is not None]
+        if len(entries) == 0:
+            return buffers
+
+        mapped = None
+        with open(path, "rb") as f:
+            if any(entry.compress_type == zipfile.ZIP_STORED for entry in entries):
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        for entry in entries:
+            if entry.compress_type == zipfile.ZIP_STORED:
+                # the data follows the local header, whose name and extra field lengths may differ
+                # from those of the central directory
+                name_length, extra_length = struct.unpack_from("<HH", mapped, entry.header_offset + 26)
+                start = entry.header_offset + 30 + name_length + extra_length
+                buffers.append(memoryview(mapped)[start:start + entry.file_size])
+            else:
+                buffers.append(apk.read(entry))
+    return buffers
+
+
+def scan_dex(path, class_names=None):
+    """
+    Scan the dex files of an APK, or a single dex file. This runs inside a worker thread or process.
+    """
+    result = DexResult(path)
+    try:
+        for buffer in open_dex_buffers(path):
+            result.bytes_read += len(buffer)
+            findings, classes_scanned = DexFile(buffer).scan(class_names)
+            result.classes_read += classes_scanned
+            for name, class_findings in findings.items():
+                merged = result.findings.setdefault(name, [])
+                merged.extend(finding for finding in class_findings if finding not in merged)
+    except (OSError, ValueError, zipfile.BadZipFile, struct.error, IndexError, DexError) as e:
+        result.error = str(e)
+    return result
+
+
+class DexScanner:
+    """
+    Scans the bytecode of APKs and dex files, several files at a time
+    """
+    def __init__(self, max_workers=None, use_processes=False):
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+
+    def scan(self, paths, class_names=None):
+        """
+        Scan the APKs or dex files of paths and return a list of DexResult in the same order. Given
+        class_names, only the classes belonging to them are scanned.
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+
+        executor_type = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with executor_type(max_workers=self.max_workers) as executor:
+            results = list(executor.map(scan_dex, paths, [class_names] * len(paths)))
+
+        for result in results:
+            if result.error is not None:
+                logging.warning(f"Could not read dex file {result.path}: {result.error}")
+        return results
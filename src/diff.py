@@ -0,0 +1,448 @@
+from entities import Component, Document
+from manifest_parser import ManifestParser
+from source_index import SourceIndex, get_digest
+from intent_cache import add_cache_arguments, create_cache
+from source_scanner import EXTRACTOR_VERSION
+import argparse
+import json
+import logging
+import sys
+
+
+class ComponentState:
+    """
+    What the analysis of a snapshot knows about one component declared in its manifest, along with the
+    entities added to the document for it
+    """
+    def __init__(self, component, qualified_name):
+        self.component = component
+        self.qualified_name = qualified_name
+
+        # in-bound interface linked from the implicit message bus when the component has intent filters
+        self.filter_interface = None
+
+        # the source file of the component, the digest of its content and what was found in it.
+        # analyzed stays False until the source has been looked for at least once
+        self.analyzed = False
+        self.path = None
+        self.digest = None
+        self.scan_result = None
+
+        # out-bound interface linked to the implicit message bus when the source sends implicit Intents
+        self.implicit_interface = None
+
+        # (sender, receiver) name pairs of the explicit links found in the source
+        self.links = set()
+
+
+class ExplicitLink:
+    """
+    The entities added to the document for an explicit Intent between two components
+    """
+    def __init__(self, connector, sender, receiver, interface_out, interface_in):
+        self.connector = connector
+        self.sender = sender
+        self.receiver = receiver
+        self.interface_out = interface_out
+        self.interface_in = interface_in
+
+
+class Analysis:
+    """
+    The result of analyzing one snapshot of an app. It is kept so the next snapshot can be analyzed
+    incrementally, see IncrementalAnalyzer.
+    """
+    def __init__(self, doc):
+        self.doc = doc
+        self.manifest_digest = None
+        self.authorities = {}
+        self.source_index = None
+
+        # qualified name to ComponentState, in the order the manifest declares the components
+        self.components = {}
+
+        # (sender, receiver) name pairs to their ExplicitLink, or to None if they could not be resolved
+        self.explicit_links = {}
+
+
+class ArchitectureDiff:
+    """
+    The changes between the architectures of two snapshots of an app. Links are the links between
+    components: explicit Intents (through their connector), implicit Intents sent to the implicit
+    message bus and intent filters receiving them from it. Interfaces are named after the component
+    they belong to and the component, or bus, on the other end of their link.
+    """
+    # kinds of links
+    EXPLICIT = "explicit"
+    IMPLICIT = "implicit"
+    INTENT_FILTER = "intent-filter"
+
+    def __init__(self):
+        self.manifest_changed = False
+
+        # source files read and scanned again, and the components whose previous analysis was reused
+        self.files_changed = []
+        self.components_reused = 0
+
+        self.components_added = []
+        self.components_removed = []
+
+        # net number of additions of each (component, direction, peer) interface and (kind, sender,
+        # receiver) link, so something removed and added back while updating is not reported at all
+        self._interfaces = {}
+        self._links = {}
+
+    def add_interface(self, component, direction, peer, count=1):
+        key = (component, direction, peer)
+        self._interfaces[key] = self._interfaces.get(key, 0) + count
+
+    def add_link(self, kind, sender, receiver, count=1):
+        key = (kind, sender, receiver)
+        self._links[key] = self._links.get(key, 0) + count
+
+    @staticmethod
+    def _expand(counts, sign):
+        return sorted(key for key, count in counts.items() if count * sign > 0 for _ in range(abs(count)))
+
+    def get_interfaces(self, sign):
+        # interfaces of components added or removed as a whole are implied by the component itself
+        skipped = set(self.components_added) | set(self.components_removed)
+        return [key for key in self._expand(self._interfaces, sign) if key[0] not in skipped]
+
+    def get_links(self, sign):
+        return self._expand(self._links, sign)
+
+    def get_components_changed(self):
+        """
+        Get the names of the components found in both snapshots whose interfaces changed
+        """
+        return sorted({key[0] for key in self.get_interfaces(1) + self.get_interfaces(-1)})
+
+    def is_empty(self):
+        return len(self.components_added) + len(self.components_removed) == 0 \
+            and not any(self._interfaces.values()) and not any(self._links.values())
+
+    def to_dict(self):
+        def interfaces(sign):
+            return [{"component": component, "direction": direction, "peer": peer}
+                    for component, direction, peer in self.get_interfaces(sign)]
+
+        def links(sign):
+            return [{"kind": kind, "sender": sender, "receiver": receiver}
+                    for kind, sender, receiver in self.get_links(sign)]
+
+        return {
+            "manifest_changed": self.manifest_changed,
+            "files_changed": self.files_changed,
+            "components_reused": self.components_reused,
+            "components": {
+                "added": sorted(self.components_added),
+                "removed": sorted(self.components_removed),
+                "changed": self.get_components_changed(),
+            },
+            "interfaces": {"added": interfaces(1), "removed": interfaces(-1)},
+            "links": {"added": links(1), "removed": links(-1)},
+        }
+
+
+class IncrementalAnalyzer:
+    """
+    Analyzes successive snapshots of an app, such as its releases. Given the Analysis of the previous
+    snapshot, only the source files whose content changed are scanned again, the manifest is only parsed
+    again if it changed, and the previous Document is updated in place rather than rebuilt. The changes
+    are recorded as they are made, so comparing two snapshots costs time proportional to the change,
+    plus a walk of the source roots to find out which files changed.
+    """
+    def __init__(self, parser=None):
+        self.parser = parser if parser is not None else ManifestParser()
+
+        # updates assume a connector per explicit link and an implicit link per sender to the bus
+        if self.parser.aggregate or self.parser.resolve_implicit:
+            raise ValueError("Incremental analysis does not support aggregated or resolved implicit links")
+
+    def analyze(self, manifest_file, architecture_name, src_dir=None, previous=None):
+        """
+        Analyze a snapshot of an app. previous, the Analysis of an earlier snapshot, is updated in place
+        and must not be used afterwards.
+        Returns a tuple (analysis, diff) where diff is an ArchitectureDiff from the previous snapshot, or
+        from an empty app without one.
+        """
+        profiler = self.parser.profiler
+
+        if previous is None:
+            analysis = Analysis(Document(architecture_name + ".xml", architecture_name,
+                                         id_allocator=self.parser.id_allocator, profiler=profiler))
+        else:
+            analysis = previous
+            analysis.doc.output_file_name = architecture_name + ".xml"
+            analysis.doc.main_structure_name = architecture_name
+
+        diff = ArchitectureDiff()
+        with profiler.phase("diff"):
+            with profiler.phase("update_components"):
+                components_changed, authorities_changed = self.update_components(analysis, manifest_file, diff)
+
+            with profiler.phase("update_sources"):
+                pending_links = self.update_sources(analysis, src_dir, authorities_changed, diff)
+
+            with profiler.phase("update_links"):
+                # components may now resolve to other names, so every link is checked when they changed
+                if components_changed:
+                    pending_links = {link for state in analysis.components.values() for link in state.links}
+                self.update_explicit_links(analysis, pending_links, diff)
+
+                # the bus only exists while something is linked to it, as in a document built from scratch
+                bus = analysis.doc.get_bus()
+                if bus is not None and len(analysis.doc.get_outgoing_links(bus)) + len(analysis.doc.get_incoming_links(bus)) == 0:
+                    analysis.doc.remove_connector(bus)
+
+            self.add_diagnostics(analysis, src_dir)
+
+        profiler.count("files_reanalyzed", len(diff.files_changed))
+        profiler.count("components_reused", diff.components_reused)
+
+        return analysis, diff
+
+    def update_components(self, analysis, manifest_file, diff):
+        """
+        Add and remove components to match the manifest, if it changed.
+        Returns a tuple (components_changed, authorities_changed)
+        """
+        content = self.parser.read_file(manifest_file)
+        if content is None:
+            logging.critical(f"Could not read content of \"{manifest_file}\"")
+            exit()
+
+        digest = get_digest(content)
+        if digest == analysis.manifest_digest:
+            return False, False
+
+        analysis.manifest_digest = digest
+        diff.manifest_changed = True
+
+        # parsing into a document of its own is what a full analysis would do anyway, and the manifest
+        # is small next to the source
+        _, components, authorities = self.parser.parse_manifest(manifest_file, analysis.doc.main_structure_name)
+        declared = {qualified_name: component for component, qualified_name in components}
+
+        doc = analysis.doc
+        components_changed = False
+        for qualified_name, state in list(analysis.components.items()):
+            component = declared.get(qualified_name)
+            if component is None or component.get_name() != state.component.get_name():
+                self.remove_component(analysis, state, diff)
+                components_changed = True
+
+        states = {}
+        for qualified_name, declared_component in declared.items():
+            has_filters = declared_component.get_interface_in() is not None
+            state = analysis.components.get(qualified_name)
+            if state is None:
+                state = ComponentState(Component(name=declared_component.get_name()), qualified_name)
+                doc.add_component(state.component, qualified_name=qualified_name)
+                diff.components_added.append(state.component.get_name())
+                components_changed = True
+
+            if has_filters and state.filter_interface is None:
+                state.filter_interface = self.parser.add_intent_filter_link(doc, state.component)
+                diff.add_link(ArchitectureDiff.INTENT_FILTER, doc.get_bus().get_name(), state.component.get_name())
+                diff.add_interface(state.component.get_name(), "in", doc.get_bus().get_name())
+            elif not has_filters and state.filter_interface is not None:
+                self.remove_bus_link(analysis, state, state.filter_interface, ArchitectureDiff.INTENT_FILTER, diff)
+                state.filter_interface = None
+            states[qualified_name] = state
+
+        authorities_changed = authorities != analysis.authorities
+        analysis.components = states
+        analysis.authorities = authorities
+        return components_changed, authorities_changed
+
+    def remove_bus_link(self, analysis, state, interface, kind, diff):
+        """
+        Remove the link between a component and the implicit message bus through one of its interfaces
+        """
+        doc = analysis.doc
+        bus_name = doc.get_bus().get_name()
+        for link in list(doc.get_outgoing_links(interface)) + list(doc.get_incoming_links(interface)):
+            doc.remove_link(link)
+        state.component.remove_interface(interface)
+
+        if kind == ArchitectureDiff.IMPLICIT:
+            diff.add_link(kind, state.component.get_name(), bus_name, -1)
+            diff.add_interface(state.component.get_name(), "out", bus_name, -1)
+        else:
+            diff.add_link(kind, bus_name, state.component.get_name(), -1)
+            diff.add_interface(state.component.get_name(), "in", bus_name, -1)
+
+    def remove_component(self, analysis, state, diff):
+        for link in state.links:
+            self.remove_explicit_link(analysis, link, diff)
+        state.links = set()
+
+        if state.implicit_interface is not None:
+            self.remove_bus_link(analysis, state, state.implicit_interface, ArchitectureDiff.IMPLICIT, diff)
+        if state.filter_interface is not None:
+            self.remove_bus_link(analysis, state, state.filter_interface, ArchitectureDiff.INTENT_FILTER, diff)
+
+        # explicit links from other components to this one are removed once they are found not to resolve
+        analysis.doc.remove_component(state.component)
+        del analysis.components[state.qualified_name]
+        diff.components_removed.append(state.component.get_name())
+
+    def update_sources(self, analysis, src_dir, authorities_changed, diff):
+        """
+        Find the source of every component, scan the sources whose content changed, and update the links
+        to the implicit message bus of the components whose findings changed.
+        Returns the set of (sender, receiver) name pairs of the explicit links found for the first time
+        """
+        source_index = SourceIndex(src_dir, previous=analysis.source_index) if src_dir is not None else None
+        analysis.source_index = source_index
+
+        # the components whose findings need to be turned into links again, and those to scan first
+        changed = []
+        rescan = []
+        for state in analysis.components.values():
+            path = source_index.find(state.qualified_name) if source_index is not None else None
+            digest = source_index.get_digest(path) if path is not None else None
+            state.path = path
+
+            if state.analyzed and digest == state.digest:
+                diff.components_reused += 1
+                # provider URIs resolve to other components when the authorities changed
+                if authorities_changed and state.scan_result is not None:
+                    changed.append(state)
+                continue
+
+            state.analyzed = True
+            state.digest = digest
+            state.scan_result = None
+            changed.append(state)
+            if path is not None:
+                rescan.append(state)
+
+        scan_results = self.parser.scan_sources([state.path for state in rescan])
+        diff.files_changed = sorted(scan_results)
+        for state in rescan:
+            state.scan_result = scan_results[state.path]
+
+        pending_links = set()
+        doc = analysis.doc
+        for state in changed:
+            if state.scan_result is not None:
+                links, has_implicit = self.parser.get_source_links(state.component.get_name(), state.scan_result,
+                                                                   analysis.authorities)
+            else:
+                links, has_implicit = set(), False
+
+            if has_implicit and state.implicit_interface is None:
+                state.implicit_interface = self.parser.add_implicit_link(doc, state.component)
+                diff.add_link(ArchitectureDiff.IMPLICIT, state.component.get_name(), doc.get_bus().get_name())
+                diff.add_interface(state.component.get_name(), "out", doc.get_bus().get_name())
+            elif not has_implicit and state.implicit_interface is not None:
+                self.remove_bus_link(analysis, state, state.implicit_interface, ArchitectureDiff.IMPLICIT, diff)
+                state.implicit_interface = None
+
+            for link in state.links - links:
+                self.remove_explicit_link(analysis, link, diff)
+            pending_links.update(links - state.links)
+            state.links = links
+
+        return pending_links
+
+    def update_explicit_links(self, analysis, links, diff):
+        """
+        Resolve the components of each (sender, receiver) name pair, and connect them again if they are
+        not the components they were connected to before
+        """
+        for link in links:
+            sender, receiver = self.parser.resolve_explicit_link(analysis.doc, link[0], link[1])
+            explicit_link = analysis.explicit_links.get(link)
+            if explicit_link is not None and explicit_link.sender is sender and explicit_link.receiver is receiver:
+                continue
+
+            self.remove_explicit_link(analysis, link, diff)
+            analysis.explicit_links[link] = None
+            if sender is None or receiver is None:
+                continue
+
+            connector = self.parser.add_explicit_link(analysis.doc, link[0], link[1])
+            interface_out = next(iter(analysis.doc.get_incoming_links(connector))).get_start()
+            interface_in = next(iter(analysis.doc.get_outgoing_links(connector))).get_end()
+            analysis.explicit_links[link] = ExplicitLink(connector, sender, receiver, interface_out, interface_in)
+
+            diff.add_link(ArchitectureDiff.EXPLICIT, sender.get_name(), receiver.get_name())
+            diff.add_interface(sender.get_name(), "out", receiver.get_name())
+            diff.add_interface(receiver.get_name(), "in", sender.get_name())
+
+    def remove_explicit_link(self, analysis, link, diff):
+        explicit_link = analysis.explicit_links.pop(link, None)
+        if explicit_link is None:
+            return
+
+        # the interfaces may belong to a component that was already removed, which is harmless
+        explicit_link.sender.remove_interface(explicit_link.interface_out)
+        explicit_link.receiver.remove_interface(explicit_link.interface_in)
+        analysis.doc.remove_connector(explicit_link.connector)
+
+        sender_name = explicit_link.sender.get_name()
+        receiver_name = explicit_link.receiver.get_name()
+        diff.add_link(ArchitectureDiff.EXPLICIT, sender_name, receiver_name, -1)
+        diff.add_interface(sender_name, "out", receiver_name, -1)
+        diff.add_interface(receiver_name, "in", sender_name, -1)
+
+    def add_diagnostics(self, analysis, src_dir):
+        # the diagnostics of the previous snapshot no longer apply, they are cheap to list again
+        doc = analysis.doc
+        doc.clear_diagnostics()
+        if src_dir is not None:
+            for state in analysis.components.values():
+                if state.path is None:
+                    doc.add_diagnostic(f"Could not find the source of {state.qualified_name} in {analysis.source_index.roots}")
+        for link, explicit_link in analysis.explicit_links.items():
+            if explicit_link is None:
+                doc.add_diagnostic(f"Could not resolve explicit Intent from {link[0]} to {link[1]}")
+
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='main.py diff',
+                                         description='Compare the architectures of two snapshots of an android '
+                                                     'application, such as two releases.')
+
+    arg_parser.add_argument('old_manifest', type=str, help='Path to the manifest file, or to an APK, of the old snapshot')
+    arg_parser.add_argument('new_manifest', type=str, help='Path to the manifest file, or to an APK, of the new snapshot')
+    arg_parser.add_argument('--old-src', dest='old_src_dir', type=str, action='append',
+                            help='Path to the source code of the old snapshot. May be given several times')
+    arg_parser.add_argument('--new-src', dest='new_src_dir', type=str, action='append',
+                            help='Path to the source code of the new snapshot. May be given several times')
+    arg_parser.add_argument('--report', dest='report', type=str, default=None,
+                            help='Path of the JSON report of the changes to write (default: the standard output)')
+    arg_parser.add_argument('--debug', dest='debug', action='store_const',
+                            const=True, default=False,
+                            help='Run the program in debug mode')
+    add_cache_arguments(arg_parser)
+
+    return arg_parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    analyzer = IncrementalAnalyzer(ManifestParser(cache=create_cache(args, EXTRACTOR_VERSION)))
+    analysis, _ = analyzer.analyze(args.old_manifest, "old", src_dir=args.old_src_dir)
+    _, diff = analyzer.analyze(args.new_manifest, "new", src_dir=args.new_src_dir, previous=analysis)
+
+    report = json.dumps(diff.to_dict(), indent=4)
+    if args.report is None:
+        print(report)
+    else:
+        with open(args.report, "w") as f:
+            f.write(report + "\n")
+        print(f"{len(diff.components_added)} components added, {len(diff.components_removed)} removed and "
+              f"{len(diff.get_components_changed())} changed. Report written to {args.report}", file=sys.stderr)
+
+    return 0
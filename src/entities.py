@@ -1,7 +1,13 @@
-from xml.etree.ElementTree import Element, SubElement, tostring
-from xml.dom import minidom
+from xml.etree.ElementTree import Element, SubElement
+from exporters import DocumentOrder, XadlExporter, get_exporter
+from sinks import CountingStream, DirectorySink, get_sink, open_compressed
+from identifiers import get_id_allocator
+from profiling import NULL_PROFILER
+from intent_filters import IntentFilterIndex
+import io
 import uuid
 import os
+import sys
 import logging
 
 
@@ -12,11 +18,22 @@ def get_uuid():
     return uuid.uuid4()
 
 
+def get_default_output_dir():
+    """
+    Get the output/ directory at the root of the project
+    """
+    project_root = os.path.dirname(os.path.realpath(__file__ + "/.."))
+    return project_root + "/output/"
+
+
 class Structure:
     """
     Represents a <structure /> tag in an ArchStudio xml document
     """
-    def __init__(self, name, id):
+    # entities are created by the tens of thousands for large apps, so none of them carry a __dict__
+    __slots__ = ("_name", "_id")
+
+    def __init__(self, name, id=None):
         self._name = name
         self._id = id
 
@@ -24,29 +41,46 @@ class Structure:
         return self._name
 
     def get_id(self):
+        # ids are allocated lazily, a Document assigns them in bulk when it is written out
+        if self._id is None:
+            self._id = str(get_uuid())
         return self._id
 
+    def set_id(self, id):
+        self._id = id
+
+    def get_properties(self):
+        # extra fields written by the json and jsonl exporters, if any
+        return None
+
     def to_xml(self):
         raise NotImplementedError("Child classes of Structure must override to_xml")
 
+    def write_xml(self, writer):
+        raise NotImplementedError("Child classes of Structure must override write_xml")
+
 
 class Component(Structure):
     """
     Represents a component as a first class entity
     """
+    __slots__ = ("_interfaces",)
+
     def __init__(self, name="[New Component]"):
-        super().__init__(name, str(get_uuid()))
-        self._interfaces = set()
+        super().__init__(name)
+
+        # a dict is used as an insertion ordered set, it is also smaller than a set for a few interfaces
+        self._interfaces = {}
 
     def add_interface(self, interface):
-        self._interfaces.add(interface)
+        self._interfaces[interface] = None
         interface.set_parent(self)
 
     def remove_interface(self, interface):
-        self._interfaces.remove(interface)
+        del self._interfaces[interface]
 
     def get_interfaces(self):
-        return self._interfaces
+        return self._interfaces.keys()
 
     def get_interface_in(self):
         # find the first interface with direction "in"
@@ -66,7 +100,7 @@ class Component(Structure):
         # we don't actually care about the interface direction here, this method is provided
         # so both Component and Connector have a standard interface for adding Interfaces
         if interface.get_direction() == Interface.DIRECTION_OUT:
-            self._interfaces.add(interface)
+            self._interfaces[interface] = None
             interface.set_parent(self)
         else:
             direction = Interface.direction_strings[interface.get_direction()]
@@ -76,7 +110,7 @@ class Component(Structure):
     def add_interface_in(self, interface):
         # see comment in add_interface_out
         if interface.get_direction() == Interface.DIRECTION_IN:
-            self._interfaces.add(interface)
+            self._interfaces[interface] = None
             interface.set_parent(self)
         else:
             direction = Interface.direction_strings[interface.get_direction()]
@@ -86,12 +120,19 @@ class Component(Structure):
     def to_xml(self):
         # TODO: method stub
         el = Element("structure_3_0:component")
-        el.set("structure_3_0:id", self._id)
+        el.set("structure_3_0:id", self.get_id())
         el.set("structure_3_0:name", self._name)
         for interface in self._interfaces:
             el.append(interface.to_xml())
         return el
 
+    def write_xml(self, writer, interfaces=None):
+        # interfaces can be given to write them in a different order than they were added in
+        writer.start("structure_3_0:component", (("structure_3_0:id", self.get_id()), ("structure_3_0:name", self._name)))
+        for interface in (interfaces if interfaces is not None else self._interfaces):
+            interface.write_xml(writer)
+        writer.end()
+
 
 class Connector(Structure):
     """
@@ -99,12 +140,15 @@ class Connector(Structure):
     Connectors in ArchStudio are more similar to components and can have names,
     interfaces, and links to other components.
     """
+    __slots__ = ("_interface_in", "_interface_out")
+
     def __init__(self, name="[New Connector]"):
-        super().__init__(name, str(get_uuid()))
+        super().__init__(name)
 
         # all connectors should have one incoming interface and one outgoing interface
-        self._interface_in = Interface(name=self._name + " Interface In", direction=Interface.DIRECTION_IN, parent=self)
-        self._interface_out = Interface(name=self._name + " Interface Out", direction=Interface.DIRECTION_OUT, parent=self)
+        # their names are derived from the connector name when needed rather than stored
+        self._interface_in = Interface(name=None, direction=Interface.DIRECTION_IN, parent=self)
+        self._interface_out = Interface(name=None, direction=Interface.DIRECTION_OUT, parent=self)
 
     def get_interface_in(self):
         return self._interface_in
@@ -126,12 +170,53 @@ class Connector(Structure):
     def to_xml(self):
         # TODO: method stub
         el = Element("structure_3_0:connector")
-        el.set("structure_3_0:id", self._id)
-        el.set("structure_3_0:name", self._name)
+        el.set("structure_3_0:id", self.get_id())
+        el.set("structure_3_0:name", self.get_name())
         el.append(self._interface_in.to_xml())
         el.append(self._interface_out.to_xml())
         return el
 
+    def write_xml(self, writer):
+        writer.start("structure_3_0:connector", (("structure_3_0:id", self.get_id()), ("structure_3_0:name", self.get_name())))
+        self._interface_in.write_xml(writer)
+        self._interface_out.write_xml(writer)
+        writer.end()
+
+
+class AggregateConnector(Connector):
+    """
+    A single connector for every interaction between a sender and a receiver, counting them by kind,
+    e.g. "Explicit Intent". Its name is derived from its kinds and count.
+    """
+    __slots__ = ("_sender_name", "_receiver_name", "_kinds")
+
+    def __init__(self, sender_name, receiver_name):
+        super().__init__(name=None)
+        self._sender_name = sender_name
+        self._receiver_name = receiver_name
+
+        # the number of interactions of each kind
+        self._kinds = {}
+
+    def add_interaction(self, kind, count=1):
+        self._kinds[kind] = self._kinds.get(kind, 0) + count
+
+    def get_kinds(self):
+        # sorted, so the name doesn't depend on the order the interactions were found in
+        return sorted(self._kinds)
+
+    def get_count(self):
+        return sum(self._kinds.values())
+
+    def get_name(self):
+        # a single interaction is named just like a connector of its own would be
+        name = f"{' and '.join(self.get_kinds())} from {self._sender_name} to {self._receiver_name}"
+        count = self.get_count()
+        return name if count == 1 else f"{name} ({count} interactions)"
+
+    def get_properties(self):
+        return {"count": self.get_count(), "kinds": {kind: self._kinds[kind] for kind in self.get_kinds()}}
+
 
 class Interface(Structure):
     """
@@ -139,6 +224,8 @@ class Interface(Structure):
     and allow links to connect a component/connector to another component/connector
     """
 
+    __slots__ = ("_direction", "_parent")
+
     DIRECTION_NONE      = 0
     DIRECTION_IN        = 1
     DIRECTION_OUT       = 2
@@ -160,11 +247,27 @@ class Interface(Structure):
         DIRECTION_IN_OUT: "in-out"
     }
 
+    # suffixes appended to the name of the parent of an interface created without a name
+    name_suffixes = {
+        DIRECTION_NONE: " Interface",
+        DIRECTION_IN: " Interface In",
+        DIRECTION_OUT: " Interface Out",
+        DIRECTION_IN_OUT: " Interface In-Out"
+    }
+
     def __init__(self, name="[New Interface]", direction=DIRECTION_NONE, parent=None):
-        super().__init__(name, str(get_uuid()))
+        # interface names are heavily repeated, so share a single copy of each
+        super().__init__(sys.intern(name) if name is not None else None)
         self._direction = direction
         self._parent = parent
 
+    def get_name(self):
+        # interfaces owned by connectors are named after the connector
+        if self._name is None:
+            parent_name = self._parent.get_name() if self._parent is not None else "[New Interface]"
+            return parent_name + Interface.name_suffixes[self._direction]
+        return self._name
+
     def set_direction(self, direction):
         if direction in Interface.VALID_DIRECTIONS:
             self._direction = direction
@@ -184,8 +287,8 @@ class Interface(Structure):
     def to_xml(self):
         # TODO: method stub
         el = Element("structure_3_0:interface")
-        el.set("structure_3_0:id", self._id)
-        el.set("structure_3_0:name", self._name)
+        el.set("structure_3_0:id", self.get_id())
+        el.set("structure_3_0:name", self.get_name())
 
         direction_string = Interface.direction_strings[self._direction]
         if len(direction_string) > 0:
@@ -193,13 +296,24 @@ class Interface(Structure):
 
         return el
 
+    def write_xml(self, writer):
+        attrib = [("structure_3_0:id", self.get_id()), ("structure_3_0:name", self.get_name())]
+
+        direction_string = Interface.direction_strings[self._direction]
+        if len(direction_string) > 0:
+            attrib.append(("structure_3_0:direction", direction_string))
+
+        writer.element("structure_3_0:interface", attrib)
+
 
 class Link(Structure):
     """
     Represents a link between two interfaces in ArchStudio
     """
+    __slots__ = ("_start", "_end")
+
     def __init__(self, name="[New Link]", start=None, end=None):
-        super().__init__(name, str(get_uuid()))
+        super().__init__(name)
 
         # start point should be an interface with direction "out"
         self._start = start
@@ -225,7 +339,7 @@ class Link(Structure):
     def set_start(self, start):
         if type(start) is Interface:
             self._start = start
-        elif type(start) in (Connector, Component):
+        elif isinstance(start, (Connector, Component)):
             self._start = start.get_interface_in()
         else:
             logging.critical(f"Invalid start point type {type(start)}")
@@ -234,7 +348,7 @@ class Link(Structure):
     def set_end(self, end):
         if type(end) is Interface:
             self._end = end
-        elif type(end) in (Connector, Component):
+        elif isinstance(end, (Connector, Component)):
             self._end = self._start.get_interface_out()
         else:
             logging.critical(f"Invalid end point type {type(end)}")
@@ -255,12 +369,12 @@ class Link(Structure):
     def to_xml(self):
         # TODO: method stub
         el = Element("structure_3_0:link")
-        el.set("structure_3_0:id", self._id)
+        el.set("structure_3_0:id", self.get_id())
         el.set("structure_3_0:name", self._name)
 
         # Need start and end components
         if self._start is None or self._end is None:
-            logging.critical(f"Link {self._name} ({self._id}) missing start and/or end points")
+            logging.critical(f"Link {self._name} ({self.get_id()}) missing start and/or end points")
             exit()
 
         point1 = SubElement(el, "structure_3_0:point1")
@@ -271,62 +385,235 @@ class Link(Structure):
 
         return el
 
+    def write_xml(self, writer):
+        # Need start and end components
+        if self._start is None or self._end is None:
+            logging.critical(f"Link {self._name} ({self.get_id()}) missing start and/or end points")
+            exit()
+
+        writer.start("structure_3_0:link", (("structure_3_0:id", self.get_id()), ("structure_3_0:name", self._name)))
+        writer.element("structure_3_0:point1", text=self._start.get_id())
+        writer.element("structure_3_0:point2", text=self._end.get_id())
+        writer.end()
+
 
 class Document:
     """
     Represents an ArchStudio document object
     """
-    def __init__(self, file_name, structure_name):
+    def __init__(self, file_name, structure_name, id_allocator="random", profiler=None):
         # TODO: method stub
         self.output_file_name = file_name
         self.main_structure_name = structure_name
-        self._entities = set()
-        self._components = set()
-        self._connectors = set()
-        self._links = set()
+
+        # the package and version of the app, when known
+        self.package_name = None
+        self.version = None
+
+        # dicts are used as insertion ordered sets
+        self._components = {}
+        self._connectors = {}
+        self._links = {}
         self._bus = None
 
+        # problems found while building the document that did not stop the analysis
+        self._diagnostics = []
+
+        # the intent filters of the components, used to resolve implicit Intents, see intent_filters.py
+        self._intent_filters = IntentFilterIndex()
+
+        # allocates the ids of every entity when the document is written, see identifiers.py
+        self._id_allocator = get_id_allocator(id_allocator)
+        self._structure_id = None
+
+        # records how long writing the document takes, see profiling.py
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+
+        # lookup indexes kept in sync by the add/remove methods below so that name and endpoint
+        # resolution does not need to scan every entity in the document
+        self._components_by_name = {}
+        self._components_by_simple_name = {}
+        self._links_by_endpoints = {}
+        self._outgoing_links = {}
+        self._incoming_links = {}
+
     def add_bus(self):
         # don't add a new bus if we already have one
         if self._bus is None:
             bus = Connector(name="Implicit Message Bus")
             self._bus = bus 
-            self._entities.add(bus)
-            self._connectors.add(bus)
+            self._connectors[bus] = None
         return self._bus
 
     def remove_bus(self):
-        bus = self._bus 
-        self._entities.remove(bus)
-        self._connectors.remove(bus)
-        self._bus = None
+        self.remove_connector(self._bus)
 
     def get_bus(self):
         return self._bus
 
     def get_connectors(self):
-        return self._connectors
-
-    def add_component(self, component):
-        self._components.add(component)
-        self._entities.add(component)
+        return self._connectors.keys()
+
+    def add_component(self, component, qualified_name=None):
+        # the qualified name is kept so the name indexes can be repaired when a component is removed
+        self._components[component] = qualified_name
+        if type(component) is Component:
+            self._index_component(component, qualified_name)
+
+    def remove_component(self, component):
+        """
+        Remove a component along with every link to or from it
+        """
+        for link in list(self._outgoing_links.get(component, {})) + list(self._incoming_links.get(component, {})):
+            if link in self._links:
+                self.remove_link(link)
+
+        qualified_name = self._components.pop(component)
+        if type(component) is not Component:
+            return
+
+        # another component registered under one of the same names now becomes the one found by it
+        names = {component.get_name()}
+        if qualified_name is not None:
+            names.add(qualified_name)
+        stale_names = {name for name in names if self._components_by_name.get(name) is component}
+        stale_simple_names = {name.split(".")[-1] for name in names
+                              if self._components_by_simple_name.get(name.split(".")[-1]) is component}
+        for name in stale_names:
+            del self._components_by_name[name]
+        for simple_name in stale_simple_names:
+            del self._components_by_simple_name[simple_name]
+
+        if len(stale_names) + len(stale_simple_names) > 0:
+            for other, other_qualified_name in self._components.items():
+                if type(other) is not Component:
+                    continue
+                for name in (other.get_name(), other_qualified_name):
+                    if name in stale_names:
+                        self._components_by_name.setdefault(name, other)
+                    if name is not None and name.split(".")[-1] in stale_simple_names:
+                        self._components_by_simple_name.setdefault(name.split(".")[-1], other)
 
     def add_connector(self, connector):
-        self._connectors.add(connector)
-        self._entities.add(connector)
+        self._connectors[connector] = None
+
+    def remove_connector(self, connector):
+        """
+        Remove a connector along with every link to or from it
+        """
+        for link in list(self._outgoing_links.get(connector, {})) + list(self._incoming_links.get(connector, {})):
+            if link in self._links:
+                self.remove_link(link)
+        del self._connectors[connector]
+        if connector is self._bus:
+            self._bus = None
+
+    def _index_component(self, component, qualified_name=None):
+        # the first component registered under a name wins, matching the behavior of a linear scan
+        # over components in insertion order
+        names = {component.get_name()}
+        if qualified_name is not None:
+            names.add(qualified_name)
+
+        for name in names:
+            self._components_by_name.setdefault(name, component)
+            self._components_by_simple_name.setdefault(name.split(".")[-1], component)
+
+    def get_component(self, name):
+        """
+        Get a component by its name or the fully qualified name it was registered with
+        """
+        return self._components_by_name.get(name)
 
     def get_component_from_simple_name(self, simple_name):
-        for component in self._components:
-            name = component.get_name()
-            if name.split(".")[-1] == simple_name:
-                return component
-        return None
+        return self._components_by_simple_name.get(simple_name)
+
+    def get_qualified_name(self, component):
+        return self._components.get(component)
 
     def get_components(self):
-        return self._components
+        return self._components.keys()
+
+    def add_diagnostic(self, message):
+        logging.warning(message)
+        self._diagnostics.append(message)
+
+    def get_diagnostics(self):
+        return self._diagnostics
+
+    def clear_diagnostics(self):
+        self._diagnostics = []
+
+    def get_intent_filters(self):
+        return self._intent_filters
 
     def get_links(self):
-        return self._links
+        return self._links.keys()
+
+    def get_outgoing_links(self, node):
+        """
+        Get the links starting at an interface, or at any interface of a component/connector
+        """
+        owner = self.get_owner(node)
+        links = self._outgoing_links.get(owner, {}).keys()
+        if owner is node:
+            return links
+        return [link for link in links if link.get_start() is node]
+
+    def get_incoming_links(self, node):
+        """
+        Get the links ending at an interface, or at any interface of a component/connector
+        """
+        owner = self.get_owner(node)
+        links = self._incoming_links.get(owner, {}).keys()
+        if owner is node:
+            return links
+        return [link for link in links if link.get_end() is node]
+
+    @staticmethod
+    def get_owner(node):
+        """
+        Get the component or connector owning the end of a link. Interfaces without a parent stand
+        for themselves
+        """
+        # links are indexed by their owners, which keeps the indexes to a single entry per link end
+        if type(node) is Interface:
+            parent = node.get_parent()
+            return parent if parent is not None else node
+        return node
+
+    def _index_link(self, link):
+        start = self.get_owner(link.get_start())
+        end = self.get_owner(link.get_end())
+
+        # dicts are used as insertion ordered sets
+        self._outgoing_links.setdefault(start, {})[link] = None
+        self._incoming_links.setdefault(end, {})[link] = None
+        self._links_by_endpoints.setdefault((start, end), link)
+
+    def _unindex_link(self, link):
+        start = self.get_owner(link.get_start())
+        end = self.get_owner(link.get_end())
+
+        outgoing = self._outgoing_links.get(start)
+        if outgoing is not None:
+            outgoing.pop(link, None)
+            if not outgoing:
+                del self._outgoing_links[start]
+
+        incoming = self._incoming_links.get(end)
+        if incoming is not None:
+            incoming.pop(link, None)
+            if not incoming:
+                del self._incoming_links[end]
+
+        # if another link shares the same endpoints, it now becomes the one returned by get_link
+        if self._links_by_endpoints.get((start, end)) is link:
+            del self._links_by_endpoints[(start, end)]
+            for other in self._outgoing_links.get(start, {}):
+                if self.get_owner(other.get_end()) is end:
+                    self._links_by_endpoints[(start, end)] = other
+                    break
 
     # TODO: automatically add components/connectors if they don't already exist
     def add_link(self, start, end):
@@ -334,7 +621,7 @@ class Document:
         interface_out = None
         if type(start) is Interface and start.get_direction() == Interface.DIRECTION_OUT:
             interface_out = start
-        elif type(start) in (Component, Connector):
+        elif isinstance(start, (Component, Connector)):
             interface_out = start.get_interface_out()
 
             # now make sure interface_out is not None and create a new interface if it is
@@ -349,7 +636,7 @@ class Document:
         interface_in = None
         if type(end) is Interface and end.get_direction() == Interface.DIRECTION_IN:
             interface_in = end
-        elif type(end) in (Component, Connector):
+        elif isinstance(end, (Component, Connector)):
             interface_in = end.get_interface_in()
 
             # now make sure interface_out is not None and create a new interface if it is
@@ -361,36 +648,33 @@ class Document:
             exit()
 
         link = Link(start=interface_out, end=interface_in)
-        self._entities.add(link)
-        self._links.add(link)
+        self._links[link] = None
+        self._index_link(link)
 
         # check if we should add the endpoints
         # don't add them if they have type Interface
         
         if type(start) is Component:
-            self._components.add(start)
-            self._entities.add(start) 
-        elif type(start) is Connector:
-            self._connectors.add(start)
-            self._entities.add(start) 
+            if start not in self._components:
+                self.add_component(start)
+        elif isinstance(start, Connector):
+            self._connectors[start] = None
         elif type(start) is not Interface:
             logging.critical(f"Invalid type for the start point {type(start)}")
             exit()
 
         
         if type(end) is Component:
-            self._components.add(end)
-            self._entities.add(end) 
-        elif type(end) is Connector:
-            self._connectors.add(end)
-            self._entities.add(end) 
+            if end not in self._components:
+                self.add_component(end)
+        elif isinstance(end, Connector):
+            self._connectors[end] = None
         elif type(end) is not Interface:
             logging.critical(f"Invalid type for the end point {type(end)}")
             exit()
         
         return link
 
-    # TODO: fix remove link using endpoints
     def remove_link(self, link=None, start=None, end=None):
         if link is None:
             if start is None or end is None:
@@ -399,77 +683,177 @@ class Document:
             
             link = self.get_link(start, end)
 
-        self._entities.remove(link)
-        self._links.remove(link)
+        del self._links[link]
+        self._unindex_link(link)
 
     def get_link(self, sender, receiver):
         logging.debug(f"Checking for link between {sender} and {receiver}")
-        for link in self._links:
-            start_int = link.get_start()
-            start_comp = link.get_start_component()
-            end_int = link.get_end()
-            end_comp = link.get_end_component()
-            logging.debug(f"Checking link {start_comp if start_comp is not None else start_int} -> {end_comp if end_comp is not None else end_int}")
-            match = True
-            # check if sender is the same
-            if type(sender) is Interface:
-                match = match and sender == start_int
-            elif type(sender) in (Component, Connector):
-                match = match and sender == start_comp
-            else:
-                match = False
-
-            # check if receiver is the same
-            if type(receiver) is Interface:
-                match = match and receiver == end_int
-            elif type(receiver) in (Component, Connector):
-                match = match and receiver == end_comp
-            else:
-                match = False
-
-            if match:
+        if not isinstance(sender, (Interface, Component, Connector)) or not isinstance(receiver, (Interface, Component, Connector)):
+            return None
+
+        start = self.get_owner(sender)
+        end = self.get_owner(receiver)
+        if start is sender and end is receiver:
+            return self._links_by_endpoints.get((start, end))
+
+        # at least one endpoint is an interface of a component/connector, so check the links of its owner
+        for link in self._outgoing_links.get(start, {}):
+            if (start is sender or link.get_start() is sender) and (end is receiver or link.get_end() is receiver) \
+                    and self.get_owner(link.get_end()) is end:
                 return link
-                
         return None
 
-    def to_xml(self):
-        # xadlcore is the root tag of the document
-        # we are using xADL version 3.0
-        xadlcore = Element("xadlcore_3_0:xADL")
-        xadlcore.set("xmlns:xsi", "http://www.w3.org/2001/XMLSchema-instance")
-        xadlcore.set("xmlns:hints_3_0", "http://www.archstudio.org/xadl3/schemas/hints-3.0.xsd")
-        xadlcore.set("xmlns:structure_3_0", "http://www.archstudio.org/xadl3/schemas/structure-3.0.xsd")
-        xadlcore.set("xmlns:xadlcore_3_0", "http://www.archstudio.org/xadl3/schemas/xadlcore-3.0.xsd")
-
-        # this it the main structure for our architecture
-        # every structure requires a unique ID
-        body = SubElement(xadlcore, "structure_3_0:structure")
-        body.set("structure_3_0:id", str(get_uuid()))
-        body.set("structure_3_0:name", self.main_structure_name)
-
-        # Add additional structure to the document
-        for entity in self._entities:
-            body.append(entity.to_xml())
-
-        # parse to a string, encode as utf-8 and return a bytes object
-        return minidom.parseString(tostring(xadlcore)).toprettyxml(indent="    ", encoding="UTF-8")
-
-    def write_current_contents(self):
-        project_root = os.path.dirname(os.path.realpath(__file__ + "/.."))
-        output_dir = project_root + "/output/"
-
-        logging.debug(f"Checking if output directory {output_dir} exists")
+    def get_canonical_order(self):
+        """
+        Sort the entities of the document by their content. Every entity, including interfaces, also
+        gets a key that only depends on its content: its name, the role of an interface and the
+        endpoints of a link.
+        Returns a tuple (components, interfaces, connectors, links, keys) where interfaces maps every
+        component to its interfaces in canonical order and keys maps every entity to its key.
+        """
+        keys = {}
+        used_keys = {}
+
+        def add_key(entity, key):
+            # entities with identical content are told apart by the order they were sorted in
+            count = used_keys.get(key, 0)
+            used_keys[key] = count + 1
+            keys[entity] = key if count == 0 else f"{key}#{count}"
+
+        # an interface is identified by the components/connectors on the other ends of its links
+        peers = {}
+        for link in self._links:
+            start = link.get_start()
+            end = link.get_end()
+            peers.setdefault(start, []).append("out:" + self.get_owner(end).get_name())
+            peers.setdefault(end, []).append("in:" + self.get_owner(start).get_name())
+        for interface_peers in peers.values():
+            interface_peers.sort()
 
-        if not os.path.exists(output_dir):
-            logging.debug(f"Path does not exist. Creating directory {output_dir}")
-            os.mkdir(output_dir)
+        def interface_sort_key(interface):
+            return (interface.get_direction(), interface.get_name(), peers.get(interface, []))
 
-        out_file = output_dir + self.output_file_name
+        def interface_key(owner_key, interface):
+            direction = Interface.direction_strings[interface.get_direction()]
+            return f"{owner_key}/interface:{direction}:{interface.get_name()}:{','.join(peers.get(interface, []))}"
+
+        components = sorted(self._components, key=lambda component: component.get_name())
+        interfaces = {}
+        for component in components:
+            add_key(component, "component:" + component.get_name())
+            interfaces[component] = sorted(component.get_interfaces(), key=interface_sort_key)
+            for interface in interfaces[component]:
+                add_key(interface, interface_key(keys[component], interface))
+
+        connectors = sorted(self._connectors, key=lambda connector: connector.get_name())
+        for connector in connectors:
+            add_key(connector, "connector:" + connector.get_name())
+            add_key(connector.get_interface_in(), keys[connector] + "/interface:in")
+            add_key(connector.get_interface_out(), keys[connector] + "/interface:out")
+
+        # interfaces linked without ever being attached to a component or connector
+        for link in self._links:
+            for interface in (link.get_start(), link.get_end()):
+                if interface not in keys:
+                    add_key(interface, interface_key("", interface))
+
+        def link_key(link):
+            return f"link:{keys[link.get_start()]}->{keys[link.get_end()]}"
+
+        links = sorted(self._links, key=link_key)
+        for link in links:
+            add_key(link, link_key(link))
+
+        return components, interfaces, connectors, links, keys
+
+    def assign_ids(self):
+        """
+        Allocate the id of the structure and, for deterministic allocators, of every entity.
+        Entities are visited in canonical order so counter based ids are reproducible as well.
+        Returns the canonical order of the entities as (components, interfaces, connectors, links).
+        """
+        components, interfaces, connectors, links, keys = self.get_canonical_order()
+
+        allocator = self._id_allocator
+        allocator.reset()
+        self._structure_id = allocator.allocate("structure:" + self.main_structure_name)
+
+        if allocator.deterministic:
+            # keys are in the order the entities were visited
+            for entity, key in keys.items():
+                entity.set_id(allocator.allocate(key))
+
+        return components, interfaces, connectors, links
+
+    def get_export_order(self):
+        """
+        Allocate the ids of the document and get its entities in the order they are exported
+        """
+        with self.profiler.phase("assign_ids"):
+            components, interfaces, connectors, links = self.assign_ids()
+        return DocumentOrder(self._structure_id, self.main_structure_name, components, interfaces, connectors, links)
+
+    def write(self, stream, format="xadl", compress=False):
+        """
+        Stream the document to a binary stream in one of the formats of exporters.py, optionally
+        gzip compressed. Output is written as the entities are visited, so no tree or string copy of
+        the whole document is ever built in memory.
+        """
+        exporter = get_exporter(format)
+        order = self.get_export_order()
+        with self.profiler.phase("serialize"):
+            with open_compressed(stream, compress) as output:
+                exporter.write(order, output)
+
+    def write_xml(self, stream, indent="    "):
+        """
+        Stream the document as xADL to a binary stream.
+        Pass indent=None to write the document without any whitespace between elements.
+        """
+        self.write(stream, XadlExporter(indent=indent))
 
-        # to_xml returns a bytes object so we open file with "write bytes" mode
-        with open(out_file, "wb") as f:
-            f.write(self.to_xml())
+    def to_xml(self):
+        # write to an in-memory stream and return the encoded utf-8 bytes
+        stream = io.BytesIO()
+        self.write_xml(stream)
+        return stream.getvalue()
+
+    def to_bytes(self, format="xadl", compress=False):
+        """
+        Get the document in one of the formats of exporters.py without touching the disk
+        """
+        stream = io.BytesIO()
+        self.write(stream, format, compress)
+        return stream.getvalue()
+
+    def get_output_file_name(self, format="xadl", compress=False):
+        """
+        Name the output after the file name of the document, with the extension of its format
+        """
+        exporter = get_exporter(format)
+        file_name = os.path.splitext(self.output_file_name)[0] + exporter.extension
+        return file_name + ".gz" if compress else file_name
+
+    def export(self, sink, format="xadl", compress=False):
+        """
+        Write the document to a sink, see sinks.py. format is the name of an exporter, or an exporter.
+        Returns where the output was written.
+        """
+        sink = get_sink(sink)
+        file_name = self.get_output_file_name(format, compress)
+
+        with sink.open(file_name) as stream:
+            counting_stream = CountingStream(stream)
+            self.write(counting_stream, format, compress)
+            self.profiler.count("output_bytes", counting_stream.bytes_written)
+
+        return sink.get_location(file_name)
+
+    def write_current_contents(self, output_dir=None, format="xadl", compress=False):
+        if output_dir is None:
+            output_dir = get_default_output_dir()
+
+        logging.debug(f"Writing the document to {output_dir}")
 
         # return the name of the file we wrote to so we can report its location to the user
-        return out_file
-            
\ No newline at end of file
+        return self.export(DirectorySink(output_dir), format, compress)
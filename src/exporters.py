@@ -0,0 +1,254 @@
+from xadl_writer import XadlWriter, FLUSH_THRESHOLD
+from xml.sax.saxutils import escape, quoteattr
+import json
+
+
+# bumped whenever the layout of the json and jsonl formats changes
+GRAPH_FORMAT_VERSION = 1
+
+
+class DocumentOrder:
+    """
+    The entities of a document in the order they are exported, see Document.get_canonical_order
+    """
+    def __init__(self, structure_id, structure_name, components, interfaces, connectors, links):
+        self.structure_id = structure_id
+        self.structure_name = structure_name
+        self.components = components
+        self.interfaces = interfaces
+        self.connectors = connectors
+        self.links = links
+
+    def get_nodes(self):
+        """
+        Get the nodes of the graph as (node, kind) pairs: every component and connector, then the
+        interfaces linked without being attached to either
+        """
+        nodes = [(component, "component") for component in self.components]
+        nodes += [(connector, "connector") for connector in self.connectors]
+
+        seen = set()
+        for link in self.links:
+            for interface in (link.get_start(), link.get_end()):
+                if interface.get_parent() is None and interface not in seen:
+                    seen.add(interface)
+                    nodes.append((interface, "interface"))
+        return nodes
+
+    @staticmethod
+    def get_node(interface):
+        # a link is an edge between the components/connectors owning its interfaces
+        parent = interface.get_parent()
+        return parent if parent is not None else interface
+
+
+class Exporter:
+    """
+    Writes a document to a binary stream in one output format. Child classes either override
+    iter_text, yielding the output in pieces, or write for full control over the stream.
+    """
+    name = None
+    extension = None
+
+    def write(self, order, stream):
+        write_text(self.iter_text(order), stream)
+
+    def iter_text(self, order):
+        raise NotImplementedError("Child classes of Exporter must override iter_text or write")
+
+
+class XadlExporter(Exporter):
+    """
+    The pretty printed xADL 3.0 ArchStudio opens, with every interface of every entity
+    """
+    name = "xadl"
+    extension = ".xml"
+
+    def __init__(self, indent="    "):
+        self.indent = indent
+
+    def write(self, order, stream):
+        writer = XadlWriter(stream, indent=self.indent)
+        writer.start_document()
+
+        # xadlcore is the root tag of the document
+        # we are using xADL version 3.0
+        writer.start("xadlcore_3_0:xADL", (
+            ("xmlns:xsi", "http://www.w3.org/2001/XMLSchema-instance"),
+            ("xmlns:hints_3_0", "http://www.archstudio.org/xadl3/schemas/hints-3.0.xsd"),
+            ("xmlns:structure_3_0", "http://www.archstudio.org/xadl3/schemas/structure-3.0.xsd"),
+            ("xmlns:xadlcore_3_0", "http://www.archstudio.org/xadl3/schemas/xadlcore-3.0.xsd"),
+        ))
+
+        # this it the main structure for our architecture
+        # every structure requires a unique ID
+        writer.start("structure_3_0:structure", (
+            ("structure_3_0:id", order.structure_id),
+            ("structure_3_0:name", order.structure_name),
+        ))
+
+        # Add additional structure to the document, in canonical order so identical documents
+        # are written out byte for byte the same
+        for component in order.components:
+            component.write_xml(writer, order.interfaces[component])
+        for entity in order.connectors + order.links:
+            entity.write_xml(writer)
+
+        writer.end_document()
+
+
+class JsonExporter(Exporter):
+    """
+    A single compact JSON object holding the graph: components and connectors are nodes and links
+    are edges between them. Interfaces are left out, every node has one in and one out.
+    """
+    name = "json"
+    extension = ".json"
+
+    def iter_text(self, order):
+        yield '{"version":%d,"structure":{"id":%s,"name":%s},"nodes":[' % (
+            GRAPH_FORMAT_VERSION, json.dumps(order.structure_id), json.dumps(order.structure_name))
+        separator = ""
+        for node, kind in order.get_nodes():
+            yield separator + json.dumps(get_node({"id": node.get_id(), "name": node.get_name(), "type": kind}, node),
+                                         separators=(",", ":"))
+            separator = ","
+        yield '],"edges":['
+        separator = ""
+        for link in order.links:
+            yield separator + json.dumps(get_edge(link), separators=(",", ":"))
+            separator = ","
+        yield "]}\n"
+
+
+class JsonLinesExporter(Exporter):
+    """
+    One JSON object per line: the structure, then every node, then every edge. Each line is
+    independent, so the output can be consumed as a stream without holding it all in memory.
+    """
+    name = "jsonl"
+    extension = ".jsonl"
+
+    def iter_text(self, order):
+        yield json.dumps({"type": "structure", "version": GRAPH_FORMAT_VERSION, "id": order.structure_id,
+                          "name": order.structure_name}, separators=(",", ":")) + "\n"
+        for node, kind in order.get_nodes():
+            yield json.dumps(get_node({"type": kind, "id": node.get_id(), "name": node.get_name()}, node),
+                             separators=(",", ":")) + "\n"
+        for link in order.links:
+            edge = get_edge(link)
+            yield json.dumps({"type": "edge", **edge}, separators=(",", ":")) + "\n"
+
+
+class GraphmlExporter(Exporter):
+    """
+    GraphML, for graph tools such as Gephi, yEd or networkx
+    """
+    name = "graphml"
+    extension = ".graphml"
+
+    def iter_text(self, order):
+        yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+               '<key id="structure" for="graph" attr.name="name" attr.type="string"/>\n'
+               '<key id="name" for="node" attr.name="name" attr.type="string"/>\n'
+               '<key id="type" for="node" attr.name="type" attr.type="string"/>\n')
+        yield f'<graph id={quoteattr(order.structure_id)} edgedefault="directed">\n'
+        yield f'<data key="structure">{escape(order.structure_name)}</data>\n'
+        for node, kind in order.get_nodes():
+            yield (f'<node id={quoteattr(node.get_id())}><data key="name">{escape(node.get_name())}</data>'
+                   f'<data key="type">{kind}</data></node>\n')
+        for link in order.links:
+            edge = get_edge(link)
+            yield (f'<edge id={quoteattr(edge["id"])} source={quoteattr(edge["source"])} '
+                   f'target={quoteattr(edge["target"])}/>\n')
+        yield "</graph>\n</graphml>\n"
+
+
+class DotExporter(Exporter):
+    """
+    Graphviz DOT, nodes are identified by their ids and labelled with their names
+    """
+    name = "dot"
+    extension = ".dot"
+
+    # connectors are drawn differently so the implicit message bus stands out
+    shapes = {"component": "box", "connector": "ellipse", "interface": "point"}
+
+    def iter_text(self, order):
+        yield f"digraph {quote_dot(order.structure_name)} {{\n"
+        for node, kind in order.get_nodes():
+            yield f"  {quote_dot(node.get_id())} [label={quote_dot(node.get_name())}, shape={self.shapes[kind]}];\n"
+        for link in order.links:
+            edge = get_edge(link)
+            yield f"  {quote_dot(edge['source'])} -> {quote_dot(edge['target'])};\n"
+        yield "}\n"
+
+
+def write_text(pieces, stream):
+    """
+    Encode pieces of text to a binary stream, buffering small pieces into larger writes
+    """
+    buffer = []
+    buffered = 0
+    for text in pieces:
+        buffer.append(text)
+        buffered += len(text)
+        if buffered >= FLUSH_THRESHOLD:
+            stream.write("".join(buffer).encode("utf-8"))
+            buffer = []
+            buffered = 0
+    if len(buffer) > 0:
+        stream.write("".join(buffer).encode("utf-8"))
+
+
+def get_node(record, node):
+    # aggregated connectors also carry their count and kinds of interaction
+    properties = node.get_properties()
+    if properties is not None:
+        record.update(properties)
+    return record
+
+
+def get_edge(link):
+    return {
+        "id": link.get_id(),
+        "source": DocumentOrder.get_node(link.get_start()).get_id(),
+        "target": DocumentOrder.get_node(link.get_end()).get_id(),
+    }
+
+
+def quote_dot(text):
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+EXPORTERS = {
+    "xadl": XadlExporter,
+    "json": JsonExporter,
+    "jsonl": JsonLinesExporter,
+    "graphml": GraphmlExporter,
+    "dot": DotExporter,
+}
+
+
+def get_exporter(exporter):
+    """
+    Get an exporter from its name in EXPORTERS, or return it unchanged if it already is one
+    """
+    if isinstance(exporter, Exporter):
+        return exporter
+    if exporter not in EXPORTERS:
+        raise ValueError(f"Unknown output format {exporter}, expected one of {', '.join(EXPORTERS)}")
+    return EXPORTERS[exporter]()
+
+
+def add_format_arguments(arg_parser):
+    """
+    Add the command line options selecting the output format
+    """
+    arg_parser.add_argument('--format', dest='format', choices=list(EXPORTERS), default='xadl',
+                            help='Output format: xADL for ArchStudio, or the graph alone as compact JSON, JSON Lines, '
+                                 'GraphML or Graphviz DOT (default: xadl)')
+    arg_parser.add_argument('--gzip', dest='gzip', action='store_const',
+                            const=True, default=False,
+                            help='Compress the output with gzip')
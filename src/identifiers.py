@@ -0,0 +1,73 @@
+import uuid
+
+
+# namespace for the UUIDs derived from entity content, any fixed UUID works as long as it never changes
+CONTENT_NAMESPACE = uuid.UUID("6f1f2c59-3a0e-4b8e-9d51-0d7c3b2a8e41")
+
+
+class IdAllocator:
+    """
+    Allocates the ids of the entities in a document. Each entity is identified by a key that only
+    depends on its content, such as its name, the role of an interface or the endpoints of a link.
+    """
+    # deterministic allocators give the same id to the same key in every run
+    deterministic = True
+
+    def reset(self):
+        pass
+
+    def allocate(self, key):
+        raise NotImplementedError("Child classes of IdAllocator must override allocate")
+
+
+class RandomIdAllocator(IdAllocator):
+    """
+    Allocates a random 128 bit UUID for every entity
+    """
+    deterministic = False
+
+    def allocate(self, key):
+        return str(uuid.uuid4())
+
+
+class CounterIdAllocator(IdAllocator):
+    """
+    Allocates sequential ids formatted as UUIDs. Entities are visited in a canonical order, so the ids
+    are reproducible for identical input without hashing anything.
+    """
+    def __init__(self):
+        self._next = 0
+
+    def reset(self):
+        self._next = 0
+
+    def allocate(self, key):
+        self._next += 1
+        return "00000000-0000-0000-0000-%012x" % self._next
+
+
+class ContentIdAllocator(IdAllocator):
+    """
+    Allocates name based UUIDs by hashing the key of each entity, so an entity keeps its id across
+    runs even when other entities are added or removed
+    """
+    def allocate(self, key):
+        return str(uuid.uuid5(CONTENT_NAMESPACE, key))
+
+
+ID_ALLOCATORS = {
+    "random": RandomIdAllocator,
+    "counter": CounterIdAllocator,
+    "content": ContentIdAllocator,
+}
+
+
+def get_id_allocator(allocator):
+    """
+    Get an allocator from its name in ID_ALLOCATORS, or return it unchanged if it already is one
+    """
+    if isinstance(allocator, IdAllocator):
+        return allocator
+    if allocator not in ID_ALLOCATORS:
+        raise ValueError(f"Unknown id allocator {allocator}, expected one of {', '.join(ID_ALLOCATORS)}")
+    return ID_ALLOCATORS[allocator]()
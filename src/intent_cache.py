@@ -0,0 +1,270 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+
+# bound on the total size of the cache before the least recently used entries are evicted
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# the total size of the entries when they were last counted, and a journal of the size of every entry
+# written since, one per line. Appending a line is atomic, so concurrent writers don't need a lock
+SIZE_FILE = "size"
+JOURNAL_FILE = "written"
+
+# once the journal is larger, its lines are folded into one when it is next read
+JOURNAL_MAX_BYTES = 64 * 1024
+
+
+def get_default_cache_dir():
+    """
+    Get the per-user cache directory, honoring XDG_CACHE_HOME if it is set
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "android_architecture_analyzer")
+
+
+def add_cache_arguments(arg_parser):
+    """
+    Add the command line options controlling the intent cache
+    """
+    arg_parser.add_argument('--cache-dir', dest='cache_dir', type=str, default=None,
+                            help=f'Directory of the cache of per-file Intent extraction results (default: {get_default_cache_dir()})')
+    arg_parser.add_argument('--cache-max-mb', dest='cache_max_mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                            help='Size bound of the cache in megabytes before old entries are evicted')
+    arg_parser.add_argument('--no-cache', dest='no_cache', action='store_const',
+                            const=True, default=False,
+                            help='Do not read or write the cache of per-file Intent extraction results')
+
+
+def create_cache(args, version):
+    """
+    Create the IntentCache described by parsed command line options, or None if caching is disabled
+    """
+    if args.no_cache:
+        return None
+    cache_dir = args.cache_dir if args.cache_dir is not None else get_default_cache_dir()
+    return IntentCache(cache_dir, version, max_bytes=args.cache_max_mb * 1024 * 1024)
+
+
+class IntentCache:
+    """
+    On-disk cache of the Intents extracted from source files. Entries are keyed by a hash of the file
+    content and the extractor version, so identical files are hits no matter which app or path they
+    come from, and changing the extractor invalidates every previous entry.
+
+    Long running processes can also keep up to memory_entries of the most recently used entries in
+    memory, so repeated lookups don't touch the disk at all.
+    """
+    def __init__(self, cache_dir, version, max_bytes=DEFAULT_MAX_BYTES, memory_entries=0):
+        self.cache_dir = cache_dir
+        self.version = str(version)
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+
+        # dicts are insertion ordered, so the first key is always the least recently used one
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # the cache is sent to worker processes, which start with an empty memory layer of their own
+        state = self.__dict__.copy()
+        state["_memory"] = {}
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory.pop(key, None)
+            self._memory[key] = value
+            while len(self._memory) > self.memory_entries:
+                del self._memory[next(iter(self._memory))]
+
+    def get_key(self, content):
+        """
+        Get the cache key of a bytes-like object holding the content of a file
+        """
+        digest = hashlib.sha256(self.version.encode("utf-8") + b"\0")
+        digest.update(content)
+        return digest.hexdigest()
+
+    def _get_path(self, key):
+        # shard entries over subdirectories so no single directory grows too large
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key):
+        """
+        Get the cached value for a key, or None if there is no entry
+        """
+        if self.memory_entries > 0:
+            with self._lock:
+                value = self._memory.get(key)
+            if value is not None:
+                self._remember(key, value)
+                return value
+
+        path = self._get_path(key)
+        try:
+            with open(path, "r") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # refresh the modification time, which is what eviction uses to find the least recently used entries
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        if self.memory_entries > 0:
+            self._remember(key, value)
+
+        return value
+
+    def put(self, key, value):
+        if self.memory_entries > 0:
+            self._remember(key, value)
+
+        path = self._get_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            # write to a temporary file and rename it so concurrent readers never see a partial entry
+            data = json.dumps(value, separators=(",", ":")).encode("utf-8")
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.debug(f"Could not write cache entry {path}: {e}")
+            return
+
+        self._record_write(len(data))
+
+    def _record_write(self, size):
+        # an entry written again is counted twice, which only makes the next prune count sooner
+        path = os.path.join(self.cache_dir, JOURNAL_FILE)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, f"{size}\n".encode("ascii"))
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logging.debug(f"Could not record the size of a cache entry in {path}: {e}")
+
+    def get_size(self):
+        """
+        Get the total size of the entries as tracked on write, without walking the cache,
+        or None if the entries were never counted
+        """
+        try:
+            with open(os.path.join(self.cache_dir, SIZE_FILE), "r") as f:
+                total = int(f.read())
+        except (OSError, ValueError):
+            return None
+
+        path = os.path.join(self.cache_dir, JOURNAL_FILE)
+        try:
+            with open(path, "r") as f:
+                fold = os.fstat(f.fileno()).st_size > JOURNAL_MAX_BYTES
+                # a line still being appended by another process is left for the next count
+                written = sum(int(line) for line in f if line.endswith("\n"))
+        except FileNotFoundError:
+            return total
+        except (OSError, ValueError):
+            return None
+
+        if fold:
+            self._fold_journal(path)
+        return total + written
+
+    def _fold_journal(self, path):
+        # the journal is moved aside first, so entries written meanwhile start a new one, and its total is
+        # appended to the new one as a single line. Only a write that opened the journal before it was
+        # moved and appends after it was read can go uncounted, until the next walk
+        try:
+            fd, folded_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            os.close(fd)
+            os.replace(path, folded_path)
+        except OSError as e:
+            logging.debug(f"Could not fold the journal of the intent cache in {self.cache_dir}: {e}")
+            return
+
+        try:
+            with open(folded_path, "r") as f:
+                written = sum(int(line) for line in f if line.endswith("\n"))
+            self._record_write(written)
+            os.remove(folded_path)
+        except (OSError, ValueError) as e:
+            logging.debug(f"Could not fold the journal of the intent cache in {self.cache_dir}: {e}")
+
+    def _write_size(self, total):
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                f.write(str(total))
+            os.replace(tmp_path, os.path.join(self.cache_dir, SIZE_FILE))
+        except OSError as e:
+            logging.debug(f"Could not write the size of the intent cache in {self.cache_dir}: {e}")
+
+    def prune(self):
+        """
+        Evict the least recently used entries until the cache fits within max_bytes. The entries are
+        only walked when their size tracked on write is over max_bytes, or was never counted.
+        Returns the number of evicted entries.
+        """
+        tracked = self.get_size()
+        if tracked is not None and tracked <= self.max_bytes:
+            return 0
+
+        # the journal is dropped before counting, so entries written meanwhile are counted at worst twice
+        try:
+            os.remove(os.path.join(self.cache_dir, JOURNAL_FILE))
+        except OSError:
+            pass
+
+        entries = []
+        total = 0
+        try:
+            shards = [entry.path for entry in os.scandir(self.cache_dir) if entry.is_dir()]
+        except OSError:
+            return 0
+
+        for shard in shards:
+            try:
+                for entry in os.scandir(shard):
+                    if not entry.name.endswith(".json"):
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            except OSError:
+                # another process may be pruning at the same time
+                continue
+
+        if total <= self.max_bytes:
+            self._write_size(total)
+            return 0
+
+        evicted = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            evicted += 1
+        self._write_size(total)
+
+        logging.debug(f"Evicted {evicted} entries from the intent cache in {self.cache_dir}")
+        return evicted
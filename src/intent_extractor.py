@@ -0,0 +1,521 @@
+import heapq
+import re
+
+
+# comments and string literals, matched as a whole so nothing inside them is mistaken for code. The
+# quantifiers are possessive so a literal is never read twice, and a comment left open runs to the end
+# of the file, as it would for the compiler
+COMMENT_OR_STRING = (rb'/(?:/[^\n]*+|\*(?:[^*]++|\*(?!/))*+(?:\*/|\Z))'
+                     rb'|"(?:""(?:[^"]++|"(?!""))*+"""|(?:\\.|[^"\\\n])*+")|\'(?:\\.|[^\'\\\n])*+\'')
+
+IDENTIFIER_PATTERN = re.compile(rb"[\w$]")
+
+# a run of code, consumed in bulk, followed by the comment or literal ending it, a quote or slash that
+# doesn't start one, or the end of the buffer
+CODE_PATTERN = re.compile(rb"(?:[^/\"']++|/(?![/*]))*+(?P<token>" + COMMENT_OR_STRING + rb"|[/\"']|\Z)", re.DOTALL)
+
+# tokens that matter while splitting the arguments of a call
+ARGUMENT_PATTERN = re.compile(rb"(?P<skip>" + COMMENT_OR_STRING + rb")|(?P<open>[(\[{])|(?P<close>[)\]}])|(?P<comma>,)", re.DOTALL)
+
+CLASS_LITERAL_PATTERN = re.compile(r"^([\w$.]+?)\s*(?:\.\s*class|::\s*class(?:\s*\.\s*java)?)$")
+STRING_LITERAL_PATTERN = re.compile(r'^"((?:\\.|[^"\\])*)"$')
+INTENT_CONSTANT_PATTERN = re.compile(r"^(?:android\.content\.)?Intent\.(ACTION_\w+|CATEGORY_\w+)$")
+INLINE_INTENT_PATTERN = re.compile(r"^(?:new\s+)?Intent\s*\(")
+URI_PARSE_PATTERN = re.compile(r'^Uri\s*\.\s*parse\s*\(\s*"((?:\\.|[^"\\])*)"\s*\)$')
+RESOURCE_REFERENCE_PATTERN = re.compile(r"^(?:[\w.]+\.)?R\s*\.\s*(layout|menu|xml|navigation)\s*\.\s*(\w+)$")
+
+# the variable an Intent is assigned to or called on, from the text just before a trigger,
+# e.g. "Intent intent = new " or "intent."
+VARIABLE_PATTERN = re.compile(rb"([A-Za-z_$][\w$]*)\s*(?:=\s*(?:new\s+)?|\.\s*)$")
+VARIABLE_LOOKBEHIND = 64
+
+
+class Finding:
+    """
+    A single inter-component communication found in a source file
+    """
+    __slots__ = ("kind", "target", "line", "detail", "api")
+
+    # an Intent addressed to a specific class, target is the class name
+    EXPLICIT_INTENT = "explicit-intent"
+
+    # an Intent resolved by the system from its action, detail is the action if it is known and
+    # target the data URI if it is a literal
+    IMPLICIT_INTENT = "implicit-intent"
+
+    # a service started, stopped or bound, target is the class name if the Intent is created inline
+    SERVICE = "service"
+
+    # a broadcast sent, target is the class name if the Intent is created inline
+    BROADCAST = "broadcast"
+
+    # a content provider URI, target is the authority
+    PROVIDER = "provider"
+
+    # a layout, menu, preference screen or navigation graph used by the class, target is e.g. "layout/main"
+    RESOURCE = "resource"
+
+    # the APIs an implicit Intent is sent through, which decide the kind of component receiving it
+    ACTIVITY_API = "activity"
+    SERVICE_API = "service"
+    BROADCAST_API = "broadcast"
+
+    def __init__(self, kind, target=None, line=None, detail=None, api=None):
+        self.kind = kind
+        self.target = target
+        self.line = line
+        self.detail = detail
+
+        # the API an implicit Intent is sent through, or None if it isn't known
+        self.api = api
+
+    def __eq__(self, other):
+        return isinstance(other, Finding) and self.to_list() == other.to_list()
+
+    def __hash__(self):
+        return hash(tuple(self.to_list()))
+
+    def __repr__(self):
+        return f"Finding({self.kind!r}, {self.target!r}, line={self.line!r}, detail={self.detail!r}, api={self.api!r})"
+
+    def to_list(self):
+        # compact form used when findings are cached or sent between processes
+        return [self.kind, self.target, self.line, self.detail, self.api]
+
+    @staticmethod
+    def from_list(values):
+        return Finding(*values)
+
+
+# the API of every method sending an Intent
+SEND_APIS = {
+    "startActivity": Finding.ACTIVITY_API,
+    "startActivityForResult": Finding.ACTIVITY_API,
+    "startActivities": Finding.ACTIVITY_API,
+    "startActivityIfNeeded": Finding.ACTIVITY_API,
+    "startService": Finding.SERVICE_API,
+    "startForegroundService": Finding.SERVICE_API,
+    "stopService": Finding.SERVICE_API,
+    "bindService": Finding.SERVICE_API,
+    "sendBroadcast": Finding.BROADCAST_API,
+    "sendBroadcastAsUser": Finding.BROADCAST_API,
+    "sendOrderedBroadcast": Finding.BROADCAST_API,
+    "sendOrderedBroadcastAsUser": Finding.BROADCAST_API,
+    "sendStickyBroadcast": Finding.BROADCAST_API,
+}
+
+
+class Call:
+    """
+    A call or constructor invocation matched by a detector trigger
+    """
+    __slots__ = ("name", "arguments", "line")
+
+    def __init__(self, name, arguments, line):
+        self.name = name
+        self.arguments = arguments
+        self.line = line
+
+
+def get_class_literal(argument):
+    """
+    Get the class named by a Java (Foo.class) or Kotlin (Foo::class.java) class literal, or None
+    """
+    match = CLASS_LITERAL_PATTERN.match(argument)
+    return match.group(1) if match is not None else None
+
+
+def get_string_literal(argument):
+    match = STRING_LITERAL_PATTERN.match(argument)
+    return match.group(1) if match is not None else None
+
+
+def get_uri_literal(argument):
+    """
+    Get the URI of a Uri.parse("...") call with a literal, or None
+    """
+    match = URI_PARSE_PATTERN.match(argument)
+    return match.group(1) if match is not None else None
+
+
+def get_action(argument):
+    """
+    Get the action string named by an argument, either a string literal or one of the Intent constants.
+    Returns None if the argument is not recognizably an action.
+    """
+    literal = get_string_literal(argument)
+    if literal is not None:
+        return literal
+
+    match = INTENT_CONSTANT_PATTERN.match(argument)
+    if match is not None:
+        # Intent.ACTION_VIEW is "android.intent.action.VIEW", Intent.CATEGORY_HOME is "android.intent.category.HOME"
+        kind, _, name = match.group(1).partition("_")
+        return f"android.intent.{kind.lower()}.{name}"
+
+    return None
+
+
+def get_inline_target(argument):
+    """
+    Get the class targeted by an Intent created inline as an argument, e.g.
+    startService(new Intent(this, SyncService.class))
+    """
+    match = INLINE_INTENT_PATTERN.match(argument)
+    if match is None:
+        return None
+    arguments = split_arguments(argument.encode("utf-8"), match.end() - 1)
+    if len(arguments) >= 2:
+        return get_class_literal(arguments[-1])
+    return None
+
+
+def split_arguments(buffer, open_paren):
+    """
+    Split the arguments of the call whose opening parenthesis is at open_paren.
+    Returns the list of arguments as stripped strings.
+    """
+    return ArgumentScanner(buffer).scan(open_paren)[0]
+
+
+class ArgumentScanner:
+    """
+    Splits the arguments of the calls in a buffer. The brackets following an opening parenthesis are
+    matched once and remembered, so the arguments of calls nested in one another or never closed are
+    split without reading any part of the buffer again, and splitting the arguments of every call in a
+    file costs at most one pass over it.
+
+    Opening parentheses must be passed in increasing order and lie outside comments and literals.
+    """
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+        # the offsets of the commas and of the closing bracket of every bracket matched so far, by the
+        # offset of the opening bracket, and where matching stopped
+        self._brackets = {}
+        self._position = 0
+
+    def scan(self, open_paren):
+        """
+        Split the arguments of the call whose opening parenthesis is at open_paren, see split_arguments.
+        Returns a tuple (arguments, end) where end is the offset of the closing parenthesis, or the
+        length of the buffer if the call is never closed
+        """
+        if open_paren >= self._position or open_paren not in self._brackets:
+            self._match(open_paren)
+        separators, end = self._brackets[open_paren]
+
+        # the text after the last comma of a call never closed isn't an argument
+        bounds = separators if end is None else separators + [end]
+        arguments = [bytes(self.buffer[bounds[i] + 1:bounds[i + 1]]).decode("utf-8", errors="replace").strip()
+                     for i in range(len(bounds) - 1)]
+        if end is None:
+            end = len(self.buffer)
+        if arguments == [""]:
+            return [], end
+        return arguments, end
+
+    def _match(self, open_bracket):
+        # the separators of the brackets not closed yet, innermost last, each starting with the offset
+        # of its opening bracket
+        opened = []
+        for match in ARGUMENT_PATTERN.finditer(self.buffer, open_bracket):
+            kind = match.lastgroup
+            if kind == "open":
+                opened.append([match.start()])
+            elif len(opened) == 0:
+                continue
+            elif kind == "close":
+                separators = opened.pop()
+                self._brackets[separators[0]] = (separators, match.start())
+                if len(opened) == 0:
+                    self._position = match.end()
+                    return
+            elif kind == "comma":
+                opened[-1].append(match.start())
+
+        for separators in opened:
+            self._brackets[separators[0]] = (separators, None)
+        self._position = len(self.buffer)
+
+
+def get_variable(buffer, start):
+    """
+    Get the variable the result of the call at start is assigned to, or the call is made on, or None
+    """
+    match = VARIABLE_PATTERN.search(bytes(buffer[max(0, start - VARIABLE_LOOKBEHIND):start]))
+    return match.group(1).decode("utf-8") if match is not None else None
+
+
+class Detector:
+    """
+    Base class of the detectors run by an IntentExtractor. A detector lists the calls it wants to see
+    in triggers and, optionally, string literal prefixes in string_prefixes. The extractor matches
+    every trigger of every detector in the same pass over a file.
+    """
+    # names of methods or constructors, e.g. "setClass" or "Intent"
+    triggers = ()
+
+    # prefixes of string literals, e.g. "content://"
+    string_prefixes = ()
+
+    def detect_call(self, call):
+        return ()
+
+    def detect_string(self, value, line):
+        return ()
+
+
+class IntentConstructorDetector(Detector):
+    """
+    new Intent(context, Target.class), new Intent(action[, uri]) and new Intent(action, uri, context, Target.class)
+    """
+    triggers = ("Intent",)
+
+    def detect_call(self, call):
+        arguments = call.arguments
+        if len(arguments) in (2, 4):
+            target = get_class_literal(arguments[-1])
+            if target is not None:
+                return (Finding(Finding.EXPLICIT_INTENT, target, call.line),)
+
+        if len(arguments) in (1, 2):
+            action = get_action(arguments[0])
+            if action is not None:
+                uri = get_uri_literal(arguments[1]) if len(arguments) == 2 else None
+                return (Finding(Finding.IMPLICIT_INTENT, uri, call.line, action),)
+
+        return ()
+
+
+class ComponentNameDetector(Detector):
+    """
+    setClass(context, Target.class), setClassName(context, "Target") and new ComponentName(context, Target.class)
+    """
+    triggers = ("setClass", "setClassName", "ComponentName")
+
+    def detect_call(self, call):
+        if len(call.arguments) != 2:
+            return ()
+
+        target = get_class_literal(call.arguments[1])
+        if target is None:
+            target = get_string_literal(call.arguments[1])
+        if target is None:
+            return ()
+        return (Finding(Finding.EXPLICIT_INTENT, target, call.line),)
+
+
+class ActionDetector(Detector):
+    """
+    intent.setAction(action)
+    """
+    triggers = ("setAction",)
+
+    def detect_call(self, call):
+        if len(call.arguments) != 1:
+            return ()
+        action = get_action(call.arguments[0])
+        if action is None:
+            return ()
+        return (Finding(Finding.IMPLICIT_INTENT, None, call.line, action),)
+
+
+class ServiceDetector(Detector):
+    """
+    startService, startForegroundService, stopService and bindService
+    """
+    triggers = ("startService", "startForegroundService", "stopService", "bindService")
+
+    def detect_call(self, call):
+        if len(call.arguments) == 0:
+            return ()
+        return (Finding(Finding.SERVICE, get_inline_target(call.arguments[0]), call.line, call.name),)
+
+
+class BroadcastDetector(Detector):
+    """
+    sendBroadcast, sendOrderedBroadcast, sendStickyBroadcast and their variants
+    """
+    triggers = ("sendBroadcast", "sendBroadcastAsUser", "sendOrderedBroadcast", "sendOrderedBroadcastAsUser",
+                "sendStickyBroadcast")
+
+    def detect_call(self, call):
+        if len(call.arguments) == 0:
+            return ()
+        return (Finding(Finding.BROADCAST, get_inline_target(call.arguments[0]), call.line, call.name),)
+
+
+class ProviderDetector(Detector):
+    """
+    content:// URIs, as passed to ContentResolver queries
+    """
+    string_prefixes = ("content://",)
+
+    def detect_string(self, value, line):
+        authority = value[len("content://"):].split("/", 1)[0]
+        if len(authority) == 0:
+            return ()
+        return (Finding(Finding.PROVIDER, authority, line, value),)
+
+
+class ResourceDetector(Detector):
+    """
+    Layouts, menus, preference screens and navigation graphs used by a class, e.g.
+    setContentView(R.layout.main), inflate(R.menu.main, menu) or addPreferencesFromResource(R.xml.settings)
+    """
+    triggers = ("setContentView", "inflate", "addPreferencesFromResource", "setPreferencesFromResource",
+                "setDefaultValues", "setGraph")
+
+    def detect_call(self, call):
+        findings = []
+        for argument in call.arguments:
+            match = RESOURCE_REFERENCE_PATTERN.match(argument)
+            if match is not None:
+                findings.append(Finding(Finding.RESOURCE, f"{match.group(1)}/{match.group(2)}", call.line))
+        return findings
+
+
+DEFAULT_DETECTORS = (
+    IntentConstructorDetector(),
+    ComponentNameDetector(),
+    ActionDetector(),
+    ServiceDetector(),
+    BroadcastDetector(),
+    ProviderDetector(),
+    ResourceDetector(),
+)
+
+
+class IntentExtractor:
+    """
+    Finds inter-component communication in Java and Kotlin sources in a single linear pass.
+
+    The re module only skips ahead quickly to where a match can start when the pattern begins with a
+    literal, so calls are matched from their opening parenthesis in the reversed file, with the names
+    of every trigger spelled backwards, and strings from a quote followed by a prefix some detector
+    wants. Comments and literals are only read up to the last of these, to drop the ones inside them.
+    Registering more detectors only adds alternatives to the pattern, never more passes over the file.
+    """
+    def __init__(self, detectors=DEFAULT_DETECTORS):
+        self.detectors = tuple(detectors)
+
+        self._call_detectors = {}
+        for detector in self.detectors:
+            for trigger in detector.triggers:
+                self._call_detectors.setdefault(trigger, []).append(detector)
+
+        # calls sending an Intent are matched too, to find out the API of implicit Intents
+        for trigger in SEND_APIS:
+            self._call_detectors.setdefault(trigger, [])
+        self._string_detectors = [(prefix.encode("utf-8"), detector) for detector in self.detectors
+                                  for prefix in detector.string_prefixes]
+
+        self._call_pattern = re.compile(b"".join(self._get_call_alternatives()))
+
+    def _get_call_alternatives(self):
+        # the reversed names are grouped by their first character, which is what lets the re module skip
+        # ahead, with the longest names tried first, and a trigger must not be the end of a longer name,
+        # e.g. myIntent(
+        triggers_by_last = {}
+        for trigger in sorted(self._call_detectors, key=len, reverse=True):
+            triggers_by_last.setdefault(trigger[-1], []).append(re.escape(trigger[-2::-1]))
+
+        yield rb"\(\s*+(?:"
+        yield "|".join(re.escape(last) + "(?:" + "|".join(rests) + ")"
+                       for last, rests in triggers_by_last.items()).encode("utf-8")
+        yield rb")(?![\w$])"
+
+    def extract(self, buffer):
+        """
+        Extract the findings from a bytes object or an mmap holding a source file.
+        Returns the findings in the order they appear in the file.
+
+        The API of an implicit Intent is known when the Intent is created among the arguments of the
+        call sending it, or is held by a variable later passed to such a call.
+        """
+        # the (offset of the parenthesis, offset of the name) of every call, in the order of the file
+        size = len(buffer)
+        calls = [(size - 1 - match.start(), size - match.end())
+                 for match in self._call_pattern.finditer(buffer[::-1])]
+        calls.reverse()
+
+        # the (offset of the quote, None) of every string that may start with a prefix
+        strings = set()
+        for prefix, _ in self._string_detectors:
+            start = buffer.find(b'"' + prefix)
+            while start != -1:
+                strings.add((start, None))
+                start = buffer.find(b'"' + prefix, start + 1)
+
+        findings = []
+        line = 1
+        last = 0
+        scanner = ArgumentScanner(buffer)
+
+        # the comments and literals are read along with the candidates, the current one ending past
+        # the candidate and the previous one before it
+        tokens = CODE_PATTERN.finditer(buffer)
+        token_start = token_end = previous_end = 0
+
+        # the (api, end) of the send calls whose arguments are being read, innermost last, and the
+        # implicit Intents held by each variable that weren't sent yet
+        sending = []
+        pending = {}
+
+        for position, start in heapq.merge(calls, sorted(strings), key=lambda candidate: candidate[0]):
+            while token_end <= position:
+                previous_end = token_end
+                token = next(tokens)
+                token_start, token_end = token.start("token"), token.end()
+
+            if start is None:
+                if position == token_start and token_end - token_start > 1:
+                    line += buffer[last:position].count(b"\n")
+                    last = position
+                    self._detect_string(buffer[token_start:token_end], line, findings)
+                continue
+
+            # a name followed by a line break may lie in a comment, e.g. "// an Intent" before "(a).b()"
+            if position >= token_start or start < previous_end:
+                continue
+
+            # slicing works the same for bytes and mmaps, and never copies more than the file in total
+            line += buffer[last:start].count(b"\n")
+            last = start
+
+            name = bytes(buffer[start:position]).rstrip().decode("utf-8")
+
+            arguments, end = scanner.scan(position)
+            call = Call(name, arguments, line)
+            call_findings = []
+            for detector in self._call_detectors[name]:
+                call_findings.extend(detector.detect_call(call))
+
+            while len(sending) > 0 and sending[-1][1] <= start:
+                sending.pop()
+            implicit = [finding for finding in call_findings if finding.kind == Finding.IMPLICIT_INTENT]
+            if len(implicit) > 0:
+                if len(sending) > 0:
+                    for finding in implicit:
+                        finding.api = sending[-1][0]
+                else:
+                    variable = get_variable(buffer, start)
+                    if variable is not None:
+                        pending.setdefault(variable, []).extend(implicit)
+
+            api = SEND_APIS.get(name)
+            if api is not None:
+                sending.append((api, end))
+                for finding in pending.pop(arguments[0], ()) if len(arguments) > 0 else ():
+                    finding.api = api
+
+            findings.extend(call_findings)
+
+        return findings
+
+    def _detect_string(self, literal, line, findings):
+        value = bytes(literal[1:-1])
+        for prefix, detector in self._string_detectors:
+            if value.startswith(prefix):
+                findings.extend(detector.detect_string(value.decode("utf-8", errors="replace"), line))
@@ -0,0 +1,317 @@
+import logging
+import re
+
+
+ANDROID_SCHEMA = "{http://schemas.android.com/apk/res/android}"
+
+# every Intent passed to startActivity gets this category, so activities only receive implicit
+# Intents through filters declaring it
+CATEGORY_DEFAULT = "android.intent.category.DEFAULT"
+
+# an Intent with a type but no URI still matches filters for these schemes
+TYPE_ONLY_SCHEMES = ("content", "file")
+
+URI_PATTERN = re.compile(r"^(?P<scheme>[A-Za-z][\w+.\-]*):(?://(?P<host>[^/?#:]*)(?::\d+)?)?(?P<path>[^?#]*)")
+
+
+class IntentFilter:
+    """
+    An <intent-filter> of a component. Data is matched the way Android does: every scheme, host and
+    path of the filter is accepted independently of the others.
+    """
+    def __init__(self, component, actions=(), categories=(), schemes=(), hosts=(), paths=(), path_prefixes=(),
+                 path_patterns=(), mime_types=(), component_type=None, exported=True):
+        self.component = component
+
+        # the kind of component declaring the filter, e.g. "Receiver", and whether other apps may reach it
+        self.component_type = component_type
+        self.exported = exported
+
+        self.actions = set(actions)
+        self.categories = set(categories)
+        self.schemes = set(schemes)
+        self.hosts = set(hosts)
+        self.paths = set(paths)
+        self.path_prefixes = set(path_prefixes)
+        self.path_patterns = set(path_patterns)
+        self.mime_types = set(mime_types)
+
+    @staticmethod
+    def from_element(component, element, component_type=None, exported=True):
+        """
+        Read an <intent-filter> element of a manifest
+        """
+        def get_values(tag, attribute):
+            return [child.get(f"{ANDROID_SCHEMA}{attribute}") for child in element.findall(tag)
+                    if child.get(f"{ANDROID_SCHEMA}{attribute}") is not None]
+
+        return IntentFilter(component, get_values("action", "name"), get_values("category", "name"),
+                            get_values("data", "scheme"), get_values("data", "host"), get_values("data", "path"),
+                            get_values("data", "pathPrefix"), get_values("data", "pathPattern"),
+                            get_values("data", "mimeType"), component_type, exported)
+
+    def has_paths(self):
+        return len(self.paths) + len(self.path_prefixes) + len(self.path_patterns) > 0
+
+
+class ImplicitIntent:
+    """
+    What is known of an implicit Intent: its action and, when they are literals, its data URI and MIME
+    type. The extractors don't report categories, which are left to callers that know them
+    """
+    def __init__(self, action, categories=(), uri=None, mime_type=None, component_type=None):
+        self.action = action
+        self.categories = set(categories)
+        self.uri = uri
+        self.mime_type = mime_type
+
+        # the kind of component receiving the Intent, from the API it is sent through, e.g. "Receiver"
+        # for a broadcast, or None if any kind may
+        self.component_type = component_type
+
+    def get_uri_parts(self):
+        """
+        Split the data URI into (scheme, host, path), or return None if there is none
+        """
+        if self.uri is None:
+            return None
+        match = URI_PATTERN.match(self.uri)
+        if match is None:
+            return None
+        return match.group("scheme").lower(), (match.group("host") or "").lower() or None, match.group("path")
+
+
+def compile_path_pattern(pattern):
+    """
+    Compile the simple glob of android:pathPattern, where "." is any character and "*" repeats the
+    character before it, into a regular expression. As in Android's PatternMatcher, a "*" with no
+    character to repeat, e.g. at the start of "*.pdf" or the second one of "a**", is a literal
+    """
+    expression = []
+    escaped = False
+    # whether the last character can be repeated by a "*"
+    repeatable = False
+    for character in pattern:
+        if escaped:
+            expression.append(re.escape(character))
+            escaped = False
+            repeatable = True
+        elif character == "\\":
+            escaped = True
+        elif character == "*" and repeatable:
+            expression.append("*")
+            repeatable = False
+        else:
+            expression.append("." if character == "." else re.escape(character))
+            repeatable = True
+    return re.compile("".join(expression) + r"\Z", re.DOTALL)
+
+
+def get_literal_prefix(pattern):
+    # the characters a pathPattern starts with for certain, up to its first wildcard
+    prefix = []
+    for i, character in enumerate(pattern):
+        if character in ".\\" or (i + 1 < len(pattern) and pattern[i + 1] == "*"):
+            break
+        prefix.append(character)
+    return "".join(prefix)
+
+
+class PathTrie:
+    """
+    A character trie of the paths of intent filters. Exact paths are stored at their last character,
+    prefixes at their last character too and matched by every path passing through it, and patterns
+    under their literal prefix, only checked against the paths that get that far.
+    """
+    def __init__(self):
+        self._root = {}
+
+    def _get_node(self, path):
+        node = self._root
+        for character in path:
+            node = node.setdefault(character, {})
+        return node
+
+    def add_path(self, path, value):
+        self._get_node(path).setdefault("exact", []).append(value)
+
+    def add_prefix(self, prefix, value):
+        self._get_node(prefix).setdefault("prefix", []).append(value)
+
+    def add_pattern(self, pattern, value):
+        self._get_node(get_literal_prefix(pattern)).setdefault("pattern", []).append((compile_path_pattern(pattern), value))
+
+    def match(self, path):
+        """
+        Get the values of every path, prefix and pattern matching a path
+        """
+        values = set()
+        node = self._root
+        depth = 0
+        while True:
+            # keys of the trie are single characters, so they never collide with these markers
+            values.update(node.get("prefix", ()))
+            for pattern, value in node.get("pattern", ()):
+                if pattern.match(path) is not None:
+                    values.add(value)
+            if depth == len(path):
+                values.update(node.get("exact", ()))
+                break
+            node = node.get(path[depth])
+            if node is None:
+                break
+            depth += 1
+        return values
+
+
+class IntentFilterIndex:
+    """
+    The intent filters of every component of an app, indexed by action, scheme, host, path and MIME
+    type, so an implicit Intent is resolved with a few lookups instead of matching it against every
+    filter. Categories are only checked against the few filters matching the action. Filters are
+    referred to by their position in filters.
+    """
+    def __init__(self):
+        self.filters = []
+        self.unindexed = []
+        self._by_action = {}
+        self._by_component_type = {}
+        self._by_scheme = {}
+        self._by_host = {}
+        self._by_mime_type = {}
+        self._paths = PathTrie()
+
+        # filters accepting any Intent without data, without a host constraint and without a path constraint
+        self._without_data = set()
+        self._any_host = set()
+        self._any_path = set()
+
+        # filters with a MIME type, which Intents without a type never match, and with a type but no scheme
+        self._typed = set()
+        self._type_only = set()
+
+    def add(self, intent_filter):
+        position = len(self.filters)
+        self.filters.append(intent_filter)
+
+        for action in intent_filter.actions:
+            self._by_action.setdefault(action, set()).add(position)
+        self._by_component_type.setdefault(intent_filter.component_type, set()).add(position)
+
+        if len(intent_filter.schemes) == 0 and len(intent_filter.mime_types) == 0:
+            self._without_data.add(position)
+        for scheme in intent_filter.schemes:
+            self._by_scheme.setdefault(scheme.lower(), set()).add(position)
+
+        if len(intent_filter.hosts) == 0:
+            self._any_host.add(position)
+        for host in intent_filter.hosts:
+            self._by_host.setdefault(host.lower(), set()).add(position)
+
+        if not intent_filter.has_paths():
+            self._any_path.add(position)
+        for path in intent_filter.paths:
+            self._paths.add_path(path, position)
+        for prefix in intent_filter.path_prefixes:
+            self._paths.add_prefix(prefix, position)
+        for pattern in intent_filter.path_patterns:
+            try:
+                self._paths.add_pattern(pattern, position)
+            except re.error as e:
+                logging.warning(f"Ignoring android:pathPattern \"{pattern}\" of {intent_filter.component}: {e}")
+
+        if len(intent_filter.mime_types) > 0:
+            self._typed.add(position)
+            if len(intent_filter.schemes) == 0:
+                self._type_only.add(position)
+        for mime_type in intent_filter.mime_types:
+            self._by_mime_type.setdefault(mime_type.lower(), set()).add(position)
+
+    def add_element(self, component, element, component_type=None, exported=True):
+        """
+        Index an <intent-filter> element of a component. Every filter is kept in filters, but those of
+        activities that don't declare CATEGORY_DEFAULT can't receive implicit Intents from other
+        components and are left out of the index.
+        """
+        intent_filter = IntentFilter.from_element(component, element, component_type, exported)
+        if component_type == "Activity" and CATEGORY_DEFAULT not in intent_filter.categories:
+            self.unindexed.append(intent_filter)
+            return None
+        self.add(intent_filter)
+        return intent_filter
+
+    def get_all_filters(self):
+        # including the filters left out of the index, e.g. the MAIN/LAUNCHER filter of an app
+        return self.filters + self.unindexed
+
+    def _match_host(self, host):
+        # only the filters naming a host, the ones accepting any host are checked separately
+        positions = set(self._by_host.get("*", ()))
+        if host is None:
+            return positions
+        positions.update(self._by_host.get(host, ()))
+
+        # wildcard hosts such as *.example.com
+        parts = host.split(".")
+        for i in range(len(parts)):
+            positions.update(self._by_host.get("*." + ".".join(parts[i:]), ()))
+        return positions
+
+    def _match_mime_type(self, mime_type):
+        mime_type = mime_type.lower()
+        base_type = mime_type.split("/")[0]
+        positions = set()
+        for key in (mime_type, base_type + "/*", "*/*", "*"):
+            positions.update(self._by_mime_type.get(key, ()))
+        return positions
+
+    def resolve(self, intent):
+        """
+        Get the components whose filters match an ImplicitIntent, in the order their filters were added
+        """
+        if intent.action is None:
+            return []
+
+        positions = set(self._by_action.get(intent.action, ()))
+        if len(positions) == 0:
+            return []
+
+        if intent.component_type is not None:
+            positions &= self._by_component_type.get(intent.component_type, set())
+
+        if len(intent.categories) > 0:
+            positions = {position for position in positions if intent.categories <= self.filters[position].categories}
+
+        uri_parts = intent.get_uri_parts()
+        if uri_parts is None and intent.mime_type is None:
+            positions &= self._without_data
+        else:
+            if uri_parts is not None:
+                # the candidates are few once filtered by action, so they are checked one by one
+                # rather than copying the larger sets of filters accepting any host or path
+                scheme, host, path = uri_parts
+                schemes = self._by_scheme.get(scheme, ())
+                hosts = self._match_host(host)
+                paths = self._paths.match(path)
+                type_only = self._type_only if scheme in TYPE_ONLY_SCHEMES else ()
+                positions = {position for position in positions
+                             if position in type_only or (position in schemes
+                                                          and (position in self._any_host or position in hosts)
+                                                          and (position in self._any_path or position in paths))}
+            else:
+                positions &= self._type_only
+
+            if intent.mime_type is not None:
+                positions &= self._match_mime_type(intent.mime_type)
+            else:
+                positions -= self._typed
+
+        components = []
+        for position in sorted(positions):
+            component = self.filters[position].component
+            if component not in components:
+                components.append(component)
+        return components
+
+    def __len__(self):
+        return len(self.filters)
@@ -1,5 +1,20 @@
-from entities import Component, Connector, Interface, Link, Document
+import sys
+
+# "main.py client" only talks to a running server, so it is dispatched before the analyzer is imported
+if __name__ == "__main__" and sys.argv[1:2] == ["client"]:
+    import client
+    sys.exit(client.main(sys.argv[2:]))
+
+from entities import get_default_output_dir
 from manifest_parser import ManifestParser
+from intent_cache import add_cache_arguments, create_cache
+from source_scanner import EXTRACTOR_VERSION
+from identifiers import ID_ALLOCATORS
+from profiling import Profiler, NULL_PROFILER
+from exporters import add_format_arguments
+from sinks import DirectorySink, StdoutSink, get_sink
+from pipeline import stream_architecture
+from store import ArchitectureStore, add_store_arguments
 import argparse
 import logging
 
@@ -16,49 +31,213 @@ class bcolors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
-if __name__ == "__main__":
+
+def add_common_arguments(arg_parser):
+    """
+    Add the optional arguments shared by every command that runs an analysis
+    """
+    arg_parser.add_argument('--debug', dest='debug', action='store_const',
+                    const=True, default=False,
+                    help='Run the program in debug mode')
+    arg_parser.add_argument('--scan-workers', dest='scan_workers', type=int, default=None,
+                    help='Number of workers used to scan source files concurrently')
+    arg_parser.add_argument('--scan-processes', dest='scan_processes', action='store_const',
+                    const=True, default=False,
+                    help='Scan source files in worker processes instead of threads')
+    arg_parser.add_argument('--stream', dest='stream', action='store_const',
+                    const=True, default=False,
+                    help='Parse the manifest incrementally, keeping only one component in memory at a time. '
+                         'Useful for very large merged manifests. With --format jsonl the whole analysis is streamed: '
+                         'edges are written as soon as the source of their component has been scanned')
+    add_cache_arguments(arg_parser)
+    arg_parser.add_argument('--ids', dest='ids', choices=sorted(ID_ALLOCATORS), default='random',
+                    help='How entity ids are allocated: random UUIDs, sequential ids, or UUIDs derived from the content '
+                         'of each entity. counter and content give byte-identical output for identical input')
+
+
+def setup_logging(debug):
+    # instantiate a logger to be used throughout the application
+    if debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+
+def build_arg_parser():
     # setup the argument parser
-    arg_parser = argparse.ArgumentParser(description='Extract the architecture from an android application.')
+    arg_parser = argparse.ArgumentParser(description='Extract the architecture from an android application.',
+                                         epilog='Additional commands: ' + ', '.join(sorted(COMMANDS)) +
+                                                '. Run "main.py <command> --help" for details.')
 
     # positional arguments
-    arg_parser.add_argument('manifest', metavar='manifest_file', type=str, help='Path to the manifest file to analyze')
+    arg_parser.add_argument('manifest', metavar='manifest_file', type=str, help='Path to the manifest file, or to an APK, to analyze')
     arg_parser.add_argument('structure', metavar='structure_name', type=str, help='Name of the output base structure for the extracted architecture')
 
     # optional arguments
-    arg_parser.add_argument('--debug', dest='debug', action='store_const',
+    add_common_arguments(arg_parser)
+    arg_parser.add_argument('--src', dest='src_dir', type=str, action='append',
+                    help='Path to the source code corresponding to the provided manifest file. '
+                         'May be given several times for apps with more than one source root')
+    arg_parser.add_argument('--res', dest='res_dir', type=str, action='append',
+                    help='Path to the res/ directory of the application. Components started from its layouts, menus, '
+                         'preference screens and navigation graphs are linked too. May be given several times')
+    arg_parser.add_argument('--libs', dest='lib_dir', type=str, action='append',
+                    help='Path to a directory of bundled library JARs, e.g. libs/, or to a single JAR. The classes of '
+                         'components implemented in them are scanned too. Their bytecode is not followed, so a class '
+                         'sending an explicit Intent is linked to every component it loads as a constant, e.g. '
+                         'DetailActivity.class. May be given several times')
+    arg_parser.add_argument('--dex', dest='dex_files', type=str, action='append',
+                    help='Path to an APK, or to a classes.dex file, whose bytecode is scanned for the Intents sent by '
+                         'the components. Useful for apps without source. May be given several times')
+    arg_parser.add_argument('--resolve-implicit', dest='resolve_implicit', action='store_const',
                     const=True, default=False,
-                    help='Run the program in debug mode')
-    arg_parser.add_argument('--src', dest='src_dir', type=str, help='Path to the source code corresponding to the provided manifest file')
+                    help='Connect the senders of implicit Intents to the components whose intent filters match their '
+                         'action and literal data URI, falling back to the implicit message bus when none do')
+    arg_parser.add_argument('--aggregate', dest='aggregate', action='store_const',
+                    const=True, default=False,
+                    help='Connect each pair of components through a single connector counting their interactions, '
+                         'and give every component one interface per kind of interaction and direction, instead of a '
+                         'connector and two interfaces per Intent. Much smaller output for large apps')
+    arg_parser.add_argument('--profile', dest='profile', type=str, default=None, metavar='REPORT_FILE',
+                    help='Write the time, CPU time and peak memory of each phase of the analysis, along with '
+                         'counters such as the number of files scanned, as JSON to REPORT_FILE')
+    add_format_arguments(arg_parser)
+    add_store_arguments(arg_parser)
+    arg_parser.add_argument('--output', dest='output', type=str, default=None, metavar='PATH',
+                    help='Write the output to PATH: a file, a directory (ending with /) or - for the standard output '
+                         '(default: output/)')
+
+    return arg_parser
 
-    # now parse the args
-    args = arg_parser.parse_args()
 
+def run(args):
     # get the path to the manifest file to analyze
     manifest = args.manifest
 
     # get the name of the root structure for our output
     structure = args.structure
 
-    # check if we should run in debug mode
-    DEBUG = args.debug
-
     # check if the user provided a path to source code
     src_dir = args.src_dir
 
-    # instantiate a logger to be used throughout the application
-    if DEBUG:
-        logging.basicConfig(level=logging.DEBUG)
-    else:
-        logging.basicConfig(level=logging.INFO)
+    setup_logging(args.debug)
+
+    profiler = Profiler() if args.profile is not None else NULL_PROFILER
+    profiler.start()
 
     # now init the parser to analyze the manifest
-    parser = ManifestParser()
+    parser = ManifestParser(scan_workers=args.scan_workers, scan_processes=args.scan_processes,
+                            cache=create_cache(args, EXTRACTOR_VERSION), id_allocator=args.ids, profiler=profiler,
+                            stream=args.stream, resolve_implicit=args.resolve_implicit,
+                            aggregate=args.aggregate)
 
-    # parse the manifest
-    doc = parser.parse(manifest, structure, src_dir=src_dir)
+    sink = get_sink(args.output) if args.output is not None else None
+    stream_analysis = args.stream and args.format == "jsonl"
+    # these options need the whole document, so it is built in memory before being written
+    unstreamable = [option for option, value in (("--res", args.res_dir), ("--libs", args.lib_dir),
+                                                 ("--dex", args.dex_files), ("--resolve-implicit", args.resolve_implicit),
+                                                 ("--aggregate", args.aggregate), ("--store", args.store))
+                    if value]
+    if stream_analysis and len(unstreamable) > 0:
+        logging.warning(f"{', '.join(unstreamable)} can't be streamed, the architecture is built in memory before "
+                        "being written")
+        stream_analysis = False
 
-    # write the resulting architecture to an xml file
-    file_name = doc.write_current_contents()
+    if stream_analysis:
+        # findings flow straight to the output without ever building a document
+        with profiler.phase("stream_architecture"):
+            file_name = stream_architecture(parser, manifest, structure, sink or DirectorySink(get_default_output_dir()),
+                                            src_dir=src_dir, compress=args.gzip)
+    else:
+        # parse the manifest
+        doc = parser.parse(manifest, structure, src_dir=src_dir, res_dir=args.res_dir, lib_dir=args.lib_dir,
+                           dex_files=args.dex_files)
+
+        # write the resulting architecture to a file, or wherever --output points to
+        with profiler.phase("write_xml"):
+            if sink is None:
+                file_name = doc.write_current_contents(format=args.format, compress=args.gzip)
+            else:
+                file_name = doc.export(sink, format=args.format, compress=args.gzip)
+
+        if args.store is not None:
+            with profiler.phase("store"):
+                with ArchitectureStore(args.store) as store:
+                    store.add(doc)
+            logging.info(f"Stored {structure} in {args.store}")
+
+    profiler.stop()
+    if args.profile is not None:
+        profiler.write(args.profile)
+        logging.info(f"Profile written to {args.profile}")
+
+    # the output itself went to stdout, don't mix the message into it
+    if isinstance(sink, StdoutSink):
+        return
 
     # we wrote to the file without error so notify the user
     print(f"{bcolors.OKGREEN}[SUCCESS]{bcolors.ENDC} Output written to {bcolors.UNDERLINE}{file_name}{bcolors.ENDC}")
+
+
+def run_batch(argv):
+    import batch
+    return batch.main(argv)
+
+
+def run_diff(argv):
+    import diff
+    return diff.main(argv)
+
+
+def run_project(argv):
+    import project
+    return project.main(argv)
+
+
+def run_server(argv):
+    import server
+    return server.main(argv)
+
+
+def run_client(argv):
+    import client
+    return client.main(argv)
+
+
+def run_query(argv):
+    import query
+    return query.main(argv)
+
+
+def run_store(argv):
+    import store
+    return store.main(argv)
+
+
+# subcommands are dispatched on the first argument so the original
+# "main.py manifest structure" invocation keeps working unchanged
+COMMANDS = {
+    "batch": run_batch,
+    "diff": run_diff,
+    "project": run_project,
+    "serve": run_server,
+    "client": run_client,
+    "query": run_query,
+    "store": run_store,
+}
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if len(argv) > 0 and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
+
+    # now parse the args
+    args = build_arg_parser().parse_args(argv)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
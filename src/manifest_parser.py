@@ -1,29 +1,168 @@
-from entities import Component, Connector, Interface, Link, Document
+from entities import AggregateConnector, Component, Connector, Interface, Document
 import xml.etree.ElementTree as ET
+from source_scanner import SourceScanner, ScanResult
+from intent_extractor import Finding
+from intent_filters import ImplicitIntent
+from source_index import SourceIndex
+from resource_scanner import ResourceScanner
+from classfile import JarScanner
+from dex import DexScanner
+from profiling import NULL_PROFILER
+from axml import decode, is_apk, is_binary_xml, read_apk_manifest
+from collections import Counter
 import logging
-import re
+import os
 
 
 ANDROID_SCHEMA = "{http://schemas.android.com/apk/res/android}"
 
+# elements of the application streamed as components, and the type of each
+STREAMED_COMPONENT_TYPES = {
+    "activity": "Activity",
+    "service": "Service",
+    "receiver": "Receiver",
+    "provider": "Provider",
+}
+
+# the kind of interaction of each finding linking two components, as counted by aggregated connectors
+INTERACTION_KINDS = {
+    Finding.EXPLICIT_INTENT: "Explicit Intent",
+    Finding.SERVICE: "Service",
+    Finding.BROADCAST: "Broadcast",
+    Finding.PROVIDER: "Provider",
+}
+
+# the kind of component receiving the implicit Intents sent through each API
+RECEIVER_TYPES = {
+    Finding.ACTIVITY_API: "Activity",
+    Finding.SERVICE_API: "Service",
+    Finding.BROADCAST_API: "Receiver",
+}
+
+
+class DeclaredComponent:
+    """
+    A component declared in a manifest, as plain data rather than an entity of a Document
+    """
+    def __init__(self, name, qualified_name, component_type, has_intent_filters=False, authorities=None):
+        self.name = name
+        self.qualified_name = qualified_name
+        self.component_type = component_type
+        self.has_intent_filters = has_intent_filters
+        self.authorities = authorities if authorities is not None else []
+
+    def __repr__(self):
+        return f"DeclaredComponent({self.qualified_name})"
+
+
+class SourceLink:
+    """
+    A finding in the source of the component named sender. target is the name the finding refers to,
+    such as the class of an explicit Intent or the provider of a content URI, and receiver is the
+    DeclaredComponent it resolves to, or None
+    """
+    def __init__(self, sender, finding, path, target=None, receiver=None):
+        self.sender = sender
+        self.finding = finding
+        self.path = path
+        self.target = target
+        self.receiver = receiver
+
+    @property
+    def is_implicit(self):
+        return self.finding.kind == Finding.IMPLICIT_INTENT
+
+    def __repr__(self):
+        return f"SourceLink({self.sender} -> {self.target}, {self.finding})"
+
+
+class ComponentTable:
+    """
+    The names of the components declared in a manifest, to resolve the targets of findings without
+    building a Document. Names resolve the same way as in ManifestParser.resolve_explicit_link.
+    """
+    def __init__(self, components=()):
+        self.components = []
+
+        # content provider authorities to the qualified names of their providers
+        self.authorities = {}
+
+        self._by_name = {}
+        self._by_simple_name = {}
+        for component in components:
+            self.add(component)
+
+    def add(self, component):
+        # the first component registered under a name wins, as in Document
+        self.components.append(component)
+        for name in (component.name, component.qualified_name):
+            self._by_name.setdefault(name, component)
+            self._by_simple_name.setdefault(name.split(".")[-1], component)
+        for authority in component.authorities:
+            self.authorities.setdefault(authority, component.qualified_name)
+
+    def resolve(self, name):
+        component = self._by_name.get(name)
+        if component is None:
+            component = self._by_simple_name.get(name.split(".")[-1])
+        return component
+
+    def __len__(self):
+        return len(self.components)
+
+
 class ManifestParser:
-    def __init__(self, use_fully_qualified_names=False):
+    def __init__(self, use_fully_qualified_names=False, scan_workers=None, scan_processes=False, cache=None,
+                 id_allocator="random", profiler=None, stream=False, source_indexes=None, resolve_implicit=False,
+                 aggregate=False):
         self.use_fully_qualified_names = use_fully_qualified_names
 
+        # connect the senders of implicit Intents straight to the components whose intent filters match
+        # them, instead of only to the implicit message bus, see add_resolved_implicit_links
+        self.resolve_implicit = resolve_implicit
+
+        # connect each pair of components through a single connector, counting their interactions, and
+        # reuse one interface per kind of interaction on every component, see add_aggregate_link
+        self.aggregate = aggregate
+
+        # parse text manifests incrementally instead of building the whole tree, see parse_manifest_stream
+        self.stream = stream
+
+        # mapping, shared between parsers, of source roots to their last SourceIndex, which lets a long
+        # running process only read the source files that changed since the previous analysis
+        self.source_indexes = source_indexes
+
+        self.id_allocator = id_allocator
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        self.scanner = SourceScanner(max_workers=scan_workers, use_processes=scan_processes, cache=cache)
+        self.resource_scanner = ResourceScanner(max_workers=scan_workers, use_processes=scan_processes)
+        self.jar_scanner = JarScanner(max_workers=scan_workers, use_processes=scan_processes)
+        self.dex_scanner = DexScanner(max_workers=scan_workers, use_processes=scan_processes)
+
     def read_file(self, manifest_file):
+        # the manifest of an APK is read straight from the archive, without extracting anything else
         try:
-            with open(manifest_file, "r") as f:
+            if is_apk(manifest_file):
+                return read_apk_manifest(manifest_file)
+            with open(manifest_file, "rb") as f:
                 content = f.read()
                 return content
         except Exception as e:
             return None
 
     def get_element_tree(self, content):
+        # manifests taken from an APK are in Android's binary XML format rather than text
+        if is_binary_xml(content):
+            return decode(content)
         return ET.fromstring(content)
 
     def get_package_name(self, tree):
         return tree.get("package")
 
+    def get_version(self, tree):
+        # the version name shown to users, or the internal version code if there is none
+        return tree.get(f"{ANDROID_SCHEMA}versionName") or tree.get(f"{ANDROID_SCHEMA}versionCode")
+
     def get_tags_from_app(self, tree, tag):
         return tree.find("application").findall(tag)
 
@@ -45,116 +184,269 @@ class ManifestParser:
     def get_intent_filters(self, element):
         return element.findall("intent-filter")
 
-    def parse_component(self, doc, xml_component, package_name, component_type, src_dir=None):
+    def parse_component(self, doc, xml_component, package_name, component_type):
+        """
+        Create a component for a manifest element and add it to the document.
+        Returns a tuple (component, fully_qualified_name)
+        """
+        name, fully_qualified_name = self.get_component_names(xml_component, package_name, component_type)
+
+        filters = self.get_intent_filters(xml_component)
+        exported = xml_component.get(f"{ANDROID_SCHEMA}exported") != "false"
+
+        # when implicit Intents are resolved, the bus only stands for the other apps, which can't reach
+        # components that aren't exported
+        component = self.add_component(doc, name, fully_qualified_name,
+                                       len(filters) > 0 and (exported or not self.resolve_implicit))
+        for element in filters:
+            doc.get_intent_filters().add_element(component, element, component_type, exported)
+
+        return component, fully_qualified_name
+
+    def get_component_names(self, xml_component, package_name, component_type):
+        """
+        Get the names of the component of a manifest element as a tuple (name, fully_qualified_name)
+        """
         name = xml_component.get(f"{ANDROID_SCHEMA}name")
-        fully_qualified_name = name
 
         if name is None:
             logging.critical(f"{component_type} {xml_component} missing name (Attributes: {xml_component.attrib})")
             exit()
 
-        if not self.use_fully_qualified_names and name.startswith(package_name + "."):
-            name = name.replace(package_name + ".", "")
-        
+        fully_qualified_name = self.get_qualified_class_name(name, package_name)
+        return self.get_display_name(fully_qualified_name, package_name), fully_qualified_name
+
+    def get_display_name(self, fully_qualified_name, package_name):
+        # components of the app package are named relative to it unless asked otherwise
+        if not self.use_fully_qualified_names and package_name is not None \
+                and fully_qualified_name.startswith(package_name + "."):
+            return fully_qualified_name.replace(package_name + ".", "")
+        return fully_qualified_name
+
+    def add_component(self, doc, name, fully_qualified_name, has_intent_filters):
+        """
+        Create a component and add it to the document, linked from the implicit message bus if it
+        declares intent filters
+        """
         component = Component(name=name)
-        doc.add_component(component)
-
-        filters = self.get_intent_filters(xml_component)
-
-        if filters is not None and len(filters) > 0:
-            # we can receive implicit intents from the android system, so make sure the doc contains
-            # a message bus and connect us to it
-            bus = doc.get_bus()
-            if bus is None:
-                bus = doc.add_bus()
-
-            # create a new in-bound interface for the component
-            interface_in = Interface(direction=Interface.DIRECTION_IN)
-            component.add_interface_in(interface_in)
-            doc.add_link(bus, interface_in)
-
-        # now attempt to process source code if a destination was provided
-        if src_dir is not None:
-            # append a trailing forward slash if we need to
-            if src_dir[-1] != "/":
-                src_dir += "/"
-
-            # get the relative path to the Java class for this component
-            file_path = src_dir + fully_qualified_name.replace(".", "/") + ".java"
-
-            logging.debug(f"Parsing source file {file_path}")
-
-            src_string = None
-            with open(file_path, "rb") as f:
-                src_string = str(f.read())
-
-            if src_string is None:
-                logging.error(f"Could not read content from {file_path}")
-                return
-            
-            #print(src_string)
-
-            # TODO: currently does not match intents like:
-            # new Intent (...);
-            # new Intent(this, someFunc());
-            # new Intent();
-
-            regex = "new Intent\\([^\\)]*\\)" #(\\.[^\\)]*\\))?"
-            occurences = re.findall(regex, src_string)
-
-            logging.debug(f"Occurences of Intents in {file_path}: {occurences}")
-
-            # now check each Intent and see if it is an implicit or explicit Intent
-            links_to_add = set()
-            for intent in occurences:
-                if intent.startswith("new Intent(this,"):
-                    # we have an explicit intent
-                    # we can't build the link to other components yet in case we haven't created them,
-                    # so store the link we will need to be created later
-                    sender = name 
-
-                    # get rid of the constructor call
-                    receiver = intent.replace("new Intent(this,", "")
-
-                    # trim any excess whitespace
-                    receiver = receiver.strip()
-
-                    # remove the trailing parentheses
-                    receiver = receiver[:-1]
-
-                    # get rid of the Java .class extension
-                    receiver = receiver.replace(".class", "")
-
-                    logging.debug(f"Extracted explicit Intent: {sender} -> {receiver}")
-                    links_to_add.add((sender, receiver))
-
-                elif intent.startswith("new Intent(Intent.") or intent.startswith("new Intent(android.content.Intent."):
-                    # we have an implicit intent
-                    # create a link from this component to the Android system message bus
-                    bus = doc.get_bus()
-                    if bus is None:
-                        bus = doc.add_bus()
-
-                    # create a new out-bound interface for the component
-                    logging.debug(f"Checking if link exists between {component.get_name()} and implicit message bus")
-                    if doc.get_link(component, bus) is None:
-                        logging.debug("Link does not exist")
-                        interface_out = Interface(direction=Interface.DIRECTION_OUT)
-                        component.add_interface_out(interface_out)
-                        doc.add_link(interface_out, bus)
-                else:
-                    pass
-                    # we don't recognize or don't support this syntax
-                    # complain about it so we can fix it or add support
-                    #logging.error(f"Unsupported syntax in {file_path}: {intent}")
-            return links_to_add
-        else:
-            # we didn't parse source code so we don't have any additional links to add later
-            return set()
+        doc.add_component(component, qualified_name=fully_qualified_name)
+
+        if has_intent_filters:
+            self.add_intent_filter_link(doc, component)
+
+        return component
+
+    def add_intent_filter_link(self, doc, component):
+        """
+        Link the implicit message bus to a component through a new in-bound interface.
+        Returns the interface
+        """
+        # we can receive implicit intents from the android system, so make sure the doc contains
+        # a message bus and connect us to it
+        bus = doc.get_bus()
+        if bus is None:
+            bus = doc.add_bus()
+
+        # create a new in-bound interface for the component
+        interface_in = Interface(direction=Interface.DIRECTION_IN)
+        component.add_interface_in(interface_in)
+        doc.add_link(bus, interface_in)
+        return interface_in
+
+    def get_qualified_class_name(self, name, package_name):
+        # the manifest may abbreviate class names in the app package as ".Name" or just "Name"
+        if package_name is not None:
+            if name.startswith("."):
+                return package_name + name
+            if "." not in name:
+                return package_name + "." + name
+        return name
+
+    def get_source_index(self, src_dir):
+        """
+        Build the index of the classes declared under one or more source roots
+        """
+        if self.source_indexes is None:
+            return SourceIndex(src_dir)
+
+        roots = [src_dir] if isinstance(src_dir, str) else list(src_dir)
+        key = tuple(os.path.abspath(root) for root in roots)
+        source_index = SourceIndex(roots, previous=self.source_indexes.get(key))
+        self.source_indexes[key] = source_index
+        return source_index
+
+    def scan_sources(self, paths):
+        """
+        Scan the source files of every component at once so the files are read concurrently
+        """
+        return self.scanner.scan(paths)
+
+    def get_authorities(self, xml_component):
+        """
+        Get the authorities a content provider is registered under
+        """
+        authorities = xml_component.get(f"{ANDROID_SCHEMA}authorities")
+        if authorities is None:
+            return []
+        return [authority.strip() for authority in authorities.split(";") if len(authority.strip()) > 0]
+
+    def get_source_links(self, sender, scan_result, authorities=None):
+        """
+        Find the inter-component communication in the scanned source of the component named sender.
+        Explicit Intents, and content provider URIs whose authority belongs to one of the providers
+        in authorities, are returned as (sender, receiver) name pairs to be linked once every component
+        has been created. When aggregating, they are returned as a Counter of (sender, receiver, kind)
+        instead, see INTERACTION_KINDS, so every interaction is counted.
+        Returns a tuple (links_to_add, has_implicit)
+        """
+        links_to_add = self.create_link_set()
+        if scan_result.error is not None:
+            logging.error(f"Could not read content from {scan_result.path}: {scan_result.error}")
+            return links_to_add, False
+
+        logging.debug(f"Findings in {scan_result.path}: {scan_result.findings}")
+
+        links = list(self.iter_source_links(sender, scan_result, authorities))
+
+        # the Intent created inline for a service or broadcast is also reported as an explicit Intent,
+        # which is the same interaction
+        inline = {(link.finding.line, link.target) for link in links
+                  if link.finding.kind in (Finding.SERVICE, Finding.BROADCAST) and link.target is not None}
+
+        has_implicit = False
+        for link in links:
+            if link.is_implicit:
+                has_implicit = True
+            elif link.target is not None:
+                logging.debug(f"Extracted {link.finding.kind} on line {link.finding.line}: {sender} -> {link.target}")
+                if not self.aggregate:
+                    links_to_add.add((sender, link.target))
+                elif link.finding.kind != Finding.EXPLICIT_INTENT or (link.finding.line, link.target) not in inline:
+                    links_to_add[(sender, link.target, INTERACTION_KINDS[link.finding.kind])] += 1
+
+        return links_to_add, has_implicit
+
+    def create_link_set(self):
+        # the explicit links still to be added: (sender, receiver) name pairs, or a Counter of
+        # (sender, receiver, kind) when aggregating, see get_source_links
+        return Counter() if self.aggregate else set()
+
+    def iter_source_links(self, sender, scan_result, authorities=None):
+        """
+        Yield a SourceLink for every finding in the scanned source of the component named sender, with
+        the name of the component it targets, see get_source_links
+        """
+        for finding in scan_result.findings:
+            target = None
+            if finding.kind in (Finding.EXPLICIT_INTENT, Finding.SERVICE, Finding.BROADCAST):
+                # services and broadcasts only have a target when their Intent is created inline,
+                # which is also reported as an explicit Intent on its own
+                target = finding.target
+            elif finding.kind == Finding.PROVIDER and authorities is not None:
+                target = authorities.get(finding.target)
+            yield SourceLink(sender, finding, scan_result.path, target)
+
+    def add_source_links(self, doc, component, scan_result, authorities=None):
+        """
+        Link a component to the implicit message bus if its source sends implicit Intents, and return
+        the (sender, receiver) name pairs of its explicit links, see get_source_links
+        """
+        # we can't build the link to other components yet in case we haven't created them,
+        # so store the link we will need to be created later
+        links_to_add, has_implicit = self.get_source_links(component.get_name(), scan_result, authorities)
+
+        if has_implicit and not (self.resolve_implicit and self.add_resolved_implicit_links(doc, component, scan_result)):
+            # we have an implicit intent
+            # create a link from this component to the Android system message bus
+            self.ensure_implicit_link(doc, component)
+
+        return links_to_add
+
+    def add_resolved_implicit_links(self, doc, component, scan_result):
+        """
+        Connect a component to every component whose intent filters match one of the implicit Intents
+        sent from its source. An Intent sent through a known API only reaches that kind of component,
+        e.g. a broadcast only reaches receivers. Returns whether all of them were resolved, otherwise
+        the component still needs its link to the implicit message bus
+        """
+        resolved = True
+        for finding in scan_result.findings:
+            if finding.kind != Finding.IMPLICIT_INTENT:
+                continue
+            intent = ImplicitIntent(finding.detail, uri=finding.target, component_type=RECEIVER_TYPES.get(finding.api))
+            receivers = doc.get_intent_filters().resolve(intent)
+            if len(receivers) == 0:
+                logging.debug(f"Could not resolve implicit Intent {finding.detail} from {component.get_name()}")
+                self.profiler.count("unresolved_implicit_intents")
+                resolved = False
+                continue
+            self.profiler.count("resolved_implicit_intents")
+            for receiver in receivers:
+                self.add_implicit_intent_link(doc, component, receiver)
+        return resolved
+
+    def add_implicit_intent_link(self, doc, sender, receiver):
+        """
+        Connect a sender to the receiver of one of its implicit Intents through a connector, unless they
+        already are. Returns the connector
+        """
+        if self.aggregate:
+            return self.add_aggregate_link(doc, sender, receiver, "Implicit Intent")
+
+        name = f"Implicit Intent from {sender.get_name().split('.')[-1]} to {receiver.get_name().split('.')[-1]}"
+        for link in doc.get_outgoing_links(sender):
+            connector = link.get_end().get_parent()
+            if isinstance(connector, Connector) and connector.get_name() == name:
+                return connector
+        return self.connect(doc, sender, receiver, name)
+
+    def ensure_implicit_link(self, doc, component):
+        logging.debug(f"Checking if link exists between {component.get_name()} and implicit message bus")
+        if doc.get_bus() is None or doc.get_link(component, doc.get_bus()) is None:
+            logging.debug("Link does not exist")
+            self.add_implicit_link(doc, component)
+
+    def add_implicit_link(self, doc, component):
+        """
+        Link a component to the implicit message bus through a new out-bound interface.
+        Returns the interface
+        """
+        bus = doc.get_bus()
+        if bus is None:
+            bus = doc.add_bus()
+
+        interface_out = Interface(direction=Interface.DIRECTION_OUT)
+        component.add_interface_out(interface_out)
+        doc.add_link(interface_out, bus)
+        return interface_out
+
+    def is_streamable(self, manifest_file):
+        # binary manifests, including the manifests of APKs, are always decoded as a whole
+        if is_apk(manifest_file):
+            return False
+        try:
+            with open(manifest_file, "rb") as f:
+                return not is_binary_xml(f.read(8))
+        except OSError:
+            # reported when the manifest is read
+            return False
+
+    def parse_manifest(self, manifest_file, architecture_name):
+        """
+        Create a document holding a component for every activity, service, receiver and provider
+        declared in a manifest.
+        Returns a tuple (doc, components, authorities) where components is a list of
+        (component, fully_qualified_name) tuples and authorities maps content provider authorities
+        to the qualified names of their providers.
+        """
+        profiler = self.profiler
+
+        if self.stream and self.is_streamable(manifest_file):
+            return self.parse_manifest_stream(manifest_file, architecture_name)
 
-    def parse(self, manifest_file, architecture_name, src_dir=None):
         # first open and read the file
-        content = self.read_file(manifest_file)
+        with profiler.phase("read_manifest"):
+            content = self.read_file(manifest_file)
 
         # check if we successfully read any content
         if content is None:
@@ -162,8 +454,11 @@ class ManifestParser:
             logging.critical(f"Could not read content of \"{manifest_file}\"")
             exit()
 
+        profiler.count("manifest_bytes", len(content))
+
         # now parse the string to a tree
-        tree = self.get_element_tree(content)
+        with profiler.phase("parse_xml"):
+            tree = self.get_element_tree(content)
 
         package_name = self.get_package_name(tree)
         
@@ -181,50 +476,483 @@ class ManifestParser:
         logging.debug(f"Providers: {providers}")
 
         # create a document
-        doc = Document(architecture_name + ".xml", architecture_name)
+        doc = Document(architecture_name + ".xml", architecture_name, id_allocator=self.id_allocator, profiler=profiler)
+        doc.package_name = package_name
+        doc.version = self.get_version(tree)
 
         # now create entities for components in the manifest
         # iterate over each list separately because it doesn't take any longer and we may want to handle each
         # differently in the future
+        # TODO: may need to handle content provider differently as it has access to a data store and serves content
+        components = []
+
+        # content provider authorities to the qualified names of their providers
+        authorities = {}
+
+        with profiler.phase("create_components"):
+            for xml_components, component_type in ((activities, "Activity"), (services, "Service"),
+                                                   (receivers, "Receiver"), (providers, "Provider")):
+                for xml_component in xml_components:
+                    component, fully_qualified_name = self.parse_component(doc, xml_component, package_name, component_type)
+                    components.append((component, fully_qualified_name))
+                    if component_type == "Provider":
+                        for authority in self.get_authorities(xml_component):
+                            authorities.setdefault(authority, fully_qualified_name)
+
+        profiler.count("components", len(components))
+
+        return doc, components, authorities
+
+    def parse_manifest_stream(self, manifest_file, architecture_name):
+        """
+        Same as parse_manifest, but the manifest is parsed incrementally. Each component is created as
+        soon as its element closes, along with its intent filters, and the element is then dropped, so
+        memory use depends on the largest component rather than on the size of the whole manifest.
+        """
+        profiler = self.profiler
+        profiler.count("manifest_bytes", os.path.getsize(manifest_file))
+
+        doc = Document(architecture_name + ".xml", architecture_name, id_allocator=self.id_allocator, profiler=profiler)
+        components = []
+        authorities = {}
+
+        with profiler.phase("stream_manifest"):
+            # the root is complete on its start event, so only the first few bytes are parsed here
+            for _, root in ET.iterparse(manifest_file, events=("start",)):
+                doc.package_name = self.get_package_name(root)
+                doc.version = self.get_version(root)
+                break
+
+            for element, component_type, package_name in self.iter_component_elements(manifest_file):
+                component, fully_qualified_name = self.parse_component(doc, element, package_name, component_type)
+                components.append((component, fully_qualified_name))
+                if component_type == "Provider":
+                    for authority in self.get_authorities(element):
+                        authorities.setdefault(authority, fully_qualified_name)
+
+        profiler.count("components", len(components))
+
+        return doc, components, authorities
+
+    def iter_component_elements(self, manifest_file):
+        """
+        Yield a tuple (element, component_type, package_name) for every component element of the
+        application of a text manifest, as soon as the element closes. The element is dropped once the
+        next one is requested, so memory use depends on the largest component rather than on the size
+        of the whole manifest.
+        """
+        package_name = None
+
+        # the open elements, so processed elements can be removed from their parent
+        path = []
+
+        for event, element in ET.iterparse(manifest_file, events=("start", "end")):
+            if event == "start":
+                if len(path) == 0:
+                    package_name = self.get_package_name(element)
+                    logging.debug(f"Package name: {package_name}")
+                path.append(element)
+                continue
+
+            path.pop()
+            if len(path) == 0:
+                continue
+            parent = path[-1]
+
+            component_type = STREAMED_COMPONENT_TYPES.get(element.tag)
+            if component_type is not None and parent.tag == "application" and len(path) == 2:
+                yield element, component_type, package_name
+
+            # drop every child of the manifest or the application once it is complete. The element
+            # is always the last child of its parent, so removing it doesn't search the children
+            if len(path) <= 2:
+                parent.remove(element)
+
+    def iter_tree_component_elements(self, manifest_file):
+        """
+        Same as iter_component_elements for manifests that have to be decoded as a whole
+        """
+        content = self.read_file(manifest_file)
+        if content is None:
+            logging.critical(f"Could not read content of \"{manifest_file}\"")
+            exit()
 
-        links_to_add = set()
-        for activity in activities:
-            links_to_add.update(self.parse_component(doc, activity, package_name, "Activity", src_dir=src_dir))
-
-        for service in services:
-            links_to_add.update(self.parse_component(doc, service, package_name, "Service", src_dir=src_dir))
-
-        for receiver in receivers:
-            links_to_add.update(self.parse_component(doc, service, package_name, "Receiver", src_dir=src_dir))
-
-        for provider in providers:
-            # TODO: may need to handle content provider differently as it has access to a data store and serves content
-            links_to_add.update(self.parse_component(doc, service, package_name, "Provider", src_dir=src_dir))
-
+        tree = self.get_element_tree(content)
+        package_name = self.get_package_name(tree)
+        application = tree.find("application")
+        for element in (application if application is not None else []):
+            component_type = STREAMED_COMPONENT_TYPES.get(element.tag)
+            if component_type is not None:
+                yield element, component_type, package_name
+
+    def iter_components(self, manifest_file):
+        """
+        Yield a DeclaredComponent for every activity, service, receiver and provider declared in a
+        manifest, in the order they are declared. Text manifests are parsed incrementally, so the first
+        components are available before the rest of the manifest has been read.
+        """
+        if self.is_streamable(manifest_file):
+            elements = self.iter_component_elements(manifest_file)
+        else:
+            elements = self.iter_tree_component_elements(manifest_file)
+
+        for element, component_type, package_name in elements:
+            name, fully_qualified_name = self.get_component_names(element, package_name, component_type)
+            authorities = self.get_authorities(element) if component_type == "Provider" else []
+            yield DeclaredComponent(name, fully_qualified_name, component_type,
+                                    len(self.get_intent_filters(element)) > 0, authorities)
+
+    def iter_findings(self, manifest_file, src_dir, components=None, window=None):
+        """
+        Yield a SourceLink, with its receiver resolved, for every finding in the source of the components
+        declared in a manifest, or of the given DeclaredComponents. Findings are yielded as soon as their
+        file has been scanned, and at most window files are scanned ahead of the caller, so memory use
+        doesn't grow with the number of files and callers can act before the whole app is finished.
+        """
+        # every name has to be known before the first target can be resolved, but the manifest is
+        # small next to the sources
+        table = ComponentTable(self.iter_components(manifest_file) if components is None else components)
+        source_index = self.get_source_index(src_dir)
+
+        # components declared in the same file share its scan
+        sources = {}
+        for component in table.components:
+            path = source_index.find(component.qualified_name)
+            if path is None:
+                logging.debug(f"Could not find the source of {component.qualified_name} in {source_index.roots}")
+                continue
+            sources.setdefault(path, []).append(component)
+
+        for senders, scan_result in zip(sources.values(), self.scanner.iter_scan(sources, window=window)):
+            self.profiler.count("files_scanned")
+            if scan_result.error is not None:
+                logging.error(f"Could not read content from {scan_result.path}: {scan_result.error}")
+                continue
+
+            for sender in senders:
+                for link in self.iter_source_links(sender.name, scan_result, table.authorities):
+                    if link.target is not None:
+                        link.receiver = table.resolve(link.target)
+                    yield link
+
+    def scan_resources(self, res_dir):
+        """
+        Scan the layouts, menus, xml and navigation graphs of one or more res/ directories.
+        Returns a ResourceIndex
+        """
+        with self.profiler.phase("scan_resources"):
+            resources = self.resource_scanner.scan(res_dir)
+        self.profiler.count("resource_files_scanned", resources.files_scanned)
+        self.profiler.count("resource_files_parsed", resources.files_parsed)
+        return resources
+
+    def scan_libraries(self, lib_dir):
+        """
+        Scan the classes of the JARs in one or more directories, or of JARs given directly.
+        Returns a list of JarResult
+        """
+        with self.profiler.phase("scan_libraries"):
+            libraries = self.jar_scanner.scan(lib_dir)
+        for library in libraries:
+            self.profiler.count("library_classes_read", library.classes_read)
+            self.profiler.count("library_bytes_read", library.bytes_read)
+        return libraries
+
+    def scan_dex(self, dex_files, components):
+        """
+        Scan the bytecode of the components in APKs or dex files. Only the classes of components, and
+        their inner classes, are decoded.
+        Returns a list of DexResult
+        """
+        with self.profiler.phase("scan_dex"):
+            results = self.dex_scanner.scan(dex_files, {fully_qualified_name for _, fully_qualified_name in components})
+        for result in results:
+            self.profiler.count("dex_classes_scanned", result.classes_read)
+            self.profiler.count("dex_bytes_read", result.bytes_read)
+        return results
+
+    def find_library_links(self, doc, components, authorities, libraries):
+        """
+        Add the links of the components whose classes are found in library JARs or dex files, see
+        JarResult and DexResult, and return the (sender, receiver) name pairs of their explicit links.
+        Since the targets of a class in a JAR are guessed from every class it loads as a constant, only
+        those declared in the manifest are kept.
+        """
+        qualified_names = {fully_qualified_name for _, fully_qualified_name in components}
+        links_to_add = self.create_link_set()
+        with self.profiler.phase("add_library_links"):
+            for component, fully_qualified_name in components:
+                for library in libraries:
+                    findings = [finding for finding in library.findings.get(fully_qualified_name, [])
+                                if finding.kind != Finding.EXPLICIT_INTENT or finding.target in qualified_names]
+                    if len(findings) > 0:
+                        scan_result = ScanResult(library.path, findings)
+                        links_to_add.update(self.add_source_links(doc, component, scan_result, authorities))
+        return links_to_add
+
+    def find_class_source(self, source_index, class_name):
+        # classes named in resources may be relative to the package, which the simple name makes up for
+        path = source_index.find(class_name)
+        if path is None:
+            paths = source_index.find_simple_name(class_name.split(".")[-1])
+            path = paths[0] if len(paths) > 0 else None
+        return path
+
+    def find_fragment_sources(self, source_index, sources, scan_results, resources, resource_uses):
+        """
+        Find and scan the source of the fragments in the resources used by each component, then of the
+        fragments in the resources those fragments use. A fragment's findings belong to the component
+        hosting it, so the new (component, path) pairs are returned to be handled like sources of the
+        component itself. The resources used by each component are added to resource_uses.
+        """
+        fragment_sources = []
+        known = set(sources)
+        pending = list(sources)
+        changed = list(resource_uses)
+
+        while len(changed) > 0:
+            for component, path in pending:
+                resource_uses[component].extend(finding.target for finding in scan_results[path].findings
+                                                if finding.kind == Finding.RESOURCE)
+
+            found = []
+            for component in dict.fromkeys(changed):
+                for fragment in resources.get_fragments(resource_uses[component]):
+                    path = self.find_class_source(source_index, fragment)
+                    if path is None:
+                        logging.debug(f"Could not find the source of fragment {fragment}")
+                    elif (component, path) not in known:
+                        known.add((component, path))
+                        found.append((component, path))
+
+            scan_results.update(self.scan_sources([path for _, path in found if path not in scan_results]))
+            fragment_sources.extend(found)
+            pending = found
+            changed = [component for component, _ in found]
+
+        self.profiler.count("fragment_sources", len(fragment_sources))
+        return fragment_sources
+
+    def add_resource_links(self, doc, component, resource_uses, resources):
+        """
+        Link a component to the implicit message bus if the resources it uses start implicit Intents,
+        and return the (sender, receiver) name pairs of the components they start
+        """
+        if len(resources.get_actions(resource_uses)) > 0:
+            self.ensure_implicit_link(doc, component)
+        if self.aggregate:
+            return Counter((component.get_name(), target, INTERACTION_KINDS[Finding.EXPLICIT_INTENT])
+                           for target in resources.get_targets(resource_uses))
+        return {(component.get_name(), target) for target in resources.get_targets(resource_uses)}
+
+    def find_resource_links(self, doc, components, resources):
+        """
+        Same as find_source_links without the source, the resources of each component are only known
+        from their tools:context
+        """
+        links_to_add = self.create_link_set()
+        with self.profiler.phase("add_resource_links"):
+            for component, fully_qualified_name in components:
+                links_to_add.update(self.add_resource_links(doc, component, resources.get_context_uses(fully_qualified_name),
+                                                            resources))
+        return links_to_add
+
+    def find_source_links(self, doc, components, authorities, src_dir, resources=None):
+        """
+        Find the source of every component under src_dir and scan it for inter-component communication.
+        Links to the implicit message bus are added right away, and the (sender, receiver) name pairs of
+        the explicit links are returned. Given the ResourceIndex of the app, the components started from
+        the resources each component uses, and the findings of the fragments it hosts, are included.
+        """
+        profiler = self.profiler
+        links_to_add = self.create_link_set()
+
+        with profiler.phase("index_sources"):
+            source_index = self.get_source_index(src_dir)
+
+            sources = []
+            for component, fully_qualified_name in components:
+                path = source_index.find(fully_qualified_name)
+                if path is None:
+                    doc.add_diagnostic(f"Could not find the source of {fully_qualified_name} in {source_index.roots}")
+                    continue
+                sources.append((component, path))
+
+        profiler.count("files_indexed", source_index.files_indexed)
+        profiler.count("bytes_indexed", source_index.bytes_read)
+        profiler.count("files_reused", source_index.files_reused)
+
+        with profiler.phase("scan_sources"):
+            scan_results = self.scan_sources([path for _, path in sources])
+
+        if profiler.enabled:
+            for result in scan_results.values():
+                profiler.count("files_scanned")
+                profiler.count("bytes_scanned", result.bytes_read)
+                profiler.count("findings", len(result.findings))
+                if result.error is not None:
+                    profiler.count("scan_errors")
+                if result.cached is not None:
+                    profiler.count("cache_hits" if result.cached else "cache_misses")
+
+        resource_uses = {}
+        if resources is not None:
+            with profiler.phase("scan_fragments"):
+                for component, fully_qualified_name in components:
+                    resource_uses[component] = resources.get_context_uses(fully_qualified_name)
+                sources += self.find_fragment_sources(source_index, sources, scan_results, resources, resource_uses)
+
+        with profiler.phase("add_source_links"):
+            for component, path in sources:
+                links_to_add.update(self.add_source_links(doc, component, scan_results[path], authorities))
+
+        if resources is not None:
+            with profiler.phase("add_resource_links"):
+                for component, _ in components:
+                    links_to_add.update(self.add_resource_links(doc, component, resource_uses[component], resources))
+
+        return links_to_add
+
+    def add_explicit_links(self, doc, links_to_add):
+        """
+        Resolve the components of each (sender, receiver) name pair and connect them
+        """
         logging.debug(f"Found {len(links_to_add)} links to add ({len(links_to_add) + len(doc.get_links())} total)")
         logging.debug(f"Adding links {links_to_add}")
 
         for link in links_to_add:
-            sender_simple_name = link[0].split(".")[-1]
-            receiver_simple_name = link[1].split(".")[-1]
-            
-            # get the sender and receiver components
-            sender = doc.get_component_from_simple_name(sender_simple_name)
-            receiver = doc.get_component_from_simple_name(receiver_simple_name)
-
-            # add interfaces to each
-            sender_interface_out = Interface(direction=Interface.DIRECTION_OUT)
-            sender.add_interface_out(sender_interface_out)
-            receiver_interface_in = Interface(direction=Interface.DIRECTION_IN)
-            receiver.add_interface_in(receiver_interface_in)
-
-            # now add a connector to represent the explicit intent
-            connector = Connector(name=f"Explicit Intent from {sender_simple_name} to {receiver_simple_name}")
+            # aggregated links are counted by kind, see get_source_links
+            kind, count = (link[2], links_to_add[link]) if self.aggregate else (INTERACTION_KINDS[Finding.EXPLICIT_INTENT], 1)
+            if self.add_explicit_link(doc, link[0], link[1], kind, count) is None:
+                # the target of the Intent is not a component declared in the manifest
+                doc.add_diagnostic(f"Could not resolve explicit Intent from {link[0]} to {link[1]}")
+                self.profiler.count("unresolved_links")
+
+    def resolve_explicit_link(self, doc, sender_name, receiver_name):
+        """
+        Get the components of a (sender, receiver) name pair, preferring an exact match on the
+        qualified name. Returns a tuple (sender, receiver) where either may be None
+        """
+        sender = doc.get_component(sender_name) or doc.get_component_from_simple_name(sender_name.split(".")[-1])
+        receiver = doc.get_component(receiver_name) or doc.get_component_from_simple_name(receiver_name.split(".")[-1])
+        return sender, receiver
+
+    def add_explicit_link(self, doc, sender_name, receiver_name, kind="Explicit Intent", count=1):
+        """
+        Connect the components of a (sender, receiver) name pair through a connector. When aggregating,
+        count interactions of a kind are added to the connector of the pair.
+        Returns the connector, or None if either component could not be resolved
+        """
+        sender, receiver = self.resolve_explicit_link(doc, sender_name, receiver_name)
+        if sender is None or receiver is None:
+            return None
+
+        if self.aggregate:
+            return self.add_aggregate_link(doc, sender, receiver, kind, count)
+
+        # the connector represents the explicit intent
+        return self.connect(doc, sender, receiver,
+                            f"Explicit Intent from {sender_name.split('.')[-1]} to {receiver_name.split('.')[-1]}")
+
+    def connect(self, doc, sender, receiver, connector_name):
+        """
+        Connect two components through a new connector and a new interface on each.
+        Returns the connector
+        """
+        # add interfaces to each
+        sender_interface_out = Interface(direction=Interface.DIRECTION_OUT)
+        sender.add_interface_out(sender_interface_out)
+        receiver_interface_in = Interface(direction=Interface.DIRECTION_IN)
+        receiver.add_interface_in(receiver_interface_in)
+
+        # now add the connector
+        connector = Connector(name=connector_name)
+        doc.add_connector(connector)
+
+        # finally add a link from the sender to the connector, and from the connector to the receiver
+        doc.add_link(sender_interface_out, connector)
+        doc.add_link(connector, receiver_interface_in)
+        return connector
+
+    def get_kind_interface(self, component, kind, direction):
+        """
+        Get the interface of a component for one kind of interaction in one direction, e.g.
+        "Explicit Intent Out", creating it the first time
+        """
+        name = f"{kind} {Interface.direction_strings[direction].capitalize()}"
+        for interface in component.get_interfaces():
+            if interface.get_direction() == direction and interface.get_name() == name:
+                return interface
+
+        interface = Interface(name=name, direction=direction)
+        if direction == Interface.DIRECTION_OUT:
+            component.add_interface_out(interface)
+        else:
+            component.add_interface_in(interface)
+        return interface
+
+    def add_aggregate_link(self, doc, sender, receiver, kind, count=1):
+        """
+        Count count interactions of a kind from sender to receiver on the AggregateConnector standing for
+        all of their interactions, creating and linking it the first time. Each kind of interaction goes
+        through its own interface on either component.
+        Returns the connector
+        """
+        connector = None
+        for link in doc.get_outgoing_links(sender):
+            owner = link.get_end().get_parent()
+            if isinstance(owner, AggregateConnector) and doc.get_link(owner, receiver) is not None:
+                connector = owner
+                break
+
+        if connector is None:
+            connector = AggregateConnector(sender.get_name().split(".")[-1], receiver.get_name().split(".")[-1])
             doc.add_connector(connector)
 
-            # finally add a link from the sender to the connector, and from the connector to the receiver
-            doc.add_link(sender_interface_out, connector)
-            doc.add_link(connector, receiver_interface_in)
+        interface_out = self.get_kind_interface(sender, kind, Interface.DIRECTION_OUT)
+        if doc.get_link(interface_out, connector) is None:
+            doc.add_link(interface_out, connector)
+        interface_in = self.get_kind_interface(receiver, kind, Interface.DIRECTION_IN)
+        if doc.get_link(connector, interface_in) is None:
+            doc.add_link(connector, interface_in)
+
+        connector.add_interaction(kind, count)
+        return connector
+
+    def parse(self, manifest_file, architecture_name, src_dir=None, res_dir=None, lib_dir=None, dex_files=None):
+        profiler = self.profiler
+
+        with profiler.phase("parse"):
+            doc, components, authorities = self.parse_manifest(manifest_file, architecture_name)
+
+            links_to_add = self.create_link_set()
+
+            # the layouts, menus and navigation graphs declare links of their own
+            resources = self.scan_resources(res_dir) if res_dir is not None else None
+
+            # now attempt to process source code if a destination was provided
+            if src_dir is not None:
+                links_to_add = self.find_source_links(doc, components, authorities, src_dir, resources)
+            elif resources is not None:
+                links_to_add = self.find_resource_links(doc, components, resources)
+
+            # components may also be implemented by the classes of bundled libraries
+            if lib_dir is not None:
+                links_to_add.update(self.find_library_links(doc, components, authorities, self.scan_libraries(lib_dir)))
+
+            # or only be available as bytecode
+            if dex_files is not None:
+                links_to_add.update(self.find_library_links(doc, components, authorities,
+                                                            self.scan_dex(dex_files, components)))
+
+            profiler.count("explicit_links_found", len(links_to_add))
+
+            with profiler.phase("resolve_links"):
+                self.add_explicit_links(doc, links_to_add)
+
+        profiler.count("connectors", len(doc.get_connectors()))
+        profiler.count("links", len(doc.get_links()))
+        profiler.count("diagnostics", len(doc.get_diagnostics()))
 
         logging.debug(f"Total Components in Doc: {len(doc.get_components())}")
         logging.debug(f"Total Connectors in Doc: {len(doc.get_connectors())}")
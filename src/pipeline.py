@@ -0,0 +1,119 @@
+from exporters import JsonLinesExporter, GRAPH_FORMAT_VERSION, write_text
+from identifiers import get_id_allocator
+from intent_extractor import Finding
+from sinks import CountingStream, get_sink, open_compressed
+import json
+import logging
+
+
+BUS_NAME = "Implicit Message Bus"
+
+# findings that link their sender to another component through a connector, see ManifestParser.get_source_links
+EXPLICIT_KINDS = (Finding.EXPLICIT_INTENT, Finding.SERVICE, Finding.BROADCAST, Finding.PROVIDER)
+
+
+class RecordIds:
+    """
+    Allocates the ids of streamed records from the same keys Document uses for components and
+    connectors, so content based ids match those of a document written with --format jsonl
+    """
+    def __init__(self, allocator):
+        self.allocator = get_id_allocator(allocator)
+        self.allocator.reset()
+
+        # names used more than once are told apart by the order they were streamed in
+        self._used_keys = {}
+
+    def allocate(self, key):
+        count = self._used_keys.get(key, 0)
+        self._used_keys[key] = count + 1
+        key = key if count == 0 else f"{key}#{count}"
+        return key, self.allocator.allocate(key)
+
+
+def iter_graph_records(parser, manifest_file, architecture_name, src_dir=None, window=None):
+    """
+    Yield the records of the jsonl graph format, see exporters.JsonLinesExporter, as the architecture
+    of an app is extracted. Component nodes are yielded as the manifest is read and the edges of a
+    component as soon as its source has been scanned, so nothing is kept of a component afterwards but
+    its id. Records come in the order they are found rather than in canonical order.
+    """
+    profiler = parser.profiler
+    ids = RecordIds(parser.id_allocator)
+    _, structure_id = ids.allocate("structure:" + architecture_name)
+    yield {"type": "structure", "version": GRAPH_FORMAT_VERSION, "id": structure_id, "name": architecture_name}
+
+    # the key and id of every component, by name, and of the bus once it is needed
+    nodes = {}
+    bus = []
+
+    def get_bus():
+        if len(bus) == 0:
+            bus.append(ids.allocate("connector:" + BUS_NAME))
+            yield {"type": "connector", "id": bus[0][1], "name": BUS_NAME}
+
+    def edge(source, target):
+        _, edge_id = ids.allocate(f"edge:{source[0]}->{target[0]}")
+        return {"type": "edge", "id": edge_id, "source": source[1], "target": target[1]}
+
+    components = []
+    for component in parser.iter_components(manifest_file):
+        components.append(component)
+        node = ids.allocate("component:" + component.name)
+        nodes.setdefault(component.name, node)
+        yield {"type": "component", "id": node[1], "name": component.name}
+
+        if component.has_intent_filters:
+            yield from get_bus()
+            yield edge(bus[0], node)
+    profiler.count("components", len(components))
+
+    if src_dir is None:
+        return
+
+    # the findings of a component are consecutive, so duplicates only need to be tracked for one at a time
+    sender = None
+    linked = set()
+    for link in parser.iter_findings(manifest_file, src_dir, components=components, window=window):
+        if link.sender != sender:
+            sender = link.sender
+            linked = set()
+        if link.target in linked or (link.target is None and not link.is_implicit):
+            continue
+        linked.add(link.target)
+
+        if link.is_implicit:
+            yield from get_bus()
+            yield edge(nodes[sender], bus[0])
+        elif link.finding.kind in EXPLICIT_KINDS and link.receiver is None:
+            # the target of the Intent is not a component declared in the manifest
+            logging.debug(f"Could not resolve explicit Intent from {sender} to {link.target}")
+            profiler.count("unresolved_links")
+        else:
+            connector_name = f"Explicit Intent from {sender.split('.')[-1]} to {link.target.split('.')[-1]}"
+            connector = ids.allocate("connector:" + connector_name)
+            yield {"type": "connector", "id": connector[1], "name": connector_name}
+            yield edge(nodes[sender], connector)
+            yield edge(connector, nodes[link.receiver.name])
+            profiler.count("explicit_links_found")
+
+
+def stream_architecture(parser, manifest_file, architecture_name, sink, src_dir=None, compress=False, window=None):
+    """
+    Extract the architecture of an app straight to a sink in the jsonl format, without building a
+    Document. Output is written as it is found, see iter_graph_records.
+    Returns where the output was written.
+    """
+    sink = get_sink(sink)
+    file_name = architecture_name + JsonLinesExporter.extension
+    if compress:
+        file_name += ".gz"
+
+    records = iter_graph_records(parser, manifest_file, architecture_name, src_dir=src_dir, window=window)
+    with sink.open(file_name) as stream:
+        counting_stream = CountingStream(stream)
+        with open_compressed(counting_stream, compress) as output:
+            write_text((json.dumps(record, separators=(",", ":")) + "\n" for record in records), output)
+        parser.profiler.count("output_bytes", counting_stream.bytes_written)
+
+    return sink.get_location(file_name)
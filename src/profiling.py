@@ -0,0 +1,197 @@
+import json
+import os
+import time
+import tracemalloc
+
+
+class Phase:
+    """
+    Wall and CPU time spent in a phase of the analysis, summed over every time it ran
+    """
+    __slots__ = ("name", "calls", "wall", "cpu", "peak_memory")
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+
+        # highest traced memory while the phase ran, None if memory was not traced
+        self.peak_memory = None
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "wall_seconds": self.wall,
+            "cpu_seconds": self.cpu,
+            "peak_memory_bytes": self.peak_memory,
+        }
+
+
+class PhaseTimer:
+    """
+    Context manager timing one run of a phase
+    """
+    __slots__ = ("_profiler", "_name", "_wall", "_cpu")
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._profiler._enter(self._name)
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        self._profiler._exit(wall, cpu)
+        return False
+
+
+class Profiler:
+    """
+    Records the time spent in each phase of an analysis along with counters such as the number of
+    files scanned or links created. Phases may be nested, and are named after their enclosing
+    phases, e.g. "parse/scan_sources". The CPU time is the time of the whole process, so it includes
+    the time of worker threads.
+    """
+    enabled = True
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self._phases = {}
+        self._stack = []
+        self._counters = {}
+        self._started_tracing = False
+        self._wall = None
+        self._cpu = None
+        self.peak_memory = None
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    def stop(self):
+        self._wall = time.perf_counter() - self._wall
+        self._cpu = time.process_time() - self._cpu
+        if tracemalloc.is_tracing():
+            self.peak_memory = max(self.peak_memory or 0, tracemalloc.get_traced_memory()[1])
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+    def phase(self, name):
+        """
+        Get a context manager timing a phase, e.g. "with profiler.phase('scan_sources'):"
+        """
+        return PhaseTimer(self, name)
+
+    def count(self, name, amount=1):
+        """
+        Add amount to a counter
+        """
+        self._counters[name] = self._counters.get(name, 0) + amount
+
+    def get_counter(self, name):
+        return self._counters.get(name, 0)
+
+    def get_phase(self, name):
+        return self._phases.get(name)
+
+    def _enter(self, name):
+        path = name if len(self._stack) == 0 else self._stack[-1] + "/" + name
+        self._stack.append(path)
+
+        if tracemalloc.is_tracing():
+            # the peak of the enclosing phase must not be lost when the peak is reset for this one
+            peak = tracemalloc.get_traced_memory()[1]
+            self.peak_memory = max(self.peak_memory or 0, peak)
+            for enclosing in self._stack[:-1]:
+                phase = self._phases[enclosing]
+                phase.peak_memory = max(phase.peak_memory or 0, peak)
+            tracemalloc.reset_peak()
+
+        if path not in self._phases:
+            self._phases[path] = Phase(path)
+
+    def _exit(self, wall, cpu):
+        path = self._stack.pop()
+        phase = self._phases[path]
+        phase.calls += 1
+        phase.wall += wall
+        phase.cpu += cpu
+
+        if tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            phase.peak_memory = max(phase.peak_memory or 0, peak)
+
+    def to_dict(self):
+        return {
+            "wall_seconds": self._wall,
+            "cpu_seconds": self._cpu,
+            "peak_memory_bytes": self.peak_memory,
+            "phases": [phase.to_dict() for phase in self._phases.values()],
+            "counters": dict(self._counters),
+        }
+
+    def write(self, path):
+        """
+        Write the report as JSON to path
+        """
+        directory = os.path.dirname(path)
+        if len(directory) > 0:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+class NullPhaseTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class NullProfiler:
+    """
+    Profiler that records nothing, used when profiling is disabled. Every method returns right
+    away and phase always returns the same shared context manager, so instrumented code costs a
+    method call per phase and nothing more.
+    """
+    enabled = False
+
+    _TIMER = NullPhaseTimer()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def phase(self, name):
+        return self._TIMER
+
+    def count(self, name, amount=1):
+        pass
+
+    def get_counter(self, name):
+        return 0
+
+    def get_phase(self, name):
+        return None
+
+    def to_dict(self):
+        return {}
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,326 @@
+from entities import Document
+from manifest_parser import ManifestParser, ANDROID_SCHEMA, STREAMED_COMPONENT_TYPES
+from intent_cache import add_cache_arguments, create_cache
+from source_scanner import EXTRACTOR_VERSION
+from identifiers import ID_ALLOCATORS
+from exporters import add_format_arguments
+from sinks import StdoutSink, get_sink
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import argparse
+import logging
+import os
+import re
+
+
+# where the Android Gradle plugin looks for the manifest and the source of the main source set
+MANIFEST_PATH = os.path.join("src", "main", "AndroidManifest.xml")
+SOURCE_DIRECTORIES = (os.path.join("src", "main", "java"), os.path.join("src", "main", "kotlin"))
+RESOURCE_DIRECTORY = os.path.join("src", "main", "res")
+
+SETTINGS_FILES = ("settings.gradle", "settings.gradle.kts")
+BUILD_FILES = ("build.gradle", "build.gradle.kts")
+
+# directories that never hold modules, skipped when walking the project
+SKIPPED_DIRECTORIES = {"build", "node_modules"}
+
+# the project paths listed by include statements, e.g. include ':app', ':lib:core' or include("app")
+INCLUDE_PATTERN = re.compile(r"^\s*include\b\s*\(?([^\n]*)", re.MULTILINE)
+PROJECT_PATH_PATTERN = re.compile(r"""["']:?([\w\-.:]+)["']""")
+
+APPLICATION_PLUGIN = "com.android.application"
+
+
+class GradleModule:
+    """
+    A module of a Gradle build with an Android manifest
+    """
+    def __init__(self, name, path, manifest, src_dirs, is_application=False, res_dirs=None):
+        self.name = name
+        self.path = path
+        self.manifest = manifest
+        self.src_dirs = src_dirs
+        self.is_application = is_application
+        self.res_dirs = res_dirs if res_dirs is not None else []
+
+
+class ModuleManifest:
+    """
+    The components declared in the manifest of a module, as plain data so it can be read in another
+    process. components is a list of (qualified_name, has_intent_filters) tuples and authorities is a
+    list of (authority, qualified_name) tuples.
+    """
+    def __init__(self, manifest, package_name, components, authorities):
+        self.manifest = manifest
+        self.package_name = package_name
+        self.components = components
+        self.authorities = authorities
+
+
+def get_included_paths(settings_file):
+    """
+    Get the directories, relative to the project, of the projects included by a Gradle settings file
+    """
+    with open(settings_file, "r") as f:
+        content = f.read()
+
+    paths = []
+    for match in INCLUDE_PATTERN.finditer(content):
+        for project_path in PROJECT_PATH_PATTERN.findall(match.group(1)):
+            paths.append(os.path.join(*[part for part in project_path.split(":") if len(part) > 0]))
+    return paths
+
+
+def is_application_module(module_dir):
+    for build_file in BUILD_FILES:
+        path = os.path.join(module_dir, build_file)
+        if os.path.isfile(path):
+            with open(path, "r") as f:
+                return APPLICATION_PLUGIN in f.read()
+    return False
+
+
+def walk_module_dirs(project_dir):
+    # iterative walk using scandir, the same as SourceIndex
+    directories = [project_dir]
+    while len(directories) > 0:
+        directory = directories.pop()
+        if os.path.isfile(os.path.join(directory, MANIFEST_PATH)):
+            yield directory
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            logging.warning(f"Could not list project directory {directory}: {e}")
+            continue
+
+        for entry in entries:
+            # a module's own src/ never holds another module
+            if entry.name.startswith(".") or entry.name in SKIPPED_DIRECTORIES or entry.name == "src":
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                directories.append(entry.path)
+
+
+def find_modules(project_dir):
+    """
+    Find every module of a Gradle project that has a manifest. The modules included by settings.gradle
+    are used when the project has one, otherwise the project is searched for src/main/AndroidManifest.xml.
+    Application modules come first, since their declarations take priority when manifests are merged,
+    then library modules, each sorted by path.
+    """
+    module_dirs = None
+    for settings_file in SETTINGS_FILES:
+        path = os.path.join(project_dir, settings_file)
+        if os.path.isfile(path):
+            module_dirs = [project_dir] + [os.path.join(project_dir, included) for included in get_included_paths(path)]
+            break
+
+    if module_dirs is None:
+        module_dirs = walk_module_dirs(project_dir)
+
+    modules = []
+    for module_dir in module_dirs:
+        manifest = os.path.join(module_dir, MANIFEST_PATH)
+        if not os.path.isfile(manifest):
+            logging.debug(f"Skipping module {module_dir}, no {MANIFEST_PATH} found")
+            continue
+
+        relative_path = os.path.relpath(module_dir, project_dir)
+        name = ":" if relative_path == "." else ":" + relative_path.replace(os.sep, ":")
+        src_dirs = [os.path.join(module_dir, src_dir) for src_dir in SOURCE_DIRECTORIES
+                    if os.path.isdir(os.path.join(module_dir, src_dir))]
+        res_dir = os.path.join(module_dir, RESOURCE_DIRECTORY)
+        res_dirs = [res_dir] if os.path.isdir(res_dir) else []
+        modules.append(GradleModule(name, module_dir, manifest, src_dirs, is_application_module(module_dir), res_dirs))
+
+    # the same module may be found twice when settings.gradle includes the root project
+    modules = list({module.name: module for module in modules}.values())
+    modules.sort(key=lambda module: (not module.is_application, module.name))
+    return modules
+
+
+def read_module_manifest(manifest_file):
+    """
+    Read the components declared in the manifest of a module. This runs inside a worker thread or process.
+    """
+    parser = ManifestParser()
+    content = parser.read_file(manifest_file)
+    if content is None:
+        logging.critical(f"Could not read content of \"{manifest_file}\"")
+        exit()
+
+    tree = parser.get_element_tree(content)
+    package_name = parser.get_package_name(tree)
+    application = tree.find("application")
+
+    components = []
+    authorities = []
+    for element in (application if application is not None else []):
+        component_type = STREAMED_COMPONENT_TYPES.get(element.tag)
+        if component_type is None:
+            continue
+
+        name = element.get(f"{ANDROID_SCHEMA}name")
+        if name is None:
+            logging.critical(f"{component_type} {element} in {manifest_file} missing name (Attributes: {element.attrib})")
+            exit()
+
+        qualified_name = parser.get_qualified_class_name(name, package_name)
+        components.append((qualified_name, len(parser.get_intent_filters(element)) > 0))
+        if component_type == "Provider":
+            authorities.extend((authority, qualified_name) for authority in parser.get_authorities(element))
+
+    return ModuleManifest(manifest_file, package_name, components, authorities)
+
+
+class ProjectParser:
+    """
+    Extracts the architecture of a Gradle multi-module project. The manifests of the modules are read
+    concurrently and merged into a single document, where a component declared by several modules
+    appears once. The sources of every module are indexed together, so Intents sent from one module
+    resolve to components declared in another.
+    """
+    def __init__(self, parser=None, workers=None, use_processes=False):
+        self.parser = parser if parser is not None else ManifestParser()
+        self.workers = workers
+        self.use_processes = use_processes
+
+    def read_manifests(self, modules):
+        executor_type = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with executor_type(max_workers=self.workers) as executor:
+            return list(executor.map(read_module_manifest, [module.manifest for module in modules]))
+
+    def merge_manifests(self, doc, manifests):
+        """
+        Add the components of every manifest to the document. The first declaration of a qualified name
+        wins, later ones only add the intent filters it didn't have, as the manifest merger does.
+        Returns a tuple (components, authorities) as ManifestParser.parse_manifest does
+        """
+        components = []
+        components_by_name = {}
+        authorities = {}
+        merged = 0
+
+        for manifest in manifests:
+            for qualified_name, has_intent_filters in manifest.components:
+                component = components_by_name.get(qualified_name)
+                if component is not None:
+                    merged += 1
+                    if has_intent_filters and component.get_interface_in() is None:
+                        self.parser.add_intent_filter_link(doc, component)
+                    continue
+
+                # components are named relative to the package of their module, unless another
+                # module already has a component by that name
+                name = self.parser.get_display_name(qualified_name, manifest.package_name)
+                if doc.get_component(name) is not None:
+                    name = qualified_name
+
+                component = self.parser.add_component(doc, name, qualified_name, has_intent_filters)
+                components_by_name[qualified_name] = component
+                components.append((component, qualified_name))
+
+            for authority, qualified_name in manifest.authorities:
+                authorities.setdefault(authority, qualified_name)
+
+        logging.debug(f"Merged {len(components)} components, {merged} declared by more than one module")
+        self.parser.profiler.count("components_merged", merged)
+        return components, authorities
+
+    def parse(self, project_dir, architecture_name, modules=None):
+        """
+        Extract the architecture of every module of the project, or of the given GradleModules
+        """
+        profiler = self.parser.profiler
+        if modules is None:
+            modules = find_modules(project_dir)
+        logging.debug(f"Modules: {[module.name for module in modules]}")
+        profiler.count("modules", len(modules))
+
+        with profiler.phase("parse"):
+            with profiler.phase("read_manifests"):
+                manifests = self.read_manifests(modules)
+
+            doc = Document(architecture_name + ".xml", architecture_name, id_allocator=self.parser.id_allocator,
+                           profiler=profiler)
+            with profiler.phase("merge_manifests"):
+                components, authorities = self.merge_manifests(doc, manifests)
+            profiler.count("components", len(components))
+
+            # a single index over every module is what resolves Intents across modules
+            src_dirs = [src_dir for module in modules for src_dir in module.src_dirs]
+            res_dirs = [res_dir for module in modules for res_dir in module.res_dirs]
+            resources = self.parser.scan_resources(res_dirs) if len(res_dirs) > 0 else None
+            links_to_add = self.parser.create_link_set()
+            if len(src_dirs) > 0:
+                links_to_add = self.parser.find_source_links(doc, components, authorities, src_dirs, resources)
+            elif resources is not None:
+                links_to_add = self.parser.find_resource_links(doc, components, resources)
+            profiler.count("explicit_links_found", len(links_to_add))
+
+            with profiler.phase("resolve_links"):
+                self.parser.add_explicit_links(doc, links_to_add)
+
+        profiler.count("connectors", len(doc.get_connectors()))
+        profiler.count("links", len(doc.get_links()))
+        return doc
+
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='main.py project',
+                                         description='Extract the architecture of a Gradle multi-module android project.')
+
+    arg_parser.add_argument('project', metavar='project_dir', type=str,
+                            help='Path to the root of the Gradle project')
+    arg_parser.add_argument('structure', metavar='structure_name', type=str,
+                            help='Name of the output base structure for the extracted architecture')
+    arg_parser.add_argument('--debug', dest='debug', action='store_const',
+                            const=True, default=False,
+                            help='Run the program in debug mode')
+    arg_parser.add_argument('--workers', dest='workers', type=int, default=None,
+                            help='Number of manifests read at the same time')
+    arg_parser.add_argument('--processes', dest='processes', action='store_const',
+                            const=True, default=False,
+                            help='Read manifests in worker processes instead of threads')
+    arg_parser.add_argument('--scan-workers', dest='scan_workers', type=int, default=None,
+                            help='Number of workers used to scan source files concurrently')
+    add_cache_arguments(arg_parser)
+    arg_parser.add_argument('--ids', dest='ids', choices=sorted(ID_ALLOCATORS), default='random',
+                            help='How entity ids are allocated (see main.py --help)')
+    arg_parser.add_argument('--aggregate', dest='aggregate', action='store_const',
+                            const=True, default=False,
+                            help='Use a single connector per pair of components (see main.py --help)')
+    add_format_arguments(arg_parser)
+    arg_parser.add_argument('--output', dest='output', type=str, default=None, metavar='PATH',
+                            help='Write the output to PATH (see main.py --help)')
+
+    return arg_parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    parser = ManifestParser(scan_workers=args.scan_workers, cache=create_cache(args, EXTRACTOR_VERSION),
+                            id_allocator=args.ids, aggregate=args.aggregate)
+    modules = find_modules(args.project)
+    if len(modules) == 0:
+        logging.critical(f"No module with a {MANIFEST_PATH} found in {args.project}")
+        exit()
+    logging.info(f"Analyzing {len(modules)} modules: {', '.join(module.name for module in modules)}")
+
+    doc = ProjectParser(parser, workers=args.workers, use_processes=args.processes).parse(args.project, args.structure,
+                                                                                          modules=modules)
+
+    sink = get_sink(args.output) if args.output is not None else None
+    if sink is None:
+        file_name = doc.write_current_contents(format=args.format, compress=args.gzip)
+    else:
+        file_name = doc.export(sink, format=args.format, compress=args.gzip)
+
+    if not isinstance(sink, StdoutSink):
+        print(f"\033[92m[SUCCESS]\033[0m Output written to \033[4m{file_name}\033[0m")
+    return 0
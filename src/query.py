@@ -0,0 +1,365 @@
+from manifest_parser import ManifestParser
+from intent_cache import add_cache_arguments, create_cache
+from source_scanner import EXTRACTOR_VERSION
+from array import array
+import argparse
+import gzip
+import heapq
+import json
+import logging
+
+
+BUS_NAME = "Implicit Message Bus"
+
+# file extensions of the graphs written by exporters.JsonExporter and JsonLinesExporter
+GRAPH_EXTENSIONS = (".json", ".jsonl", ".json.gz", ".jsonl.gz")
+
+
+class Graph:
+    """
+    A compact directed graph of the components of an architecture, for answering questions such as
+    what a component can reach. Nodes are numbered from 0 and the edges are held in compressed sparse
+    row form: the successors of node i are targets[offsets[i]:offsets[i + 1]], and the same arrays are
+    kept for the predecessors. The implicit message bus is a node of its own, while the connectors of
+    explicit Intents are replaced by a direct edge from their sender to their receiver.
+    """
+    def __init__(self, names, kinds, edges, qualified_names=None):
+        self.names = names
+        self.kinds = kinds
+
+        # name, qualified name and simple name to node, the first node wins
+        self._nodes_by_name = {}
+        self._nodes_by_simple_name = {}
+        for node, name in enumerate(names):
+            self._nodes_by_name.setdefault(name, node)
+            self._nodes_by_simple_name.setdefault(name.split(".")[-1], node)
+        for node, qualified_name in (qualified_names or {}).items():
+            self._nodes_by_name.setdefault(qualified_name, node)
+
+        edges = sorted(set(edges))
+        self.offsets, self.targets = self._compress(len(names), edges)
+        self.reverse_offsets, self.reverse_targets = self._compress(len(names), sorted((end, start) for start, end in edges))
+
+    @staticmethod
+    def _compress(node_count, edges):
+        # edges are sorted by their start, so the targets of each node are contiguous
+        offsets = array("l", [0]) * (node_count + 1)
+        targets = array("l", [end for _, end in edges])
+        for start, _ in edges:
+            offsets[start + 1] += 1
+        for node in range(node_count):
+            offsets[node + 1] += offsets[node]
+        return offsets, targets
+
+    @classmethod
+    def from_nodes(cls, nodes, edges, qualified_names=None):
+        """
+        Build the graph from the entities of an architecture. nodes is a list of (key, name, kind)
+        tuples, where kind is "component", "connector" or "interface", and edges a list of (key, key)
+        pairs. qualified_names maps keys of components to their qualified names.
+        """
+        index = {}
+        names = []
+        kinds = []
+        connectors = set()
+        for key, name, kind in nodes:
+            if kind == "connector" and name != BUS_NAME:
+                connectors.add(key)
+                continue
+            index[key] = len(names)
+            names.append(name)
+            kinds.append(kind)
+
+        # connect the senders of each connector to its receivers, skipping the connector itself
+        senders = {}
+        receivers = {}
+        direct = []
+        for start, end in edges:
+            if end in connectors:
+                senders.setdefault(end, []).append(start)
+            elif start in connectors:
+                receivers.setdefault(start, []).append(end)
+            else:
+                direct.append((start, end))
+        for connector in connectors:
+            for start in senders.get(connector, []):
+                direct.extend((start, end) for end in receivers.get(connector, []))
+
+        graph_edges = [(index[start], index[end]) for start, end in direct if start in index and end in index]
+        node_qualified_names = {index[key]: name for key, name in (qualified_names or {}).items() if key in index}
+        return cls(names, kinds, graph_edges, node_qualified_names)
+
+    @classmethod
+    def from_document(cls, doc):
+        nodes = [(component, component.get_name(), "component") for component in doc.get_components()]
+        nodes += [(connector, connector.get_name(), "connector") for connector in doc.get_connectors()]
+
+        edges = [(doc.get_owner(link.get_start()), doc.get_owner(link.get_end())) for link in doc.get_links()]
+
+        # interfaces linked without belonging to a component or connector stand for themselves
+        known = {key for key, _, _ in nodes}
+        for start, end in edges:
+            for node in (start, end):
+                if node not in known:
+                    known.add(node)
+                    nodes.append((node, node.get_name(), "interface"))
+
+        qualified_names = {component: doc.get_qualified_name(component) for component in doc.get_components()
+                           if doc.get_qualified_name(component) is not None}
+        return cls.from_nodes(nodes, edges, qualified_names)
+
+    @classmethod
+    def from_json(cls, path):
+        """
+        Load a graph written with --format json or jsonl, optionally gzip compressed
+        """
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            if path.endswith((".jsonl", ".jsonl.gz")):
+                records = [json.loads(line) for line in f if len(line.strip()) > 0]
+                nodes = [record for record in records if record["type"] not in ("structure", "edge")]
+                edges = [record for record in records if record["type"] == "edge"]
+            else:
+                graph = json.load(f)
+                nodes = [{"type": node["type"], "id": node["id"], "name": node["name"]} for node in graph["nodes"]]
+                edges = graph["edges"]
+
+        return cls.from_nodes([(node["id"], node["name"], node["type"]) for node in nodes],
+                              [(edge["source"], edge["target"]) for edge in edges])
+
+    def __len__(self):
+        return len(self.names)
+
+    def find(self, name):
+        """
+        Get the node of a component by its name, qualified name or simple name, or None
+        """
+        node = self._nodes_by_name.get(name)
+        if node is None:
+            node = self._nodes_by_simple_name.get(name.split(".")[-1])
+        return node
+
+    def successors(self, node):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def predecessors(self, node):
+        return self.reverse_targets[self.reverse_offsets[node]:self.reverse_offsets[node + 1]]
+
+    def out_degree(self, node):
+        return self.offsets[node + 1] - self.offsets[node]
+
+    def in_degree(self, node):
+        return self.reverse_offsets[node + 1] - self.reverse_offsets[node]
+
+    def reachable(self, node, reverse=False):
+        """
+        Get the nodes reachable from a node, or with reverse=True the nodes that can reach it, in
+        breadth first order and without the node itself unless it is on a cycle
+        """
+        offsets, targets = (self.reverse_offsets, self.reverse_targets) if reverse else (self.offsets, self.targets)
+        seen = bytearray(len(self.names))
+        order = []
+        frontier = [node]
+        while len(frontier) > 0:
+            next_frontier = []
+            for current in frontier:
+                for neighbor in targets[offsets[current]:offsets[current + 1]]:
+                    if not seen[neighbor]:
+                        seen[neighbor] = 1
+                        order.append(neighbor)
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        return order
+
+    def shortest_path(self, source, target):
+        """
+        Get a shortest path from source to target as a list of nodes, or None if there is none
+        """
+        if source == target:
+            return [source]
+
+        parents = array("l", [-1]) * len(self.names)
+        parents[source] = source
+        frontier = [source]
+        offsets, targets = self.offsets, self.targets
+        while len(frontier) > 0:
+            next_frontier = []
+            for current in frontier:
+                for neighbor in targets[offsets[current]:offsets[current + 1]]:
+                    if parents[neighbor] != -1:
+                        continue
+                    parents[neighbor] = current
+                    if neighbor == target:
+                        path = [target]
+                        while path[-1] != source:
+                            path.append(parents[path[-1]])
+                        return path[::-1]
+                    next_frontier.append(neighbor)
+            frontier = next_frontier
+        return None
+
+    def strongly_connected_components(self, min_size=1):
+        """
+        Get the strongly connected components of the graph, with Tarjan's algorithm written without
+        recursion so deep graphs don't hit the recursion limit. Returns a list of lists of nodes, the
+        largest first, keeping only components of at least min_size nodes.
+        """
+        node_count = len(self.names)
+        offsets, targets = self.offsets, self.targets
+        index = array("l", [-1]) * node_count
+        low = array("l", [0]) * node_count
+        on_stack = bytearray(node_count)
+        stack = []
+        components = []
+        counter = 0
+
+        for root in range(node_count):
+            if index[root] != -1:
+                continue
+
+            # each frame is a node and the position of the next successor to visit
+            frames = [(root, offsets[root])]
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+
+            while len(frames) > 0:
+                node, position = frames[-1]
+                if position < offsets[node + 1]:
+                    frames[-1] = (node, position + 1)
+                    successor = targets[position]
+                    if index[successor] == -1:
+                        index[successor] = low[successor] = counter
+                        counter += 1
+                        stack.append(successor)
+                        on_stack[successor] = 1
+                        frames.append((successor, offsets[successor]))
+                    elif on_stack[successor] and index[successor] < low[node]:
+                        low[node] = index[successor]
+                    continue
+
+                frames.pop()
+                if len(frames) > 0 and low[node] < low[frames[-1][0]]:
+                    low[frames[-1][0]] = low[node]
+
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = 0
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) >= min_size:
+                        components.append(component)
+
+        components.sort(key=len, reverse=True)
+        return components
+
+    def cycles(self):
+        """
+        Get the groups of nodes that can all reach each other, including nodes linked to themselves
+        """
+        return [component for component in self.strongly_connected_components()
+                if len(component) > 1 or component[0] in self.successors(component[0])]
+
+    def rank_by_degree(self, top=10, reverse=False):
+        """
+        Get the top nodes by out-degree, or in-degree with reverse=True, as (node, degree) pairs
+        """
+        offsets = self.reverse_offsets if reverse else self.offsets
+        return heapq.nlargest(top, ((node, offsets[node + 1] - offsets[node]) for node in range(len(self.names))),
+                              key=lambda pair: pair[1])
+
+
+def load_graph(args):
+    """
+    Load the graph of an exported JSON graph, or analyze a manifest to build one
+    """
+    if args.input.endswith(GRAPH_EXTENSIONS):
+        return Graph.from_json(args.input)
+
+    parser = ManifestParser(cache=create_cache(args, EXTRACTOR_VERSION))
+    return Graph.from_document(parser.parse(args.input, "query", src_dir=args.src_dir))
+
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='main.py query',
+                                         description='Answer questions about the graph of an extracted architecture.')
+    arg_parser.add_argument('input', type=str,
+                            help='A graph written with --format json or jsonl, or a manifest file or APK to analyze')
+    arg_parser.add_argument('--src', dest='src_dir', type=str, action='append',
+                            help='Path to the source code of the manifest to analyze')
+    arg_parser.add_argument('--json', dest='json', action='store_const',
+                            const=True, default=False,
+                            help='Print the answer as JSON')
+    arg_parser.add_argument('--debug', dest='debug', action='store_const',
+                            const=True, default=False,
+                            help='Run the program in debug mode')
+    add_cache_arguments(arg_parser)
+
+    queries = arg_parser.add_subparsers(dest='query', required=True, metavar='query')
+    reaches = queries.add_parser('reachable', help='What a component can reach')
+    reaches.add_argument('component')
+    reached = queries.add_parser('reached-by', help='What can reach a component')
+    reached.add_argument('component')
+    path = queries.add_parser('path', help='A shortest path between two components')
+    path.add_argument('source')
+    path.add_argument('target')
+    queries.add_parser('cycles', help='Groups of components that can all reach each other')
+    for name, help_text in (('fan-out', 'The components sending to the most others'),
+                            ('fan-in', 'The components receiving from the most others')):
+        ranking = queries.add_parser(name, help=help_text)
+        ranking.add_argument('--top', dest='top', type=int, default=10, help='Number of components to list')
+
+    return arg_parser
+
+
+def find_node(graph, name):
+    node = graph.find(name)
+    if node is None:
+        logging.critical(f"No component named {name}")
+        exit()
+    return node
+
+
+def run_query(graph, args):
+    """
+    Answer the query of the parsed arguments, as a list of names or of (name, value) pairs
+    """
+    if args.query in ("reachable", "reached-by"):
+        nodes = graph.reachable(find_node(graph, args.component), reverse=args.query == "reached-by")
+        return [graph.names[node] for node in nodes]
+    if args.query == "path":
+        path = graph.shortest_path(find_node(graph, args.source), find_node(graph, args.target))
+        return [graph.names[node] for node in path] if path is not None else []
+    if args.query == "cycles":
+        return [[graph.names[node] for node in component] for component in graph.cycles()]
+    return [(graph.names[node], degree) for node, degree in graph.rank_by_degree(args.top, reverse=args.query == "fan-in")]
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    answer = run_query(load_graph(args), args)
+
+    if args.json:
+        if args.query in ("fan-in", "fan-out"):
+            answer = [{"name": name, "degree": degree} for name, degree in answer]
+        print(json.dumps(answer, indent=2))
+    else:
+        for item in answer:
+            if args.query == "cycles":
+                print(" <-> ".join(item))
+            elif args.query in ("fan-in", "fan-out"):
+                print(f"{item[1]}\t{item[0]}")
+            else:
+                print(item)
+
+    return 0 if args.query != "path" or len(answer) > 0 else 1
@@ -0,0 +1,248 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from source_index import get_digest
+import xml.etree.ElementTree as ET
+import logging
+import os
+
+
+# resource directories holding the wiring of an app, each may come in qualified variants e.g. layout-land
+RESOURCE_TYPES = ("layout", "menu", "xml", "navigation")
+
+ANDROID_SCHEMA = "{http://schemas.android.com/apk/res/android}"
+APP_SCHEMA = "{http://schemas.android.com/apk/res-auto}"
+TOOLS_SCHEMA = "{http://schemas.android.com/tools}"
+
+# elements embedding or navigating to a fragment, named by android:name or class
+FRAGMENT_TAGS = ("fragment", "dialog", "androidx.fragment.app.FragmentContainerView")
+
+
+def get_reference(value):
+    """
+    Get the resource named by an attribute value such as "@layout/toolbar" or "@+navigation/main",
+    as "layout/toolbar", or None if it doesn't name one of RESOURCE_TYPES
+    """
+    if value is None or not value.startswith("@"):
+        return None
+    resource_type, _, name = value.lstrip("@+").partition("/")
+    if resource_type not in RESOURCE_TYPES or len(name) == 0:
+        return None
+    return f"{resource_type}/{name}"
+
+
+class ResourceResult:
+    """
+    The component relationships declared in a resource file. Class names are as written, they may
+    be relative to the package of the app, e.g. ".MainActivity"
+    """
+    def __init__(self, path, context=None, targets=None, actions=None, fragments=None, includes=None, error=None):
+        self.path = path
+
+        # the class the resource belongs to, from tools:context
+        self.context = context
+
+        # classes started by the resource: <intent android:targetClass> in preference screens and
+        # <activity> destinations of navigation graphs
+        self.targets = targets if targets is not None else []
+
+        # actions of implicit Intents started by the resource, from <intent android:action>
+        self.actions = actions if actions is not None else []
+
+        # fragments embedded in a layout, opened by a preference or navigated to
+        self.fragments = fragments if fragments is not None else []
+
+        # other resources pulled in, e.g. by <include layout="@layout/toolbar"> or app:navGraph
+        self.includes = includes if includes is not None else []
+
+        self.error = error
+
+
+def scan_resource(path):
+    """
+    Parse a resource file and collect what it declares. This runs inside a worker thread or process.
+    """
+    try:
+        tree = ET.parse(path)
+    except (OSError, ET.ParseError) as e:
+        return ResourceResult(path, error=str(e))
+
+    root = tree.getroot()
+    result = ResourceResult(path, context=root.get(f"{TOOLS_SCHEMA}context"))
+
+    for element in root.iter():
+        tag = element.tag
+        name = element.get(f"{ANDROID_SCHEMA}name")
+
+        if tag == "intent":
+            target = element.get(f"{ANDROID_SCHEMA}targetClass")
+            action = element.get(f"{ANDROID_SCHEMA}action")
+            if target is not None:
+                result.targets.append(target)
+            elif action is not None:
+                result.actions.append(action)
+        elif tag == "activity" and name is not None:
+            # a destination of a navigation graph
+            result.targets.append(name)
+        elif tag in FRAGMENT_TAGS or tag.endswith(".FragmentContainerView"):
+            fragment = name if name is not None else element.get("class")
+            if fragment is not None and "NavHostFragment" not in fragment:
+                result.fragments.append(fragment)
+
+        # preferences opening a fragment
+        for schema in (ANDROID_SCHEMA, APP_SCHEMA):
+            fragment = element.get(f"{schema}fragment")
+            if fragment is not None:
+                result.fragments.append(fragment)
+
+        for value in (element.get("layout"), element.get(f"{APP_SCHEMA}graph"), element.get(f"{APP_SCHEMA}navGraph"),
+                      element.get(f"{ANDROID_SCHEMA}layout")):
+            reference = get_reference(value)
+            if reference is not None:
+                result.includes.append(reference)
+
+    return result
+
+
+def read_digest(path):
+    """
+    Hash the content of a resource file, or return None if it can't be read
+    """
+    try:
+        with open(path, "rb") as f:
+            return get_digest(f.read())
+    except OSError as e:
+        logging.warning(f"Could not read resource {path}: {e}")
+        return None
+
+
+class ResourceIndex:
+    """
+    The scanned resources of an app, by name, e.g. "layout/main". A resource has one result per
+    distinct content among its qualifier variants, such as layout-land and layout-port.
+    """
+    def __init__(self, results_by_name):
+        self.results_by_name = results_by_name
+
+        # the resources declaring each tools:context, by simple class name
+        self._contexts = {}
+        for name, results in results_by_name.items():
+            for result in results:
+                if result.context is not None:
+                    self._contexts.setdefault(result.context.split(".")[-1], []).append((result.context, name))
+
+        self.files_scanned = 0
+        self.files_parsed = 0
+
+    def get_context_uses(self, qualified_name):
+        """
+        Get the resources whose tools:context is the class qualified_name. Relative context names only
+        have to match the simple name, since tools:context is often relative to the wrong package.
+        """
+        uses = []
+        for context, name in self._contexts.get(qualified_name.split(".")[-1], []):
+            if (context.startswith(".") or context == qualified_name) and name not in uses:
+                uses.append(name)
+        return uses
+
+    def get_closure(self, names):
+        """
+        Get the results of resources and of every resource they include, transitively
+        """
+        results = []
+        seen = set()
+        pending = list(names)
+        while len(pending) > 0:
+            name = pending.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            for result in self.results_by_name.get(name, []):
+                results.append(result)
+                pending.extend(result.includes)
+        return results
+
+    def get_targets(self, names):
+        return list(dict.fromkeys(target for result in self.get_closure(names) for target in result.targets))
+
+    def get_actions(self, names):
+        return list(dict.fromkeys(action for result in self.get_closure(names) for action in result.actions))
+
+    def get_fragments(self, names):
+        return list(dict.fromkeys(fragment for result in self.get_closure(names) for fragment in result.fragments))
+
+    def __len__(self):
+        return len(self.results_by_name)
+
+
+class ResourceScanner:
+    """
+    Walks the res/ directories of an app once and scans its layouts, menus, xml and navigation
+    graphs concurrently. Qualifier variants with identical content, which are common across density
+    and orientation directories, are only parsed once.
+    """
+    def __init__(self, max_workers=None, use_processes=False):
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+
+    def find_resources(self, res_dirs):
+        """
+        Get the paths of every resource file of RESOURCE_TYPES, as a dictionary mapping resource names
+        such as "layout/main" to the paths of their variants
+        """
+        if isinstance(res_dirs, str):
+            res_dirs = [res_dirs]
+
+        paths = {}
+        for res_dir in res_dirs:
+            try:
+                directories = [entry for entry in os.scandir(res_dir) if entry.is_dir()]
+            except OSError as e:
+                logging.warning(f"Could not list resource directory {res_dir}: {e}")
+                continue
+
+            for directory in sorted(directories, key=lambda entry: entry.name):
+                # layout-land-v21 holds layouts
+                resource_type = directory.name.split("-")[0]
+                if resource_type not in RESOURCE_TYPES:
+                    continue
+                for entry in sorted(os.scandir(directory.path), key=lambda entry: entry.name):
+                    if entry.name.endswith(".xml") and entry.is_file():
+                        paths.setdefault(f"{resource_type}/{entry.name[:-len('.xml')]}", []).append(entry.path)
+        return paths
+
+    def scan(self, res_dirs):
+        """
+        Scan every resource of one or more res/ directories and return a ResourceIndex
+        """
+        paths = self.find_resources(res_dirs)
+        all_paths = [path for variants in paths.values() for path in variants]
+
+        executor_type = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with executor_type(max_workers=self.max_workers) as executor:
+            # hash every file, then parse a single file per distinct content
+            digests = dict(zip(all_paths, executor.map(read_digest, all_paths)))
+            first_paths = {}
+            for path in all_paths:
+                if digests[path] is not None:
+                    first_paths.setdefault(digests[path], path)
+            unique_paths = list(first_paths.values())
+            results = dict(zip(unique_paths, executor.map(scan_resource, unique_paths)))
+
+        results_by_digest = {digests[path]: result for path, result in results.items()}
+        results_by_name = {}
+        for name, variants in paths.items():
+            name_results = []
+            for path in variants:
+                result = results_by_digest.get(digests[path])
+                if result is None or result in name_results:
+                    continue
+                if result.error is not None:
+                    logging.warning(f"Could not parse resource {path}: {result.error}")
+                    continue
+                name_results.append(result)
+            results_by_name[name] = name_results
+
+        logging.debug(f"Scanned {len(all_paths)} resource files, {len(unique_paths)} distinct")
+        index = ResourceIndex(results_by_name)
+        index.files_scanned = len(all_paths)
+        index.files_parsed = len(unique_paths)
+        return index
@@ -0,0 +1,300 @@
+from batch import BatchJob, analyze_app
+from client import ENCODING, DEFAULT_HOST, add_connection_arguments, get_default_socket_path
+from intent_cache import add_cache_arguments, create_cache
+from source_scanner import EXTRACTOR_VERSION
+from store import ArchitectureStore
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+
+
+# most recently used source indexes kept by each worker
+DEFAULT_INDEX_ENTRIES = 32
+
+# most recently used cache entries kept in memory by each worker
+DEFAULT_MEMORY_ENTRIES = 100000
+
+# requests are single lines of JSON, bound their size so a bad client can't exhaust memory
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+class SourceIndexStore:
+    """
+    Bounded mapping of source roots to their last SourceIndex, evicting the least recently used.
+    It is shared by the threads of a thread pool.
+    """
+    def __init__(self, max_entries=DEFAULT_INDEX_ENTRIES):
+        self.max_entries = max_entries
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            source_index = self._indexes.pop(key, None)
+            if source_index is not None:
+                self._indexes[key] = source_index
+            return source_index
+
+    def __setitem__(self, key, source_index):
+        with self._lock:
+            self._indexes.pop(key, None)
+            self._indexes[key] = source_index
+            while len(self._indexes) > self.max_entries:
+                del self._indexes[next(iter(self._indexes))]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._indexes)
+
+
+class WorkerState:
+    """
+    What a worker keeps warm between requests: the intent cache with its memory layer and the
+    source indexes of the apps it analyzed. Compiled patterns are module globals and stay warm as well.
+    """
+    def __init__(self, cache, index_entries, scan_workers):
+        self.cache = cache
+        self.source_indexes = SourceIndexStore(index_entries)
+        self.scan_workers = scan_workers
+
+
+# set once in every worker process, shared by the threads of a thread pool
+WORKER_STATE = None
+
+
+def init_worker(cache, index_entries, scan_workers):
+    global WORKER_STATE
+    if WORKER_STATE is None:
+        WORKER_STATE = WorkerState(cache, index_entries, scan_workers)
+
+
+def analyze_request(request):
+    """
+    Run an analysis request inside a worker and return the response
+    """
+    job = BatchJob(request["manifest"], request["structure"], request.get("src_dir"), res_dir=request.get("res_dir"),
+                   lib_dir=request.get("lib_dir"), dex_files=request.get("dex_files"))
+    parser_options = {
+        "cache": WORKER_STATE.cache,
+        "source_indexes": WORKER_STATE.source_indexes,
+        "scan_workers": WORKER_STATE.scan_workers,
+        "id_allocator": request.get("ids") or "random",
+        "stream": bool(request.get("stream")),
+        "resolve_implicit": bool(request.get("resolve_implicit")),
+        "aggregate": bool(request.get("aggregate")),
+    }
+    export_options = {"format": request.get("format") or "xadl", "compress": bool(request.get("gzip"))}
+    return analyze_app(job, request.get("output_dir"), parser_options, profile=request.get("profile"),
+                       export_options=export_options, store_rows=request.get("store") is not None,
+                       output=request.get("output"))
+
+
+class AnalysisServer:
+    """
+    Accepts analysis requests over a Unix socket or a localhost TCP port. Requests and responses are
+    single lines of JSON. Connections are served by an asyncio event loop while the analyses run on a
+    pool of worker threads or processes that keep their caches between requests.
+    """
+    def __init__(self, workers=None, use_processes=False, cache=None, index_entries=DEFAULT_INDEX_ENTRIES,
+                 scan_workers=None):
+        executor_type = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self.executor = executor_type(max_workers=workers, initializer=init_worker,
+                                      initargs=(cache, index_entries, scan_workers))
+        self.started = time.time()
+        self.requests = 0
+        self.failures = 0
+        self.active = 0
+        self._stopped = None
+
+        # the server is the only writer of the stores, one analysis at a time, see store_rows
+        self._store_lock = threading.Lock()
+
+    async def dispatch(self, request):
+        command = request.get("command", "analyze")
+        if command == "ping":
+            return {"status": "ok"}
+        if command == "stats":
+            return {
+                "status": "ok",
+                "uptime_seconds": time.time() - self.started,
+                "requests": self.requests,
+                "failures": self.failures,
+                "active": self.active,
+            }
+        if command == "shutdown":
+            # the server stops once the response has been sent, see handle_connection
+            return {"status": "ok"}
+        if command != "analyze":
+            return {"status": "error", "error": f"Unknown command {command}"}
+
+        for field in ("manifest", "structure"):
+            if not isinstance(request.get(field), str):
+                return {"status": "error", "error": f"Missing {field}"}
+        if request.get("output") == "-":
+            return {"status": "error", "error": "The output can't be written to the standard output of the server"}
+
+        self.requests += 1
+        self.active += 1
+        try:
+            response = await asyncio.get_running_loop().run_in_executor(self.executor, analyze_request, request)
+            rows = response.pop("rows", None)
+            if rows is not None:
+                await asyncio.get_running_loop().run_in_executor(None, self.store_rows, request["store"], rows,
+                                                                 response)
+        finally:
+            self.active -= 1
+
+        if response["status"] != "ok":
+            self.failures += 1
+        logging.info(f"[{response['status']}] {response['structure']} ({response['seconds']:.3f}s)")
+        return response
+
+    def store_rows(self, path, rows, response):
+        """
+        Add the DocumentRows of an analysis to the store at path, recording a failure in its response
+        """
+        try:
+            with self._store_lock:
+                with ArchitectureStore(path) as store:
+                    store.add_rows(rows)
+        except sqlite3.Error as e:
+            response["status"] = "error"
+            response["error"] = f"Could not store the architecture in {path}: {e}"
+
+    async def handle_connection(self, reader, writer):
+        shutdown = False
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, {"status": "error", "error": "Request too large"})
+                    break
+
+                try:
+                    request = json.loads(line.decode(ENCODING))
+                    if not isinstance(request, dict):
+                        raise ValueError("expected an object")
+                except ValueError as e:
+                    request = None
+                    response = {"status": "error", "error": f"Invalid request: {e}"}
+                else:
+                    response = await self.dispatch(request)
+                await self.respond(writer, response)
+
+                if request is not None and request.get("command") == "shutdown":
+                    shutdown = True
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            if shutdown:
+                self._stopped.set()
+
+    async def respond(self, writer, response):
+        writer.write(json.dumps(response).encode(ENCODING) + b"\n")
+        await writer.drain()
+
+    async def serve(self, socket_path=None, port=None):
+        """
+        Serve until a shutdown request or a SIGINT or SIGTERM
+        """
+        self._stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signal_number, self._stopped.set)
+            except (NotImplementedError, RuntimeError):
+                # not supported on this platform or outside the main thread
+                pass
+
+        if port is not None:
+            server = await asyncio.start_server(self.handle_connection, DEFAULT_HOST, port, limit=MAX_REQUEST_BYTES)
+            address = f"{DEFAULT_HOST}:{server.sockets[0].getsockname()[1]}"
+        else:
+            socket_path = socket_path if socket_path is not None else get_default_socket_path()
+            remove_stale_socket(socket_path)
+            server = await asyncio.start_unix_server(self.handle_connection, socket_path, limit=MAX_REQUEST_BYTES)
+            os.chmod(socket_path, 0o600)
+            address = socket_path
+
+        logging.info(f"Listening on {address}")
+        self.address = address
+        try:
+            async with server:
+                await self._stopped.wait()
+        finally:
+            if port is None and os.path.exists(socket_path):
+                os.remove(socket_path)
+            self.executor.shutdown(wait=True)
+        logging.info("Server stopped")
+
+
+def remove_stale_socket(socket_path):
+    """
+    Remove a socket left behind by a server that didn't stop cleanly, refusing to replace a running one
+    """
+    if not os.path.exists(socket_path):
+        return
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        os.remove(socket_path)
+    else:
+        raise RuntimeError(f"Another server is already listening on {socket_path}")
+    finally:
+        probe.close()
+
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='main.py serve',
+                                         description='Run a long lived analysis server that keeps its caches warm '
+                                                     'between requests. Send it requests with "main.py client".')
+    arg_parser.add_argument('--debug', dest='debug', action='store_const',
+                            const=True, default=False,
+                            help='Run the program in debug mode')
+    arg_parser.add_argument('--workers', dest='workers', type=int, default=None,
+                            help='Number of analyses run at the same time')
+    arg_parser.add_argument('--processes', dest='processes', action='store_const',
+                            const=True, default=False,
+                            help='Run analyses in worker processes instead of threads. Each process keeps its own caches')
+    arg_parser.add_argument('--scan-workers', dest='scan_workers', type=int, default=None,
+                            help='Number of threads used by each analysis to scan source files')
+    arg_parser.add_argument('--index-entries', dest='index_entries', type=int, default=DEFAULT_INDEX_ENTRIES,
+                            help='Number of source indexes kept by each worker')
+    arg_parser.add_argument('--memory-entries', dest='memory_entries', type=int, default=DEFAULT_MEMORY_ENTRIES,
+                            help='Number of intent cache entries kept in memory by each worker')
+    add_cache_arguments(arg_parser)
+    add_connection_arguments(arg_parser)
+    return arg_parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    cache = create_cache(args, EXTRACTOR_VERSION)
+    if cache is not None:
+        cache.memory_entries = args.memory_entries
+
+    server = AnalysisServer(workers=args.workers, use_processes=args.processes, cache=cache,
+                            index_entries=args.index_entries, scan_workers=args.scan_workers)
+    asyncio.run(server.serve(socket_path=args.socket, port=args.port))
+    return 0
@@ -0,0 +1,149 @@
+from contextlib import contextmanager
+import gzip
+import io
+import logging
+import os
+import sys
+
+
+class CountingStream:
+    """
+    Forwards writes to a binary stream while counting the bytes written
+    """
+    def __init__(self, stream):
+        self._stream = stream
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return self._stream.write(data)
+
+    def flush(self):
+        self._stream.flush()
+
+
+class Sink:
+    """
+    Where an exported document ends up. Documents name the output they write, e.g. "app.json",
+    and each sink decides what to do with that name.
+    """
+    @contextmanager
+    def open(self, file_name):
+        """
+        Open a binary stream for the output named file_name
+        """
+        raise NotImplementedError("Child classes of Sink must override open")
+        yield
+
+    def get_location(self, file_name):
+        """
+        Describe where the output named file_name was written, to report it to the user
+        """
+        raise NotImplementedError("Child classes of Sink must override get_location")
+
+
+class DirectorySink(Sink):
+    """
+    Writes every output to a file named after it inside a directory, which is created if needed
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def get_location(self, file_name):
+        return os.path.join(self.directory, file_name)
+
+    @contextmanager
+    def open(self, file_name):
+        if not os.path.exists(self.directory):
+            logging.debug(f"Path does not exist. Creating directory {self.directory}")
+            os.makedirs(self.directory, exist_ok=True)
+
+        with open(self.get_location(file_name), "wb") as f:
+            yield f
+
+
+class FileSink(Sink):
+    """
+    Writes the output to a given path whatever its name
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def get_location(self, file_name):
+        return self.path
+
+    @contextmanager
+    def open(self, file_name):
+        directory = os.path.dirname(self.path)
+        if len(directory) > 0:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(self.path, "wb") as f:
+            yield f
+
+
+class StdoutSink(Sink):
+    """
+    Writes the output to the standard output so it can be piped to another program
+    """
+    def get_location(self, file_name):
+        return "<stdout>"
+
+    @contextmanager
+    def open(self, file_name):
+        stream = sys.stdout.buffer
+        yield stream
+        stream.flush()
+
+
+class MemorySink(Sink):
+    """
+    Keeps every output in memory, for library callers who want the bytes without touching the disk
+    """
+    def __init__(self):
+        self.outputs = {}
+
+    def get_location(self, file_name):
+        return f"<memory:{file_name}>"
+
+    @contextmanager
+    def open(self, file_name):
+        stream = io.BytesIO()
+        yield stream
+        self.outputs[file_name] = stream.getvalue()
+
+    def getvalue(self, file_name=None):
+        """
+        Get the bytes of the output named file_name, or of the last output written
+        """
+        if file_name is None:
+            file_name = next(reversed(self.outputs))
+        return self.outputs[file_name]
+
+
+def get_sink(target):
+    """
+    Get the sink for an --output argument: "-" for the standard output, a directory (an existing one
+    or a path ending with a separator) or a file path. A Sink is returned unchanged.
+    """
+    if isinstance(target, Sink):
+        return target
+    if target == "-":
+        return StdoutSink()
+    if target.endswith(("/", os.sep)) or os.path.isdir(target):
+        return DirectorySink(target)
+    return FileSink(target)
+
+
+@contextmanager
+def open_compressed(stream, compress):
+    """
+    Wrap a binary stream so what is written to it is gzip compressed. The timestamp and file name in
+    the gzip header are left out so identical documents still compress to identical bytes.
+    """
+    if not compress:
+        yield stream
+        return
+
+    with gzip.GzipFile(filename="", fileobj=stream, mode="wb", mtime=0) as compressed:
+        yield compressed
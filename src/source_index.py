@@ -0,0 +1,231 @@
+import hashlib
+import logging
+import os
+import re
+
+
+SOURCE_EXTENSIONS = (".java", ".kt")
+
+PACKAGE_PATTERN = re.compile(rb"^\s*package\s+([\w.]+)", re.MULTILINE)
+
+# comments and string literals are matched so the braces and keywords inside them are skipped,
+# declarations and braces are what we actually track to find nested types
+DECLARATION_PATTERN = re.compile(
+    rb'(?P<skip>//[^\n]*|/\*.*?\*/|"""(?:.|\n)*?"""|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')'
+    rb"|(?<![.\w$])(?:(?:enum|data|sealed|inner|annotation|value|abstract|open|final|static|public|private|protected|internal)\s+)*"
+    rb"(?:@?interface|class|enum|object|record)\s+(?P<name>[A-Za-z_$][\w$]*)"
+    rb"|(?P<open>\{)|(?P<close>\})|(?P<end>;|(?<![\w$])fun(?![\w$]))",
+    re.DOTALL
+)
+
+
+def find_declared_types(content):
+    """
+    Find the types declared in a Java or Kotlin source file.
+    Returns a tuple (package_name, type_names) where every type name is qualified by its enclosing
+    types, e.g. "Outer.Inner", but not by the package.
+    """
+    match = PACKAGE_PATTERN.search(content)
+    package_name = match.group(1).decode("utf-8") if match is not None else None
+
+    type_names = []
+
+    # one entry per open brace, holding the qualified name of the type whose body it opens, or
+    # None for any other block
+    scopes = []
+
+    # a type that was declared but whose body hasn't been opened yet
+    pending = None
+
+    for match in DECLARATION_PATTERN.finditer(content):
+        if match.group("skip") is not None:
+            continue
+        elif match.group("name") is not None:
+            enclosing = [scope for scope in scopes if scope is not None]
+            name = match.group("name").decode("utf-8")
+            pending = ".".join(enclosing[-1:] + [name])
+            type_names.append(pending)
+        elif match.group("open") is not None:
+            scopes.append(pending)
+            pending = None
+        elif match.group("close") is not None:
+            if len(scopes) > 0:
+                scopes.pop()
+            pending = None
+        else:
+            # a statement or function ended before the declared type had a body
+            pending = None
+
+    return package_name, type_names
+
+
+def get_digest(content):
+    """
+    Hash the content of a source file, to tell whether it changed between two snapshots of an app
+    """
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+class SourceIndex:
+    """
+    Maps class names to the source files declaring them. The source roots are walked once, and every
+    .java and .kt file is indexed by the package and types it declares, including nested types.
+
+    Given the previous index of the same roots, the declarations of files whose size and modification
+    time haven't changed are reused instead of reading the files again. The previous index may also be
+    of other roots, such as an earlier checkout of the app, in which case files are matched by their
+    path relative to their root and reused when their content hasn't changed.
+    """
+    def __init__(self, roots, previous=None):
+        if isinstance(roots, str):
+            roots = [roots]
+        self.roots = list(roots)
+
+        # path to (mtime_ns, size, digest, package_name, type_names) of every indexed file
+        self._declarations = {}
+        self._previous = previous._declarations if previous is not None else {}
+        self._previous_relative = self._get_relative_declarations(previous)
+
+        # fully qualified name (with nested types separated by ".") to path
+        self._files_by_name = {}
+
+        # simple name of a type to the paths declaring a type with that name
+        self._files_by_simple_name = {}
+
+        self.files_indexed = 0
+        self.files_reused = 0
+        self.bytes_read = 0
+
+        self._build()
+
+        # only needed while building
+        self._previous = None
+        self._previous_relative = None
+
+    def _get_relative_declarations(self, previous):
+        """
+        Key the declarations of an index of other roots by (position of the root, relative path)
+        """
+        if previous is None or [os.path.abspath(root) for root in previous.roots] == \
+                [os.path.abspath(root) for root in self.roots]:
+            return None
+
+        relative_declarations = {}
+        for position, root in enumerate(previous.roots):
+            prefix = os.path.join(root, "")
+            for path, declaration in previous._declarations.items():
+                if path.startswith(prefix):
+                    relative_declarations.setdefault((position, path[len(prefix):]), declaration)
+        return relative_declarations
+
+    def _walk(self, root):
+        # iterative walk using scandir, which avoids a stat call per entry on most platforms
+        directories = [root]
+        while len(directories) > 0:
+            directory = directories.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                logging.warning(f"Could not list source directory {directory}: {e}")
+                continue
+
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif entry.name.endswith(SOURCE_EXTENSIONS):
+                    yield entry
+
+    def _build(self):
+        for position, root in enumerate(self.roots):
+            prefix = os.path.join(root, "")
+            for entry in self._walk(root):
+                if len(self._previous) > 0:
+                    self._add_entry(entry, (position, entry.path[len(prefix):]))
+                else:
+                    self.add_file(entry.path)
+
+        logging.debug(f"Indexed {len(self._files_by_name)} types in {self.files_indexed + self.files_reused} source files "
+                      f"under {self.roots} ({self.files_reused} unchanged since the previous index)")
+
+    def _add_entry(self, entry, relative_path):
+        try:
+            stat = entry.stat()
+        except OSError:
+            self.add_file(entry.path)
+            return
+
+        declaration = self._previous.get(entry.path)
+        if declaration is not None and declaration[0] == stat.st_mtime_ns and declaration[1] == stat.st_size:
+            self.files_reused += 1
+            self._add_declaration(entry.path, declaration)
+            return
+
+        if declaration is None and self._previous_relative is not None:
+            declaration = self._previous_relative.get(relative_path)
+        self.add_file(entry.path, stat, previous=declaration)
+
+    def add_file(self, path, stat=None, previous=None):
+        """
+        Read and index a source file. If the previous declaration of the file is given and the content of
+        the file hasn't changed since, the types it declared are reused rather than searched for again.
+        """
+        try:
+            with open(path, "rb") as f:
+                if stat is None:
+                    stat = os.fstat(f.fileno())
+                content = f.read()
+        except OSError as e:
+            logging.warning(f"Could not read source file {path}: {e}")
+            return
+
+        self.bytes_read += len(content)
+        digest = get_digest(content)
+
+        if previous is not None and previous[2] == digest:
+            self.files_reused += 1
+            package_name, type_names = previous[3], previous[4]
+        else:
+            self.files_indexed += 1
+            package_name, type_names = find_declared_types(content)
+        self._add_declaration(path, (stat.st_mtime_ns, stat.st_size, digest, package_name, type_names))
+
+    def _add_declaration(self, path, declaration):
+        self._declarations[path] = declaration
+        _, _, _, package_name, type_names = declaration
+
+        # a file without any type we recognize can still be found by its file name
+        if len(type_names) == 0:
+            type_names = [os.path.splitext(os.path.basename(path))[0]]
+
+        for type_name in type_names:
+            name = type_name if package_name is None else f"{package_name}.{type_name}"
+            self._files_by_name.setdefault(name, path)
+            self._files_by_simple_name.setdefault(type_name.split(".")[-1], []).append(path)
+
+    def find(self, name):
+        """
+        Get the path of the file declaring a class. Nested classes may be given either as
+        Outer.Inner or with their binary name Outer$Inner. Returns None if no file declares it.
+        """
+        path = self._files_by_name.get(name)
+        if path is None and "$" in name:
+            path = self._files_by_name.get(name.replace("$", "."))
+        return path
+
+    def find_simple_name(self, simple_name):
+        """
+        Get the paths of every file declaring a type with the given simple name
+        """
+        return self._files_by_simple_name.get(simple_name, [])
+
+    def get_digest(self, path):
+        """
+        Get the digest of the content of an indexed file, or None if it isn't indexed
+        """
+        declaration = self._declarations.get(path)
+        return declaration[2] if declaration is not None else None
+
+    def __len__(self):
+        return len(self._files_by_name)
@@ -0,0 +1,164 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from intent_extractor import Finding, IntentExtractor
+import logging
+import mmap
+import os
+
+
+# bump whenever the extraction changes so previously cached results are not reused
+EXTRACTOR_VERSION = 6
+
+# compiled once per process and shared by every scan
+EXTRACTOR = IntentExtractor()
+
+
+class ScanResult:
+    """
+    The inter-component communication found in a single source file
+    """
+    def __init__(self, path, findings=None, bytes_read=0, error=None, cached=None):
+        self.path = path
+
+        # the Findings of the file in the order they appear in it
+        self.findings = findings if findings is not None else []
+
+        self.bytes_read = bytes_read
+        self.error = error
+
+        # True if the result came from the intent cache, False if it was stored in it, None without a cache
+        self.cached = cached
+
+    @property
+    def explicit_targets(self):
+        # simple or qualified class names targeted by explicit Intents, in the order they appear
+        return [finding.target for finding in self.findings if finding.kind == Finding.EXPLICIT_INTENT]
+
+    @property
+    def has_implicit(self):
+        # whether the file sends at least one implicit Intent
+        return any(finding.kind == Finding.IMPLICIT_INTENT for finding in self.findings)
+
+
+def scan_buffer(buffer):
+    """
+    Find the inter-component communication in a buffer of source code. The buffer can be any
+    bytes-like object, including an mmap, and is never decoded as a whole.
+    Returns a list of Findings
+    """
+    return EXTRACTOR.extract(buffer)
+
+
+def scan_file(path, cache=None):
+    """
+    Memory-map a source file and extract its findings, using the cached result for its content if
+    an IntentCache is given
+    """
+    cached = None
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+
+            # empty files can't be memory-mapped
+            if size == 0:
+                return ScanResult(path)
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                key = None
+                value = None
+                if cache is not None:
+                    key = cache.get_key(buffer)
+                    value = cache.get(key)
+
+                if value is not None:
+                    findings = [Finding.from_list(finding) for finding in value["findings"]]
+                    cached = True
+                else:
+                    findings = scan_buffer(buffer)
+                    if cache is not None:
+                        cache.put(key, {"findings": [finding.to_list() for finding in findings]})
+                        cached = False
+    except OSError as e:
+        return ScanResult(path, error=str(e))
+
+    return ScanResult(path, findings, bytes_read=size, cached=cached)
+
+
+class SourceScanner:
+    """
+    Scans many source files concurrently. Threads overlap the file I/O and are cheap to start, while
+    processes also spread the regex matching over several cores for very large source trees.
+    """
+    def __init__(self, max_workers=None, use_processes=False, cache=None):
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.cache = cache
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def scan(self, paths):
+        """
+        Scan every path and return a dictionary mapping each path to its ScanResult
+        """
+        # the same file may back several components, only scan it once
+        unique_paths = list(dict.fromkeys(paths))
+        if len(unique_paths) == 0:
+            return {}
+
+        logging.debug(f"Scanning {len(unique_paths)} source files")
+
+        executor_type = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with executor_type(max_workers=self.max_workers) as executor:
+            # chunk the work when using processes so we don't pay one round trip per file
+            chunksize = max(1, len(unique_paths) // (4 * (self.max_workers or os.cpu_count() or 1))) if self.use_processes else 1
+            results = dict(zip(unique_paths, executor.map(partial(scan_file, cache=self.cache), unique_paths, chunksize=chunksize)))
+
+        self.record_cache_use(sum(1 for result in results.values() if result.cached is True),
+                              sum(1 for result in results.values() if result.cached is False))
+        return results
+
+    def iter_scan(self, paths, window=None):
+        """
+        Scan every path, yielding the ScanResults in the order of paths as they become ready. At most
+        window files, by default a few per worker, are scanned ahead of the caller, so results pile up
+        no faster than they are consumed. paths may be any iterable and is read lazily.
+        """
+        if window is None:
+            window = 4 * (self.max_workers or os.cpu_count() or 1)
+
+        hits = 0
+        misses = 0
+        executor_type = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with executor_type(max_workers=self.max_workers) as executor:
+            pending = deque()
+            paths = iter(paths)
+            while True:
+                # keep the window full, then hand over the oldest result
+                for path in paths:
+                    pending.append(executor.submit(scan_file, path, self.cache))
+                    if len(pending) >= window:
+                        break
+                if len(pending) == 0:
+                    break
+
+                result = pending.popleft().result()
+                if result.cached is True:
+                    hits += 1
+                elif result.cached is False:
+                    misses += 1
+                yield result
+
+        self.record_cache_use(hits, misses)
+
+    def record_cache_use(self, hits, misses):
+        if self.cache is None:
+            return
+
+        self.cache_hits += hits
+        self.cache_misses += misses
+        logging.debug(f"Intent cache: {hits} hits, {misses} misses ({self.cache_hits} hits, {self.cache_misses} misses in total)")
+
+        # new entries may have pushed the cache over its size bound
+        if misses > 0:
+            self.cache.prune()
@@ -0,0 +1,397 @@
+from entities import Interface
+import argparse
+import json
+import logging
+import sqlite3
+import time
+
+
+# bumped whenever the schema changes, a database with another version is rebuilt from scratch
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS apps (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL DEFAULT '',
+    package TEXT,
+    stored_at REAL NOT NULL,
+    UNIQUE (name, version)
+);
+CREATE TABLE IF NOT EXISTS nodes (
+    id INTEGER PRIMARY KEY,
+    app_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    simple_name TEXT NOT NULL,
+    qualified_name TEXT,
+    properties TEXT
+);
+CREATE TABLE IF NOT EXISTS interfaces (
+    id INTEGER PRIMARY KEY,
+    app_id INTEGER NOT NULL,
+    node_id INTEGER,
+    name TEXT NOT NULL,
+    direction TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS links (
+    app_id INTEGER NOT NULL,
+    start_interface INTEGER NOT NULL,
+    end_interface INTEGER NOT NULL,
+    start_node INTEGER,
+    end_node INTEGER
+);
+CREATE TABLE IF NOT EXISTS intent_filters (
+    id INTEGER PRIMARY KEY,
+    app_id INTEGER NOT NULL,
+    node_id INTEGER NOT NULL,
+    component_type TEXT,
+    exported INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS filter_values (
+    app_id INTEGER NOT NULL,
+    filter_id INTEGER NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS nodes_app ON nodes (app_id);
+CREATE INDEX IF NOT EXISTS nodes_qualified_name ON nodes (qualified_name);
+CREATE INDEX IF NOT EXISTS nodes_simple_name ON nodes (simple_name);
+CREATE INDEX IF NOT EXISTS interfaces_app ON interfaces (app_id);
+CREATE INDEX IF NOT EXISTS links_app ON links (app_id);
+CREATE INDEX IF NOT EXISTS links_end ON links (end_node, start_node);
+CREATE INDEX IF NOT EXISTS links_start ON links (start_node, end_node);
+CREATE INDEX IF NOT EXISTS intent_filters_app ON intent_filters (app_id);
+CREATE INDEX IF NOT EXISTS filter_values_app ON filter_values (app_id);
+CREATE INDEX IF NOT EXISTS filter_values_lookup ON filter_values (field, value, filter_id);
+"""
+
+# tables holding the entities of an app, in the order they are deleted
+APP_TABLES = ("filter_values", "intent_filters", "links", "interfaces", "nodes")
+
+# the intent filter fields that can be looked up, as stored in filter_values
+FILTER_FIELDS = ("action", "category", "scheme", "host", "path", "mime_type")
+
+
+class DocumentRows:
+    """
+    The rows of a document, numbered from 0 within the document. They only hold plain values so they
+    can be built in a worker process and sent to the process writing the store.
+    """
+    def __init__(self, doc, name=None, version=None):
+        self.name = name if name is not None else doc.main_structure_name
+        self.version = version if version is not None else (doc.version or "")
+        self.package = doc.package_name
+
+        # (node, kind, name, simple name, qualified name, properties)
+        self.nodes = []
+        # (interface, node, name, direction)
+        self.interfaces = []
+        # (start interface, end interface, start node, end node)
+        self.links = []
+        # (filter, node, component type, exported)
+        self.filters = []
+        # (filter, field, value)
+        self.filter_values = []
+
+        node_ids = {}
+        interface_ids = {}
+
+        def add_node(entity, kind, qualified_name=None):
+            node_ids[entity] = len(self.nodes)
+            properties = entity.get_properties()
+            self.nodes.append((len(self.nodes), kind, entity.get_name(), entity.get_name().split(".")[-1],
+                               qualified_name, json.dumps(properties) if properties is not None else None))
+
+        def add_interface(interface):
+            if interface not in interface_ids:
+                interface_ids[interface] = len(self.interfaces)
+                self.interfaces.append((len(self.interfaces), node_ids.get(interface.get_parent()), interface.get_name(),
+                                        Interface.direction_strings[interface.get_direction()]))
+            return interface_ids[interface]
+
+        for component in doc.get_components():
+            add_node(component, "component", doc.get_qualified_name(component))
+        for connector in doc.get_connectors():
+            add_node(connector, "bus" if connector is doc.get_bus() else "connector")
+
+        for component in doc.get_components():
+            for interface in component.get_interfaces():
+                add_interface(interface)
+        for connector in doc.get_connectors():
+            add_interface(connector.get_interface_in())
+            add_interface(connector.get_interface_out())
+
+        for link in doc.get_links():
+            start, end = link.get_start(), link.get_end()
+            self.links.append((add_interface(start), add_interface(end), node_ids.get(start.get_parent()),
+                               node_ids.get(end.get_parent())))
+
+        for intent_filter in doc.get_intent_filters().get_all_filters():
+            filter_id = len(self.filters)
+            self.filters.append((filter_id, node_ids[intent_filter.component], intent_filter.component_type,
+                                 int(intent_filter.exported)))
+            for field, values in (("action", intent_filter.actions), ("category", intent_filter.categories),
+                                  ("scheme", intent_filter.schemes), ("host", intent_filter.hosts),
+                                  ("path", intent_filter.paths | intent_filter.path_prefixes | intent_filter.path_patterns),
+                                  ("mime_type", intent_filter.mime_types)):
+                self.filter_values.extend((filter_id, field, value) for value in sorted(values))
+
+
+class ArchitectureStore:
+    """
+    A SQLite database holding the architectures of many apps, keyed by app name and version, for
+    lookups across all of them. Every app is written in a single transaction with bulk inserts, and
+    storing an app again replaces it.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+
+        # a single writer appends apps while readers keep working
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            logging.warning(f"Rebuilding {path}, it was written with schema version {version}")
+            with self.connection:
+                for table in APP_TABLES + ("apps",):
+                    self.connection.execute(f"DROP TABLE IF EXISTS {table}")
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _get_next_id(self, table):
+        return self.connection.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+
+    def _delete(self, app_id):
+        for table in APP_TABLES:
+            self.connection.execute(f"DELETE FROM {table} WHERE app_id = ?", (app_id,))
+        self.connection.execute("DELETE FROM apps WHERE id = ?", (app_id,))
+
+    def add(self, doc, name=None, version=None):
+        """
+        Store a Document, replacing any app with the same name and version. Returns the id of the app
+        """
+        return self.add_rows(DocumentRows(doc, name, version))
+
+    def add_rows(self, rows):
+        """
+        Store the DocumentRows of an app, see add
+        """
+        with self.connection:
+            existing = self.connection.execute("SELECT id FROM apps WHERE name = ? AND version = ?",
+                                               (rows.name, rows.version)).fetchone()
+            if existing is not None:
+                self._delete(existing[0])
+
+            app_id = self.connection.execute("INSERT INTO apps (name, version, package, stored_at) VALUES (?, ?, ?, ?)",
+                                             (rows.name, rows.version, rows.package, time.time())).lastrowid
+
+            # rows are numbered from 0 within the document, so they are offset past the ids already used
+            node_base = self._get_next_id("nodes")
+            interface_base = self._get_next_id("interfaces")
+            filter_base = self._get_next_id("intent_filters")
+
+            def node_id(node):
+                return node_base + node if node is not None else None
+
+            self.connection.executemany(
+                "INSERT INTO nodes (id, app_id, kind, name, simple_name, qualified_name, properties) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((node_base + node, app_id, *values) for node, *values in rows.nodes))
+            self.connection.executemany(
+                "INSERT INTO interfaces (id, app_id, node_id, name, direction) VALUES (?, ?, ?, ?, ?)",
+                ((interface_base + interface, app_id, node_id(node), name, direction)
+                 for interface, node, name, direction in rows.interfaces))
+            self.connection.executemany(
+                "INSERT INTO links (app_id, start_interface, end_interface, start_node, end_node) VALUES (?, ?, ?, ?, ?)",
+                ((app_id, interface_base + start, interface_base + end, node_id(start_node), node_id(end_node))
+                 for start, end, start_node, end_node in rows.links))
+            self.connection.executemany(
+                "INSERT INTO intent_filters (id, app_id, node_id, component_type, exported) VALUES (?, ?, ?, ?, ?)",
+                ((filter_base + intent_filter, app_id, node_base + node, component_type, exported)
+                 for intent_filter, node, component_type, exported in rows.filters))
+            self.connection.executemany(
+                "INSERT INTO filter_values (app_id, filter_id, field, value) VALUES (?, ?, ?, ?)",
+                ((app_id, filter_base + intent_filter, field, value) for intent_filter, field, value in rows.filter_values))
+        return app_id
+
+    def remove(self, name, version=None):
+        """
+        Remove every version of an app, or a single one. Returns the number of apps removed
+        """
+        query = "SELECT id FROM apps WHERE name = ?" + (" AND version = ?" if version is not None else "")
+        with self.connection:
+            app_ids = [row[0] for row in self.connection.execute(query, (name,) if version is None else (name, version))]
+            for app_id in app_ids:
+                self._delete(app_id)
+        return len(app_ids)
+
+    def get_apps(self):
+        """
+        Get the (name, version, package, components) of every app stored
+        """
+        return self.connection.execute(
+            "SELECT apps.name, apps.version, apps.package, "
+            "(SELECT COUNT(*) FROM nodes WHERE nodes.app_id = apps.id AND nodes.kind = 'component') "
+            "FROM apps ORDER BY apps.name, apps.version").fetchall()
+
+    def find_components(self, name):
+        """
+        Get the (app, version, qualified name) of the components named name, by qualified or simple name
+        """
+        column = "qualified_name" if "." in name else "simple_name"
+        return self.connection.execute(
+            "SELECT apps.name, apps.version, nodes.qualified_name FROM nodes JOIN apps ON apps.id = nodes.app_id "
+            f"WHERE nodes.{column} = ? AND nodes.kind = 'component' ORDER BY apps.name, apps.version, 3",
+            (name,)).fetchall()
+
+    def find_filters(self, component_type=None, exported=None, **values):
+        """
+        Get the (app, version, qualified name, component type) of the components with an intent filter
+        matching every value given, by field of FILTER_FIELDS, e.g. find_filters("Receiver", True,
+        action="android.intent.action.BOOT_COMPLETED")
+        """
+        conditions = []
+        parameters = []
+        for field, value in values.items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Unknown intent filter field {field}")
+            if value is None:
+                continue
+            # each condition is a lookup in the covering index of filter_values
+            conditions.append("intent_filters.id IN (SELECT filter_id FROM filter_values WHERE field = ? AND value = ?)")
+            parameters += [field, value]
+        if component_type is not None:
+            conditions.append("intent_filters.component_type = ?")
+            parameters.append(component_type)
+        if exported is not None:
+            conditions.append("intent_filters.exported = ?")
+            parameters.append(int(exported))
+
+        return self.connection.execute(
+            "SELECT DISTINCT apps.name, apps.version, nodes.qualified_name, intent_filters.component_type "
+            "FROM intent_filters JOIN nodes ON nodes.id = intent_filters.node_id "
+            "JOIN apps ON apps.id = intent_filters.app_id" +
+            (" WHERE " + " AND ".join(conditions) if len(conditions) > 0 else "") +
+            " ORDER BY apps.name, apps.version, 3", parameters).fetchall()
+
+    def find_reaching(self, name):
+        """
+        Get the (app, version, qualified name) of the components that reach the components named name,
+        by qualified or simple name, through any number of links. The implicit message bus is not
+        followed, as it would make every sender of an implicit Intent reach every intent filter.
+        """
+        column = "qualified_name" if "." in name else "simple_name"
+        return self.connection.execute(
+            "WITH RECURSIVE reached(node) AS ("
+            f"SELECT id FROM nodes WHERE {column} = ? AND kind = 'component' "
+            "UNION SELECT links.start_node FROM links JOIN reached ON links.end_node = reached.node "
+            "JOIN nodes ON nodes.id = links.start_node WHERE nodes.kind != 'bus') "
+            "SELECT DISTINCT apps.name, apps.version, nodes.qualified_name FROM reached "
+            "JOIN nodes ON nodes.id = reached.node JOIN apps ON apps.id = nodes.app_id "
+            f"WHERE nodes.kind = 'component' AND nodes.{column} != ? ORDER BY apps.name, apps.version, 3",
+            (name, name)).fetchall()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM apps").fetchone()[0]
+
+
+def add_store_arguments(arg_parser):
+    """
+    Add the option writing the analyzed architectures to a store
+    """
+    arg_parser.add_argument('--store', dest='store', type=str, default=None, metavar='DATABASE',
+                            help='Also store the architecture in the SQLite database DATABASE, replacing the same app '
+                                 'and version if it is already there. See "main.py store --help" to query it')
+
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='main.py store',
+                                         description='Look up components across every app of an architecture store.')
+    arg_parser.add_argument('database', type=str, help='The SQLite database written with --store')
+    arg_parser.add_argument('--json', dest='json', action='store_const',
+                            const=True, default=False,
+                            help='Print the answer as JSON')
+    arg_parser.add_argument('--debug', dest='debug', action='store_const',
+                            const=True, default=False,
+                            help='Run the program in debug mode')
+
+    queries = arg_parser.add_subparsers(dest='query', required=True, metavar='query')
+    queries.add_parser('apps', help='The apps stored')
+    components = queries.add_parser('components', help='The apps declaring a component, by qualified or simple name')
+    components.add_argument('component')
+    reaching = queries.add_parser('reaching', help='The components of every app reaching a component, by qualified or '
+                                                   'simple name, e.g. an activity of an SDK')
+    reaching.add_argument('component')
+    filters = queries.add_parser('filters', help='The components with an intent filter matching every option given, '
+                                                 'e.g. --action android.intent.action.BOOT_COMPLETED --type Receiver')
+    for field in FILTER_FIELDS:
+        filters.add_argument('--' + field.replace('_', '-'), dest=field, type=str, default=None)
+    filters.add_argument('--type', dest='component_type', choices=("Activity", "Service", "Receiver", "Provider"),
+                         default=None)
+    filters.add_argument('--exported', dest='exported', action='store_const', const=True, default=None,
+                         help='Only the components other apps may reach')
+    remove = queries.add_parser('remove', help='Remove an app, or a single version of it')
+    remove.add_argument('app')
+    remove.add_argument('--version', dest='version', type=str, default=None)
+
+    return arg_parser
+
+
+def run_query(store, args):
+    """
+    Answer the query of the parsed arguments, as a list of rows
+    """
+    if args.query == "apps":
+        return store.get_apps()
+    if args.query == "components":
+        return store.find_components(args.component)
+    if args.query == "reaching":
+        return store.find_reaching(args.component)
+    if args.query == "filters":
+        return store.find_filters(args.component_type, args.exported,
+                                  **{field: getattr(args, field) for field in FILTER_FIELDS})
+    return [(store.remove(args.app, args.version),)]
+
+
+COLUMNS = {
+    "apps": ("app", "version", "package", "components"),
+    "components": ("app", "version", "component"),
+    "reaching": ("app", "version", "component"),
+    "filters": ("app", "version", "component", "type"),
+    "remove": ("removed",),
+}
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    with ArchitectureStore(args.database) as store:
+        start = time.perf_counter()
+        answer = run_query(store, args)
+        logging.debug(f"Answered in {(time.perf_counter() - start) * 1000:.2f}ms")
+
+    if args.json:
+        print(json.dumps([dict(zip(COLUMNS[args.query], row)) for row in answer], indent=2))
+    else:
+        for row in answer:
+            print("\t".join(str(value) for value in row))
+
+    return 0
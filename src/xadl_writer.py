@@ -0,0 +1,98 @@
+from xml.sax.saxutils import escape
+
+
+# attribute values are quoted with double quotes so those need escaping as well
+ATTRIBUTE_ENTITIES = {'"': "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#9;"}
+
+# size of the output buffer, in characters, before it is flushed to the underlying stream
+FLUSH_THRESHOLD = 1 << 16
+
+
+class XadlWriter:
+    """
+    Incrementally writes an xml document to a binary stream. Elements are written as soon as they
+    are started, so the size of the document never has to fit in memory. The output matches the
+    layout of minidom's toprettyxml.
+    """
+    def __init__(self, stream, indent="    ", encoding="UTF-8"):
+        self._stream = stream
+        self._indent = indent
+        self._encoding = encoding
+
+        # names of the elements that have been started but not ended
+        self._open_tags = []
+
+        # True while the last start tag is missing its closing ">", so it can still become "/>"
+        self._pending_start = False
+
+        self._buffer = []
+        self._buffered = 0
+
+    def _write(self, text):
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= FLUSH_THRESHOLD:
+            self.flush()
+
+    def _newline(self):
+        if self._indent is not None:
+            self._write("\n" + self._indent * len(self._open_tags))
+
+    def _close_pending_start(self):
+        if self._pending_start:
+            self._write(">")
+            self._pending_start = False
+
+    def _write_start(self, tag, attrib):
+        self._close_pending_start()
+        if len(self._open_tags) > 0:
+            self._newline()
+        self._write("<" + tag)
+        if attrib is not None:
+            for key, value in attrib:
+                self._write(f' {key}="{escape(value, ATTRIBUTE_ENTITIES)}"')
+
+    def start_document(self):
+        self._write(f'<?xml version="1.0" encoding="{self._encoding}"?>')
+        if self._indent is not None:
+            self._write("\n")
+
+    def start(self, tag, attrib=None):
+        """
+        Start an element that will have children. attrib is an iterable of (name, value) pairs.
+        """
+        self._write_start(tag, attrib)
+        self._open_tags.append(tag)
+        self._pending_start = True
+
+    def end(self):
+        tag = self._open_tags.pop()
+        if self._pending_start:
+            self._write("/>")
+            self._pending_start = False
+        else:
+            self._newline()
+            self._write(f"</{tag}>")
+
+    def element(self, tag, attrib=None, text=None):
+        """
+        Write a complete element with no child elements
+        """
+        self._write_start(tag, attrib)
+        if text is None:
+            self._write("/>")
+        else:
+            self._write(f">{escape(text)}</{tag}>")
+
+    def end_document(self):
+        while len(self._open_tags) > 0:
+            self.end()
+        if self._indent is not None:
+            self._write("\n")
+        self.flush()
+
+    def flush(self):
+        if len(self._buffer) > 0:
+            self._stream.write("".join(self._buffer).encode(self._encoding))
+            self._buffer = []
+            self._buffered = 0
@@ -2,6 +2,27 @@ import unittest
 from .test_component import TestComponent
 from .test_connector import TestConnector
 from .test_document import TestDocument
+from .test_batch import TestBatch
+from .test_source_scanner import TestSourceScanner
+from .test_intent_cache import TestIntentCache
+from .test_identifiers import TestIdentifiers
+from .test_source_index import TestSourceIndex
+from .test_intent_extractor import TestIntentExtractor
+from .test_benchmarks import TestBenchmarks
+from .test_profiling import TestProfiling
+from .test_axml import TestAxml
+from .test_manifest_parser import TestManifestParser
+from .test_server import TestServer
+from .test_exporters import TestExporters
+from .test_diff import TestDiff
+from .test_project import TestProject
+from .test_query import TestQuery
+from .test_pipeline import TestPipeline
+from .test_resource_scanner import TestResourceScanner
+from .test_intent_filters import TestIntentFilters
+from .test_classfile import TestClassFile
+from .test_dex import TestDex
+from .test_store import TestStore
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
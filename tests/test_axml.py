@@ -0,0 +1,194 @@
+import unittest
+import os
+import struct
+import sys
+import tempfile
+import zipfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from axml import (AxmlError, RES_STRING_POOL_TYPE, RES_XML_END_ELEMENT_TYPE, RES_XML_END_NAMESPACE_TYPE,
+                  RES_XML_RESOURCE_MAP_TYPE, RES_XML_START_ELEMENT_TYPE, RES_XML_START_NAMESPACE_TYPE, RES_XML_TYPE,
+                  TYPE_INT_BOOLEAN, TYPE_INT_DEC, TYPE_REFERENCE, TYPE_STRING, UTF8_FLAG, decode, is_binary_xml)
+from batch import build_jobs, find_app_roots
+from manifest_parser import ManifestParser
+
+ANDROID = "http://schemas.android.com/apk/res/android"
+
+NO_ENTRY = 0xffffffff
+
+
+class AxmlBuilder:
+    """
+    Builds binary XML the way aapt lays it out: a string pool, a resource map covering the attribute
+    names, then namespace and element chunks
+    """
+    def __init__(self, utf8=False, strip_names=False):
+        self.utf8 = utf8
+        self.strip_names = strip_names
+        self.strings = []
+        self.resource_ids = []
+        self.nodes = []
+
+    def string(self, value):
+        if value is None:
+            return NO_ENTRY
+        if value not in self.strings:
+            self.strings.append(value)
+        return self.strings.index(value)
+
+    def attribute_name(self, name, resource_id):
+        # attribute names with a resource id come first in the pool, in the order of the resource map
+        if resource_id is None:
+            return self.string(name)
+        if resource_id not in self.resource_ids:
+            self.resource_ids.append(resource_id)
+            self.strings.insert(len(self.resource_ids) - 1, "" if self.strip_names else name)
+        return self.resource_ids.index(resource_id)
+
+    def start(self, name, attributes=()):
+        # attributes are (namespace, name, resource_id, value) where value is a string or (type, data)
+        self.nodes.append(("start", name, attributes))
+
+    def end(self, name):
+        self.nodes.append(("end", name, ()))
+
+    def build(self):
+        # register every attribute name first so they sit at the start of the pool
+        for _, _, attributes in self.nodes:
+            for _, name, resource_id, _ in attributes:
+                self.attribute_name(name, resource_id)
+
+        chunks = [self.namespace(RES_XML_START_NAMESPACE_TYPE)]
+        for kind, name, attributes in self.nodes:
+            if kind == "start":
+                chunks.append(self.start_element(name, attributes))
+            else:
+                chunks.append(self.node(RES_XML_END_ELEMENT_TYPE, struct.pack("<II", NO_ENTRY, self.string(name))))
+        chunks.append(self.namespace(RES_XML_END_NAMESPACE_TYPE))
+
+        resource_map = struct.pack(f"<HHI{len(self.resource_ids)}I", RES_XML_RESOURCE_MAP_TYPE, 8,
+                                   8 + 4 * len(self.resource_ids), *self.resource_ids)
+        body = self.string_pool() + resource_map + b"".join(chunks)
+        return struct.pack("<HHI", RES_XML_TYPE, 8, 8 + len(body)) + body
+
+    def namespace(self, chunk_type):
+        return self.node(chunk_type, struct.pack("<II", self.string("android"), self.string(ANDROID)))
+
+    def node(self, chunk_type, extension):
+        return struct.pack("<HHIII", chunk_type, 16, 16 + len(extension), 1, NO_ENTRY) + extension
+
+    def start_element(self, name, attributes):
+        packed = b""
+        for namespace, attribute_name, resource_id, value in attributes:
+            if isinstance(value, str):
+                raw_value, data_type, data = self.string(value), TYPE_STRING, self.string(value)
+            else:
+                raw_value, (data_type, data) = NO_ENTRY, value
+            packed += struct.pack("<IIIHBBI", self.string(namespace), self.attribute_name(attribute_name, resource_id),
+                                  raw_value, 8, 0, data_type, data)
+        extension = struct.pack("<IIHHHHHH", NO_ENTRY, self.string(name), 20, 20, len(attributes), 0, 0, 0)
+        return self.node(RES_XML_START_ELEMENT_TYPE, extension + packed)
+
+    def string_pool(self):
+        offsets = []
+        data = b""
+        for value in self.strings:
+            offsets.append(len(data))
+            if self.utf8:
+                encoded = value.encode("utf-8")
+                data += bytes([len(value), len(encoded)]) + encoded + b"\0"
+            else:
+                data += struct.pack("<H", len(value)) + value.encode("utf-16-le") + b"\0\0"
+        data += b"\0" * (-len(data) % 4)
+
+        header_size = 28
+        strings_start = header_size + 4 * len(offsets)
+        header = struct.pack("<HHIIIIII", RES_STRING_POOL_TYPE, header_size, strings_start + len(data),
+                             len(self.strings), 0, UTF8_FLAG if self.utf8 else 0, strings_start, 0)
+        return header + struct.pack(f"<{len(offsets)}I", *offsets) + data
+
+
+def build_manifest(utf8=False, strip_names=False):
+    builder = AxmlBuilder(utf8=utf8, strip_names=strip_names)
+    builder.start("manifest", [(None, "package", None, "com.example.app"),
+                               (ANDROID, "versionCode", 0x0101021b, (TYPE_INT_DEC, 12)),
+                               (ANDROID, "versionName", 0x0101021c, "1.2")])
+    builder.start("application", [(ANDROID, "label", 0x01010001, (TYPE_REFERENCE, 0x7f040000)),
+                                  (ANDROID, "debuggable", 0x0101000f, (TYPE_INT_BOOLEAN, 0xffffffff))])
+    builder.start("activity", [(ANDROID, "name", 0x01010003, ".MainActivity")])
+    builder.start("intent-filter")
+    builder.start("action", [(ANDROID, "name", 0x01010003, "android.intent.action.MAIN")])
+    builder.end("action")
+    builder.end("intent-filter")
+    builder.end("activity")
+    builder.start("service", [(ANDROID, "name", 0x01010003, "com.example.app.SyncService"),
+                              (ANDROID, "priority", 0x0101001c, (TYPE_INT_DEC, 0xfffffffe))])
+    builder.end("service")
+    builder.start("provider", [(ANDROID, "name", 0x01010003, ".ScoreProvider"),
+                               (ANDROID, "authorities", 0x01010018, "com.example.app.scores"),
+                               (ANDROID, "grantUriPermissions", 0x0101001b, (TYPE_INT_BOOLEAN, 0xffffffff))])
+    builder.end("provider")
+    builder.end("application")
+    builder.end("manifest")
+    return builder.build()
+
+
+class TestAxml(unittest.TestCase):
+
+    def check_manifest(self, root):
+        self.assertEqual(root.tag, "manifest")
+        self.assertEqual(root.get("package"), "com.example.app")
+
+        application = root.find("application")
+        self.assertEqual(application.get(f"{{{ANDROID}}}label"), "@0x7f040000")
+        self.assertEqual(application.get(f"{{{ANDROID}}}debuggable"), "true")
+
+        activity = application.find("activity")
+        self.assertEqual(activity.get(f"{{{ANDROID}}}name"), ".MainActivity")
+        self.assertEqual(activity.find("intent-filter/action").get(f"{{{ANDROID}}}name"), "android.intent.action.MAIN")
+        self.assertEqual(application.find("service").get(f"{{{ANDROID}}}priority"), "-2")
+        self.assertEqual(application.find("provider").get(f"{{{ANDROID}}}authorities"), "com.example.app.scores")
+
+    def test_decode_utf16(self):
+        data = build_manifest()
+        self.assertTrue(is_binary_xml(data))
+        self.check_manifest(decode(data))
+
+    def test_decode_utf8(self):
+        self.check_manifest(decode(build_manifest(utf8=True)))
+
+    def test_decode_stripped_names(self):
+        # names of framework attributes are recovered from the resource map
+        root = decode(build_manifest(strip_names=True))
+        self.assertEqual(root.find("application/activity").get(f"{{{ANDROID}}}name"), ".MainActivity")
+        self.assertEqual(root.find("application/provider").get(f"{{{ANDROID}}}authorities"), "com.example.app.scores")
+        self.assertEqual(root.find("application/provider").get(f"{{{ANDROID}}}grantUriPermissions"), "true")
+        self.assertEqual(root.find("application/service").get(f"{{{ANDROID}}}priority"), "-2")
+        self.assertEqual(root.get(f"{{{ANDROID}}}versionCode"), "12")
+        self.assertEqual(ManifestParser().get_version(root), "1.2")
+
+    def test_decode_truncated(self):
+        data = build_manifest()
+        self.assertRaises(AxmlError, decode, data[:len(data) // 2])
+        self.assertFalse(is_binary_xml(b"<manifest/>"))
+
+    def test_parse_apk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            apk = os.path.join(tmp, "app.apk")
+            with zipfile.ZipFile(apk, "w") as f:
+                f.writestr("AndroidManifest.xml", build_manifest())
+                f.writestr("classes.dex", b"dex\n035\0")
+
+            doc = ManifestParser().parse(apk, "app")
+            self.assertEqual(sorted(component.get_name() for component in doc.get_components()),
+                             ["MainActivity", "ScoreProvider", "SyncService"])
+
+            # the activity receives implicit Intents through its intent filter
+            self.assertIsNotNone(doc.get_bus())
+
+            entries = find_app_roots(tmp)
+            self.assertEqual(entries, [(apk, None)])
+            self.assertEqual([job.structure for job in build_jobs(entries)], ["app"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from batch import BatchJob, analyze_app, build_jobs, read_manifest_list
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_read_manifest_list(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            list_file = os.path.join(tmp, "apps.txt")
+            with open(list_file, "w") as f:
+                f.write("# comment\n\nfirst/AndroidManifest.xml first/src\nsecond/AndroidManifest.xml\n")
+
+            entries = read_manifest_list(list_file)
+
+        self.assertEqual(entries, [
+            (os.path.join(tmp, "first/AndroidManifest.xml"), [os.path.join(tmp, "first/src")]),
+            (os.path.join(tmp, "second/AndroidManifest.xml"), None),
+        ])
+
+    def test_build_jobs_unique_names(self):
+        jobs = build_jobs([("a/app/AndroidManifest.xml", None), ("b/app/AndroidManifest.xml", None)])
+
+        self.assertEqual([job.structure for job in jobs], ["app", "app-2"])
+
+    def test_analyze_app(self):
+        manifest = os.path.join(DATA_DIR, "simple_manifest", "AndroidManifest.xml")
+        with tempfile.TemporaryDirectory() as tmp:
+            result = analyze_app(BatchJob(manifest, "simple"), tmp, {})
+
+            self.assertEqual(result["status"], "ok")
+            self.assertEqual(result["components"], 1)
+            self.assertTrue(os.path.isfile(result["output"]))
+
+    def test_analyze_app_error(self):
+        result = analyze_app(BatchJob("does/not/exist.xml", "missing"), None, {})
+
+        self.assertEqual(result["status"], "error")
+        self.assertTrue("error" in result)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+from run import compare, run_phases
+from synthetic_app import SyntheticApp, generate
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_generate(self):
+        app = SyntheticApp(components=40, intent_density=1.0, implicit_ratio=0.0, seed=3)
+        with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+            manifest_path, src_dir = generate(first, app)
+            generate(second, app)
+
+            # the same seed gives the same project
+            with open(manifest_path) as f, open(os.path.join(second, "AndroidManifest.xml")) as g:
+                self.assertEqual(f.read(), g.read())
+
+            timings = run_phases(manifest_path, src_dir)
+            self.assertEqual(timings["components"], 40)
+
+            # one explicit Intent per component, some of which may target the same component twice,
+            # and the message bus of the activities with intent filters
+            self.assertGreater(timings["connectors"], 30)
+            self.assertLessEqual(timings["connectors"], 41)
+
+    def test_compare(self):
+        baseline = {"sizes": {"10": {"parse": 1.0, "scan": 1.0, "link": 0.001, "serialize": 1.0, "total": 3.001}}}
+        results = {"sizes": {"10": {"parse": 1.1, "scan": 1.5, "link": 0.002, "serialize": 0.5, "total": 3.102}}}
+
+        # the link phase doubled, but by less than the noise floor
+        self.assertEqual(compare(results, baseline, 0.2), [("10", "scan", 1.0, 1.5)])
+        self.assertEqual(compare(results, baseline, 0.6), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+import os
+import sys
+import struct
+import tempfile
+import zipfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from classfile import ClassFileError, JarScanner, get_findings, get_qualified_name, read_class, scan_jar
+from intent_extractor import Finding
+from manifest_parser import ManifestParser
+
+MANIFEST = """<manifest xmlns:android="http://schemas.android.com/apk/res/android" package="com.example.lib">
+    <application>
+        <activity android:name=".MainActivity" />
+        <activity android:name=".DetailActivity" />
+    </application>
+</manifest>
+"""
+
+
+def build_class(name, super_name="android/app/Activity", classes=(), methods=(), strings=(), constants=()):
+    """
+    Build a class file holding a constant pool, with a long to check wide entries are skipped, and a
+    method loading the classes of constants with ldc, after a switch and a wide instruction
+    """
+    pool = []
+
+    def add(entry):
+        pool.append(entry)
+        return len(pool)
+
+    def utf8(value):
+        data = value.encode("utf-8")
+        return add(struct.pack(">BH", 1, len(data)) + data)
+
+    def class_ref(value):
+        return add(struct.pack(">BH", 7, utf8(value)))
+
+    this_class = class_ref(name)
+    super_class = class_ref(super_name)
+    add(struct.pack(">Bq", 5, 1))
+    pool.append(b"")
+    for value in classes:
+        class_ref(value)
+    for value in strings:
+        add(struct.pack(">BH", 8, utf8(value)))
+    for owner, method, descriptor in methods:
+        name_and_type = add(struct.pack(">BHH", 12, utf8(method), utf8(descriptor)))
+        add(struct.pack(">BHH", 10, class_ref(owner), name_and_type))
+
+    members = struct.pack(">HH", 0, 0)
+    if len(constants) > 0:
+        code = struct.pack(">B3xiiiii", 0xaa, 0, 0, 1, 0, 0) + bytes([0xc4, 0x84, 0, 1, 0, 1])
+        for value in constants:
+            code += struct.pack(">BH", 0x13, class_ref(value))
+        code += b"\xb1"
+        attribute = struct.pack(">HIHHI", utf8("Code"), 12 + len(code), 2, 2, len(code)) + code + bytes(4)
+        members = struct.pack(">HHHHHH", 0, 1, 0, utf8("run"), utf8("()V"), 1) + attribute
+
+    return (struct.pack(">IHHH", 0xCAFEBABE, 0, 50, len(pool) + 1) + b"".join(pool) +
+            struct.pack(">HHHH", 0x21, this_class, super_class, 0) + members + struct.pack(">H", 0))
+
+
+EXPLICIT_METHODS = [("android/content/Intent", "<init>", "(Landroid/content/Context;Ljava/lang/Class;)V"),
+                    ("com/example/lib/MainActivity", "startActivity", "(Landroid/content/Intent;)V")]
+IMPLICIT_METHODS = [("android/content/Intent", "<init>", "(Ljava/lang/String;)V"),
+                    ("android/content/Context", "sendBroadcast", "(Landroid/content/Intent;)V")]
+
+
+class TestClassFile(unittest.TestCase):
+
+    def test_read_class(self):
+        info = read_class(build_class("com/example/lib/MainActivity", classes=["com/example/lib/DetailActivity"],
+                                      methods=EXPLICIT_METHODS, strings=["hello"]))
+
+        self.assertEqual(info.name, "com/example/lib/MainActivity")
+        self.assertEqual(info.super_name, "android/app/Activity")
+        self.assertIn("com/example/lib/DetailActivity", info.classes)
+        self.assertEqual(info.class_constants, [])
+        self.assertEqual(info.strings, ["hello"])
+        self.assertEqual(info.methods, EXPLICIT_METHODS)
+
+    def test_malformed(self):
+        with self.assertRaises(ClassFileError):
+            read_class(b"PK\x03\x04" + bytes(20))
+        with self.assertRaises(ClassFileError):
+            read_class(build_class("a/B")[:20])
+
+    def test_findings(self):
+        # only the classes loaded as constants are targets, not the super class nor the others referenced
+        explicit = get_findings(read_class(build_class("com/example/lib/MainActivity$1",
+                                                       super_name="com/example/lib/BaseActivity",
+                                                       classes=["com/example/lib/Helper"],
+                                                       methods=EXPLICIT_METHODS,
+                                                       constants=["com/example/lib/DetailActivity", "java/lang/String",
+                                                                  "com/example/lib/DetailActivity"])))
+        self.assertEqual(explicit, [Finding(Finding.EXPLICIT_INTENT, "com.example.lib.DetailActivity")])
+
+        implicit = get_findings(read_class(build_class("a/B", methods=IMPLICIT_METHODS,
+                                                       strings=["com.example.lib.ACTION_SYNC", "not an action",
+                                                                "com.example.lib.EXTRA_ID", "android.intent.action.VIEW",
+                                                                "android.permission.CAMERA"])))
+        self.assertEqual(implicit, [Finding(Finding.IMPLICIT_INTENT, detail="com.example.lib.ACTION_SYNC", api=Finding.BROADCAST_API),
+                                    Finding(Finding.IMPLICIT_INTENT, detail="android.intent.action.VIEW", api=Finding.BROADCAST_API)])
+
+        # an Intent that is never sent is not a finding
+        self.assertEqual(get_findings(read_class(build_class("a/B", methods=EXPLICIT_METHODS[:1]))), [])
+
+    def test_qualified_name(self):
+        self.assertEqual(get_qualified_name("com/example/Main$Inner$1"), "com.example.Main")
+
+    def test_scan(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            libs = os.path.join(tmp, "libs")
+            os.makedirs(libs)
+            with zipfile.ZipFile(os.path.join(libs, "app.jar"), "w", zipfile.ZIP_DEFLATED) as jar:
+                jar.writestr("META-INF/MANIFEST.MF", "Manifest-Version: 1.0\n")
+                jar.writestr("com/example/lib/MainActivity.class",
+                             build_class("com/example/lib/MainActivity", classes=["com/example/lib/MainActivity"],
+                                         methods=EXPLICIT_METHODS,
+                                         constants=["com/example/lib/DetailActivity", "com/example/lib/Helper"]))
+                jar.writestr("com/example/lib/MainActivity$1.class",
+                             build_class("com/example/lib/MainActivity$1", methods=IMPLICIT_METHODS,
+                                         strings=["android.intent.action.SEND"]))
+                jar.writestr("com/example/lib/Broken.class", b"\xca\xfe\xba\xbe")
+            with open(os.path.join(libs, "broken.jar"), "wb") as f:
+                f.write(b"PK\x03\x04 not a zip")
+
+            result = scan_jar(os.path.join(libs, "app.jar"))
+            self.assertIsNone(result.error)
+            self.assertEqual(result.classes_read, 3)
+            self.assertEqual(list(result.findings), ["com.example.lib.MainActivity"])
+
+            self.assertIsNotNone(JarScanner(max_workers=2).scan(libs)[1].error)
+
+            manifest = os.path.join(tmp, "AndroidManifest.xml")
+            with open(manifest, "w") as f:
+                f.write(MANIFEST)
+            doc = ManifestParser().parse(manifest, "lib", lib_dir=[libs])
+
+        # Helper is not a component and MainActivity is only referenced, so the only explicit link is the one
+        # to DetailActivity
+        self.assertEqual(sorted(connector.get_name() for connector in doc.get_connectors()),
+                         ["Explicit Intent from MainActivity to DetailActivity", "Implicit Message Bus"])
+        self.assertEqual(doc.get_diagnostics(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
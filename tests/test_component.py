@@ -44,5 +44,11 @@ class TestComponent(unittest.TestCase):
         self.assertTrue(self.mock is component.get_interface_in())
         self.mock.get_direction = None
 
+    def test_no_instance_dict(self):
+        component = Component()
+
+        self.assertFalse(hasattr(component, "__dict__"))
+        self.assertFalse(hasattr(Interface(), "__dict__"))
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
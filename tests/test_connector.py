@@ -24,4 +24,10 @@ class TestConnector(unittest.TestCase):
         connector.add_interface_in(self.mock)
 
         self.assertTrue(self.mock is connector.get_interface_in())
-        self.mock.get_direction = None
\ No newline at end of file
+        self.mock.get_direction = None
+
+    def test_interface_names(self):
+        connector = Connector(name="Explicit Intent")
+
+        self.assertEqual(connector.get_interface_in().get_name(), "Explicit Intent Interface In")
+        self.assertEqual(connector.get_interface_out().get_name(), "Explicit Intent Interface Out")
@@ -0,0 +1,216 @@
+import unittest
+import os
+import sys
+import struct
+import tempfile
+import zipfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from dex import DexError, DexFile, DexScanner, get_qualified_name, read_uleb128, scan_dex
+from intent_extractor import Finding
+from manifest_parser import ManifestParser
+
+MANIFEST = """<manifest xmlns:android="http://schemas.android.com/apk/res/android" package="com.example.app">
+    <application>
+        <activity android:name=".MainActivity" />
+        <activity android:name=".DetailActivity" />
+        <activity android:name=".SettingsActivity" />
+        <receiver android:name=".SyncReceiver">
+            <intent-filter>
+                <action android:name="com.example.app.SYNC" />
+            </intent-filter>
+        </receiver>
+    </application>
+</manifest>
+"""
+
+INTENT = "Landroid/content/Intent;"
+CONTEXT = "Landroid/content/Context;"
+
+
+def encode_uleb128(value):
+    data = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value == 0:
+            data.append(byte)
+            return bytes(data)
+        data.append(byte | 0x80)
+
+
+class DexBuilder:
+    """
+    Builds the tables of a dex file read by DexFile, leaving out everything it never reads
+    """
+    def __init__(self):
+        self.strings = []
+        self.types = []
+        self.protos = []
+        self.methods = []
+        self.classes = []
+
+    def string(self, value):
+        if value not in self.strings:
+            self.strings.append(value)
+        return self.strings.index(value)
+
+    def type(self, descriptor):
+        index = self.string(descriptor)
+        if index not in self.types:
+            self.types.append(index)
+        return self.types.index(index)
+
+    def method(self, owner, name, parameters=()):
+        proto = tuple(self.type(parameter) for parameter in parameters)
+        if proto not in self.protos:
+            self.protos.append(proto)
+        method = (self.type(owner), self.protos.index(proto), self.string(name))
+        if method not in self.methods:
+            self.methods.append(method)
+        return self.methods.index(method)
+
+    def add_class(self, descriptor, *methods):
+        self.classes.append((self.type(descriptor), methods))
+
+    def build(self):
+        void = self.type("V")
+        offsets = [0x70]
+        for count, size in ((len(self.strings), 4), (len(self.types), 4), (len(self.protos), 12),
+                            (len(self.methods), 8), (len(self.classes), 32)):
+            offsets.append(offsets[-1] + count * size)
+        data = bytearray()
+
+        def append(content):
+            # items are 4-byte aligned
+            data.extend(bytes(-len(data) % 4))
+            data.extend(content)
+            return offsets[-1] + len(data) - len(content)
+
+        string_offsets = [append(encode_uleb128(len(value)) + value.encode() + b"\0") for value in self.strings]
+        parameter_offsets = [append(struct.pack(f"<I{len(proto)}H", len(proto), *proto)) if len(proto) > 0 else 0
+                             for proto in self.protos]
+        class_data_offsets = []
+        for _, methods in self.classes:
+            code_offsets = [append(struct.pack(f"<HHHHII{len(code)}H", 4, 1, 2, 0, 0, len(code), *code))
+                            for code in methods]
+            class_data = encode_uleb128(0) + encode_uleb128(0) + encode_uleb128(len(methods)) + encode_uleb128(0)
+            for i, code_offset in enumerate(code_offsets):
+                class_data += encode_uleb128(min(i, 1)) + encode_uleb128(1) + encode_uleb128(code_offset)
+            class_data_offsets.append(append(class_data))
+
+        tables = b"".join(struct.pack("<I", offset) for offset in string_offsets)
+        tables += b"".join(struct.pack("<I", index) for index in self.types)
+        tables += b"".join(struct.pack("<III", 0, void, offset) for offset in parameter_offsets)
+        tables += b"".join(struct.pack("<HHI", *method) for method in self.methods)
+        tables += b"".join(struct.pack("<IIIIIIII", type_index, 1, 0xffffffff, 0, 0, 0, class_data_offset, 0)
+                           for (type_index, _), class_data_offset in zip(self.classes, class_data_offsets))
+
+        header = bytearray(0x70)
+        header[:8] = b"dex\n035\0"
+        struct.pack_into("<III", header, 0x20, 0x70 + len(tables) + len(data), 0x70, 0x12345678)
+        for field, (count, offset) in zip((0x38, 0x40, 0x48, 0x58, 0x60),
+                                          ((len(self.strings), offsets[0]), (len(self.types), offsets[1]),
+                                           (len(self.protos), offsets[2]), (len(self.methods), offsets[3]),
+                                           (len(self.classes), offsets[4]))):
+            struct.pack_into("<II", header, field, count, offset)
+        return bytes(header) + tables + bytes(data)
+
+
+def build_app_dex():
+    dex = DexBuilder()
+    explicit = dex.method(INTENT, "<init>", (CONTEXT, "Ljava/lang/Class;"))
+    implicit = dex.method(INTENT, "<init>", ("Ljava/lang/String;",))
+    set_class_name = dex.method(INTENT, "setClassName", (CONTEXT, "Ljava/lang/String;"))
+    start = dex.method("Landroid/app/Activity;", "startActivity", (INTENT,))
+    broadcast = dex.method("Landroid/content/Context;", "sendBroadcast", (INTENT,))
+
+    dex.add_class("Lcom/example/app/MainActivity;", [
+        0x0022, dex.type(INTENT),                           # new-instance v0, Intent
+        0x011c, dex.type("Lcom/example/app/DetailActivity;"),  # const-class v1, DetailActivity
+        0x3070, explicit, 0x0210,                           # invoke-direct {v0, v2, v1}, Intent.<init>
+        0x206e, start, 0x0030,                              # invoke-virtual {v3, v0}, startActivity
+        0x0018, 0x001c, 0x001c, 0x001c, 0x001c,             # const-wide v0, with const-class lookalikes
+        0x011a, dex.string("com.example.app.SYNC"),         # const-string v1, "com.example.app.SYNC"
+        0x2070, implicit, 0x0010,                           # invoke-direct {v0, v1}, Intent.<init>
+        0x206e, broadcast, 0x0030,                          # invoke-virtual {v3, v0}, sendBroadcast
+        0x000e,                                             # return-void
+        0x0000, 0x0000,                                     # nops, aligning the payload
+        0x0100, 0x0001, 0x001c, 0x0000, 0x001c, 0x0000,     # packed-switch payload
+    ])
+    dex.add_class("Lcom/example/app/MainActivity$1;", [
+        0x011a, dex.string("com.example.app.SettingsActivity"),
+        0x3074, set_class_name, 0x0000,                     # invoke-direct/range, Intent.setClassName
+        0x000e,
+    ])
+    dex.add_class("Lcom/example/other/Unrelated;", [
+        0x011c, dex.type("Lcom/example/app/DetailActivity;"),
+        0x3070, explicit, 0x0210,
+        0x000e,
+    ])
+    return dex.build()
+
+
+class TestDex(unittest.TestCase):
+
+    def test_uleb128(self):
+        self.assertEqual(read_uleb128(b"\x7f", 0), (127, 1))
+        self.assertEqual(read_uleb128(b"\x00\x80\x7f", 1), (16256, 3))
+
+    def test_qualified_name(self):
+        self.assertEqual(get_qualified_name("Lcom/example/Main$Inner$1;"), "com.example.Main")
+
+    def test_tables(self):
+        dex = DexFile(build_app_dex())
+        self.assertEqual([descriptor for descriptor, _ in dex.iter_classes()],
+                         ["Lcom/example/app/MainActivity;", "Lcom/example/app/MainActivity$1;",
+                          "Lcom/example/other/Unrelated;"])
+        self.assertEqual(dex.get_method(0), (INTENT, "<init>", (CONTEXT, "Ljava/lang/Class;")))
+
+        with self.assertRaises(DexError):
+            DexFile(b"PK\x03\x04" + bytes(0x70))
+
+    def test_scan(self):
+        findings, classes_scanned = DexFile(build_app_dex()).scan()
+        self.assertEqual(classes_scanned, 3)
+        self.assertEqual(findings["com.example.app.MainActivity"],
+                         [Finding(Finding.EXPLICIT_INTENT, "com.example.app.DetailActivity"),
+                          Finding(Finding.IMPLICIT_INTENT, detail="com.example.app.SYNC", api=Finding.BROADCAST_API),
+                          Finding(Finding.EXPLICIT_INTENT, "com.example.app.SettingsActivity")])
+
+        # only the classes asked for are decoded
+        findings, classes_scanned = DexFile(build_app_dex()).scan({"com.example.other.Unrelated"})
+        self.assertEqual((list(findings), classes_scanned), (["com.example.other.Unrelated"], 1))
+
+    def test_apk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            apk = os.path.join(tmp, "app.apk")
+            with zipfile.ZipFile(apk, "w") as f:
+                f.writestr("classes.dex", build_app_dex(), zipfile.ZIP_STORED)
+                f.writestr("classes2.dex", build_app_dex(), zipfile.ZIP_DEFLATED)
+                f.writestr("res/raw/classes.dex", b"not scanned")
+            dex_file = os.path.join(tmp, "classes.dex")
+            with open(dex_file, "wb") as f:
+                f.write(build_app_dex())
+            broken = os.path.join(tmp, "broken.dex")
+            with open(broken, "wb") as f:
+                f.write(b"dex\n035\0")
+
+            results = DexScanner(max_workers=2).scan([apk, dex_file, broken], {"com.example.app.MainActivity"})
+            self.assertEqual([result.classes_read for result in results], [4, 2, 0])
+            self.assertEqual(results[0].findings, results[1].findings)
+            self.assertIsNotNone(results[2].error)
+            self.assertIsNone(scan_dex(apk).error)
+
+            manifest = os.path.join(tmp, "AndroidManifest.xml")
+            with open(manifest, "w") as f:
+                f.write(MANIFEST)
+            doc = ManifestParser(resolve_implicit=True).parse(manifest, "app", dex_files=[apk])
+
+        self.assertEqual(sorted(connector.get_name() for connector in doc.get_connectors()),
+                         ["Explicit Intent from MainActivity to DetailActivity",
+                          "Explicit Intent from MainActivity to SettingsActivity",
+                          "Implicit Intent from MainActivity to SyncReceiver", "Implicit Message Bus"])
+
+
+if __name__ == '__main__':
+    unittest.main()
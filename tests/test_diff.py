@@ -0,0 +1,151 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from diff import ArchitectureDiff, IncrementalAnalyzer
+from manifest_parser import ManifestParser
+
+MANIFEST = """<manifest xmlns:android="http://schemas.android.com/apk/res/android" package="com.example.app">
+    <application>
+        <activity android:name=".MainActivity">
+            <intent-filter><action android:name="android.intent.action.MAIN" /></intent-filter>
+        </activity>
+        <activity android:name=".GameActivity" />
+        <activity android:name=".HelpActivity" />
+    </application>
+</manifest>
+"""
+
+SOURCES = {
+    "MainActivity.java": """package com.example.app;
+class MainActivity extends Activity {
+    void start() {
+        startActivity(new Intent(this, GameActivity.class));
+        startActivity(new Intent(this, HelpActivity.class));
+    }
+}
+""",
+    "GameActivity.java": """package com.example.app;
+class GameActivity extends Activity {
+    void share() { startActivity(new Intent(Intent.ACTION_SEND)); }
+}
+""",
+    "HelpActivity.java": """package com.example.app;
+class HelpActivity extends Activity { }
+""",
+}
+
+
+def write_app(root, manifest=MANIFEST, sources=SOURCES):
+    src_dir = os.path.join(root, "src", "com", "example", "app")
+    os.makedirs(src_dir)
+    with open(os.path.join(root, "AndroidManifest.xml"), "w") as f:
+        f.write(manifest)
+    for name, source in sources.items():
+        with open(os.path.join(src_dir, name), "w") as f:
+            f.write(source)
+    return os.path.join(root, "AndroidManifest.xml"), [os.path.join(root, "src")]
+
+
+class TestDiff(unittest.TestCase):
+
+    def analyze_from_scratch(self, manifest, src_dir):
+        return ManifestParser(id_allocator="counter").parse(manifest, "test", src_dir=src_dir)
+
+    def test_first_analysis(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest, src_dir = write_app(tmp)
+            analysis, diff = IncrementalAnalyzer(ManifestParser(id_allocator="counter")).analyze(manifest, "test", src_dir)
+
+            self.assertEqual(analysis.doc.to_xml(), self.analyze_from_scratch(manifest, src_dir).to_xml())
+
+        self.assertEqual(diff.components_added, ["MainActivity", "GameActivity", "HelpActivity"])
+        self.assertEqual(diff.get_links(1), [
+            (ArchitectureDiff.EXPLICIT, "MainActivity", "GameActivity"),
+            (ArchitectureDiff.EXPLICIT, "MainActivity", "HelpActivity"),
+            (ArchitectureDiff.IMPLICIT, "GameActivity", "Implicit Message Bus"),
+            (ArchitectureDiff.INTENT_FILTER, "Implicit Message Bus", "MainActivity"),
+        ])
+
+    def test_changed_source(self):
+        sources = dict(SOURCES)
+        sources["MainActivity.java"] = SOURCES["MainActivity.java"].replace("this, HelpActivity.class", "Intent.ACTION_VIEW")
+        sources["GameActivity.java"] = SOURCES["GameActivity.java"].replace("Intent.ACTION_SEND", "this, HelpActivity.class")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            analyzer = IncrementalAnalyzer(ManifestParser(id_allocator="counter"))
+            old_manifest, old_src_dir = write_app(os.path.join(tmp, "v1"))
+            analysis, _ = analyzer.analyze(old_manifest, "test", old_src_dir)
+            manifest, src_dir = write_app(os.path.join(tmp, "v2"), sources=sources)
+            analysis, diff = analyzer.analyze(manifest, "test", src_dir, previous=analysis)
+
+            self.assertEqual(analysis.doc.to_xml(), self.analyze_from_scratch(manifest, src_dir).to_xml())
+
+        # only the files that changed were scanned again
+        self.assertFalse(diff.manifest_changed)
+        self.assertEqual([os.path.basename(path) for path in diff.files_changed], ["GameActivity.java", "MainActivity.java"])
+        self.assertEqual(diff.components_reused, 1)
+
+        self.assertEqual(diff.get_links(1), [
+            (ArchitectureDiff.EXPLICIT, "GameActivity", "HelpActivity"),
+            (ArchitectureDiff.IMPLICIT, "MainActivity", "Implicit Message Bus"),
+        ])
+        self.assertEqual(diff.get_links(-1), [
+            (ArchitectureDiff.EXPLICIT, "MainActivity", "HelpActivity"),
+            (ArchitectureDiff.IMPLICIT, "GameActivity", "Implicit Message Bus"),
+        ])
+        self.assertEqual(diff.get_components_changed(), ["GameActivity", "HelpActivity", "MainActivity"])
+
+    def test_changed_manifest(self):
+        manifest = MANIFEST.replace('<activity android:name=".HelpActivity" />', '<activity android:name=".AboutActivity" />')
+        manifest = manifest.replace('<intent-filter><action android:name="android.intent.action.MAIN" /></intent-filter>', '')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            analyzer = IncrementalAnalyzer(ManifestParser(id_allocator="counter"))
+            old_manifest, old_src_dir = write_app(os.path.join(tmp, "v1"))
+            analysis, _ = analyzer.analyze(old_manifest, "test", old_src_dir)
+            manifest_file, src_dir = write_app(os.path.join(tmp, "v2"), manifest=manifest)
+            analysis, diff = analyzer.analyze(manifest_file, "test", src_dir, previous=analysis)
+
+            expected = self.analyze_from_scratch(manifest_file, src_dir)
+            self.assertEqual(analysis.doc.to_xml(), expected.to_xml())
+            self.assertEqual(sorted(analysis.doc.get_diagnostics()), sorted(expected.get_diagnostics()))
+
+        self.assertTrue(diff.manifest_changed)
+        self.assertEqual(diff.files_changed, [])
+        self.assertEqual(diff.components_added, ["AboutActivity"])
+        self.assertEqual(diff.components_removed, ["HelpActivity"])
+        self.assertEqual(diff.get_links(-1), [
+            (ArchitectureDiff.EXPLICIT, "MainActivity", "HelpActivity"),
+            (ArchitectureDiff.INTENT_FILTER, "Implicit Message Bus", "MainActivity"),
+        ])
+        self.assertEqual(diff.get_interfaces(-1), [
+            ("MainActivity", "in", "Implicit Message Bus"),
+            ("MainActivity", "out", "HelpActivity"),
+        ])
+
+    def test_unchanged_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            analyzer = IncrementalAnalyzer()
+            manifest, src_dir = write_app(tmp)
+            analysis, _ = analyzer.analyze(manifest, "test", src_dir)
+            links = set(analysis.doc.get_links())
+
+            analysis, diff = analyzer.analyze(manifest, "test", src_dir, previous=analysis)
+
+        self.assertTrue(diff.is_empty())
+        self.assertEqual(diff.files_changed, [])
+        self.assertEqual(diff.components_reused, 3)
+        # the document was updated in place, not rebuilt
+        self.assertEqual(set(analysis.doc.get_links()), links)
+
+    def test_unsupported_parser(self):
+        with self.assertRaises(ValueError):
+            IncrementalAnalyzer(ManifestParser(aggregate=True))
+        with self.assertRaises(ValueError):
+            IncrementalAnalyzer(ManifestParser(resolve_implicit=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
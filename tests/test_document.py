@@ -1,9 +1,13 @@
 import unittest
 from unittest.mock import Mock
+import io
 import sys
+import xml.etree.ElementTree as ET
 sys.path.append('..')
 from src.entities import Document, Connector, Component, Link
 
+STRUCTURE = "{http://www.archstudio.org/xadl3/schemas/structure-3.0.xsd}"
+
 class TestDocument(unittest.TestCase):
     mock = Mock
 
@@ -18,6 +22,20 @@ class TestDocument(unittest.TestCase):
         doc.remove_bus()
 
         self.assertTrue(doc.get_bus() is None)
+
+    def test_remove_bus_with_links(self):
+        doc = Document("test.xml", "test-struct")
+
+        bus = doc.add_bus()
+        component = Component(name="Sender")
+        link = doc.add_link(component, bus)
+
+        doc.remove_bus()
+
+        self.assertTrue(doc.get_bus() is None)
+        self.assertEqual(len(doc.get_links()), 0)
+        self.assertTrue(doc.get_link(component, bus) is None)
+        self.assertFalse(link in doc.get_links())
     
     def test_add_component(self):
         doc = Document("test.xml", "test-struct")
@@ -76,4 +94,97 @@ class TestDocument(unittest.TestCase):
 
         link = doc.add_link(sender, receiver)
 
-        self.assertTrue(doc.get_link(sender, receiver) is link)
\ No newline at end of file
+        self.assertTrue(doc.get_link(sender, receiver) is link)
+
+    def test_get_component_by_name(self):
+        doc = Document("test.xml", "test-struct")
+
+        component = Component(name="MainActivity")
+        doc.add_component(component, qualified_name="com.example.MainActivity")
+
+        self.assertTrue(doc.get_component("MainActivity") is component)
+        self.assertTrue(doc.get_component("com.example.MainActivity") is component)
+        self.assertTrue(doc.get_component_from_simple_name("MainActivity") is component)
+        self.assertTrue(doc.get_component("OtherActivity") is None)
+
+    def test_get_link_after_remove(self):
+        doc = Document("test.xml", "test-struct")
+
+        sender = Component()
+        receiver = Component()
+
+        first = doc.add_link(sender, receiver)
+        second = doc.add_link(sender, receiver)
+
+        self.assertTrue(doc.get_link(sender, receiver) is first)
+        self.assertTrue(doc.get_link(first.get_start(), first.get_end()) is first)
+
+        doc.remove_link(first)
+
+        self.assertTrue(doc.get_link(sender, receiver) is second)
+        self.assertEqual(list(doc.get_outgoing_links(sender)), [second])
+        self.assertEqual(list(doc.get_incoming_links(receiver)), [second])
+
+        doc.remove_link(second)
+
+        self.assertTrue(doc.get_link(sender, receiver) is None)
+
+
+    def test_write_xml(self):
+        doc = Document("test.xml", "test-struct")
+
+        sender = Component(name="Sender")
+        receiver = Component(name="Receiver & Co")
+        link = doc.add_link(sender, receiver)
+
+        stream = io.BytesIO()
+        doc.write_xml(stream)
+        root = ET.fromstring(stream.getvalue())
+
+        structure = root[0]
+        self.assertEqual(structure.get(STRUCTURE + "name"), "test-struct")
+        names = {el.get(STRUCTURE + "name") for el in structure if el.tag == STRUCTURE + "component"}
+        self.assertEqual(names, {"Sender", "Receiver & Co"})
+
+        link_el = next(el for el in structure if el.tag == STRUCTURE + "link")
+        self.assertEqual(link_el[0].text, link.get_start().get_id())
+        self.assertEqual(link_el[1].text, link.get_end().get_id())
+
+        # the same document without indentation has no whitespace between elements
+        compact = io.BytesIO()
+        doc.write_xml(compact, indent=None)
+        self.assertFalse(b"\n" in compact.getvalue())
+        self.assertEqual(doc.to_xml().count(b"<structure_3_0:interface"), 2)
+
+    def test_remove_component(self):
+        doc = Document("test.xml", "test-struct")
+
+        first = Component(name="game.Activity")
+        second = Component(name="help.Activity")
+        other = Component(name="Other")
+        doc.add_component(first, qualified_name="com.example.game.Activity")
+        doc.add_component(second)
+        doc.add_component(other)
+        link = doc.add_link(first, other)
+
+        doc.remove_component(first)
+
+        self.assertFalse(first in doc.get_components())
+        self.assertFalse(link in doc.get_links())
+        self.assertEqual(list(doc.get_incoming_links(other)), [])
+        self.assertTrue(doc.get_component("com.example.game.Activity") is None)
+        # the simple name now finds the next component registered under it
+        self.assertTrue(doc.get_component_from_simple_name("Activity") is second)
+
+    def test_remove_connector(self):
+        doc = Document("test.xml", "test-struct")
+
+        bus = doc.add_bus()
+        component = Component(name="Sender")
+        doc.add_link(component, bus)
+
+        doc.remove_connector(bus)
+
+        self.assertTrue(doc.get_bus() is None)
+        self.assertEqual(len(doc.get_links()), 0)
+        self.assertEqual(len(doc.get_connectors()), 0)
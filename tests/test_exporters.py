@@ -0,0 +1,113 @@
+import unittest
+import gzip
+import json
+import os
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from exporters import EXPORTERS, JsonExporter, get_exporter
+from sinks import DirectorySink, FileSink, MemorySink, StdoutSink, get_sink
+from entities import Document, Component, Interface
+
+
+def build_document():
+    doc = Document("test.xml", "test-struct", id_allocator="counter")
+    bus = doc.add_bus()
+
+    for name in ("MainActivity", 'Game "Activity" <1>'):
+        component = Component(name=name)
+        doc.add_component(component)
+        interface_in = Interface(direction=Interface.DIRECTION_IN)
+        component.add_interface_in(interface_in)
+        doc.add_link(bus, interface_in)
+
+    main = doc.get_component("MainActivity")
+    interface_out = Interface(direction=Interface.DIRECTION_OUT)
+    main.add_interface_out(interface_out)
+    doc.add_link(interface_out, doc.get_component('Game "Activity" <1>'))
+
+    return doc
+
+
+class TestExporters(unittest.TestCase):
+
+    def test_json(self):
+        doc = build_document()
+        graph = json.loads(doc.to_bytes("json"))
+
+        nodes = {node["id"]: node for node in graph["nodes"]}
+        self.assertEqual(graph["structure"]["name"], "test-struct")
+        self.assertEqual(sorted(node["type"] for node in nodes.values()), ["component", "component", "connector"])
+        self.assertEqual(len(graph["edges"]), 3)
+
+        edges = {(nodes[edge["source"]]["name"], nodes[edge["target"]]["name"]) for edge in graph["edges"]}
+        self.assertTrue(("MainActivity", 'Game "Activity" <1>') in edges)
+        self.assertTrue(("Implicit Message Bus", "MainActivity") in edges)
+
+    def test_jsonl(self):
+        lines = build_document().to_bytes("jsonl").decode("utf-8").splitlines()
+        records = [json.loads(line) for line in lines]
+
+        self.assertEqual(records[0]["type"], "structure")
+        self.assertEqual([record["type"] for record in records].count("edge"), 3)
+
+    def test_graph_formats_match_json(self):
+        doc = build_document()
+        graph = json.loads(doc.to_bytes("json"))
+
+        root = ET.fromstring(doc.to_bytes("graphml"))
+        namespace = "{http://graphml.graphdrawing.org/xmlns}"
+        self.assertEqual(len(root.findall(f"{namespace}graph/{namespace}node")), len(graph["nodes"]))
+        self.assertEqual(len(root.findall(f"{namespace}graph/{namespace}edge")), len(graph["edges"]))
+
+        dot = doc.to_bytes("dot").decode("utf-8")
+        self.assertEqual(dot.count(" -> "), len(graph["edges"]))
+        self.assertTrue('label="Game \\"Activity\\" <1>"' in dot)
+
+    def test_reproducible_output(self):
+        for format in EXPORTERS:
+            self.assertEqual(build_document().to_bytes(format, compress=True),
+                             build_document().to_bytes(format, compress=True))
+
+    def test_gzip(self):
+        doc = build_document()
+        self.assertEqual(gzip.decompress(doc.to_bytes("xadl", compress=True)), build_document().to_xml())
+
+    def test_get_exporter(self):
+        self.assertTrue(type(get_exporter("json")) is JsonExporter)
+        exporter = JsonExporter()
+        self.assertTrue(get_exporter(exporter) is exporter)
+        self.assertRaises(ValueError, get_exporter, "unknown")
+
+    def test_memory_sink(self):
+        doc = build_document()
+        sink = MemorySink()
+
+        location = doc.export(sink, "json", compress=True)
+
+        self.assertEqual(location, "<memory:test.json.gz>")
+        self.assertEqual(gzip.decompress(sink.getvalue()), build_document().to_bytes("json"))
+
+    def test_file_sinks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            location = build_document().write_current_contents(directory, format="dot")
+            self.assertEqual(location, os.path.join(directory, "test.dot"))
+
+            path = os.path.join(directory, "nested", "graph.out")
+            self.assertEqual(build_document().export(path, "jsonl"), path)
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), build_document().to_bytes("jsonl"))
+
+    def test_get_sink(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertTrue(type(get_sink("-")) is StdoutSink)
+            self.assertTrue(type(get_sink(directory)) is DirectorySink)
+            self.assertTrue(type(get_sink("missing/")) is DirectorySink)
+            self.assertTrue(type(get_sink(os.path.join(directory, "out.json"))) is FileSink)
+            sink = MemorySink()
+            self.assertTrue(get_sink(sink) is sink)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from identifiers import CounterIdAllocator, ContentIdAllocator, RandomIdAllocator, get_id_allocator
+from entities import Document, Component, Connector, Interface
+
+
+def build_document(id_allocator, reverse=False):
+    doc = Document("test.xml", "test-struct", id_allocator=id_allocator)
+    bus = doc.add_bus()
+
+    names = ["MainActivity", "GameActivity", "HelpActivity"]
+    if reverse:
+        names.reverse()
+
+    for name in names:
+        component = Component(name=name)
+        doc.add_component(component)
+        interface_in = Interface(direction=Interface.DIRECTION_IN)
+        component.add_interface_in(interface_in)
+        doc.add_link(bus, interface_in)
+
+    main = doc.get_component("MainActivity")
+    for name in names[::-1] if reverse else names:
+        if name == "MainActivity":
+            continue
+        interface_out = Interface(direction=Interface.DIRECTION_OUT)
+        main.add_interface_out(interface_out)
+        connector = Connector(name=f"Explicit Intent from MainActivity to {name}")
+        doc.add_connector(connector)
+        doc.add_link(interface_out, connector)
+        doc.add_link(connector, doc.get_component(name))
+
+    return doc
+
+
+class TestIdentifiers(unittest.TestCase):
+
+    def test_counter_allocator(self):
+        allocator = CounterIdAllocator()
+
+        self.assertEqual(allocator.allocate("a"), "00000000-0000-0000-0000-000000000001")
+        self.assertEqual(allocator.allocate("a"), "00000000-0000-0000-0000-000000000002")
+        allocator.reset()
+        self.assertEqual(allocator.allocate("b"), "00000000-0000-0000-0000-000000000001")
+
+    def test_content_allocator(self):
+        allocator = ContentIdAllocator()
+
+        self.assertEqual(allocator.allocate("component:MainActivity"), ContentIdAllocator().allocate("component:MainActivity"))
+        self.assertNotEqual(allocator.allocate("component:MainActivity"), allocator.allocate("component:GameActivity"))
+
+    def test_get_id_allocator(self):
+        self.assertTrue(type(get_id_allocator("random")) is RandomIdAllocator)
+        allocator = CounterIdAllocator()
+        self.assertTrue(get_id_allocator(allocator) is allocator)
+        self.assertRaises(ValueError, get_id_allocator, "unknown")
+
+    def test_reproducible_output(self):
+        for id_allocator in ("counter", "content"):
+            first = build_document(id_allocator).to_xml()
+            second = build_document(id_allocator, reverse=True).to_xml()
+
+            self.assertEqual(first, second)
+
+    def test_random_ids_are_unique(self):
+        first = build_document("random").to_xml()
+        second = build_document("random").to_xml()
+
+        self.assertNotEqual(first, second)
+
+if __name__ == '__main__':
+    unittest.main()
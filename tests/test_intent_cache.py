@@ -0,0 +1,126 @@
+import unittest
+import os
+import sys
+import pickle
+import tempfile
+from unittest import mock
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import intent_cache
+from intent_cache import IntentCache
+from source_scanner import SourceScanner
+
+
+class TestIntentCache(unittest.TestCase):
+
+    def test_key_depends_on_content_and_version(self):
+        cache = IntentCache("unused", 1)
+
+        self.assertEqual(cache.get_key(b"content"), IntentCache("unused", 1).get_key(b"content"))
+        self.assertNotEqual(cache.get_key(b"content"), cache.get_key(b"other content"))
+        self.assertNotEqual(cache.get_key(b"content"), IntentCache("unused", 2).get_key(b"content"))
+
+    def test_get_put(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = IntentCache(tmp, 1)
+            key = cache.get_key(b"content")
+
+            self.assertTrue(cache.get(key) is None)
+            cache.put(key, {"explicit": ["GameActivity"], "implicit": True})
+            self.assertEqual(cache.get(key), {"explicit": ["GameActivity"], "implicit": True})
+
+    def test_memory_entries(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = IntentCache(tmp, 1, memory_entries=2)
+            keys = [cache.get_key(bytes([i])) for i in range(3)]
+            for i, key in enumerate(keys):
+                cache.put(key, {"value": i})
+
+            # the most recent entries are served from memory, even once they are gone from the disk
+            for name in os.listdir(tmp):
+                if not os.path.isdir(os.path.join(tmp, name)):
+                    continue
+                for entry in os.listdir(os.path.join(tmp, name)):
+                    os.remove(os.path.join(tmp, name, entry))
+            self.assertTrue(cache.get(keys[0]) is None)
+            self.assertEqual(cache.get(keys[2]), {"value": 2})
+
+            # worker processes get a copy of the cache without the memory layer
+            copy = pickle.loads(pickle.dumps(cache))
+            self.assertTrue(copy.get(keys[2]) is None)
+
+    def test_prune_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = IntentCache(tmp, 1)
+            keys = [cache.get_key(str(i).encode()) for i in range(4)]
+            for i, key in enumerate(keys):
+                cache.put(key, {"explicit": [], "implicit": False})
+                path = os.path.join(tmp, key[:2], key + ".json")
+                os.utime(path, (i, i))
+                entry_size = os.path.getsize(path)
+
+            cache.max_bytes = 2 * entry_size
+            self.assertEqual(cache.prune(), 2)
+
+            self.assertTrue(cache.get(keys[0]) is None)
+            self.assertTrue(cache.get(keys[1]) is None)
+            self.assertTrue(cache.get(keys[3]) is not None)
+
+    def test_size_tracked_on_write(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = IntentCache(tmp, 1)
+            keys = [cache.get_key(str(i).encode()) for i in range(3)]
+            cache.put(keys[0], {"explicit": [], "implicit": False})
+
+            # the entries are counted once, then only the entries written are added up
+            self.assertTrue(cache.get_size() is None)
+            self.assertEqual(cache.prune(), 0)
+            entry_size = cache.get_size()
+            self.assertEqual(entry_size, os.path.getsize(os.path.join(tmp, keys[0][:2], keys[0] + ".json")))
+            for key in keys[1:]:
+                cache.put(key, {"explicit": [], "implicit": False})
+            self.assertEqual(cache.get_size(), 3 * entry_size)
+
+            cache.max_bytes = 2 * entry_size
+            self.assertEqual(cache.prune(), 1)
+            self.assertEqual(cache.get_size(), 2 * entry_size)
+
+    def test_journal_folded(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = IntentCache(tmp, 1)
+            cache.prune()
+            keys = [cache.get_key(str(i).encode()) for i in range(20)]
+            for key in keys:
+                cache.put(key, {"explicit": [], "implicit": False})
+            size = cache.get_size()
+
+            # the journal keeps growing while the cache fits, until it is folded into a single line
+            journal = os.path.join(tmp, intent_cache.JOURNAL_FILE)
+            with mock.patch.object(intent_cache, "JOURNAL_MAX_BYTES", 16):
+                self.assertEqual(cache.get_size(), size)
+            with open(journal) as f:
+                self.assertEqual(f.read(), f"{size}\n")
+            self.assertEqual(cache.get_size(), size)
+            self.assertEqual([name for name in os.listdir(tmp) if name.endswith(".tmp")], [])
+
+    def test_identical_files_are_hits(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = IntentCache(os.path.join(tmp, "cache"), 1)
+            paths = []
+            for app in ("first", "second"):
+                os.makedirs(os.path.join(tmp, app))
+                path = os.path.join(tmp, app, "BaseActivity.java")
+                with open(path, "wb") as f:
+                    f.write(b"startActivity(new Intent(this, GameActivity.class));")
+                paths.append(path)
+
+            scanner = SourceScanner(max_workers=1, cache=cache)
+            first = scanner.scan(paths[:1])
+            second = scanner.scan(paths[1:])
+
+        self.assertFalse(first[paths[0]].cached)
+        self.assertTrue(second[paths[1]].cached)
+        self.assertEqual(second[paths[1]].explicit_targets, ["GameActivity"])
+        self.assertEqual((scanner.cache_hits, scanner.cache_misses), (1, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from intent_extractor import Detector, Finding, IntentExtractor, split_arguments
+
+
+class TestIntentExtractor(unittest.TestCase):
+
+    def setUp(self):
+        self.extractor = IntentExtractor()
+
+    def get_findings(self, source, kind=None):
+        findings = self.extractor.extract(source)
+        return [finding for finding in findings if kind is None or finding.kind == kind]
+
+    def test_explicit_intent(self):
+        source = b"""
+        startActivity(new Intent(this, GameActivity.class));
+        startActivity(new Intent (getContext(), com.example.SettingsActivity.class));
+        Intent intent = new Intent(Intent.ACTION_VIEW, Uri.parse("x"), this, ViewerActivity.class);
+        """
+        findings = self.get_findings(source, Finding.EXPLICIT_INTENT)
+        self.assertEqual([finding.target for finding in findings],
+                         ["GameActivity", "com.example.SettingsActivity", "ViewerActivity"])
+        self.assertEqual([finding.line for finding in findings], [2, 3, 4])
+
+    def test_nested_calls(self):
+        source = b"startActivity(new Intent(getActivity(this, a(b, c)), DetailActivity.class));"
+        self.assertEqual(self.get_findings(source), [Finding(Finding.EXPLICIT_INTENT, "DetailActivity", 1)])
+
+    def test_kotlin_class_literal(self):
+        source = b"startActivity(Intent(this, GameActivity::class.java))"
+        self.assertEqual(self.get_findings(source), [Finding(Finding.EXPLICIT_INTENT, "GameActivity", 1)])
+
+    def test_implicit_intent(self):
+        source = b"""
+        Intent share = new Intent(Intent.ACTION_SEND);
+        Intent custom = new Intent("com.example.ACTION_SYNC");
+        share.setAction(Intent.ACTION_VIEW);
+        """
+        findings = self.get_findings(source, Finding.IMPLICIT_INTENT)
+        self.assertEqual([finding.detail for finding in findings],
+                         ["android.intent.action.SEND", "com.example.ACTION_SYNC", "android.intent.action.VIEW"])
+
+    def test_implicit_intent_uri(self):
+        source = b"""
+        startActivity(new Intent(Intent.ACTION_VIEW, Uri.parse("https://example.com/items/1")));
+        startActivity(new Intent(Intent.ACTION_VIEW, uri));
+        """
+        findings = self.get_findings(source, Finding.IMPLICIT_INTENT)
+        self.assertEqual([finding.target for finding in findings], ["https://example.com/items/1", None])
+
+    def test_implicit_intent_api(self):
+        source = b"""
+        sendBroadcast(new Intent("com.example.SYNC"));
+        startService(new Intent("com.example.UPLOAD").putExtra("id", id));
+        Intent share = new Intent(Intent.ACTION_SEND);
+        Intent view = new Intent();
+        view.setAction(Intent.ACTION_VIEW);
+        startActivity(Intent.createChooser(share, null));
+        startActivity(view);
+        Intent unsent = new Intent("com.example.UNSENT");
+        """
+        findings = self.get_findings(source, Finding.IMPLICIT_INTENT)
+        self.assertEqual([(finding.detail, finding.api) for finding in findings],
+                         [("com.example.SYNC", Finding.BROADCAST_API), ("com.example.UPLOAD", Finding.SERVICE_API),
+                          ("android.intent.action.SEND", None), ("android.intent.action.VIEW", Finding.ACTIVITY_API),
+                          ("com.example.UNSENT", None)])
+
+    def test_component_name(self):
+        source = b"""
+        intent.setClass(this, GameActivity.class);
+        intent.setClassName(this, "com.example.SettingsActivity");
+        intent.setComponent(new ComponentName(this, SyncService.class));
+        """
+        findings = self.get_findings(source, Finding.EXPLICIT_INTENT)
+        self.assertEqual([finding.target for finding in findings],
+                         ["GameActivity", "com.example.SettingsActivity", "SyncService"])
+
+    def test_services_and_broadcasts(self):
+        source = b"""
+        startService(new Intent(this, SyncService.class));
+        bindService(intent, connection, BIND_AUTO_CREATE);
+        sendBroadcast(new Intent(this, AlarmReceiver.class));
+        """
+        services = self.get_findings(source, Finding.SERVICE)
+        self.assertEqual([(finding.target, finding.detail) for finding in services],
+                         [("SyncService", "startService"), (None, "bindService")])
+
+        broadcasts = self.get_findings(source, Finding.BROADCAST)
+        self.assertEqual([(finding.target, finding.line) for finding in broadcasts], [("AlarmReceiver", 4)])
+
+    def test_provider(self):
+        source = b'Cursor cursor = resolver.query(Uri.parse("content://com.example.provider/scores"), null);'
+        self.assertEqual(self.get_findings(source),
+                         [Finding(Finding.PROVIDER, "com.example.provider", 1, "content://com.example.provider/scores")])
+
+    def test_resource(self):
+        source = b"""
+        setContentView(R.layout.activity_main);
+        getMenuInflater().inflate(com.example.R.menu.main, menu);
+        View view = inflater.inflate(R.layout.item, parent, false);
+        addPreferencesFromResource(R.xml.preferences);
+        setContentView(view);
+        """
+        self.assertEqual([(finding.target, finding.line) for finding in self.get_findings(source, Finding.RESOURCE)],
+                         [("layout/activity_main", 2), ("menu/main", 3), ("layout/item", 4), ("xml/preferences", 5)])
+
+    def test_comments_and_strings(self):
+        source = b"""
+        // startActivity(new Intent(this, LineComment.class));
+        /* startActivity(new Intent(this,
+           BlockComment.class)); */
+        String s = "new Intent(this, InString.class)";
+        String t = "\\" new Intent(this, AfterEscape.class)";
+        myIntent(this, NotAnIntent.class);
+        startActivity(new Intent(this, Real.class));
+        """
+        self.assertEqual(self.get_findings(source), [Finding(Finding.EXPLICIT_INTENT, "Real", 8)])
+
+    def test_name_before_line_break(self):
+        source = b"""
+        // the Intent
+        (a).b();
+        startActivity(new Intent
+            (this, Real.class));
+        """
+        self.assertEqual(self.get_findings(source), [Finding(Finding.EXPLICIT_INTENT, "Real", 4)])
+
+    def test_unclosed_calls(self):
+        # every call is left open, which once read the rest of the file again for each of them
+        source = b"startActivity(new Intent(this, Game.class,\n" * 20000
+        findings = self.get_findings(source)
+        self.assertEqual(len(findings), 20000)
+        self.assertEqual(findings[-1], Finding(Finding.EXPLICIT_INTENT, "Game", 20000))
+
+    def test_split_arguments(self):
+        source = b'f(a, g(b, c), "d, e", [f, g])'
+        self.assertEqual(split_arguments(source, 1), ["a", "g(b, c)", '"d, e"', "[f, g]"])
+        self.assertEqual(split_arguments(b"f()", 1), [])
+        self.assertEqual(split_arguments(b"f(a, g(b, c", 1), ["a"])
+
+    def test_custom_detector(self):
+        class StartActivityDetector(Detector):
+            triggers = ("startActivity",)
+
+            def detect_call(self, call):
+                return (Finding("start-activity", None, call.line, call.arguments[0]),)
+
+        extractor = IntentExtractor([StartActivityDetector()])
+        findings = extractor.extract(b"startActivity(intent);\nstartActivityForResult(intent, 1);")
+        self.assertEqual(findings, [Finding("start-activity", None, 1, "intent")])
+
+    def test_finding_list(self):
+        finding = Finding(Finding.EXPLICIT_INTENT, "GameActivity", 3)
+        self.assertEqual(Finding.from_list(finding.to_list()), finding)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from intent_filters import ImplicitIntent, IntentFilter, IntentFilterIndex, PathTrie, compile_path_pattern
+from manifest_parser import ManifestParser
+
+VIEW = "android.intent.action.VIEW"
+
+MANIFEST = """<manifest xmlns:android="http://schemas.android.com/apk/res/android" package="com.example.app">
+    <application>
+        <activity android:name=".MainActivity" />
+        <activity android:name=".ItemActivity">
+            <intent-filter>
+                <action android:name="android.intent.action.VIEW" />
+                <category android:name="android.intent.category.DEFAULT" />
+                <data android:scheme="https" android:host="example.com" android:pathPrefix="/items" />
+            </intent-filter>
+        </activity>
+        <activity android:name=".LauncherActivity">
+            <intent-filter>
+                <action android:name="android.intent.action.VIEW" />
+            </intent-filter>
+        </activity>
+        <activity android:name=".SyncActivity">
+            <intent-filter>
+                <action android:name="com.example.app.SYNC" />
+                <category android:name="android.intent.category.DEFAULT" />
+            </intent-filter>
+        </activity>
+        <receiver android:name=".SyncReceiver" android:exported="false">
+            <intent-filter>
+                <action android:name="com.example.app.SYNC" />
+            </intent-filter>
+        </receiver>
+    </application>
+</manifest>
+"""
+
+SOURCES = {
+    "MainActivity.java": """package com.example.app;
+
+class MainActivity {
+    void open() {
+        startActivity(new Intent(Intent.ACTION_VIEW, Uri.parse("https://example.com/items/1")));
+        startActivity(new Intent(Intent.ACTION_VIEW, Uri.parse("https://example.com/items/2")));
+        sendBroadcast(new Intent("com.example.app.SYNC"));
+        startActivity(new Intent(Intent.ACTION_SEND));
+    }
+}
+""",
+    "ItemActivity.java": "package com.example.app;\nclass ItemActivity {}\n",
+    "LauncherActivity.java": "package com.example.app;\nclass LauncherActivity {}\n",
+    "SyncActivity.java": "package com.example.app;\nclass SyncActivity {}\n",
+    "SyncReceiver.java": "package com.example.app;\nclass SyncReceiver {}\n",
+}
+
+
+class TestIntentFilters(unittest.TestCase):
+
+    def test_path_trie(self):
+        trie = PathTrie()
+        trie.add_path("/items", "exact")
+        trie.add_prefix("/items/", "prefix")
+        trie.add_pattern("/items/.*\\.png", "pattern")
+
+        self.assertEqual(trie.match("/items"), {"exact"})
+        self.assertEqual(trie.match("/items/1"), {"prefix"})
+        self.assertEqual(trie.match("/items/a/b.png"), {"prefix", "pattern"})
+        self.assertEqual(trie.match("/other"), set())
+
+    def test_path_pattern(self):
+        self.assertIsNotNone(compile_path_pattern("/a.*b").match("/axyzb"))
+        self.assertIsNotNone(compile_path_pattern("/a*b").match("/aaab"))
+        self.assertIsNone(compile_path_pattern("/a\\.b").match("/axb"))
+        self.assertIsNotNone(compile_path_pattern("/a\\.b").match("/a.b"))
+
+        # a "*" with nothing to repeat is a literal
+        self.assertIsNotNone(compile_path_pattern("*.pdf").match("*xpdf"))
+        self.assertIsNone(compile_path_pattern("*.pdf").match("/doc.pdf"))
+        self.assertIsNotNone(compile_path_pattern("a**").match("aaa*"))
+        self.assertIsNone(compile_path_pattern("a**").match("aaa"))
+
+        index = IntentFilterIndex()
+        index.add(IntentFilter("pdf", [VIEW], schemes=["file"], path_patterns=["*.pdf", "/a**"]))
+        self.assertEqual(index.resolve(ImplicitIntent(VIEW, uri="file:///aa*")), ["pdf"])
+
+    def test_resolve_data(self):
+        index = IntentFilterIndex()
+        index.add(IntentFilter("web", [VIEW], schemes=["https"], hosts=["*.example.com"], path_prefixes=["/docs"]))
+        index.add(IntentFilter("any", [VIEW], schemes=["https"]))
+        index.add(IntentFilter("plain", [VIEW]))
+        index.add(IntentFilter("images", [VIEW], mime_types=["image/*"]))
+
+        self.assertEqual(index.resolve(ImplicitIntent(VIEW, uri="https://www.example.com/docs/1")), ["web", "any"])
+        self.assertEqual(index.resolve(ImplicitIntent(VIEW, uri="https://other.org/docs/1")), ["any"])
+        self.assertEqual(index.resolve(ImplicitIntent(VIEW, uri="HTTPS://www.example.com/help")), ["any"])
+        self.assertEqual(index.resolve(ImplicitIntent(VIEW)), ["plain"])
+        self.assertEqual(index.resolve(ImplicitIntent(VIEW, mime_type="image/png")), ["images"])
+        self.assertEqual(index.resolve(ImplicitIntent(VIEW, uri="content://media/1", mime_type="image/png")), ["images"])
+        self.assertEqual(index.resolve(ImplicitIntent("android.intent.action.SEND")), [])
+        self.assertEqual(index.resolve(ImplicitIntent(None)), [])
+
+    def test_resolve_categories(self):
+        index = IntentFilterIndex()
+        index.add(IntentFilter("browsable", [VIEW], ["android.intent.category.BROWSABLE"]))
+        index.add(IntentFilter("plain", [VIEW]))
+
+        self.assertEqual(index.resolve(ImplicitIntent(VIEW, ["android.intent.category.BROWSABLE"])), ["browsable"])
+        self.assertEqual(index.resolve(ImplicitIntent(VIEW)), ["browsable", "plain"])
+
+    def test_resolve_component_type(self):
+        index = IntentFilterIndex()
+        index.add(IntentFilter("activity", ["com.example.SYNC"], component_type="Activity"))
+        index.add(IntentFilter("receiver", ["com.example.SYNC"], component_type="Receiver"))
+
+        self.assertEqual(index.resolve(ImplicitIntent("com.example.SYNC", component_type="Receiver")), ["receiver"])
+        self.assertEqual(index.resolve(ImplicitIntent("com.example.SYNC", component_type="Service")), [])
+        self.assertEqual(index.resolve(ImplicitIntent("com.example.SYNC")), ["activity", "receiver"])
+
+    def test_resolve_implicit(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = os.path.join(tmp, "AndroidManifest.xml")
+            with open(manifest, "w") as f:
+                f.write(MANIFEST)
+            src_dir = os.path.join(tmp, "src", "com", "example", "app")
+            os.makedirs(src_dir)
+            for name, content in SOURCES.items():
+                with open(os.path.join(src_dir, name), "w") as f:
+                    f.write(content)
+
+            unresolved = ManifestParser().parse(manifest, "app", src_dir=os.path.join(tmp, "src"))
+            doc = ManifestParser(resolve_implicit=True).parse(manifest, "app", src_dir=os.path.join(tmp, "src"))
+
+        self.assertEqual(len(unresolved.get_connectors()), 1)
+
+        # activities without CATEGORY_DEFAULT don't receive implicit Intents, broadcasts only reach
+        # receivers, and both items resolve to the same connector
+        self.assertEqual(sorted(connector.get_name() for connector in doc.get_connectors()),
+                         ["Implicit Intent from MainActivity to ItemActivity",
+                          "Implicit Intent from MainActivity to SyncReceiver", "Implicit Message Bus"])
+
+        # ACTION_SEND matches no filter, so MainActivity keeps its link to the bus
+        main = doc.get_component("MainActivity")
+        self.assertIsNotNone(doc.get_link(main, doc.get_bus()))
+
+        # other apps can't reach SyncReceiver, so it is only linked from the bus when nothing is resolved
+        self.assertIsNotNone(unresolved.get_link(unresolved.get_bus(), unresolved.get_component("SyncReceiver")))
+        self.assertIsNone(doc.get_link(doc.get_bus(), doc.get_component("SyncReceiver")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import unittest
+import os
+import sys
+import tempfile
+import tracemalloc
+import json
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from manifest_parser import ManifestParser
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+def write_large_manifest(path, count):
+    with open(path, "w") as f:
+        f.write('<manifest xmlns:android="http://schemas.android.com/apk/res/android" package="com.example.app">\n'
+                '<uses-permission android:name="android.permission.INTERNET"/>\n<application>\n')
+        for i in range(count):
+            f.write(f'<activity android:name=".Activity{i}"><intent-filter>'
+                    '<action android:name="android.intent.action.VIEW"/></intent-filter>' +
+                    "".join(f'<meta-data android:name="key{j}" android:value="value{j}"/>' for j in range(20)) +
+                    '</activity>\n')
+        f.write('<provider android:name=".Scores" android:authorities="com.example.scores;com.example.alt"/>\n'
+                '</application>\n</manifest>\n')
+
+
+class TestManifestParser(unittest.TestCase):
+
+    def get_summary(self, doc):
+        return (sorted(component.get_name() for component in doc.get_components()),
+                sorted(connector.get_name() for connector in doc.get_connectors()),
+                len(doc.get_links()))
+
+    def test_stream_matches_tree(self):
+        manifest = os.path.join(DATA_DIR, "Blockinger", "AndroidManifest.xml")
+        src_dir = os.path.join(DATA_DIR, "Blockinger", "src")
+
+        tree_doc = ManifestParser(id_allocator="content").parse(manifest, "Blockinger", src_dir=src_dir)
+        stream_doc = ManifestParser(id_allocator="content", stream=True).parse(manifest, "Blockinger", src_dir=src_dir)
+
+        self.assertEqual(self.get_summary(stream_doc), self.get_summary(tree_doc))
+        self.assertEqual(stream_doc.to_xml(), tree_doc.to_xml())
+
+    def test_stream_authorities(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = os.path.join(tmp, "AndroidManifest.xml")
+            write_large_manifest(manifest, 3)
+
+            _, components, authorities = ManifestParser(stream=True).parse_manifest(manifest, "app")
+
+        self.assertEqual([name for _, name in components],
+                         ["com.example.app.Activity0", "com.example.app.Activity1", "com.example.app.Activity2",
+                          "com.example.app.Scores"])
+        self.assertEqual(authorities, {"com.example.scores": "com.example.app.Scores",
+                                       "com.example.alt": "com.example.app.Scores"})
+
+    def test_stream_memory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = os.path.join(tmp, "AndroidManifest.xml")
+            write_large_manifest(manifest, 500)
+
+            peaks = []
+            for stream in (False, True):
+                tracemalloc.start()
+                doc, _, _ = ManifestParser(stream=stream).parse_manifest(manifest, "app")
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+                self.assertEqual(len(doc.get_components()), 501)
+                del doc
+
+        # the elements are dropped as they close, so only the document itself stays in memory
+        self.assertLess(peaks[1], peaks[0] / 2)
+
+    def test_iter_components(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = os.path.join(tmp, "AndroidManifest.xml")
+            write_large_manifest(manifest, 2)
+
+            components = list(ManifestParser().iter_components(manifest))
+
+        self.assertEqual([(component.name, component.qualified_name, component.component_type, component.has_intent_filters)
+                          for component in components],
+                         [("Activity0", "com.example.app.Activity0", "Activity", True),
+                          ("Activity1", "com.example.app.Activity1", "Activity", True),
+                          ("Scores", "com.example.app.Scores", "Provider", False)])
+        self.assertEqual(components[2].authorities, ["com.example.scores", "com.example.alt"])
+
+    def test_iter_findings(self):
+        manifest = os.path.join(DATA_DIR, "Blockinger", "AndroidManifest.xml")
+        src_dir = os.path.join(DATA_DIR, "Blockinger", "src")
+
+        links = list(ManifestParser().iter_findings(manifest, src_dir))
+
+        # every occurrence is a finding of its own
+        explicit = sorted({(link.sender, link.receiver.name) for link in links if link.receiver is not None})
+        self.assertEqual(explicit, [("activities.MainActivity", "activities.AboutActivity"),
+                                    ("activities.MainActivity", "activities.GameActivity"),
+                                    ("activities.MainActivity", "activities.HelpActivity"),
+                                    ("activities.MainActivity", "activities.SettingsActivity"),
+                                    ("activities.SettingsActivity", "activities.AdvancedSettingsActivity")])
+        self.assertEqual(sorted({link.sender for link in links if link.is_implicit}),
+                         ["activities.AboutActivity", "activities.MainActivity"])
+        self.assertTrue(all(link.finding.line is not None for link in links))
+
+    def test_aggregate(self):
+        manifest = os.path.join(DATA_DIR, "Blockinger", "AndroidManifest.xml")
+        src_dir = os.path.join(DATA_DIR, "Blockinger", "src")
+
+        doc = ManifestParser().parse(manifest, "Blockinger", src_dir=src_dir)
+        aggregated = ManifestParser(aggregate=True).parse(manifest, "Blockinger", src_dir=src_dir)
+
+        # every pair keeps its connector name, counting the Intents sent between them, but MainActivity
+        # sends all of its explicit Intents through a single interface
+        summary = self.get_summary(doc)
+        self.assertEqual(self.get_summary(aggregated)[:2],
+                         (summary[0], [name + " (2 interactions)" if name.endswith("to GameActivity") else name
+                                       for name in summary[1]]))
+        main = aggregated.get_component("activities.MainActivity")
+        self.assertEqual(sorted(interface.get_name() for interface in main.get_interfaces()),
+                         ["Explicit Intent Out", "[New Interface]", "[New Interface]"])
+        self.assertLess(sum(len(component.get_interfaces()) for component in aggregated.get_components()),
+                        sum(len(component.get_interfaces()) for component in doc.get_components()))
+
+    def test_aggregate_parallel_links(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = os.path.join(tmp, "AndroidManifest.xml")
+            with open(manifest, "w") as f:
+                f.write('<manifest xmlns:android="http://schemas.android.com/apk/res/android" package="com.example.app">'
+                        '<application><activity android:name=".MainActivity"/><activity android:name=".DetailActivity">'
+                        '<intent-filter><action android:name="com.example.app.SHOW"/>'
+                        '<category android:name="android.intent.category.DEFAULT"/></intent-filter></activity>'
+                        '</application></manifest>')
+            src_dir = os.path.join(tmp, "src", "com", "example", "app")
+            os.makedirs(src_dir)
+            with open(os.path.join(src_dir, "MainActivity.java"), "w") as f:
+                f.write("package com.example.app;\nclass MainActivity {\n"
+                        "void a() { startActivity(new Intent(this, DetailActivity.class)); }\n"
+                        "void b() { startActivity(new Intent(this, DetailActivity.class)); }\n"
+                        "void c() { startActivity(new Intent(this, com.example.app.DetailActivity.class)); }\n"
+                        "void d() { startService(new Intent(this, DetailActivity.class)); }\n"
+                        'void e() { startActivity(new Intent("com.example.app.SHOW")); }\n}\n')
+            with open(os.path.join(src_dir, "DetailActivity.java"), "w") as f:
+                f.write("package com.example.app;\nclass DetailActivity {}\n")
+
+            doc = ManifestParser(aggregate=True, resolve_implicit=True).parse(manifest, "app",
+                                                                                src_dir=os.path.join(tmp, "src"))
+            output = doc.write_current_contents(tmp, format="json")
+            with open(output) as f:
+                nodes = json.load(f)["nodes"]
+
+        connectors = [node for node in nodes if node["type"] == "connector" and "count" in node]
+        # every Intent sent is counted, identical ones included, and the inline Intent of the service
+        # only once, as a service
+        self.assertEqual(connectors, [{"id": connectors[0]["id"], "type": "connector", "count": 5,
+                                       "kinds": {"Explicit Intent": 3, "Implicit Intent": 1, "Service": 1},
+                                       "name": "Explicit Intent and Implicit Intent and Service from MainActivity "
+                                               "to DetailActivity (5 interactions)"}])
+
+        # one link per kind on either side of the connector
+        main = doc.get_component("MainActivity")
+        self.assertEqual(len(doc.get_outgoing_links(main)), 3)
+        self.assertEqual(len(doc.get_incoming_links(doc.get_component("DetailActivity"))), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import gzip
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from manifest_parser import ManifestParser
+from pipeline import iter_graph_records, stream_architecture
+from query import Graph
+from sinks import DirectorySink, MemorySink
+
+BLOCKINGER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'Blockinger')
+MANIFEST = os.path.join(BLOCKINGER, "AndroidManifest.xml")
+SRC_DIR = os.path.join(BLOCKINGER, "src")
+
+
+def get_edges(graph):
+    return sorted((graph.names[start], graph.names[end]) for start in range(len(graph)) for end in graph.successors(start))
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_matches_document(self):
+        doc = ManifestParser(id_allocator="content").parse(MANIFEST, "Blockinger", src_dir=SRC_DIR)
+        expected = doc.to_bytes("jsonl").decode("utf-8").splitlines()
+
+        sink = MemorySink()
+        stream_architecture(ManifestParser(id_allocator="content"), MANIFEST, "Blockinger", sink, src_dir=SRC_DIR)
+        lines = sink.getvalue().decode("utf-8").splitlines()
+
+        # the same records, only in the order they were found, apart from the ids of edges
+        self.assertEqual(len(lines), len(expected))
+        self.assertEqual(sorted(line for line in lines if '"type":"edge"' not in line),
+                         sorted(line for line in expected if '"type":"edge"' not in line))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            file_name = stream_architecture(ManifestParser(), MANIFEST, "Blockinger", DirectorySink(tmp),
+                                            src_dir=SRC_DIR, compress=True)
+            self.assertEqual(os.path.basename(file_name), "Blockinger.jsonl.gz")
+            with gzip.open(file_name, "rb") as f:
+                self.assertEqual(len(f.read().splitlines()), len(expected))
+            graph = Graph.from_json(file_name)
+        self.assertEqual(get_edges(graph), get_edges(Graph.from_document(doc)))
+
+    def test_lazy(self):
+        records = iter_graph_records(ManifestParser(id_allocator="counter"), MANIFEST, "Blockinger", src_dir=SRC_DIR)
+
+        # the first components come out before any source has been looked at
+        self.assertEqual([record["type"] for record in (next(records), next(records))], ["structure", "component"])
+        edges = [record for record in records if record["type"] == "edge"]
+        self.assertEqual(len(edges), 13)
+
+    def test_without_sources(self):
+        records = list(iter_graph_records(ManifestParser(), MANIFEST, "Blockinger"))
+        self.assertEqual([record["type"] for record in records].count("component"), 6)
+        self.assertEqual([record["type"] for record in records].count("edge"), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import io
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from manifest_parser import ManifestParser
+from profiling import NULL_PROFILER, Profiler
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_phases(self):
+        profiler = Profiler()
+        profiler.start()
+        with profiler.phase("outer"):
+            for _ in range(2):
+                with profiler.phase("inner"):
+                    data = [0] * 100000
+        profiler.stop()
+        del data
+
+        report = profiler.to_dict()
+        self.assertEqual([phase["name"] for phase in report["phases"]], ["outer", "outer/inner"])
+        self.assertEqual(profiler.get_phase("outer/inner").calls, 2)
+
+        # the peak of the inner phase also counts for the outer one
+        self.assertGreaterEqual(profiler.get_phase("outer").peak_memory, profiler.get_phase("outer/inner").peak_memory)
+        self.assertGreater(profiler.get_phase("outer/inner").peak_memory, 100000 * 8)
+        self.assertGreaterEqual(report["wall_seconds"], profiler.get_phase("outer").wall)
+
+    def test_counters(self):
+        profiler = Profiler(trace_memory=False)
+        profiler.count("files")
+        profiler.count("files", 2)
+        self.assertEqual(profiler.get_counter("files"), 3)
+        self.assertEqual(profiler.get_counter("links"), 0)
+
+    def test_null_profiler(self):
+        with NULL_PROFILER.phase("parse"):
+            NULL_PROFILER.count("files")
+        self.assertEqual(NULL_PROFILER.get_counter("files"), 0)
+        self.assertEqual(NULL_PROFILER.to_dict(), {})
+
+    def test_parse(self):
+        profiler = Profiler(trace_memory=False)
+        profiler.start()
+        parser = ManifestParser(profiler=profiler)
+        doc = parser.parse(os.path.join(DATA_DIR, "Blockinger", "AndroidManifest.xml"), "Blockinger",
+                           src_dir=os.path.join(DATA_DIR, "Blockinger", "src"))
+        doc.write_xml(io.BytesIO())
+        profiler.stop()
+
+        for name in ("parse/parse_xml", "parse/scan_sources", "parse/resolve_links", "assign_ids", "serialize"):
+            self.assertEqual(profiler.get_phase(name).calls, 1, name)
+
+        self.assertEqual(profiler.get_counter("components"), len(doc.get_components()))
+        self.assertEqual(profiler.get_counter("links"), len(doc.get_links()))
+        self.assertEqual(profiler.get_counter("files_scanned"), len(doc.get_components()))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "profile.json")
+            profiler.write(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)["counters"]["links"], len(doc.get_links()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from project import ProjectParser, find_modules, get_included_paths
+from manifest_parser import ManifestParser
+
+MANIFEST = """<manifest xmlns:android="http://schemas.android.com/apk/res/android" package="{package}">
+    <application>{components}</application>
+</manifest>
+"""
+
+# module directory to (package, components of the manifest, sources)
+MODULES = {
+    "app": ("com.example.app",
+            '<activity android:name=".MainActivity"><intent-filter><action android:name="android.intent.action.MAIN" />'
+            '</intent-filter></activity><activity android:name="com.example.login.LoginActivity" />',
+            {"com/example/app/MainActivity.java": "package com.example.app;\n"
+                                                  "class MainActivity { void f() { startActivity(new Intent(this, LoginActivity.class)); } }\n"}),
+    os.path.join("feature", "login"): ("com.example.login",
+                                       '<activity android:name=".LoginActivity"><intent-filter><action android:name="VIEW" />'
+                                       '</intent-filter></activity><activity android:name=".MainActivity" />',
+                                       {"com/example/login/LoginActivity.kt": "package com.example.login\n"
+                                                                              "class LoginActivity { fun f() { startActivity(Intent(this, com.example.app.MainActivity::class.java)) } }\n",
+                                        "com/example/login/MainActivity.java": "package com.example.login;\nclass MainActivity { }\n"}),
+}
+
+
+def write_project(root, settings=True):
+    for module_dir, (package, components, sources) in MODULES.items():
+        main_dir = os.path.join(root, module_dir, "src", "main")
+        os.makedirs(main_dir)
+        with open(os.path.join(main_dir, "AndroidManifest.xml"), "w") as f:
+            f.write(MANIFEST.format(package=package, components=components))
+        for path, source in sources.items():
+            language = "kotlin" if path.endswith(".kt") else "java"
+            path = os.path.join(main_dir, language, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(source)
+
+    with open(os.path.join(root, "app", "build.gradle"), "w") as f:
+        f.write("plugins { id 'com.android.application' }\n")
+    # a module left out of the build
+    os.makedirs(os.path.join(root, "unused", "src", "main"))
+    with open(os.path.join(root, "unused", "src", "main", "AndroidManifest.xml"), "w") as f:
+        f.write(MANIFEST.format(package="com.example.unused", components='<activity android:name=".Unused" />'))
+
+    if settings:
+        with open(os.path.join(root, "settings.gradle"), "w") as f:
+            f.write("rootProject.name = 'example'\ninclude ':feature:login', ':app'\n")
+
+
+class TestProject(unittest.TestCase):
+
+    def test_find_modules(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            write_project(tmp)
+            self.assertEqual(get_included_paths(os.path.join(tmp, "settings.gradle")),
+                             [os.path.join("feature", "login"), "app"])
+
+            modules = find_modules(tmp)
+            # the application module comes first, and the module left out of settings.gradle is ignored
+            self.assertEqual([module.name for module in modules], [":app", ":feature:login"])
+            self.assertTrue(modules[0].is_application)
+            self.assertEqual(modules[1].src_dirs, [os.path.join(tmp, "feature", "login", "src", "main", "java"),
+                                                   os.path.join(tmp, "feature", "login", "src", "main", "kotlin")])
+
+    def test_find_modules_without_settings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            write_project(tmp, settings=False)
+            self.assertEqual([module.name for module in find_modules(tmp)], [":app", ":feature:login", ":unused"])
+
+    def test_parse(self):
+        for use_processes in (False, True):
+            with tempfile.TemporaryDirectory() as tmp:
+                write_project(tmp)
+                doc = ProjectParser(ManifestParser(), use_processes=use_processes).parse(tmp, "example")
+
+            # LoginActivity is declared by both modules but appears once, with the intent filter of the library.
+            # The MainActivity of the library doesn't take the name of the one of the app
+            names = sorted(component.get_name() for component in doc.get_components())
+            self.assertEqual(names, ["MainActivity", "com.example.login.LoginActivity", "com.example.login.MainActivity"])
+            login = doc.get_component("com.example.login.LoginActivity")
+            self.assertTrue(login.get_interface_in() is not None)
+
+            # Intents are resolved across modules in both directions
+            connectors = sorted(connector.get_name() for connector in doc.get_connectors())
+            self.assertEqual(connectors, ["Explicit Intent from LoginActivity to MainActivity",
+                                          "Explicit Intent from MainActivity to LoginActivity",
+                                          "Implicit Message Bus"])
+            main = doc.get_component("com.example.app.MainActivity")
+            self.assertEqual(len(doc.get_outgoing_links(main)), 1)
+            self.assertEqual(len(doc.get_incoming_links(main)), 2)
+            self.assertEqual(doc.get_diagnostics(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
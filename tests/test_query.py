@@ -0,0 +1,93 @@
+import unittest
+import io
+import json
+import os
+import sys
+import tempfile
+from contextlib import redirect_stdout
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from query import Graph, main
+from manifest_parser import ManifestParser
+from sinks import DirectorySink
+
+BLOCKINGER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'Blockinger')
+
+
+class TestQuery(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.doc = ManifestParser(id_allocator="counter").parse(os.path.join(BLOCKINGER, "AndroidManifest.xml"),
+                                                               "Blockinger", src_dir=os.path.join(BLOCKINGER, "src"))
+        cls.graph = Graph.from_document(cls.doc)
+
+    def names(self, nodes):
+        return sorted(self.graph.names[node] for node in nodes)
+
+    def test_compile(self):
+        # explicit Intent connectors become edges, the bus stays a node
+        self.assertEqual(len(self.graph), len(self.doc.get_components()) + 1)
+        self.assertEqual(self.graph.kinds.count("connector"), 1)
+        self.assertEqual(self.graph.find("activities.MainActivity"), self.graph.find("MainActivity"))
+
+        main_activity = self.graph.find("MainActivity")
+        self.assertEqual(self.names(self.graph.successors(main_activity)),
+                         ["Implicit Message Bus", "activities.AboutActivity", "activities.GameActivity",
+                          "activities.HelpActivity", "activities.SettingsActivity"])
+        self.assertEqual(self.graph.out_degree(main_activity), len(self.graph.successors(main_activity)))
+
+    def test_reachable(self):
+        about = self.graph.find("AboutActivity")
+        game = self.graph.find("GameActivity")
+        self.assertIn(game, self.graph.reachable(about))
+        self.assertIn(about, self.graph.reachable(game, reverse=True))
+        self.assertEqual(self.graph.reachable(game), [])
+
+    def test_shortest_path(self):
+        path = self.graph.shortest_path(self.graph.find("AboutActivity"), self.graph.find("GameActivity"))
+        self.assertEqual([self.graph.names[node] for node in path],
+                         ["activities.AboutActivity", "Implicit Message Bus", "activities.MainActivity",
+                          "activities.GameActivity"])
+        self.assertIsNone(self.graph.shortest_path(self.graph.find("GameActivity"), self.graph.find("MainActivity")))
+
+    def test_strongly_connected_components(self):
+        names = ["A", "B", "C", "D", "E"]
+        edges = [(0, 1), (1, 2), (2, 0), (2, 3), (4, 4)]
+        graph = Graph(names, ["component"] * len(names), edges)
+        self.assertEqual([sorted(component) for component in graph.strongly_connected_components()],
+                         [[0, 1, 2], [3], [4]])
+        self.assertEqual([sorted(component) for component in graph.cycles()], [[0, 1, 2], [4]])
+
+        # a long chain doesn't hit the recursion limit
+        count = 20000
+        chain = Graph([str(node) for node in range(count)], ["component"] * count,
+                      [(node, node + 1) for node in range(count - 1)] + [(count - 1, 0)])
+        self.assertEqual([len(component) for component in chain.cycles()], [count])
+
+    def test_rank_by_degree(self):
+        self.assertEqual(self.graph.rank_by_degree(1), [(self.graph.find("MainActivity"), 5)])
+        self.assertEqual(self.graph.rank_by_degree(1, reverse=True), [(self.graph.find("Implicit Message Bus"), 2)])
+
+    def test_from_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for format, compress in (("json", False), ("jsonl", True)):
+                file_name = self.doc.export(DirectorySink(tmp), format=format, compress=compress)
+                graph = Graph.from_json(os.path.join(tmp, file_name))
+
+                self.assertEqual(sorted(graph.names), sorted(self.graph.names))
+                self.assertEqual(sorted((graph.names[start], graph.names[end]) for start in range(len(graph))
+                                        for end in graph.successors(start)),
+                                 sorted((self.graph.names[start], self.graph.names[end]) for start in range(len(self.graph))
+                                        for end in self.graph.successors(start)))
+
+    def test_main(self):
+        stream = io.StringIO()
+        with redirect_stdout(stream):
+            status = main([os.path.join(BLOCKINGER, "AndroidManifest.xml"), "--src", os.path.join(BLOCKINGER, "src"),
+                           "--json", "fan-out", "--top", "1"])
+        self.assertEqual(status, 0)
+        self.assertEqual(json.loads(stream.getvalue()), [{"name": "activities.MainActivity", "degree": 5}])
+
+
+if __name__ == '__main__':
+    unittest.main()
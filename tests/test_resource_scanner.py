@@ -0,0 +1,137 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from resource_scanner import ResourceScanner, get_reference
+from manifest_parser import ManifestParser
+
+MANIFEST = """<manifest xmlns:android="http://schemas.android.com/apk/res/android" package="com.example.app">
+    <application>
+        <activity android:name=".MainActivity" />
+        <activity android:name=".DetailActivity" />
+        <activity android:name=".SettingsActivity" />
+        <activity android:name=".HelpActivity" />
+    </application>
+</manifest>
+"""
+
+ANDROID = 'xmlns:android="http://schemas.android.com/apk/res/android"'
+APP = 'xmlns:app="http://schemas.android.com/apk/res-auto"'
+TOOLS = 'xmlns:tools="http://schemas.android.com/tools"'
+
+MAIN_LAYOUT = f"""<LinearLayout {ANDROID} {TOOLS} tools:context=".MainActivity">
+    <include layout="@layout/toolbar" />
+    <fragment android:name="com.example.app.HomeFragment" />
+    <Button android:onClick="onClickStart" />
+</LinearLayout>
+"""
+
+RESOURCES = {
+    "layout/activity_main.xml": MAIN_LAYOUT,
+    # an identical variant is only parsed once
+    "layout-land/activity_main.xml": MAIN_LAYOUT,
+    "layout/toolbar.xml": f'<Toolbar {ANDROID} />',
+    "layout/fragment_home.xml": f"""<FrameLayout {ANDROID} {APP}>
+    <androidx.fragment.app.FragmentContainerView android:name="androidx.navigation.fragment.NavHostFragment"
+        app:navGraph="@navigation/nav_main" />
+</FrameLayout>
+""",
+    "navigation/nav_main.xml": f"""<navigation {ANDROID}>
+    <activity android:id="@+id/detail" android:name="com.example.app.DetailActivity" />
+</navigation>
+""",
+    "xml/preferences.xml": f"""<PreferenceScreen {ANDROID}>
+    <Preference android:key="settings"><intent android:targetClass="com.example.app.SettingsActivity" /></Preference>
+    <Preference android:key="site"><intent android:action="android.intent.action.VIEW" /></Preference>
+</PreferenceScreen>
+""",
+    "values/strings.xml": '<resources><string name="app">App</string></resources>',
+    "layout/broken.xml": "<LinearLayout",
+}
+
+SOURCES = {
+    "MainActivity.java": """package com.example.app;
+class MainActivity extends PreferenceActivity {
+    void create() { addPreferencesFromResource(R.xml.preferences); }
+}
+""",
+    "HomeFragment.java": """package com.example.app;
+class HomeFragment extends Fragment {
+    View create(LayoutInflater inflater) {
+        startActivity(new Intent(getActivity(), HelpActivity.class));
+        return inflater.inflate(R.layout.fragment_home, null, false);
+    }
+}
+""",
+}
+
+
+def write_app(root):
+    for files, directory in ((RESOURCES, "res"), (SOURCES, os.path.join("src", "com", "example", "app"))):
+        for name, content in files.items():
+            path = os.path.join(root, directory, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(content)
+    with open(os.path.join(root, "AndroidManifest.xml"), "w") as f:
+        f.write(MANIFEST)
+
+
+class TestResourceScanner(unittest.TestCase):
+
+    def test_get_reference(self):
+        self.assertEqual(get_reference("@layout/toolbar"), "layout/toolbar")
+        self.assertEqual(get_reference("@+navigation/main"), "navigation/main")
+        self.assertIsNone(get_reference("@string/app"))
+        self.assertIsNone(get_reference("match_parent"))
+
+    def test_scan(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            write_app(tmp)
+            with self.assertLogs(level="WARNING"):
+                resources = ResourceScanner(max_workers=2).scan(os.path.join(tmp, "res"))
+
+        self.assertEqual(sorted(resources.results_by_name),
+                         ["layout/activity_main", "layout/broken", "layout/fragment_home", "layout/toolbar",
+                          "navigation/nav_main", "xml/preferences"])
+        self.assertEqual(resources.files_scanned, 7)
+        self.assertEqual(resources.files_parsed, 6)
+
+        main = resources.results_by_name["layout/activity_main"]
+        self.assertEqual(len(main), 1)
+        self.assertEqual(main[0].context, ".MainActivity")
+        self.assertEqual(resources.get_context_uses("com.example.app.MainActivity"), ["layout/activity_main"])
+
+        # includes are followed transitively
+        self.assertEqual(resources.get_fragments(["layout/activity_main"]), ["com.example.app.HomeFragment"])
+        self.assertEqual(resources.get_targets(["layout/fragment_home"]), ["com.example.app.DetailActivity"])
+        self.assertEqual(resources.get_targets(["xml/preferences"]), ["com.example.app.SettingsActivity"])
+        self.assertEqual(resources.get_actions(["xml/preferences"]), ["android.intent.action.VIEW"])
+
+    def test_parse(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            write_app(tmp)
+            manifest = os.path.join(tmp, "AndroidManifest.xml")
+            parser = ManifestParser()
+            with self.assertLogs(level="WARNING"):
+                doc = parser.parse(manifest, "app", src_dir=os.path.join(tmp, "src"), res_dir=[os.path.join(tmp, "res")])
+            without_sources = parser.parse(manifest, "app", res_dir=[os.path.join(tmp, "res")])
+
+        def get_links(doc):
+            return sorted(connector.get_name() for connector in doc.get_connectors())
+
+        # the layout of MainActivity hosts HomeFragment, whose own layout navigates to DetailActivity and whose
+        # source starts HelpActivity, and its preference screen starts SettingsActivity and an implicit Intent
+        self.assertEqual(get_links(doc), ["Explicit Intent from MainActivity to DetailActivity",
+                                          "Explicit Intent from MainActivity to HelpActivity",
+                                          "Explicit Intent from MainActivity to SettingsActivity",
+                                          "Implicit Message Bus"])
+        self.assertEqual(len(doc.get_outgoing_links(doc.get_component("MainActivity"))), 4)
+
+        # without the source only tools:context ties the resources to components
+        self.assertEqual(get_links(without_sources), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import client
+from client import build_arg_parser, build_request, send_request
+from intent_cache import IntentCache
+from server import AnalysisServer, SourceIndexStore
+from store import ArchitectureStore
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+class TestServer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp.name, "server.sock")
+        cache = IntentCache(os.path.join(self.tmp.name, "cache"), 1, memory_entries=100)
+        self.server = AnalysisServer(workers=2, cache=cache)
+
+        self.thread = threading.Thread(target=asyncio.run, args=(self.server.serve(socket_path=self.socket_path),))
+        self.thread.start()
+        for _ in range(100):
+            if os.path.exists(self.socket_path):
+                break
+            self.thread.join(0.05)
+
+    def tearDown(self):
+        if self.thread.is_alive():
+            send_request({"command": "shutdown"}, socket_path=self.socket_path, timeout=10)
+        self.thread.join(10)
+        self.tmp.cleanup()
+
+    def request(self, request):
+        return send_request(request, socket_path=self.socket_path, timeout=30)
+
+    def test_analyze(self):
+        self.assertEqual(self.request({"command": "ping"}), {"status": "ok"})
+
+        request = {
+            "command": "analyze",
+            "manifest": os.path.join(DATA_DIR, "Blockinger", "AndroidManifest.xml"),
+            "structure": "Blockinger",
+            "src_dir": [os.path.join(DATA_DIR, "Blockinger", "src")],
+            "output_dir": os.path.join(self.tmp.name, "output"),
+            "ids": "content",
+        }
+        outputs = []
+        for i in range(2):
+            request["profile"] = os.path.join(self.tmp.name, f"profile-{i}.json")
+            response = self.request(request)
+            self.assertEqual(response["status"], "ok")
+            self.assertEqual(response["links"], 13)
+            with open(response["output"], "rb") as f:
+                outputs.append(f.read())
+
+        self.assertEqual(outputs[0], outputs[1])
+
+        # the second request reuses the source index and the cached scan results of the first
+        with open(request["profile"]) as f:
+            counters = json.load(f)["counters"]
+        self.assertEqual(counters["files_indexed"], 0)
+        self.assertGreater(counters["files_reused"], 0)
+        self.assertEqual(counters["cache_hits"], counters["files_scanned"])
+
+        stats = self.request({"command": "stats"})
+        self.assertEqual((stats["requests"], stats["failures"]), (2, 0))
+
+    def test_analyze_options(self):
+        args = build_arg_parser().parse_args([
+            os.path.join(DATA_DIR, "Blockinger", "AndroidManifest.xml"), "Blockinger",
+            "--src", os.path.join(DATA_DIR, "Blockinger", "src"), "--aggregate", "--resolve-implicit",
+            "--output", os.path.join(self.tmp.name, "Blockinger.xml"), "--store", os.path.join(self.tmp.name, "apps.db"),
+        ])
+        response = self.request(build_request(args))
+        self.assertEqual(response["status"], "ok")
+        self.assertEqual(response["output"], os.path.join(self.tmp.name, "Blockinger.xml"))
+        self.assertTrue(os.path.isfile(response["output"]))
+        self.assertNotIn("rows", response)
+
+        # the architecture is stored by the server, MainActivity being the only component reaching GameActivity
+        with ArchitectureStore(os.path.join(self.tmp.name, "apps.db")) as store:
+            self.assertEqual(len(store.get_apps()), 1)
+            self.assertEqual(len(store.find_reaching("GameActivity")), 1)
+
+    def test_client_options(self):
+        # the options configuring the server are rejected rather than silently ignored
+        for option in (["--no-cache"], ["--cache-dir", self.tmp.name], ["--scan-workers", "2"], ["--scan-processes"]):
+            with self.assertRaises(SystemExit):
+                client.main(["AndroidManifest.xml", "app"] + option + ["--socket", self.socket_path])
+        self.assertEqual(client.main(["--ping", "--debug", "--socket", self.socket_path]), 0)
+
+    def test_errors(self):
+        response = self.request({"command": "analyze", "manifest": os.path.join(self.tmp.name, "missing.xml"),
+                                 "structure": "missing", "output_dir": self.tmp.name})
+        self.assertEqual(response["status"], "error")
+        self.assertEqual(self.request({"command": "analyze"})["status"], "error")
+        self.assertEqual(self.request({"command": "unknown"})["status"], "error")
+
+        # the server keeps running after failed requests
+        self.assertEqual(self.request({"command": "ping"}), {"status": "ok"})
+
+    def test_shutdown(self):
+        self.assertEqual(self.request({"command": "shutdown"}), {"status": "ok"})
+        self.thread.join(10)
+        self.assertFalse(self.thread.is_alive())
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_source_index_store(self):
+        store = SourceIndexStore(max_entries=2)
+        store["a"] = 1
+        store["b"] = 2
+        store.get("a")
+        store["c"] = 3
+        self.assertEqual((store.get("a"), store.get("b"), store.get("c")), (1, None, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from source_index import SourceIndex, find_declared_types
+from manifest_parser import ManifestParser
+
+JAVA_SOURCE = b"""package com.example.app;
+
+// class Commented {
+public class MainActivity extends Activity {
+    private String text = "class Quoted {";
+
+    void start() { startActivity(new Intent(this, GameActivity.class)); }
+}
+"""
+
+RECEIVERS_SOURCE = b"""package com.example.app;
+
+class Receivers {
+    public static class BootReceiver extends BroadcastReceiver {
+        void run() { new Runnable() { public void run() {} }; }
+    }
+}
+"""
+
+KOTLIN_SOURCE = b"""package com.example.app.game
+
+class GameActivity : Activity() {
+    companion object { }
+}
+"""
+
+MANIFEST = """<manifest xmlns:android="http://schemas.android.com/apk/res/android" package="com.example.app">
+    <application>
+        <activity android:name=".MainActivity" />
+        <activity android:name="com.example.app.game.GameActivity" />
+        <receiver android:name=".Receivers$BootReceiver" />
+        <service android:name="MissingService" />
+    </application>
+</manifest>
+"""
+
+
+class TestSourceIndex(unittest.TestCase):
+
+    def write_sources(self, root):
+        os.makedirs(os.path.join(root, "java", "com", "example", "app"))
+        os.makedirs(os.path.join(root, "kotlin", "game"))
+        with open(os.path.join(root, "java", "com", "example", "app", "MainActivity.java"), "wb") as f:
+            f.write(JAVA_SOURCE)
+        with open(os.path.join(root, "java", "com", "example", "app", "Receivers.java"), "wb") as f:
+            f.write(RECEIVERS_SOURCE)
+        with open(os.path.join(root, "kotlin", "game", "Game.kt"), "wb") as f:
+            f.write(KOTLIN_SOURCE)
+        return [os.path.join(root, "java"), os.path.join(root, "kotlin")]
+
+    def test_find_declared_types(self):
+        package_name, type_names = find_declared_types(JAVA_SOURCE)
+
+        self.assertEqual(package_name, "com.example.app")
+        self.assertEqual(type_names, ["MainActivity"])
+        self.assertEqual(find_declared_types(RECEIVERS_SOURCE)[1], ["Receivers", "Receivers.BootReceiver"])
+
+    def test_find(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            index = SourceIndex(self.write_sources(tmp))
+
+            main_activity = index.find("com.example.app.MainActivity")
+            self.assertTrue(main_activity.endswith("MainActivity.java"))
+            receivers = index.find("com.example.app.Receivers$BootReceiver")
+            self.assertTrue(receivers.endswith("Receivers.java"))
+            self.assertEqual(index.find("com.example.app.Receivers.BootReceiver"), receivers)
+            self.assertTrue(index.find("com.example.app.game.GameActivity").endswith("Game.kt"))
+            self.assertTrue(index.find("com.example.app.Missing") is None)
+            self.assertEqual(index.find_simple_name("BootReceiver"), [receivers])
+
+    def test_previous_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            roots = self.write_sources(tmp)
+            first = SourceIndex(roots)
+            self.assertEqual((first.files_indexed, first.files_reused), (3, 0))
+
+            # only the file that changed is read again
+            path = os.path.join(tmp, "java", "com", "example", "app", "MainActivity.java")
+            with open(path, "wb") as f:
+                f.write(JAVA_SOURCE.replace(b"MainActivity", b"HomeActivity"))
+            os.utime(path, ns=(1, 1))
+
+            second = SourceIndex(roots, previous=first)
+            self.assertEqual((second.files_indexed, second.files_reused), (1, 2))
+            self.assertEqual(second.find("com.example.app.HomeActivity"), path)
+            self.assertTrue(second.find("com.example.app.MainActivity") is None)
+            self.assertTrue(second.find("com.example.app.game.GameActivity").endswith("Game.kt"))
+
+    def test_previous_index_of_other_roots(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first = SourceIndex(self.write_sources(os.path.join(tmp, "v1")))
+            roots = self.write_sources(os.path.join(tmp, "v2"))
+            path = os.path.join(roots[0], "com", "example", "app", "MainActivity.java")
+            with open(path, "wb") as f:
+                f.write(JAVA_SOURCE.replace(b"MainActivity", b"HomeActivity"))
+
+            # every file is read to compare its content, only the one that changed is searched again
+            second = SourceIndex(roots, previous=first)
+            self.assertEqual((second.files_indexed, second.files_reused), (1, 2))
+            self.assertEqual(second.find("com.example.app.HomeActivity"), path)
+            self.assertTrue(second.find("com.example.app.game.GameActivity").startswith(roots[1]))
+            game = second.find("com.example.app.game.GameActivity")
+            self.assertEqual(second.get_digest(game), first.get_digest(first.find("com.example.app.game.GameActivity")))
+            self.assertNotEqual(second.get_digest(path), first.get_digest(first.find("com.example.app.MainActivity")))
+
+    def test_parse_records_missing_sources(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            roots = self.write_sources(tmp)
+            manifest = os.path.join(tmp, "AndroidManifest.xml")
+            with open(manifest, "w") as f:
+                f.write(MANIFEST)
+
+            doc = ManifestParser().parse(manifest, "test", src_dir=roots)
+
+        self.assertEqual(len(doc.get_components()), 4)
+        self.assertEqual(len(doc.get_diagnostics()), 1)
+        self.assertTrue("com.example.app.MissingService" in doc.get_diagnostics()[0])
+
+        # the explicit intent was found through the index and resolved to the kotlin activity
+        connectors = [connector.get_name() for connector in doc.get_connectors()]
+        self.assertEqual(connectors, ["Explicit Intent from MainActivity to GameActivity"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from intent_extractor import Finding
+from source_scanner import SourceScanner, scan_buffer, scan_file
+
+SOURCE = b"""
+public class MainActivity extends Activity {
+    void start() {
+        startActivity(new Intent(this, GameActivity.class));
+        startActivity(new Intent(Intent.ACTION_VIEW, uri));
+    }
+}
+"""
+
+
+class TestSourceScanner(unittest.TestCase):
+
+    def test_scan_buffer(self):
+        findings = scan_buffer(SOURCE)
+
+        self.assertEqual(findings, [
+            Finding(Finding.EXPLICIT_INTENT, "GameActivity", 4),
+            Finding(Finding.IMPLICIT_INTENT, None, 5, "android.intent.action.VIEW", Finding.ACTIVITY_API),
+        ])
+
+    def test_scan_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "MainActivity.java")
+            with open(path, "wb") as f:
+                f.write(SOURCE)
+            empty = os.path.join(tmp, "Empty.java")
+            open(empty, "wb").close()
+
+            result = scan_file(path)
+            self.assertEqual(result.explicit_targets, ["GameActivity"])
+            self.assertEqual(result.bytes_read, len(SOURCE))
+
+            self.assertEqual(scan_file(empty).explicit_targets, [])
+            self.assertTrue(scan_file(os.path.join(tmp, "Missing.java")).error is not None)
+
+    def test_scan_many_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for i in range(20):
+                path = os.path.join(tmp, f"Activity{i}.java")
+                with open(path, "wb") as f:
+                    f.write(f"new Intent(this, Activity{i + 1}.class)".encode())
+                paths.append(path)
+
+            results = SourceScanner(max_workers=4).scan(paths + paths)
+
+        self.assertEqual(len(results), 20)
+        for i, path in enumerate(paths):
+            self.assertEqual(results[path].explicit_targets, [f"Activity{i + 1}"])
+
+    def test_iter_scan(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for i in range(20):
+                path = os.path.join(tmp, f"Activity{i}.java")
+                with open(path, "wb") as f:
+                    f.write(f"new Intent(this, Activity{i + 1}.class)".encode())
+                paths.append(path)
+
+            requested = []
+
+            def iter_paths():
+                for path in paths:
+                    requested.append(path)
+                    yield path
+
+            results = SourceScanner(max_workers=2).iter_scan(iter_paths(), window=3)
+            first = next(results)
+            # only the window was read ahead of the first result
+            self.assertEqual(len(requested), 3)
+            self.assertEqual(first.path, paths[0])
+
+            rest = list(results)
+
+        self.assertEqual([result.path for result in rest], paths[1:])
+        for i, result in enumerate([first] + rest):
+            self.assertEqual(result.explicit_targets, [f"Activity{i + 1}"])
+
+
+if __name__ == '__main__':
+    unittest.main()
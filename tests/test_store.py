@@ -0,0 +1,110 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from batch import build_jobs, run_jobs
+from manifest_parser import ManifestParser
+from store import ArchitectureStore, DocumentRows
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+BOOT = "android.intent.action.BOOT_COMPLETED"
+
+MANIFEST = f"""<manifest xmlns:android="http://schemas.android.com/apk/res/android" package="com.example.boot"
+    android:versionCode="3">
+    <application>
+        <activity android:name=".MainActivity" />
+        <receiver android:name=".BootReceiver">
+            <intent-filter>
+                <action android:name="{BOOT}" />
+            </intent-filter>
+        </receiver>
+        <receiver android:name=".PrivateReceiver" android:exported="false">
+            <intent-filter>
+                <action android:name="{BOOT}" />
+                <data android:scheme="package" />
+            </intent-filter>
+        </receiver>
+    </application>
+</manifest>
+"""
+
+
+class TestStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmp.name, "store.db")
+
+        self.blockinger = ManifestParser().parse(os.path.join(DATA_DIR, "Blockinger", "AndroidManifest.xml"), "Blockinger",
+                                                 src_dir=os.path.join(DATA_DIR, "Blockinger", "src"))
+        self.manifest = os.path.join(self.tmp.name, "boot", "AndroidManifest.xml")
+        os.makedirs(os.path.dirname(self.manifest))
+        with open(self.manifest, "w") as f:
+            f.write(MANIFEST)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_rows(self):
+        rows = DocumentRows(self.blockinger)
+        self.assertEqual((rows.name, rows.version, rows.package), ("Blockinger", "1.8.2", "org.blockinger.game"))
+        self.assertEqual(len(rows.nodes), len(self.blockinger.get_components()) + len(self.blockinger.get_connectors()))
+        self.assertEqual(len(rows.links), len(self.blockinger.get_links()))
+
+        # the launcher filter is stored even though it isn't indexed for implicit Intents
+        self.assertIn((0, "action", "android.intent.action.MAIN"), rows.filter_values)
+
+    def test_queries(self):
+        with ArchitectureStore(self.database) as store:
+            store.add(self.blockinger)
+            store.add(ManifestParser().parse(self.manifest, "boot"))
+            self.assertEqual(store.get_apps(), [("Blockinger", "1.8.2", "org.blockinger.game", 6),
+                                                ("boot", "3", "com.example.boot", 3)])
+
+            self.assertEqual(store.find_filters("Receiver", action=BOOT),
+                             [("boot", "3", "com.example.boot.BootReceiver", "Receiver"),
+                              ("boot", "3", "com.example.boot.PrivateReceiver", "Receiver")])
+            self.assertEqual(store.find_filters("Receiver", True, action=BOOT),
+                             [("boot", "3", "com.example.boot.BootReceiver", "Receiver")])
+            self.assertEqual(store.find_filters(action=BOOT, scheme="package"),
+                             [("boot", "3", "com.example.boot.PrivateReceiver", "Receiver")])
+
+            self.assertEqual(store.find_components("GameActivity"),
+                             [("Blockinger", "1.8.2", "org.blockinger.game.activities.GameActivity")])
+
+            # the bus isn't followed, so only the components starting it through explicit Intents reach it
+            self.assertEqual(store.find_reaching("org.blockinger.game.activities.AdvancedSettingsActivity"),
+                             [("Blockinger", "1.8.2", "org.blockinger.game.activities.MainActivity"),
+                              ("Blockinger", "1.8.2", "org.blockinger.game.activities.SettingsActivity")])
+
+    def test_replace(self):
+        with ArchitectureStore(self.database) as store:
+            store.add(self.blockinger)
+            store.add(self.blockinger)
+            store.add(self.blockinger, version="1.9")
+            self.assertEqual(len(store), 2)
+            self.assertEqual(len(store.find_components("GameActivity")), 2)
+
+            self.assertEqual(store.remove("Blockinger", "1.9"), 1)
+            self.assertEqual(len(store.find_components("GameActivity")), 1)
+
+        # the store is reopened as it was left
+        with ArchitectureStore(self.database) as store:
+            self.assertEqual(len(store), 1)
+            self.assertEqual(store.remove("Blockinger"), 1)
+            self.assertEqual(store.connection.execute("SELECT COUNT(*) FROM links").fetchone()[0], 0)
+
+    def test_batch(self):
+        jobs = build_jobs([(self.manifest, None), (os.path.join(DATA_DIR, "Blockinger", "AndroidManifest.xml"),
+                                                   [os.path.join(DATA_DIR, "Blockinger", "src")])])
+        with ArchitectureStore(self.database) as store:
+            results = run_jobs(jobs, output_dir=os.path.join(self.tmp.name, "output"), workers=2, store=store)
+            self.assertEqual([result["status"] for result in results], ["ok", "ok"])
+            self.assertTrue(all("rows" not in result for result in results))
+            self.assertEqual([app[0] for app in store.get_apps()], ["Blockinger", "boot"])
+
+
+if __name__ == '__main__':
+    unittest.main()